@@ -204,11 +204,18 @@ import numpy as np
 from pathlib import Path
 from typing import List, Dict, Optional
 from datetime import datetime
-import tiktoken
+from dataclasses import dataclass, field
 from helper_llm import create_llm_client, LLMClient
+from helper_client_registry import get_llm_client
+from helper_token_estimator import ensure_calibrated, get_token_estimator
+from helper_mecab import is_mecab_available
+from helper_text_analysis import analyze_text
+from helper_qa_executor import DEFAULT_CONCURRENCY as DEFAULT_QA_CONCURRENCY, AsyncQAExecutor
+from helper_qa_journal import QAJournal, chunk_key, write_atomic
+from helper_qa_batching import TokenBudgetPacker, estimate_output_tokens, request_output_tokens
+from helper_chunk_engine import ChunkDocument, ChunkingEngine, chunk_document, default_worker_count, get_default_analyzer
 from dotenv import load_dotenv
 import logging
-import re
 from collections import Counter
 
 # ===================================================================
@@ -306,15 +313,8 @@ class KeywordExtractor:
             logger.info("⚠️ MeCabが利用できません（正規表現モード）")
 
     def _check_mecab_availability(self) -> bool:
-        """MeCabの利用可能性をチェック"""
-        try:
-            import MeCab
-            # 実際にインスタンス化して動作確認
-            tagger = MeCab.Tagger()
-            tagger.parse("テスト")
-            return True
-        except (ImportError, RuntimeError):
-            return False
+        """MeCabの利用可能性をチェック（共有トークナイザーでプロセス内1回のみ確認）"""
+        return is_mecab_available()
 
     def extract(self, text: str, top_n: int = 5) -> List[str]:
         """
@@ -340,45 +340,16 @@ class KeywordExtractor:
 
     def _extract_with_mecab(self, text: str, top_n: int) -> List[str]:
         """MeCabを使用した複合名詞抽出"""
-        import MeCab
-
-        tagger = MeCab.Tagger()
-        node = tagger.parseToNode(text)
-
-        # 複合名詞の抽出
-        compound_buffer = []
-        compound_nouns = []
-
-        while node:
-            features = node.feature.split(',')
-            pos = features[0]  # 品詞
-
-            if pos == '名詞':
-                compound_buffer.append(node.surface)
-            else:
-                # 名詞以外が来たらバッファをフラッシュ
-                if compound_buffer:
-                    compound_noun = ''.join(compound_buffer)
-                    if len(compound_noun) > 0:
-                        compound_nouns.append(compound_noun)
-                    compound_buffer = []
-
-            node = node.next
-
-        # 最後のバッファをフラッシュ
-        if compound_buffer:
-            compound_noun = ''.join(compound_buffer)
-            if len(compound_noun) > 0:
-                compound_nouns.append(compound_noun)
+        # 複合名詞の抽出（チャンクの解析結果を共有）
+        compound_nouns = analyze_text(text).compound_nouns
 
         # フィルタリングと頻度カウント
         return self._filter_and_count(compound_nouns, top_n)
 
     def _extract_with_regex(self, text: str, top_n: int) -> List[str]:
         """正規表現を使用したキーワード抽出"""
-        # カタカナ語、漢字複合語、英数字を抽出
-        pattern = r'[ァ-ヴー]{2,}|[一-龥]{2,}|[A-Za-z]{2,}[A-Za-z0-9]*'
-        words = re.findall(pattern, text)
+        # カタカナ語、漢字複合語、英数字を抽出（チャンクの解析結果を共有）
+        words = analyze_text(text).regex_terms
 
         # フィルタリングと頻度カウント
         return self._filter_and_count(words, top_n)
@@ -420,27 +391,22 @@ def analyze_chunk_complexity(chunk_text: str, lang: str = "ja") -> Dict:
     Returns:
         複雑度指標の辞書
     """
-    tokenizer = tiktoken.get_encoding("cl100k_base")
+    # 解析結果はキーワード抽出・文分割と共有（同じチャンクを再走査しない）
+    doc = analyze_text(chunk_text)
 
     # 基本メトリクス
-    sentences = chunk_text.split('。') if lang == 'ja' else chunk_text.split('.')
-    tokens = tokenizer.encode(chunk_text)
+    sentence_count = doc.count('。' if lang == 'ja' else '.') + 1
+    token_count = doc.token_count
 
     # 専門用語の検出（簡易版）
-    if lang == 'ja':
-        # カタカナ語、漢字複合語を専門用語候補とする
-        technical_pattern = r'[ァ-ヴー]{4,}|[一-龥]{4,}'
-        technical_terms = re.findall(technical_pattern, chunk_text)
-    else:
-        # 大文字で始まる複合語、長い単語を専門用語候補とする
-        technical_pattern = r'[A-Z][a-z]+(?:[A-Z][a-z]+)+|\b\w{10,}\b'
-        technical_terms = re.findall(technical_pattern, chunk_text)
+    # ja: カタカナ語、漢字複合語 / en: 大文字で始まる複合語、長い単語
+    technical_terms = doc.technical_terms(lang)
 
     # 文の複雑度（平均文長）
-    avg_sentence_length = len(tokens) / max(len(sentences), 1)
+    avg_sentence_length = token_count / max(sentence_count, 1)
 
     # 概念密度（専門用語の頻度）
-    concept_density = len(technical_terms) / max(len(tokens), 1) * 100
+    concept_density = len(technical_terms) / max(token_count, 1) * 100
 
     # 複雑度レベルの判定
     if concept_density > 5 or avg_sentence_length > 30:
@@ -455,8 +421,8 @@ def analyze_chunk_complexity(chunk_text: str, lang: str = "ja") -> Dict:
         "technical_terms": list(set(technical_terms))[:10],  # 上位10個
         "avg_sentence_length": avg_sentence_length,
         "concept_density": concept_density,
-        "sentence_count": len(sentences),
-        "token_count": len(tokens)
+        "sentence_count": sentence_count,
+        "token_count": token_count
     }
 
 def extract_key_concepts(chunk_text: str, lang: str = "ja", top_n: int = 5) -> List[str]:
@@ -504,42 +470,16 @@ def create_semantic_chunks(text: str, lang: str = "ja", max_tokens: int = 200, c
     Returns:
         チャンクのリスト
     """
-    # SemanticCoverageを使用してセマンティック分割を実行
-    from helper_rag_qa import SemanticCoverage
-
-    semantic_analyzer = SemanticCoverage(embedding_model="gemini-embedding-001")
-
-    # 段落優先のセマンティック分割を実行
-    # prefer_paragraphs=True: 段落境界を最優先
-    # max_tokens: チャンクの最大トークン数
-    # min_tokens: 最小トークン数（小さすぎるチャンクは自動マージ）
-    # verbose=False: 詳細ログを抑制
-    semantic_chunks = semantic_analyzer.create_semantic_chunks(
-        document=text,
+    # プロセス内で共有するSemanticCoverageで段落優先のセマンティック分割を実行
+    # （文書ごとに分割器・APIクライアントを作り直さない）
+    return chunk_document(
+        get_default_analyzer(),
+        text,
         max_tokens=max_tokens,
-        min_tokens=50,  # 最小トークン数
-        prefer_paragraphs=True,  # 段落優先モード
-        verbose=False
+        min_tokens=50,  # 最小トークン数（小さすぎるチャンクは自動マージ）
+        chunk_id_prefix=chunk_id_prefix
     )
 
-    # SemanticCoverageの出力形式をa02の形式に変換
-    chunks = []
-    tokenizer = tiktoken.get_encoding("cl100k_base")
-
-    for i, semantic_chunk in enumerate(semantic_chunks):
-        chunk_text = semantic_chunk['text']
-        chunk_tokens = len(tokenizer.encode(chunk_text))
-
-        chunks.append({
-            'id': f"{chunk_id_prefix}_{i}",
-            'text': chunk_text,
-            'tokens': chunk_tokens,
-            'type': semantic_chunk.get('type', 'unknown'),  # paragraph/sentence_group/forced_split
-            'sentences': semantic_chunk.get('sentences', [])
-        })
-
-    return chunks
-
 
 # ==========================================
 # データ読み込み・前処理
@@ -756,15 +696,17 @@ def load_preprocessed_data(dataset_type: str) -> pd.DataFrame:
     return df
 
 
-def create_document_chunks(df: pd.DataFrame, dataset_type: str, max_docs: Optional[int] = None, config: Optional[Dict] = None) -> List[Dict]:
-    """DataFrameから文書チャンクを作成（セマンティック分割）
+def create_document_chunks(df: pd.DataFrame, dataset_type: str, max_docs: Optional[int] = None, config: Optional[Dict] = None,
+                           workers: Optional[int] = None) -> List[Dict]:
+    """DataFrameから文書チャンクを作成（セマンティック分割、プロセス並列）
     Args:
         df: データフレーム
         dataset_type: データセットタイプ
         max_docs: 処理する最大文書数
         config: データセット設定（指定がない場合はDATASET_CONFIGSから取得）
+        workers: チャンク分割のワーカープロセス数（None=CHUNK_WORKERS またはCPUコア数）
     Returns:
-        チャンクのリスト
+        チャンクのリスト（文書順、チャンクIDは文書ID + 文書内の連番）
     """
     if config is None:
         config = DATASET_CONFIGS.get(dataset_type)
@@ -774,110 +716,120 @@ def create_document_chunks(df: pd.DataFrame, dataset_type: str, max_docs: Option
     text_col = config["text_column"]
     title_col = config.get("title_column")
     chunk_size = config["chunk_size"]
-    lang = config["lang"]
-
-    all_chunks = []
 
     # 処理する文書数を制限
     docs_to_process = df.head(max_docs) if max_docs else df
-
-    logger.info(f"チャンク作成開始: {len(docs_to_process)}件の文書（セマンティック分割）")
-
     total_docs = len(docs_to_process)
-    for i, (idx, row) in enumerate(docs_to_process.iterrows()):
-        # 進捗ログ（10件ごと）
-        if (i + 1) % 10 == 0 or (i + 1) == total_docs:
-            logger.info(f"  チャンク作成進捗: {i + 1}/{total_docs} 文書完了")
 
-        # row[text_col]はSeriesやオブジェクトの可能性があるため、明示的にstrに変換
-        text = str(row[text_col]) if pd.notna(row[text_col]) else ""
-
-        # タイトルがある場合は含める
-        if title_col and title_col in row and pd.notna(row[title_col]):
-            doc_id = f"{dataset_type}_{idx}_{str(row[title_col])[:30]}"
-        else:
-            doc_id = f"{dataset_type}_{idx}"
-
-        # セマンティック分割によるチャンク作成を使用
-        try:
-            chunk_id_prefix = f"{doc_id}_chunk"
-            chunks = create_semantic_chunks(
-                text=text,
-                lang=lang,
-                max_tokens=chunk_size,
-                chunk_id_prefix=chunk_id_prefix
-            )
-
-            # 各チャンクにメタデータを追加
-            for i, chunk in enumerate(chunks):
-                chunk['doc_id'] = doc_id
-                chunk['doc_idx'] = idx
-                chunk['chunk_idx'] = i
-                chunk['dataset_type'] = dataset_type
-                all_chunks.append(chunk)
+    # 文書が少ない場合はプロセス起動のコストが上回るため同一プロセスで実行
+    docs_per_task = 16
+    if workers is None:
+        workers = default_worker_count()
+    if total_docs < docs_per_task * 2:
+        workers = 1
+
+    logger.info(f"チャンク作成開始: {total_docs}件の文書（セマンティック分割, workers={workers}）")
+
+    def iter_docs():
+        texts = docs_to_process[text_col]
+        titles = docs_to_process[title_col] if title_col and title_col in docs_to_process.columns else None
+        for pos, (idx, raw_text) in enumerate(texts.items()):
+            # 値はSeriesやオブジェクトの可能性があるため、明示的にstrに変換
+            text = str(raw_text) if pd.notna(raw_text) else ""
+
+            # タイトルがある場合は含める
+            title = titles.iat[pos] if titles is not None else None
+            if title is not None and pd.notna(title):
+                doc_id = f"{dataset_type}_{idx}_{str(title)[:30]}"
+            else:
+                doc_id = f"{dataset_type}_{idx}"
+            yield ChunkDocument(doc_id=doc_id, doc_idx=idx, text=text)
 
-        except Exception as e:
-            logger.warning(f"チャンク作成エラー (doc {idx}): {e}")
-            continue
+    engine = ChunkingEngine(max_tokens=chunk_size, min_tokens=50, workers=workers, docs_per_task=docs_per_task)
+    all_chunks = []
+    for done, (doc, chunks) in enumerate(engine.iter_documents(iter_docs()), 1):
+        # 各チャンクにメタデータを追加
+        for i, chunk in enumerate(chunks):
+            chunk['doc_id'] = doc.doc_id
+            chunk['doc_idx'] = doc.doc_idx
+            chunk['chunk_idx'] = i
+            chunk['dataset_type'] = dataset_type
+            all_chunks.append(chunk)
+
+        # 進捗ログ（100件ごと）
+        if done % 100 == 0 or done == total_docs:
+            logger.info(f"  チャンク作成進捗: {done}/{total_docs} 文書完了")
 
     logger.info(f"チャンク作成完了: {len(all_chunks)}個のチャンク（セマンティック分割）")
     return all_chunks
 
 
-def merge_small_chunks(chunks: List[Dict], min_tokens: int = 150, max_tokens: int = 400) -> List[Dict]:
+# 統合時の区切りとそのトークン数（cl100k_base で "\n\n" は1トークン）
+MERGE_SEPARATOR = "\n\n"
+MERGE_SEPARATOR_TOKENS = 1
+
+
+def merge_small_chunks(chunks: List[Dict], min_tokens: int = 150, max_tokens: int = 400,
+                       num_threads: Optional[int] = None) -> List[Dict]:
     """小さいチャンクを統合して適切なサイズにする
+    トークン数はチャンク作成時の chunk['tokens'] を使い（未計測のチャンクのみまとめて計測）、
+    統合中のチャンクは各部分のトークン数の累計で判定する（テキストを再エンコードしない）。
     Args:
         chunks: チャンクのリスト
         min_tokens: このトークン数未満のチャンクは統合対象
         max_tokens: 統合後の最大トークン数
+        num_threads: 未計測チャンクのバッチエンコードのスレッド数（None=推定器の既定値）
     Returns:
-        統合されたチャンクのリスト
+        統合されたチャンクのリスト（統合チャンクの tokens は累計値）
     """
-    tokenizer = tiktoken.get_encoding("cl100k_base")
+    if not chunks:
+        return []
+
+    token_counts = get_token_estimator().count_chunks(chunks, num_threads=num_threads)
     merged_chunks = []
     current_merge = None
+    parts: List[str] = []
+    chunk_idxs: List = []
+    current_tokens = 0
+
+    def flush() -> None:
+        if current_merge is None:
+            return
+        current_merge['text'] = MERGE_SEPARATOR.join(parts)
+        current_merge['tokens'] = current_tokens
+        if 'chunk_idx' in current_merge and len(chunk_idxs) > 1:
+            current_merge['chunk_idx'] = "-".join(str(idx) for idx in chunk_idxs)
+        merged_chunks.append(current_merge)
 
-    for chunk in chunks:
-        chunk_tokens = len(tokenizer.encode(chunk['text']))
-
+    for chunk, chunk_tokens in zip(chunks, token_counts):
         # 大きいチャンクはそのまま追加
         if chunk_tokens >= min_tokens:
-            if current_merge:
-                merged_chunks.append(current_merge)
-                current_merge = None
+            flush()
+            current_merge = None
             merged_chunks.append(chunk)
-        else:
-            # 小さいチャンクは統合候補
-            if current_merge is None:
-                current_merge = chunk.copy()
-                current_merge['merged'] = True
-                current_merge['original_chunks'] = [chunk['id']]
-            else:
-                # 統合可能かチェック
-                merge_tokens = len(tokenizer.encode(current_merge['text']))
-                if merge_tokens + chunk_tokens <= max_tokens:
-                    # 同じ文書からのチャンクのみ統合
-                    if current_merge.get('doc_id') == chunk.get('doc_id'):
-                        current_merge['text'] += "\n\n" + chunk['text']
-                        current_merge['original_chunks'].append(chunk['id'])
-                        if 'chunk_idx' in current_merge:
-                            current_merge['chunk_idx'] = f"{current_merge['chunk_idx']}-{chunk['chunk_idx']}"
-                    else:
-                        # 異なる文書の場合は別々に
-                        merged_chunks.append(current_merge)
-                        current_merge = chunk.copy()
-                        current_merge['merged'] = True
-                        current_merge['original_chunks'] = [chunk['id']]
-                else:
-                    # サイズオーバーの場合は現在の統合を追加して新規開始
-                    merged_chunks.append(current_merge)
-                    current_merge = chunk.copy()
-                    current_merge['merged'] = True
-                    current_merge['original_chunks'] = [chunk['id']]
+            continue
+
+        # 小さいチャンクは統合候補（同じ文書からのチャンクのみ、最大トークン数まで）
+        if (current_merge is not None
+                and current_tokens + chunk_tokens <= max_tokens
+                and current_merge.get('doc_id') == chunk.get('doc_id')):
+            parts.append(chunk['text'])
+            chunk_idxs.append(chunk.get('chunk_idx'))
+            current_merge['original_chunks'].append(chunk['id'])
+            current_tokens += MERGE_SEPARATOR_TOKENS + chunk_tokens
+            continue
+
+        # 異なる文書・サイズオーバーの場合は現在の統合を追加して新規開始
+        flush()
+        current_merge = chunk.copy()
+        current_merge['merged'] = True
+        current_merge['original_chunks'] = [chunk['id']]
+        parts = [chunk['text']]
+        chunk_idxs = [chunk.get('chunk_idx')]
+        current_tokens = chunk_tokens
 
     # 最後の統合チャンクを追加
-    if current_merge:
-        merged_chunks.append(current_merge)
+    flush()
 
     logger.info(f"チャンク統合: {len(chunks)}個 → {len(merged_chunks)}個 ({100*(1-len(merged_chunks)/len(chunks)):.1f}%削減)")
     return merged_chunks
@@ -887,17 +839,25 @@ def merge_small_chunks(chunks: List[Dict], min_tokens: int = 150, max_tokens: in
 # Q/Aペア生成
 # ==========================================
 
-def determine_qa_count(chunk: Dict, config: Dict) -> int:
+def determine_qa_count(
+    chunk: Dict,
+    config: Dict,
+    model: str = "gemini-2.0-flash",
+    token_count: Optional[int] = None
+) -> int:
     """チャンクに最適なQ/A数を決定（改善版：動的調整）
     Args:
         chunk: チャンクデータ
         config: データセット設定
+        model: トークン数推定の対象となるLLM生成モデル
+        token_count: 推定済みトークン数（Noneの場合はローカル推定器で計測）
     Returns:
         Q/Aペア数
     """
     base_count = config["qa_per_chunk"]
-    client_for_token_count = create_llm_client(provider="gemini", default_model=model) # modelはLLM生成モデル
-    token_count = client_for_token_count.count_tokens(chunk['text'], model=model)
+    if token_count is None:
+        # ローカル推定（リモートのcount_tokensは呼ばない）
+        token_count = get_token_estimator().count(chunk['text'], model=model)
 
     # チャンク位置を考慮（文書後半の補正）
     chunk_position = chunk.get('chunk_idx', 0)
@@ -921,30 +881,51 @@ def determine_qa_count(chunk: Dict, config: Dict) -> int:
     return min(qa_count, 8)  # 上限を8に設定
 
 
+def plan_qa_counts(chunks: List[Dict], config: Dict, model: str = "gemini-2.0-flash") -> List[int]:
+    """チャンクリスト全体のQ/A数を一括決定（トークン数はバッチでローカル推定）
+    Args:
+        chunks: チャンクデータのリスト
+        config: データセット設定
+        model: トークン数推定の対象となるLLM生成モデル
+    Returns:
+        チャンクごとのQ/Aペア数（入力順）
+    """
+    token_counts = get_token_estimator().count_batch([c['text'] for c in chunks], model=model)
+    return [
+        determine_qa_count(chunk, config, model, token_count=tokens)
+        for chunk, tokens in zip(chunks, token_counts)
+    ]
+
+
 def generate_qa_pairs_for_batch(
     chunks: List[Dict],
     config: Dict,
     model: str = "gemini-2.0-flash",
-    client: Optional[LLMClient] = None
+    client: Optional[LLMClient] = None,
+    qa_counts: Optional[List[int]] = None
 ) -> List[Dict]:
     """複数チャンクから一度にQ/Aペアを生成（バッチ処理対応）
     Args:
-        chunks: チャンクデータのリスト（1-5個）
+        chunks: チャンクデータのリスト（TokenBudgetPacker でトークン予算内に詰め込んだもの）
         config: データセット設定
         model: 使用するモデル（デフォルト: gemini-2.0-flash）
         client: LLMクライアント（GeminiClient）
+        qa_counts: チャンクごとのQ/A数（Noneの場合は plan_qa_counts で決定）
     Returns:
         生成されたQ/Aペアのリスト
     """
     if client is None:
-        client = create_llm_client(provider="gemini")
+        client = get_llm_client(provider="gemini")
 
     if len(chunks) == 0:
         return []
 
+    if qa_counts is None:
+        qa_counts = plan_qa_counts(chunks, config, model)
+
     # 単一チャンクの場合は従来の処理
     if len(chunks) == 1:
-        return generate_qa_pairs_for_chunk(chunks[0], config, model, client)
+        return generate_qa_pairs_for_chunk(chunks[0], config, model, client, num_pairs=qa_counts[0])
 
     lang = config["lang"]
     all_qa_pairs = []
@@ -962,20 +943,14 @@ def generate_qa_pairs_for_batch(
 
         # 複数チャンクを結合してプロンプト構築
         combined_text = ""
-        chunks_data = {}
         total_pairs = 0
 
         for i, chunk in enumerate(chunks, 1):
-            num_pairs = determine_qa_count(chunk, config)
+            num_pairs = qa_counts[i - 1]
             total_pairs += num_pairs
             chunk_text = chunk['text']
 
-            # 長すぎる場合は短縮
-            if len(chunk_text) > 1000:
-                chunk_text = chunk_text[:1000] + "..."
-
-            combined_text += f"\n\n【テキスト{i}】\n{chunk_text}"
-            chunks_data[f"chunk_{i}"] = {"num_pairs": num_pairs, "chunk": chunk}
+            combined_text += f"\n\n【テキスト{i}】（{num_pairs}個）\n{chunk_text}"
 
         user_prompt = f"""以下の{len(chunks)}個のテキストから、合計{total_pairs}個のQ&Aペアを生成してください。
 {combined_text}
@@ -986,13 +961,16 @@ def generate_qa_pairs_for_batch(
 - comparison: 比較型（〜と〜の違いは？）
 - application: 応用型（〜はどのように活用されますか？）
 
+各Q&Aの text_index には、元にしたテキストの番号（【テキストN】のN）を入れてください。
+
 JSON形式で出力:
 {{
   "qa_pairs": [
     {{
       "question": "質問文",
       "answer": "回答文",
-      "question_type": "fact/reason/comparison/application"
+      "question_type": "fact/reason/comparison/application",
+      "text_index": 1
     }}
   ]
 }}"""
@@ -1009,20 +987,14 @@ Generation rules:
 
         # 複数チャンクを結合してプロンプト構築
         combined_text = ""
-        chunks_data = {}
         total_pairs = 0
 
         for i, chunk in enumerate(chunks, 1):
-            num_pairs = determine_qa_count(chunk, config)
+            num_pairs = qa_counts[i - 1]
             total_pairs += num_pairs
             chunk_text = chunk['text']
 
-            # 長すぎる場合は短縮
-            if len(chunk_text) > 1000:
-                chunk_text = chunk_text[:1000] + "..."
-
-            combined_text += f"\n\n【Text {i}】\n{chunk_text}"
-            chunks_data[f"chunk_{i}"] = {"num_pairs": num_pairs, "chunk": chunk}
+            combined_text += f"\n\n【Text {i}】 ({num_pairs} pairs)\n{chunk_text}"
 
         user_prompt = f"""Generate {total_pairs} Q&A pairs from the following {len(chunks)} texts.
 {combined_text}
@@ -1033,13 +1005,16 @@ Question types:
 - comparison: Comparative questions (What's the difference...?)
 - application: Application questions (How is... used?)
 
+Set text_index of each Q&A to the number of the text it was generated from (N in 【Text N】).
+
 Output in JSON format:
 {{
   "qa_pairs": [
     {{
       "question": "question text",
       "answer": "answer text",
-      "question_type": "fact/reason/comparison/application"
+      "question_type": "fact/reason/comparison/application",
+      "text_index": 1
     }}
   ]
 }}"""
@@ -1054,31 +1029,32 @@ Output in JSON format:
             prompt=combined_input,
             response_schema=QAPairsResponse,
             model=model,
-            max_output_tokens=4000  # バッチ処理のため増加（3チャンク対応）
+            # 見込みの出力トークン数に余裕を持たせ、モデルの出力上限で抑える
+            max_output_tokens=request_output_tokens(model, total_pairs)
         )
 
-        # 生成されたQ/Aペアを各チャンクに分配
-        # 各チャンクに期待される数だけQ/Aを割り当て
-        qa_index = 0
-        for i, chunk in enumerate(chunks, 1):
-            chunk_key = f"chunk_{i}"
-            expected_pairs = chunks_data[chunk_key]["num_pairs"]
-
-            # このチャンクに割り当てるQ/Aペアを取得
-            for _ in range(expected_pairs):
-                if qa_index < len(parsed_data.qa_pairs):
-                    qa_data = parsed_data.qa_pairs[qa_index]
-                    qa = {
-                        "question": qa_data.question,
-                        "answer": qa_data.answer,
-                        "question_type": qa_data.question_type,
-                        "source_chunk_id": chunk.get('id', ''),
-                        "doc_id": chunk.get('doc_id', ''),
-                        "dataset_type": chunk.get('dataset_type', ''),
-                        "chunk_idx": chunk.get('chunk_idx', 0)
-                    }
-                    all_qa_pairs.append(qa)
-                    qa_index += 1
+        # 生成されたQ/Aペアを text_index（【テキストN】のN）で元のチャンクに割り当て
+        # 番号のないQ/Aは元チャンクを特定できないため採用しない
+        unattributed = 0
+        for qa_data in parsed_data.qa_pairs:
+            index = qa_data.text_index
+            if index is None or not 1 <= index <= len(chunks):
+                unattributed += 1
+                continue
+            chunk = chunks[index - 1]
+            qa = {
+                "question": qa_data.question,
+                "answer": qa_data.answer,
+                "question_type": qa_data.question_type,
+                "source_chunk_id": chunk.get('id', ''),
+                "doc_id": chunk.get('doc_id', ''),
+                "dataset_type": chunk.get('dataset_type', ''),
+                "chunk_idx": chunk.get('chunk_idx', 0)
+            }
+            all_qa_pairs.append(qa)
+
+        if unattributed:
+            logger.warning(f"元テキストの番号がないQ/Aを{unattributed}件除外しました（{len(chunks)}チャンクのバッチ）")
 
         # 空レスポンスチェック
         if len(all_qa_pairs) == 0:
@@ -1093,9 +1069,9 @@ Output in JSON format:
         logger.debug(f"スタックトレース: {traceback.format_exc()}")
         # フォールバック: 個別処理
         logger.info("フォールバック: チャンクを個別処理します")
-        for chunk in chunks:
+        for chunk, num_pairs in zip(chunks, qa_counts):
             try:
-                qa_pairs = generate_qa_pairs_for_chunk(chunk, config, model, client)
+                qa_pairs = generate_qa_pairs_for_chunk(chunk, config, model, client, num_pairs=num_pairs)
                 all_qa_pairs.extend(qa_pairs)
             except Exception as chunk_error:
                 logger.error(f"チャンク個別処理エラー: {chunk_error}")
@@ -1106,7 +1082,8 @@ def generate_qa_pairs_for_chunk(
     chunk: Dict,
     config: Dict,
     model: str = "gemini-2.0-flash",
-    client: Optional[LLMClient] = None
+    client: Optional[LLMClient] = None,
+    num_pairs: Optional[int] = None
 ) -> List[Dict]:
     """単一チャンクからQ/Aペアを生成
     Args:
@@ -1114,13 +1091,15 @@ def generate_qa_pairs_for_chunk(
         config: データセット設定
         model: 使用するモデル（デフォルト: gemini-2.0-flash）
         client: LLMクライアント（GeminiClient）
+        num_pairs: Q/A数（Noneの場合は determine_qa_count で決定）
     Returns:
         生成されたQ/Aペアのリスト
     """
     if client is None:
-        client = create_llm_client(provider="gemini")
+        client = get_llm_client(provider="gemini")
 
-    num_pairs = determine_qa_count(chunk, config)
+    if num_pairs is None:
+        num_pairs = determine_qa_count(chunk, config, model)
     lang = config["lang"]
 
     # 言語別のプロンプト設定
@@ -1196,53 +1175,6 @@ Output in JSON format:
 }}"""
 
     try:
-        # チャンクが長すぎる場合は短縮（日本語テキストは長い傾向があるため）
-        max_chunk_length = 2000  # 文字数制限
-        chunk_text = chunk['text']
-        if len(chunk_text) > max_chunk_length:
-            chunk_text = chunk_text[:max_chunk_length] + "..."
-            logger.debug(f"チャンクを{max_chunk_length}文字に短縮")
-
-        # プロンプトの再構築（短縮されたテキストを使用）
-        if lang == "ja":
-            user_prompt = f"""以下のテキストから{num_pairs}個のQ&Aペアを生成してください。
-
-質問タイプ:
-{question_types_desc}
-
-テキスト:
-{chunk_text}
-
-JSON形式で出力:
-{{
-  "qa_pairs": [
-    {{
-      "question": "質問文",
-      "answer": "回答文",
-      "question_type": "fact/reason/comparison/application"
-    }}
-  ]
-}}"""
-        else:
-            user_prompt = f"""Generate {num_pairs} Q&A pairs from the following text.
-
-Question types:
-{question_types_desc}
-
-Text:
-{chunk_text}
-
-Output in JSON format:
-{{
-  "qa_pairs": [
-    {{
-      "question": "question text",
-      "answer": "answer text",
-      "question_type": "fact/reason/comparison/application"
-    }}
-  ]
-}}"""
-
         # Gemini API を使用（構造化出力）
         combined_input = f"{system_prompt}\n\n{user_prompt}"
 
@@ -1251,7 +1183,7 @@ Output in JSON format:
             prompt=combined_input,
             response_schema=QAPairsResponse,
             model=model,
-            max_output_tokens=1000
+            max_output_tokens=request_output_tokens(model, num_pairs, batch=False)
         )
 
         # レスポンスの解析
@@ -1286,32 +1218,38 @@ def generate_qa_for_dataset(
     chunks: List[Dict],
     dataset_type: str,
     model: str = "gemini-2.0-flash",
-    chunk_batch_size: int = 3,
+    chunk_batch_size: Optional[int] = None,
     merge_chunks: bool = True,
     min_tokens: int = 150,
     max_tokens: int = 400,
-    config: Optional[Dict] = None
+    config: Optional[Dict] = None,
+    concurrency: Optional[int] = None,
+    journal: Optional[QAJournal] = None,
+    token_budget: Optional[int] = None
 ) -> List[Dict]:
     """データセット全体のQ/Aペア生成（改善版）
     Args:
         chunks: チャンクリスト
         dataset_type: データセットタイプ
         model: 使用するモデル（デフォルト: gemini-2.0-flash）
-        chunk_batch_size: 1回のAPIで処理するチャンク数（1-5）
+        chunk_batch_size: 1回のAPIで処理する最大チャンク数（None=トークン予算まで詰め込む）
         merge_chunks: 小さいチャンクを統合するか
         min_tokens: 統合対象の最小トークン数
         max_tokens: 統合後の最大トークン数
         config: データセット設定（指定がない場合はDATASET_CONFIGSから取得）
+        concurrency: 同時に実行するAPI呼び出し数（None=QA_CONCURRENCY または 4、1=逐次）
+        journal: Q/A生成ジャーナル（完了済みチャンクを飛ばし、完了次第Q/Aを追記）
+        token_budget: 1回のAPIの入力 + 出力トークン予算（None=QA_BATCH_TOKEN_BUDGET またはモデル上限）
     Returns:
-        生成されたQ/Aペアのリスト
+        生成されたQ/Aペアのリスト（チャンクの入力順、journal 指定時は完了済みチャンクのQ/Aを含む）
     """
     if config is None:
         config = DATASET_CONFIGS.get(dataset_type)
         if not config:
             raise ValueError(f"未対応のデータセット: {dataset_type}")
 
-    client = create_llm_client(provider="gemini")
-    all_qa_pairs = []
+    client = get_llm_client(provider="gemini")
+    concurrency = concurrency or DEFAULT_QA_CONCURRENCY
 
     # チャンクの前処理（小さいチャンクの統合）
     if merge_chunks:
@@ -1319,67 +1257,63 @@ def generate_qa_for_dataset(
     else:
         processed_chunks = chunks
 
+    # 再開時は未完了（未処理・失敗・本文変更）のチャンクだけを詰め込み直す
     total_chunks = len(processed_chunks)
-    api_calls = (total_chunks + chunk_batch_size - 1) // chunk_batch_size
+    todo_chunks = journal.pending(processed_chunks) if journal is not None else processed_chunks
+    if len(todo_chunks) < total_chunks:
+        logger.info(f"ジャーナルから再開: 完了済み {total_chunks - len(todo_chunks)}チャンクをスキップ")
+
+    # チャンクごとのQ/A数を決め、トークン予算まで1リクエストに詰め込む
+    token_counts = get_token_estimator().count_chunks(todo_chunks, model=model)
+    qa_counts = [
+        determine_qa_count(chunk, config, model, token_count=tokens)
+        for chunk, tokens in zip(todo_chunks, token_counts)
+    ]
+    packer = TokenBudgetPacker(model, token_budget=token_budget, max_chunks=chunk_batch_size)
+    packed = packer.pack(todo_chunks, qa_counts, token_counts)
+    api_calls = len(packed)
+    # バッチ（チャンクのリスト）→ チャンクごとのQ/A数
+    qa_counts_by_batch = {tuple(id(c) for c in b.chunks): b.qa_counts for b in packed}
 
     logger.info(f"""
     Q/Aペア生成開始:
     - 元チャンク数: {len(chunks)}
-    - 処理チャンク数: {total_chunks}
-    - バッチサイズ: {chunk_batch_size}
+    - 処理チャンク数: {total_chunks}（未完了: {len(todo_chunks)}）
+    - 最大バッチサイズ: {chunk_batch_size or '制限なし'}（トークン予算: {packer.token_budget}）
     - API呼び出し予定: {api_calls}回
+    - 同時実行数: {concurrency}
     - モデル: {model}
     """)
 
-    # バッチ処理
-    for i in range(0, total_chunks, chunk_batch_size):
-        batch = processed_chunks[i:i+chunk_batch_size]
-        batch_num = i // chunk_batch_size + 1
-        total_batches = api_calls
-
-        logger.info(f"バッチ {batch_num}/{total_batches} 処理中 ({len(batch)}チャンク)...")
-
-        # リトライ機能付きQ/A生成
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                if chunk_batch_size == 1:
-                    # 単一チャンク処理
-                    qa_pairs = generate_qa_pairs_for_chunk(batch[0], config, model, client)
-                else:
-                    # バッチ処理
-                    qa_pairs = generate_qa_pairs_for_batch(batch, config, model, client)
+    def batch_qa_counts(batch: List[Dict]) -> List[int]:
+        return qa_counts_by_batch[tuple(id(c) for c in batch)]
 
-                if qa_pairs:
-                    all_qa_pairs.extend(qa_pairs)
-                    logger.debug(f"バッチ {batch_num}: {len(qa_pairs)}個のQ/Aペア生成")
-                break
+    def generate_batch(batch: List[Dict]) -> List[Dict]:
+        # 単一チャンクは個別処理、複数チャンクはバッチ処理（失敗時は関数内で個別処理にフォールバック）
+        return generate_qa_pairs_for_batch(batch, config, model, client, qa_counts=batch_qa_counts(batch))
 
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    logger.error(f"バッチ {batch_num} 生成失敗: {e}")
-                    # 最終試行失敗時は個別処理にフォールバック
-                    logger.info("個別処理にフォールバック...")
-                    for chunk in batch:
-                        try:
-                            qa_pairs = generate_qa_pairs_for_chunk(chunk, config, model, client)
-                            if qa_pairs:
-                                all_qa_pairs.extend(qa_pairs)
-                        except Exception as chunk_error:
-                            logger.error(f"チャンク処理エラー: {chunk_error}")
-                else:
-                    wait_time = 2 ** attempt
-                    logger.warning(f"リトライ {attempt + 1}/{max_retries} (待機: {wait_time}秒)")
-                    time.sleep(wait_time)
+    def on_batch_done(index: int, qa_pairs: List[Dict]) -> None:
+        logger.info(f"バッチ {index + 1}/{api_calls} 完了: {len(qa_pairs)}個のQ/Aペア")
 
-        # API制限対策（最後のバッチ以外で待機）
-        if i + chunk_batch_size < total_chunks:
-            time.sleep(0.2)  # 短縮（バッチ処理により呼び出し数が減っているため）
+    # 同時実行・レート制限（RPM/TPM）・リトライ・ジャーナルへの記録は実行器が担当
+    executor = AsyncQAExecutor(
+        generate_batch,
+        concurrency=concurrency,
+        provider="gemini",
+        model=model,
+        output_tokens_fn=lambda batch: estimate_output_tokens(sum(batch_qa_counts(batch))),
+        journal=journal
+    )
+    batches = (b.chunks for b in packed)
+    all_qa_pairs = executor.run(batches, progress_callback=on_batch_done)
+    if journal is not None:
+        # 完了済みチャンクのQ/Aも含め、チャンクの入力順に並べ直す
+        all_qa_pairs = journal.all_pairs(processed_chunks)
 
     logger.info(f"""
     Q/Aペア生成完了:
     - 生成されたQ/Aペア: {len(all_qa_pairs)}個
-    - 実行されたAPI呼び出し: 約{api_calls}回
+    - 実行されたAPI呼び出し: 約{executor.stats.generated}バッチ分（再開でスキップ: {executor.stats.resumed}）
     """)
 
     return all_qa_pairs
@@ -1496,11 +1430,97 @@ def get_optimal_thresholds(dataset_type: str) -> Dict[str, float]:
     })
 
 
-def multi_threshold_coverage(coverage_matrix: np.ndarray, chunks: List[Dict],
+@dataclass
+class CoverageSummary:
+    """カバレージ行列のチャンク単位の要約（N×Mの密行列は保持しない）
+
+    Attributes:
+        max_similarities: 各チャンクの最大類似度 (N,) float32
+        best_qa_indices: 最大類似度を与えるQ/Aペアのインデックス (N,)
+        threshold_counts: 閾値レベル別の「閾値以上のQ/A数」 {level: (N,) int}
+        thresholds: 集計に使用した閾値辞書
+    """
+    max_similarities: np.ndarray
+    best_qa_indices: np.ndarray
+    threshold_counts: Dict[str, np.ndarray] = field(default_factory=dict)
+    thresholds: Dict[str, float] = field(default_factory=dict)
+
+
+def _normalize_rows_float32(embeddings) -> np.ndarray:
+    """埋め込み行列をfloat32に変換してL2正規化（ゼロベクトルはそのまま）"""
+    matrix = np.array(embeddings, dtype=np.float32, copy=True)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(matrix), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def compute_coverage_summary(
+    doc_embeddings,
+    qa_embeddings,
+    thresholds: Optional[Dict[str, float]] = None,
+    row_block_size: int = 1024,
+    col_block_size: int = 8192
+) -> CoverageSummary:
+    """ブロック行列積によるカバレージ計算（float32・タイル単位）
+
+    チャンク×Q/Aのコサイン類似度をタイルごとに計算し、行方向の最大値・argmax・
+    閾値別ヒット数だけを保持する。密なN×M行列は一度も生成しない。
+
+    Args:
+        doc_embeddings: チャンク埋め込み (N, D)
+        qa_embeddings: Q/A埋め込み (M, D)
+        thresholds: 閾値辞書 {level: threshold}
+        row_block_size: チャンク方向のタイルサイズ
+        col_block_size: Q/A方向のタイルサイズ
+
+    Returns:
+        CoverageSummary
+    """
+    thresholds = thresholds or {}
+    docs = _normalize_rows_float32(doc_embeddings)
+    qas = _normalize_rows_float32(qa_embeddings)
+
+    n_docs = docs.shape[0]
+    n_qas = qas.shape[0]
+
+    max_similarities = np.full(n_docs, -np.inf if n_qas else 0.0, dtype=np.float32)
+    best_qa_indices = np.full(n_docs, -1, dtype=np.int64)
+    threshold_counts = {level: np.zeros(n_docs, dtype=np.int64) for level in thresholds}
+
+    for row_start in range(0, n_docs, row_block_size):
+        row_end = min(row_start + row_block_size, n_docs)
+        doc_tile = docs[row_start:row_end]
+        row_max = max_similarities[row_start:row_end]
+        row_best = best_qa_indices[row_start:row_end]
+
+        for col_start in range(0, n_qas, col_block_size):
+            col_end = min(col_start + col_block_size, n_qas)
+            sims = doc_tile @ qas[col_start:col_end].T
+
+            tile_best = sims.argmax(axis=1)
+            tile_max = sims[np.arange(sims.shape[0]), tile_best]
+            improved = tile_max > row_max
+            row_max[improved] = tile_max[improved]
+            row_best[improved] = tile_best[improved] + col_start
+
+            for level, threshold in thresholds.items():
+                threshold_counts[level][row_start:row_end] += (sims >= threshold).sum(axis=1)
+
+    return CoverageSummary(
+        max_similarities=max_similarities,
+        best_qa_indices=best_qa_indices,
+        threshold_counts=threshold_counts,
+        thresholds=dict(thresholds)
+    )
+
+
+def multi_threshold_coverage(coverage: CoverageSummary, chunks: List[Dict],
                              qa_pairs: List[Dict], thresholds: Dict[str, float]) -> Dict:
     """複数閾値でカバレージを評価
     Args:
-        coverage_matrix: カバレージ行列
+        coverage: compute_coverage_summary()のチャンク単位要約
         chunks: チャンクリスト
         qa_pairs: Q/Aペアリスト
         thresholds: 閾値辞書
@@ -1508,20 +1528,25 @@ def multi_threshold_coverage(coverage_matrix: np.ndarray, chunks: List[Dict],
         多段階カバレージ結果
     """
     results = {}
-    max_similarities = coverage_matrix.max(axis=1)
+    max_similarities = coverage.max_similarities
 
     for level, threshold in thresholds.items():
-        covered = sum(1 for s in max_similarities if s >= threshold)
+        counts = coverage.threshold_counts.get(level)
+        if counts is not None and coverage.thresholds.get(level) == threshold:
+            covered_mask = counts > 0
+        else:
+            covered_mask = max_similarities >= threshold
+
         uncovered_chunks = [
             {
                 "chunk_id": chunks[i].get("id", f"chunk_{i}"),
                 "similarity": float(max_similarities[i]),
                 "gap": float(threshold - max_similarities[i])
             }
-            for i, sim in enumerate(max_similarities)
-            if sim < threshold
+            for i in np.flatnonzero(~covered_mask)
         ]
 
+        covered = int(covered_mask.sum())
         results[level] = {
             "threshold": threshold,
             "covered_chunks": covered,
@@ -1529,22 +1554,27 @@ def multi_threshold_coverage(coverage_matrix: np.ndarray, chunks: List[Dict],
             "uncovered_count": len(uncovered_chunks),
             "uncovered_chunks": uncovered_chunks
         }
+        if counts is not None:
+            # 閾値以上の類似度を持つQ/A数の平均（チャンクあたり）
+            results[level]["avg_matching_qa"] = float(counts.mean()) if len(counts) else 0.0
 
     return results
 
 
-def analyze_chunk_characteristics_coverage(chunks: List[Dict], coverage_matrix: np.ndarray,
+def analyze_chunk_characteristics_coverage(chunks: List[Dict], coverage: CoverageSummary,
                                           qa_pairs: List[Dict], threshold: float = 0.7) -> Dict:
     """チャンク特性別のカバレージ分析
     Args:
         chunks: チャンクリスト
-        coverage_matrix: カバレージ行列
+        coverage: compute_coverage_summary()のチャンク単位要約
         qa_pairs: Q/Aペアリスト
         threshold: 判定閾値
     Returns:
         チャンク特性別カバレージ結果
     """
-    tokenizer = tiktoken.get_encoding("cl100k_base")
+    # チャンク作成時に計測済みのトークン数を再利用
+    token_counts = get_token_estimator().count_chunks(chunks)
+    max_similarities = coverage.max_similarities
     results = {
         "by_length": {},      # 長さ別
         "by_position": {},    # 位置別
@@ -1552,8 +1582,7 @@ def analyze_chunk_characteristics_coverage(chunks: List[Dict], coverage_matrix:
     }
 
     # 1. 長さ別分析
-    for i, chunk in enumerate(chunks):
-        token_count = len(tokenizer.encode(chunk['text']))
+    for i, token_count in enumerate(token_counts):
         length_category = (
             "short" if token_count < 100 else
             "medium" if token_count < 200 else
@@ -1568,7 +1597,7 @@ def analyze_chunk_characteristics_coverage(chunks: List[Dict], coverage_matrix:
                 "similarities": []
             }
 
-        max_sim = coverage_matrix[i].max()
+        max_sim = max_similarities[i]
         results["by_length"][length_category]["count"] += 1
         results["by_length"][length_category]["similarities"].append(float(max_sim))
 
@@ -1600,7 +1629,7 @@ def analyze_chunk_characteristics_coverage(chunks: List[Dict], coverage_matrix:
                 "similarities": []
             }
 
-        max_sim = coverage_matrix[i].max()
+        max_sim = max_similarities[i]
         results["by_position"][position]["count"] += 1
         results["by_position"][position]["similarities"].append(float(max_sim))
 
@@ -1678,14 +1707,6 @@ def analyze_coverage(chunks: List[Dict], qa_pairs: List[Dict], dataset_type: str
             "chunk_analysis": {}
         }
 
-    # カバレージ行列計算
-    logger.info("カバレージ行列計算中...")
-    coverage_matrix = np.zeros((len(chunks), len(qa_pairs)))
-    for i in range(len(doc_embeddings)):
-        for j in range(len(qa_embeddings)):
-            similarity = analyzer.cosine_similarity(doc_embeddings[i], qa_embeddings[j])
-            coverage_matrix[i, j] = similarity
-
     # データセット別最適閾値を取得
     thresholds = get_optimal_thresholds(dataset_type)
 
@@ -1696,9 +1717,14 @@ def analyze_coverage(chunks: List[Dict], qa_pairs: List[Dict], dataset_type: str
     else:
         standard_threshold = thresholds["standard"]
 
+    # カバレージ計算（ブロック行列積・float32、密行列は生成しない）
+    logger.info("カバレージ計算中（ブロック行列積）...")
+    coverage = compute_coverage_summary(doc_embeddings, qa_embeddings, thresholds)
+    del doc_embeddings, qa_embeddings
+
     # 基本カバレージ（標準閾値）
-    max_similarities = coverage_matrix.max(axis=1)
-    covered_count = sum(1 for s in max_similarities if s >= standard_threshold)
+    max_similarities = coverage.max_similarities
+    covered_count = int((max_similarities >= standard_threshold).sum())
     coverage_rate = covered_count / len(chunks) if chunks else 0
 
     # 未カバーチャンクの特定
@@ -1713,12 +1739,12 @@ def analyze_coverage(chunks: List[Dict], qa_pairs: List[Dict], dataset_type: str
 
     # 提案1の機能: 多段階カバレージ分析
     logger.info("多段階カバレージ分析実行中...")
-    multi_threshold_results = multi_threshold_coverage(coverage_matrix, chunks, qa_pairs, thresholds)
+    multi_threshold_results = multi_threshold_coverage(coverage, chunks, qa_pairs, thresholds)
 
     # 提案1の機能: チャンク特性別分析
     logger.info("チャンク特性別分析実行中...")
     chunk_characteristics = analyze_chunk_characteristics_coverage(
-        chunks, coverage_matrix, qa_pairs, standard_threshold
+        chunks, coverage, qa_pairs, standard_threshold
     )
 
     # 結果を統合
@@ -1729,6 +1755,7 @@ def analyze_coverage(chunks: List[Dict], qa_pairs: List[Dict], dataset_type: str
         "total_chunks": len(chunks),
         "uncovered_chunks": uncovered_chunks,
         "max_similarities": max_similarities.tolist(),
+        "best_qa_indices": coverage.best_qa_indices.tolist(),
         "threshold": standard_threshold,
 
         # 提案1: 多段階カバレージ
@@ -1774,6 +1801,58 @@ def analyze_coverage(chunks: List[Dict], qa_pairs: List[Dict], dataset_type: str
 # 結果保存
 # ==========================================
 
+def write_qa_snapshot(qa_pairs: List[Dict], dataset_type: str, output_dir: str = "qa_output/a02") -> None:
+    """生成途中のQ/Aをスナップショット（JSON/CSV）として書き出す（一時ファイル経由で置き換え）
+    Args:
+        qa_pairs: Q/Aペアリスト
+        dataset_type: データセットタイプ
+        output_dir: 出力ディレクトリ
+    """
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+    write_atomic(
+        str(output_path / f"qa_pairs_{dataset_type}_partial.json"),
+        json.dumps(qa_pairs, ensure_ascii=False, indent=2).encode('utf-8')
+    )
+    write_atomic(
+        str(output_path / f"qa_pairs_{dataset_type}_partial.csv"),
+        pd.DataFrame(qa_pairs).to_csv(index=False).encode('utf-8')
+    )
+    logger.info(f"途中経過を保存: {output_path}/qa_pairs_{dataset_type}_partial.json ({len(qa_pairs)}件)")
+
+
+def open_qa_journal(
+    dataset_type: str,
+    model: str,
+    output_dir: str = "qa_output/a02",
+    path: Optional[str] = None,
+    resume: bool = False,
+    compact_every: int = 500
+) -> QAJournal:
+    """Q/A生成ジャーナルを開く
+    Args:
+        dataset_type: データセットタイプ
+        model: 使用するモデル
+        output_dir: 出力ディレクトリ（スナップショットの出力先）
+        path: ジャーナルのパス（None={output_dir}/journal_{dataset_type}.jsonl）
+        resume: True=前回の続きから再開、False=既存のジャーナルを退避して新規開始
+        compact_every: 完了チャンクがこの件数増えるごとにコンパクション + スナップショット（0で無効）
+    Returns:
+        QAJournal
+    """
+    path = path or str(Path(output_dir) / f"journal_{dataset_type}.jsonl")
+    journal = QAJournal(
+        path,
+        resume=resume,
+        meta={"dataset_type": dataset_type, "model": model},
+        compact_every=compact_every,
+        snapshot_fn=lambda qa_pairs: write_qa_snapshot(qa_pairs, dataset_type, output_dir)
+    )
+    if resume and journal.completed:
+        logger.info(f"ジャーナルから再開: 完了済み {len(journal.completed)}チャンク ({path})")
+    return journal
+
+
 def save_results(
     qa_pairs: List[Dict],
     coverage_results: Dict,
@@ -1908,9 +1987,14 @@ def main():
     parser.add_argument(
         "--batch-chunks",
         type=int,
-        default=3,
-        choices=[1, 2, 3, 4, 5],
-        help="1回のAPIで処理するチャンク数（デフォルト: 3）"
+        default=None,
+        help="1回のAPIで処理する最大チャンク数（デフォルト: 制限なし、トークン予算まで詰め込む）"
+    )
+    parser.add_argument(
+        "--token-budget",
+        type=int,
+        default=None,
+        help="1回のAPIの入力 + 出力トークン予算（デフォルト: QA_BATCH_TOKEN_BUDGET またはモデル上限）"
     )
     parser.add_argument(
         "--merge-chunks",
@@ -1936,6 +2020,35 @@ def main():
         default=400,
         help="統合後の最大トークン数（デフォルト: 400）"
     )
+    parser.add_argument(
+        "--chunk-workers",
+        type=int,
+        default=None,
+        help="チャンク分割のワーカープロセス数（デフォルト: CHUNK_WORKERS またはCPUコア数）"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=None,
+        help="通常処理モードで同時に実行するAPI呼び出し数（デフォルト: QA_CONCURRENCY または 4、Celery不要）"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="ジャーナルから再開（完了済みチャンクを飛ばし、未完了・失敗チャンクのみ生成）"
+    )
+    parser.add_argument(
+        "--journal",
+        type=str,
+        default=None,
+        help="Q/A生成ジャーナル（JSONL）のパス（デフォルト: {出力先}/journal_{データセット}.jsonl）"
+    )
+    parser.add_argument(
+        "--compact-every",
+        type=int,
+        default=500,
+        help="完了チャンクがこの件数増えるごとにジャーナルを整理し途中経過を保存（デフォルト: 500、0で無効）"
+    )
     parser.add_argument(
         "--use-celery",
         action="store_true",
@@ -1947,6 +2060,11 @@ def main():
         default=8,
         help="Celeryワーカー数（デフォルト: 8, Gemini APIレート制限対策）"
     )
+    parser.add_argument(
+        "--calibrate-tokens",
+        action="store_true",
+        help="チャンクをサンプリングしてモデルのトークン補正係数を学習し直す（TOKEN_CORRECTIONS_PATH 指定時は保存）"
+    )
     parser.add_argument(
         "--coverage-threshold",
         type=float,
@@ -2035,18 +2153,35 @@ def main():
         logger.info("\n[2/4] チャンク作成...")
         # ローカルファイルの場合、max_docsは読み込み時に適用済み
         max_docs_for_chunks = None if args.input_file else args.max_docs
-        chunks = create_document_chunks(df, dataset_type, max_docs_for_chunks, config=config)
+        chunks = create_document_chunks(df, dataset_type, max_docs_for_chunks, config=config,
+                                        workers=args.chunk_workers)
 
         if not chunks:
             logger.error("チャンクが作成されませんでした")
             sys.exit(1)
 
-        # 3. Q/Aペア生成
+        # トークン補正係数（TOKEN_CORRECTIONS_PATH 指定時はモデルごとに初回だけ学習して保存）
+        try:
+            ratio = ensure_calibrated(
+                args.model, [c['text'] for c in chunks],
+                lambda text: get_llm_client(provider="gemini").count_tokens(text, model=args.model),
+                force=args.calibrate_tokens
+            )
+            if ratio is not None:
+                logger.info(f"トークン補正係数: {args.model} = {ratio:.4f}")
+        except Exception as e:
+            logger.warning(f"トークン補正係数の学習に失敗（補正なしで続行）: {e}")
+
+        # 3. Q/Aペア生成（完了したチャンクのQ/Aは完了次第ジャーナルに追記）
         logger.info("\n[3/4] Q/Aペア生成...")
+        journal = open_qa_journal(
+            dataset_type, args.model, args.output,
+            path=args.journal, resume=args.resume, compact_every=args.compact_every
+        )
 
         if args.use_celery:
             logger.info(f"Celery並列処理モード: ワーカー数={args.celery_workers}")
-            logger.info(f"オプション: バッチサイズ={args.batch_chunks}, チャンク統合={'有効' if args.merge_chunks else '無効'}")
+            logger.info(f"オプション: バッチサイズ={args.batch_chunks or 'トークン予算まで'}, チャンク統合={'有効' if args.merge_chunks else '無効'}")
 
             # Celeryタスクのインポート（Gemini対応の統合版を使用）
             from celery_tasks import submit_unified_qa_generation, collect_results
@@ -2058,19 +2193,36 @@ def main():
             else:
                 processed_chunks = chunks
 
-            # 並列タスク投入（Gemini APIを使用）
+            # 完了済みチャンクを除いて並列タスク投入（Gemini APIを使用）
+            todo_chunks = journal.pending(processed_chunks)
+            if len(todo_chunks) < len(processed_chunks):
+                logger.info(f"再開: {len(processed_chunks) - len(todo_chunks)}チャンクをスキップ、"
+                            f"{len(todo_chunks)}チャンクを投入")
             tasks = submit_unified_qa_generation(
-                processed_chunks, config, args.model, provider="gemini"
-            )
+                todo_chunks, config, args.model, provider="gemini"
+            ) if todo_chunks else []
+
+            # タスクの結果は届いた順にジャーナルへ記録
+            chunks_by_key = {chunk_key(c): c for c in todo_chunks}
+
+            def record_task_result(result: Dict) -> None:
+                chunk = chunks_by_key.get(str(result.get('chunk_id')))
+                if chunk is None:
+                    return
+                if result.get('success'):
+                    journal.record([chunk], result.get('qa_pairs', []))
+                else:
+                    journal.record_failure([chunk_key(chunk)], str(result.get('error', 'failed')))
 
             # 結果収集（タイムアウト: タスク数 × 10秒、最低600秒、最大1800秒）
             # 大量タスクの場合でも30分以内に収集完了を想定
             timeout_seconds = min(max(len(tasks) * 10, 600), 1800)
             logger.info(f"結果収集タイムアウト: {timeout_seconds}秒（{len(tasks)}タスク）")
-            qa_pairs = collect_results(tasks, timeout=timeout_seconds)
+            collect_results(tasks, timeout=timeout_seconds, on_result=record_task_result)
+            qa_pairs = journal.all_pairs(processed_chunks)
         else:
-            logger.info("通常処理モード")
-            logger.info(f"オプション: バッチサイズ={args.batch_chunks}, チャンク統合={'有効' if args.merge_chunks else '無効'}")
+            logger.info(f"通常処理モード（同時実行数: {args.concurrency or DEFAULT_QA_CONCURRENCY}）")
+            logger.info(f"オプション: バッチサイズ={args.batch_chunks or 'トークン予算まで'}, チャンク統合={'有効' if args.merge_chunks else '無効'}")
             qa_pairs = generate_qa_for_dataset(
                 chunks,
                 dataset_type,
@@ -2079,7 +2231,10 @@ def main():
                 merge_chunks=args.merge_chunks,
                 min_tokens=args.min_tokens,
                 max_tokens=args.max_tokens,
-                config=config
+                config=config,
+                concurrency=args.concurrency,
+                journal=journal,
+                token_budget=args.token_budget
             )
 
         if not qa_pairs:
@@ -2112,6 +2267,8 @@ def main():
         # 5. 結果保存
         logger.info("\n結果を保存中...")
         saved_files = save_results(qa_pairs, coverage_results, dataset_type, args.output)
+        journal.compact()
+        journal.close()
 
         # 完了メッセージ
         logger.info(f"""
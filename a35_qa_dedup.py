@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+a35_qa_dedup.py — Q/A CSVの近似重複除去（a42_qdrant_registration.py の前に実行）
+--------------------------------------------------------------------------------
+生成済みのQ/A CSV（qa_output/*.csv）から言い換えの重複を除き、重複除去後のCSVと
+削除したクラスタのレポート（JSON）を書き出します。重複の検出は文字シングルの
+MinHash + LSH（helper_qa_dedup）で、全組の比較をしないためほぼ線形時間で動作します。
+
+使い方：
+  # qa_output/*.csv をファイルごとに重複除去（qa_output/dedup/ に出力）
+  python a35_qa_dedup.py
+
+  # 指定ファイル・閾値、question 列だけで比較
+  python a35_qa_dedup.py qa_output/a02_qa_pairs_cc_news.csv --threshold 0.8 --question-only
+
+  # 複数ファイル（コレクション）を横断して重複除去（先に指定したファイルの行を残す）
+  python a35_qa_dedup.py qa_output/a02_qa_pairs_cc_news.csv qa_output/a10_qa_pairs_cc_news.csv --cross-file
+
+  # Embedding のコサイン類似度でも確認（候補の行だけをEmbedding）
+  python a35_qa_dedup.py --embed gemini --cosine-threshold 0.92
+
+  # 重複除去後のCSVを登録
+  python a42_qdrant_registration.py --input-file qa_output/dedup/a02_qa_pairs_cc_news_dedup.csv --recreate
+
+主要引数：
+  paths               : 対象CSV（既定: qa_output/*.csv）
+  --output-dir        : 出力先（既定: qa_output/dedup）
+  --threshold         : 重複とみなす文字シングルの Jaccard 係数（既定 0.7）
+  --num-perm          : MinHash のハッシュ関数の数（既定 128）
+  --shingle-size      : シングルの文字数（既定 3）
+  --question-only     : question 列だけで比較（既定は question + answer）
+  --cross-file        : 全ファイルを横断して重複除去
+  --embed             : Embedding で確認するプロバイダー（gemini / openai / fastembed）
+  --cosine-threshold  : Embedding のコサイン類似度の閾値（既定 0.9）
+"""
+import argparse
+import glob
+import logging
+
+from helper_qa_dedup import (
+    DEFAULT_COSINE_THRESHOLD,
+    DEFAULT_NUM_PERM,
+    DEFAULT_SHINGLE_SIZE,
+    DEFAULT_THRESHOLD,
+    QADeduplicator,
+    dedup_csv_files,
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Q/A CSVの近似重複除去（MinHash + LSH）")
+    ap.add_argument("paths", nargs="*", help="対象CSV（既定: qa_output/*.csv）")
+    ap.add_argument("--output-dir", default="qa_output/dedup")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    ap.add_argument("--num-perm", type=int, default=DEFAULT_NUM_PERM)
+    ap.add_argument("--shingle-size", type=int, default=DEFAULT_SHINGLE_SIZE)
+    ap.add_argument("--question-only", action="store_true")
+    ap.add_argument("--cross-file", action="store_true")
+    ap.add_argument("--embed", default=None, choices=["gemini", "openai", "fastembed"])
+    ap.add_argument("--cosine-threshold", type=float, default=DEFAULT_COSINE_THRESHOLD)
+    args = ap.parse_args()
+
+    paths = args.paths or sorted(glob.glob("qa_output/*.csv"))
+    if not paths:
+        logger.error("対象のCSVがありません")
+        return
+
+    embed_fn = None
+    if args.embed:
+        from helper_embedding import create_embedding_client
+        embed_fn = create_embedding_client(args.embed).embed_texts
+
+    dedup = QADeduplicator(
+        threshold=args.threshold,
+        num_perm=args.num_perm,
+        shingle_size=args.shingle_size,
+        embed_fn=embed_fn,
+        cosine_threshold=args.cosine_threshold,
+    )
+    reports = dedup_csv_files(
+        paths,
+        output_dir=args.output_dir,
+        cross_file=args.cross_file,
+        question_only=args.question_only,
+        deduplicator=dedup,
+    )
+
+    print(f"\n{'ファイル':<60}{'件数':>8}{'残り':>8}{'削除':>8}{'クラスタ':>8}")
+    for path, report in reports.items():
+        name = "（全ファイル横断）" if path == "*" else path
+        print(f"{name:<60}{report.total:>8}{report.total - report.removed:>8}{report.removed:>8}{len(report.clusters):>8}")
+    print(f"\n出力先: {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
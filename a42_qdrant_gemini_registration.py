@@ -151,7 +151,8 @@ def register_collection(
             df=df,
             vectors=vectors,
             domain=domain,
-            source_file=csv_path
+            source_file=csv_path,
+            include_answer=include_answer
         )
 
         # 5. Upsert
@@ -48,18 +48,28 @@ python a42_qdrant_registration.py \
   # 7. ローカルファイル登録（データ件数制限付き）
   python a42_qdrant_registration.py --input-file data/my_qa_data.csv --limit 100 --include-answer
 
+  # 8. 差分登録（変更分のみEmbedding・アップサート、消えた行は削除）
+  python a42_qdrant_registration.py --collection qa_cc_news_a02_llm --incremental --include-answer
+
+  # 9. 近似重複（言い換え）を除いてから登録（レポートは qa_output/dedup/ に保存）
+  python a42_qdrant_registration.py --collection qa_cc_news_a02_llm --recreate --dedup --dedup-threshold 0.7
+
 主要引数：
   --recreate          : コレクション削除→新規作成
+  --incremental       : 差分登録（ポイントIDは内容から決まるUUIDv5、--limit 指定時は削除を行わない）
   --collection        : 特定コレクションのみ処理（指定なしで全コレクション）
   --input-file        : ローカルファイルを登録（CSV/TXT/JSON/JSONL）
   --qdrant-url        : 既定は http://localhost:6333
   --batch-size        : Embeddings/Upsert バッチサイズ（既定 32）
   --limit             : データ件数上限（開発用、0=無制限）
   --include-answer    : 埋め込み入力に answer も結合（question + "\\n" + answer）
+  --dedup             : 登録前に MinHash + LSH で近似重複のQ/Aを除去（helper_qa_dedup）
+  --dedup-threshold   : 重複とみなす question + answer の文字シングルの Jaccard 係数（既定 0.7）
   --search            : クエリ指定で検索のみ実行
   --topk              : 上位件数（既定5）
 """
 import argparse
+import json
 import os
 from datetime import datetime, timezone
 from typing import Dict, Iterable, List, Optional, Any
@@ -85,6 +95,20 @@ except Exception:
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 from openai import OpenAI
+from helper_embedding_cache import (
+    EMBEDDING_CACHE_ENABLED,
+    get_shared_embedding_cache,
+    make_namespace,
+)
+from helper_search_cache import notify_collection_changed
+from helper_qa_dedup import DEFAULT_THRESHOLD as DEFAULT_DEDUP_THRESHOLD, QADeduplicator
+from qdrant_ingest_pipeline import (
+    iter_csv_batches,
+    iter_dataframe_batches,
+    qa_point_ids,
+    run_delta_ingest,
+    run_ingest_pipeline,
+)
 
 # ------------------ デフォルト設定 ------------------
 DEFAULTS = {
@@ -208,16 +232,33 @@ def embed_texts_openai(texts: List[str], model: str, client: Optional[OpenAI] =
     resp = client.embeddings.create(model=model, input=texts)
     return [d.embedding for d in resp.data]
 
-def embed_texts(texts: List[str], model: str, batch_size: int = 128) -> List[List[float]]:
+def embed_texts(texts: List[str], model: str, batch_size: int = 128,
+                dims: Optional[int] = None) -> List[List[float]]:
     """
     テキストをバッチ処理でEmbeddingに変換
     OpenAIの8192トークン制限を考慮して動的にバッチサイズを調整
 
+    dims はコレクションのベクトル設定の次元数（省略時は DEFAULTS の primary の次元数）で、
+    埋め込みキャッシュの名前空間と空文字列のゼロベクトルに使う。
+
     Note: batch_size引数は後方互換性のために残しているが、実際にはトークン数のみで制御
     """
     if hrag and hasattr(hrag, "embed_texts"):
         return hrag.embed_texts(texts, model=model, batch_size=batch_size)
 
+    dims = dims or DEFAULTS["embeddings"]["primary"]["dims"]
+    if not EMBEDDING_CACHE_ENABLED:
+        return _embed_texts_token_batched(texts, model, dims)
+
+    # 永続キャッシュ: キャッシュミスのテキストのみトークン制御付きバッチでAPIへ送信
+    return get_shared_embedding_cache().get_or_embed(
+        make_namespace("openai", model, dims), dims, texts,
+        lambda miss_texts: _embed_texts_token_batched(miss_texts, model, dims)
+    )
+
+
+def _embed_texts_token_batched(texts: List[str], model: str, dims: int) -> List[List[float]]:
+    """OpenAI Embeddingをトークン数ベースの動的バッチで生成"""
     import tiktoken
 
     enc = tiktoken.get_encoding("cl100k_base")
@@ -237,7 +278,7 @@ def embed_texts(texts: List[str], model: str, batch_size: int = 128) -> List[Lis
     # 全て空文字列の場合はダミーベクトルを返す
     if not valid_texts:
         print("\r   [WARN] 全てのテキストが空文字列です。ダミーベクトルを返します。", flush=True)
-        return [[0.0] * 1536] * len(texts)
+        return [[0.0] * dims] * len(texts)
 
     # 有効なテキストのみで埋め込み生成
     valid_vecs: List[List[float]] = []
@@ -285,7 +326,7 @@ def embed_texts(texts: List[str], model: str, batch_size: int = 128) -> List[Lis
             valid_vec_idx += 1
         else:
             # 空文字列の場合はゼロベクトル
-            vecs.append([0.0] * 1536)
+            vecs.append([0.0] * dims)
 
     return vecs
 
@@ -594,6 +635,7 @@ def create_or_recreate_collection(client: QdrantClient, name: str, recreate: boo
             client.get_collection(name)
         except Exception:
             client.create_collection(collection_name=name, vectors_config=vectors_config)
+    notify_collection_changed(name)
     # よく使うpayloadの索引（任意）
     try:
         client.create_payload_index(name, field_name="domain", field_schema=models.PayloadSchemaType.KEYWORD)
@@ -603,10 +645,15 @@ def create_or_recreate_collection(client: QdrantClient, name: str, recreate: boo
         client.create_payload_index(name, field_name="generation_method", field_schema=models.PayloadSchemaType.KEYWORD)
     except Exception:
         pass
+    try:
+        client.create_payload_index(name, field_name="source", field_schema=models.PayloadSchemaType.KEYWORD)
+    except Exception:
+        pass
 
 # ------------------ ポイント構築（Named Vectors対応） ------------------
 def build_points(df: pd.DataFrame, vectors_by_name: Dict[str, List[List[float]]], domain: str, source_file: str,
-                 generation_method: str = None, data_type: str = "qa") -> List[models.PointStruct]:
+                 generation_method: str = None, data_type: str = "qa",
+                 include_answer: bool = False) -> List[models.PointStruct]:
     # vectors_by_name: name -> list[vec]
     n = len(df)
     for name, vecs in vectors_by_name.items():
@@ -614,6 +661,8 @@ def build_points(df: pd.DataFrame, vectors_by_name: Dict[str, List[List[float]]]
             raise ValueError(f"vectors length mismatch for '{name}': df={n}, vecs={len(vecs)}")
     now_iso = datetime.now(timezone.utc).isoformat()
     points: List[models.PointStruct] = []
+    # サービス・ラッパーの登録と同じ規則のID（差分登録でも同じ規則を使う）
+    ids = qa_point_ids(df, domain, source_file, include_answer=include_answer, data_type=data_type)
 
     for i, row in enumerate(df.itertuples(index=False)):
         if data_type == "qa":
@@ -639,8 +688,8 @@ def build_points(df: pd.DataFrame, vectors_by_name: Dict[str, List[List[float]]]
             }
 
         # Qdrant requires point IDs to be UUID or unsigned integer
-        # ソースファイル名も含めてユニークなIDを生成
-        pid = abs(hash(f"{domain}-{generation_method}-{source_file}-{i}")) & 0x7FFFFFFFFFFFFFFF  # Convert to positive 64-bit integer
+        # 内容から決まるUUIDv5（再実行しても同じID）
+        pid = ids[i]
         if len(vectors_by_name) == 1:
             # 単一ベクトル
             vec = list(vectors_by_name.values())[0][i]
@@ -656,15 +705,17 @@ def upsert_points(client: QdrantClient, collection: str, points: List[models.Poi
     for chunk in batched(points, batch_size):
         client.upsert(collection_name=collection, points=chunk)
         count += len(chunk)
+    notify_collection_changed(collection)
     return count
 
 # ------------------ 検索（Named Vectors対応） ------------------
-def embed_one(text: str, model: str) -> List[float]:
-    return embed_texts([text], model=model, batch_size=1)[0]
+def embed_one(text: str, model: str, dims: Optional[int] = None) -> List[float]:
+    return embed_texts([text], model=model, batch_size=1, dims=dims)[0]
 
 def search(client: QdrantClient, collection: str, query: str, using_vec: str, model_for_using: str,
-           topk: int = 5, domain: Optional[str] = None, generation_method: Optional[str] = None):
-    qvec = embed_one(query, model=model_for_using)
+           topk: int = 5, domain: Optional[str] = None, generation_method: Optional[str] = None,
+           dims: Optional[int] = None):
+    qvec = embed_one(query, model=model_for_using, dims=dims)
     qfilter = None
     filter_conditions = []
     if domain:
@@ -719,11 +770,21 @@ def main():
                     help="ローカルファイルを登録（CSV/TXT/JSON/JSONL）")
     ap.add_argument("--qdrant-url", default=qdrant_url)
     ap.add_argument("--batch-size", type=int, default=32)
+    ap.add_argument("--stream-batch-size", type=int, default=1024,
+                    help="ストリーミング登録で1度に読み込む行数")
+    ap.add_argument("--incremental", action="store_true",
+                    help="差分登録（新規・変更行のみ登録し、削除された行をコレクションから削除）")
     ap.add_argument("--limit", type=int, default=0,
                     help="Row limit per CSV for development (0=all)")
     ap.add_argument("--include-answer", action="store_true",
                     default=rag_cfg.get("include_answer_in_embedding", False),
                     help="Use 'question\\nanswer' as embedding input.")
+    ap.add_argument("--dedup", action="store_true",
+                    help="登録前に近似重複（言い換え）のQ/Aを除去（MinHash + LSH）")
+    ap.add_argument("--dedup-threshold", type=float, default=DEFAULT_DEDUP_THRESHOLD,
+                    help="重複とみなす question + answer の文字シングルの Jaccard 係数（既定 0.7）")
+    ap.add_argument("--dedup-report-dir", default="qa_output/dedup",
+                    help="重複除去レポート（JSON）の出力先")
     ap.add_argument("--search", default=None, help="Run search only.")
     ap.add_argument("--topk", type=int, default=5)
     args = ap.parse_args()
@@ -741,7 +802,8 @@ def main():
             return
 
         model = embeddings_cfg["primary"]["model"]
-        hits = search(client, args.collection, args.search, "primary", model, topk=args.topk)
+        hits = search(client, args.collection, args.search, "primary", model, topk=args.topk,
+                      dims=embeddings_cfg["primary"]["dims"])
 
         print(f"\n[Search] collection={args.collection} query={args.search!r}")
         for h in hits:
@@ -837,31 +899,63 @@ def main():
         # コレクション作成
         create_or_recreate_collection(client, collection_name, args.recreate, embeddings_cfg)
 
-        # データタイプに応じてロード
+        # データタイプに応じてバッチ単位でロード（CSVは分割読み込み）
         data_type = mapping.get("type", "qa")
         if data_type == "raw":
-            # 生テキストファイルをロード
+            # 生テキストファイルをロード（チャンク分割済みのDataFrameをバッチに分割）
             df = load_txt(csv_file, limit=args.limit)
             print(f"   データ件数: {len(df):,}件")
-            texts = df["text"].tolist()
-        else:
-            # Q&A CSVをロード
+            batches = iter_dataframe_batches(df, batch_size=args.stream_batch_size)
+            text_fn = lambda batch: batch["text"].tolist()
+        elif args.dedup:
+            # ファイル全体を読み込み、近似重複を除いてからEmbedding（重複分のEmbeddingを生成しない）
             df = load_csv(csv_file, limit=args.limit)
-            print(f"   データ件数: {len(df):,}件")
-            texts = build_inputs(df, include_answer=args.include_answer)
-
-        # 埋め込み生成
-        vectors_by_name: Dict[str, List[List[float]]] = {}
-        for name, vcfg in embeddings_cfg.items():
-            print(f"   埋め込み生成中: {name} (model={vcfg['model']})... ", end="", flush=True)
-            vectors_by_name[name] = embed_texts(texts, model=vcfg["model"], batch_size=args.batch_size)
-            print("✓")
-
-        # ポイント構築とアップサート
-        points = build_points(df, vectors_by_name, domain, csv_file, generation_method, data_type=data_type)
-        print("   アップサート中... ", end="", flush=True)
-        n = upsert_points(client, collection_name, points, batch_size=args.batch_size)
+            df, report = QADeduplicator(threshold=args.dedup_threshold).deduplicate(df)
+            os.makedirs(args.dedup_report_dir, exist_ok=True)
+            report_path = os.path.join(args.dedup_report_dir, f"{collection_name}_dedup_report.json")
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+            print(f"   重複除去: {report.summary()}")
+            print(f"   レポート: {report_path}")
+            batches = iter_dataframe_batches(df, batch_size=args.stream_batch_size)
+            text_fn = lambda batch: build_inputs(batch, include_answer=args.include_answer)
+        else:
+            batches = iter_csv_batches(csv_file, batch_size=args.stream_batch_size, limit=args.limit)
+            text_fn = lambda batch: build_inputs(batch, include_answer=args.include_answer)
+
+        def embed_all(texts: List[str]) -> Dict[str, List[List[float]]]:
+            return {
+                name: embed_texts(texts, model=vcfg["model"], batch_size=args.batch_size, dims=vcfg["dims"])
+                for name, vcfg in embeddings_cfg.items()
+            }
+
+        def build_batch(batch: pd.DataFrame, vectors_by_name, _sparse, _start_index: int):
+            return build_points(batch, vectors_by_name, domain, csv_file, generation_method,
+                                data_type=data_type, include_answer=args.include_answer)
+
+        pipeline_kwargs = dict(
+            text_fn=text_fn,
+            embed_dense=embed_all,
+            build_points=build_batch,
+            upsert_batch_size=args.batch_size,
+        )
+
+        # 埋め込み生成 → ポイント構築 → アップサート（ストリーミング）
+        print(f"   埋め込み生成・アップサート中 (models={[v['model'] for v in embeddings_cfg.values()]})... ", end="", flush=True)
+        if args.incremental and not args.recreate:
+            # 差分登録: 既存IDにない行のみ登録し、ファイルから消えた行を削除
+            stats = run_delta_ingest(
+                client, collection_name, batches,
+                id_fn=lambda batch: qa_point_ids(batch, domain, csv_file, args.include_answer, data_type),
+                source=os.path.basename(csv_file),
+                truncated=args.limit > 0,  # --limit 以降の行を削除しない
+                **pipeline_kwargs,
+            )
+        else:
+            stats = run_ingest_pipeline(client, collection_name, batches, **pipeline_kwargs)
+        n = stats.points
         print(f"✓ {n:,}件")
+        print(f"   [Stats] {stats.summary()}")
 
         total += n
 
@@ -888,7 +982,8 @@ def main():
             print(f"\n  {collection_name}: {info.points_count:,}件登録済み")
 
             # サンプル検索
-            hits = search(client, collection_name, "気候変動", "primary", model, topk=2)
+            hits = search(client, collection_name, "気候変動", "primary", model, topk=2,
+                          dims=embeddings_cfg["primary"]["dims"])
             if hits:
                 for h in hits[:1]:
                     q = h.payload.get('question', '')[:50]
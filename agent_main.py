@@ -9,7 +9,11 @@ import logging
 import datetime
 from typing import Dict, List, Any, Optional, Union, Tuple # Added Union, Tuple
 from config import AgentConfig, PathConfig
-from agent_tools import search_rag_knowledge_base, list_rag_collections, RAGToolError
+from agent_tools import search_rag_knowledge_base, list_rag_collections, AgentAbort, RAGToolError, collection_registry
+from helper_client_registry import prewarm_clients
+from helper_collection_registry import DEFAULT_REFRESH_INTERVAL
+from helper_embedding_sparse import DEFAULT_SPARSE_MODEL
+from helper_tracing import AGENT_TRACE_FILE, JSONLTraceExporter, add_trace_exporter, span, trace
 
 # Define SYSTEM_INSTRUCTION here or move to config.py for better type hinting if it contains f-strings
 SYSTEM_INSTRUCTION: str = f"""
@@ -31,6 +35,7 @@ SYSTEM_INSTRUCTION: str = f"""
         *   **内容が不明瞭であっても、社内ナレッジに関連する可能性があると判断される質問（例：特定のコード名、システム名、ランダムに見える文字列など）。**
         *   **ただし、一般的なプログラミング言語の文法や使い方に関する質問にはツールを使用しないでください。**
     *   **ツールの利用時には、必要に応じて `collection_name` 引数に、検索対象のQdrantコレクション名を指定してください。**
+    *   **どのコレクションに情報があるか判断できない場合は、`collection_names` 引数に複数のコレクション名を指定してください。1回の呼び出しで同時に検索し、統合した結果が返ります。**
     *   **現在利用可能なコレクションは以下の通りです:**
         {", ".join(AgentConfig.RAG_AVAILABLE_COLLECTIONS)}
     *   あなたの事前学習知識だけで回答せず、必ずツールからの情報を優先してください。
@@ -72,17 +77,31 @@ def setup_logging() -> logging.Logger:
     )
     return logging.getLogger(__name__)
 
-def setup_agent() -> ChatSession: # Return type ChatSession
+def create_agent_model() -> GenerativeModel:
+    """genai の設定とEmbeddingクライアントの事前生成を行い、ツール付きモデルを作成（セッション間で共有可能）"""
     api_key: Optional[str] = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("GEMINI_API_KEY or GOOGLE_API_KEY not found in environment variables.")
     genai.configure(api_key=api_key)
+    # 検索ツールで使うEmbeddingクライアントを事前生成（初回クエリのレイテンシ削減）
+    prewarm_clients(embedding_providers=["gemini"], sparse_model=DEFAULT_SPARSE_MODEL)
+    # コレクションのメタデータを事前取得（検索時は検索リクエストだけにする）
+    try:
+        collection_registry.refresh()
+    except Exception as e:
+        logger.warning(f"コレクションレジストリの事前取得に失敗しました（初回検索時に再試行）: {e}")
+    collection_registry.start_background_refresh(DEFAULT_REFRESH_INTERVAL)
     tools_list: List[Any] = [search_rag_knowledge_base, list_rag_collections] # List of functions
     model: GenerativeModel = genai.GenerativeModel(
         model_name=AgentConfig.MODEL_NAME,
         tools=tools_list,
         system_instruction=SYSTEM_INSTRUCTION
     )
+    return model
+
+def setup_agent(model: Optional[GenerativeModel] = None) -> ChatSession: # Return type ChatSession
+    if model is None:
+        model = create_agent_model()
     chat: ChatSession = model.start_chat(enable_automatic_function_calling=False)
     return chat
 
@@ -93,7 +112,12 @@ def print_colored(text: str, color: str = "white") -> None:
     }
     print(f"{colors.get(color, '')}{text}{colors['reset']}")
 
-def run_agent_turn(chat_session: ChatSession, user_input: str, return_tool_info: bool = False) -> Union[str, Tuple[str, Dict[str, Any]]]:
+def run_agent_turn(
+    chat_session: ChatSession,
+    user_input: str,
+    return_tool_info: bool = False,
+    tools: Optional[Dict[str, Any]] = None
+) -> Union[str, Tuple[str, Dict[str, Any]]]:
     """
     Executes a single turn of the agent (User Input -> [Tools] -> Agent Response).
     This function handles the ReAct loop internally and returns the final response.
@@ -103,75 +127,94 @@ def run_agent_turn(chat_session: ChatSession, user_input: str, return_tool_info:
         user_input (str): The user's query.
         return_tool_info (bool): If True, returns (final_response_text, tool_info_dict).
                                  Otherwise, returns final_response_text.
+        tools (Optional[Dict[str, Any]]): Tool name -> function. Defaults to tools_map
+                                 (the evaluation runner passes recording/replaying tools).
                                  
     Returns:
         Union[str, Tuple[str, Dict[str, Any]]]: Agent's final response and optionally tool usage info.
     """
     logger.info(f"User Input: {user_input}")
     
+    if tools is None:
+        tools = tools_map
     tool_info: Dict[str, Any] = {"tool_used": False, "tool_name": None, "collection_name": None}
     final_response_text: str = ""
     
-    response = chat_session.send_message(user_input)
+    with trace("agent_turn") as turn:
+        with span("llm.generate", iteration=0):
+            response = chat_session.send_message(user_input)
     
-    while True:
-        function_call_found: bool = False
+        iteration: int = 0
+        while True:
+            function_call_found: bool = False
         
-        for part in response.parts:
-            if part.text:
-                log_message: str = part.text.strip()
-                if "Thought:" in log_message or "考え:" in log_message:
-                    logger.info(f"Agent Thought: {log_message}")
-                else:
-                    final_response_text = log_message
-                    logger.info(f"Agent Response: {log_message}")
-
-            if part.function_call:
-                function_call_found = True
-                fn = part.function_call
-                tool_name: str = fn.name
-                tool_args: Dict[str, Any] = dict(fn.args) # type: ignore
+            for part in response.parts:
+                if part.text:
+                    log_message: str = part.text.strip()
+                    if "Thought:" in log_message or "考え:" in log_message:
+                        logger.info(f"Agent Thought: {log_message}")
+                    else:
+                        final_response_text = log_message
+                        logger.info(f"Agent Response: {log_message}")
+
+                if part.function_call:
+                    function_call_found = True
+                    fn = part.function_call
+                    tool_name: str = fn.name
+                    tool_args: Dict[str, Any] = dict(fn.args) # type: ignore
                 
-                logger.info(f"Agent Tool Call: {tool_name}({tool_args})")
+                    logger.info(f"Agent Tool Call: {tool_name}({tool_args})")
                 
-                tool_info["tool_used"] = True
-                tool_info["tool_name"] = tool_name
-                if "collection_name" in tool_args:
-                    tool_info["collection_name"] = tool_args["collection_name"]
+                    tool_info["tool_used"] = True
+                    tool_info["tool_name"] = tool_name
+                    if "collection_name" in tool_args:
+                        tool_info["collection_name"] = tool_args["collection_name"]
+                    if tool_args.get("collection_names"):
+                        tool_args["collection_names"] = [str(c) for c in tool_args["collection_names"]]
+                        tool_info["collection_names"] = tool_args["collection_names"]
                 
-                tool_result: str = ""
-                try:
-                    if tool_name in tools_map:
-                        # mypy will complain about dynamic **tool_args, but it's valid at runtime
-                        tool_result = tools_map[tool_name](**tool_args) 
-                    else:
-                        tool_result = f"Error: Tool '{tool_name}' not found."
-                        logger.warning(f"Attempted to call unknown tool: {tool_name}")
-                except RAGToolError as e: # Catch custom RAG tool errors
-                    tool_result = f"エラーが発生しました: {str(e)}"
-                    logger.error(f"RAG Tool Error during '{tool_name}': {e}")
-                except Exception as e:
-                    tool_result = f"予期せぬエラー: {str(e)}"
-                    logger.error(f"Unexpected error during tool '{tool_name}': {e}", exc_info=True)
-
-                log_tool_result: str = str(tool_result)[:500] + "..." if len(str(tool_result)) > 500 else str(tool_result)
-                logger.info(f"Tool Result: {log_tool_result}")
+                    iteration += 1
+                    with span("react.iteration", iteration=iteration, tool=tool_name):
+                        tool_result: str = ""
+                        try:
+                            if tool_name in tools:
+                                # mypy will complain about dynamic **tool_args, but it's valid at runtime
+                                with span("tool", tool=tool_name):
+                                    tool_result = tools[tool_name](**tool_args)
+                            else:
+                                tool_result = f"Error: Tool '{tool_name}' not found."
+                                logger.warning(f"Attempted to call unknown tool: {tool_name}")
+                        except AgentAbort:
+                            # 評価の再生がカセットとずれた場合など、ツールのエラーとして扱わずターンを中断する
+                            raise
+                        except RAGToolError as e: # Catch custom RAG tool errors
+                            tool_result = f"エラーが発生しました: {str(e)}"
+                            logger.error(f"RAG Tool Error during '{tool_name}': {e}")
+                        except Exception as e:
+                            tool_result = f"予期せぬエラー: {str(e)}"
+                            logger.error(f"Unexpected error during tool '{tool_name}': {e}", exc_info=True)
+
+                        log_tool_result: str = str(tool_result)[:500] + "..." if len(str(tool_result)) > 500 else str(tool_result)
+                        logger.info(f"Tool Result: {log_tool_result}")
                 
-                response = chat_session.send_message(
-                    [genai.protos.Part(
-                        function_response={
-                            "name": tool_name,
-                            "response": {'result': tool_result}
-                        }
-                    )]
-                )
-                break 
-
-        if function_call_found:
-            continue
-        else:
-            break
-            
+                        with span("llm.generate"):
+                            response = chat_session.send_message(
+                                [genai.protos.Part(
+                                    function_response={
+                                        "name": tool_name,
+                                        "response": {'result': tool_result}
+                                    }
+                                )]
+                            )
+                    break 
+
+            if function_call_found:
+                continue
+            else:
+                break
+        turn.set(iterations=iteration, tool_used=tool_info["tool_used"])
+    tool_info["trace"] = turn.to_dict()
+
     if return_tool_info:
         return final_response_text, tool_info
     else:
@@ -185,6 +228,9 @@ def main() -> None:
     print("終了するには 'exit' または 'quit' と入力してください。\n")
     
     logger.info(f"Agent session started at {datetime.datetime.now()}")
+    if AGENT_TRACE_FILE:
+        add_trace_exporter(JSONLTraceExporter(AGENT_TRACE_FILE))
+        logger.info(f"ターンごとのレイテンシ内訳を出力します: {AGENT_TRACE_FILE}")
 
     try:
         chat_session: ChatSession = setup_agent()
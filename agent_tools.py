@@ -3,18 +3,34 @@
 import os
 import time
 import logging
-from typing import List, Optional, Dict, Any, Union
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Dict, Any, Union
 from dataclasses import dataclass, field
-from qdrant_client import QdrantClient
-from qdrant_client.http.exceptions import UnexpectedResponse, ResponseHandlingException
-from qdrant_client_wrapper import search_collection, embed_query, embed_sparse_query_unified, QDRANT_CONFIG
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client_wrapper import search_collection, search_collections, embed_query, embed_sparse_query_unified, QDRANT_CONFIG
+from qdrant_client_async import QDRANT_USE_ASYNC, get_async_client
 from config import AgentConfig
+from helper_collection_registry import CollectionInfo, CollectionRegistry
+from helper_search_cache import RAG_CACHE_ENABLED, add_collection_change_listener, get_search_cache
+from helper_tracing import span
 
 logger = logging.getLogger(__name__) # Configure logger for this module
 
 # Initialize Client
 qdrant_url: str = QDRANT_CONFIG.get("url", "http://localhost:6333")
 client: QdrantClient = QdrantClient(url=qdrant_url)
+# コレクションの存在・ポイント数・ベクトル構成（検索ごとの get_collections / get_collection を省略）
+collection_registry: CollectionRegistry = CollectionRegistry(client)
+# 登録・削除（notify_collection_changed）でレジストリのポイント数・ベクトル構成も破棄する
+add_collection_change_listener(collection_registry.invalidate)
+
+
+def _search_client() -> Union[QdrantClient, AsyncQdrantClient]:
+    """検索に使うクライアント（QDRANT_USE_ASYNC なら共有の AsyncQdrantClient で、同時セッションのI/Oを重ねる）"""
+    return get_async_client(qdrant_url) if QDRANT_USE_ASYNC else client
 
 
 # ============ カスタム例外 ============ 
@@ -34,6 +50,10 @@ class EmbeddingError(RAGToolError):
     """埋め込み生成エラー"""
     pass
 
+class AgentAbort(Exception):
+    """ツールのエラーとしてLLMに返さず、エージェントのターンを中断する例外の基底クラス"""
+    pass
+
 
 # ============ 評価用メトリクス ============ 
 @dataclass
@@ -47,18 +67,71 @@ class SearchMetrics:
     top_score: float
     scores: List[float] = field(default_factory=list)
     error: Optional[str] = None
+    vector_cache_hit: bool = False   # クエリベクトルをキャッシュから取得したか
+    result_cache_hit: bool = False   # 検索結果をキャッシュから取得したか（Embedding・検索なし）
+    stage_ms: Dict[str, float] = field(default_factory=dict)  # 段階ごとの所要時間（embed.dense, qdrant.query など）
     timestamp: str = field(default_factory=lambda: time.strftime("%Y-%m-%d %H:%M:%S"))
 
 # Global metrics log (in-memory for evaluation session)
 _search_metrics_log: List[SearchMetrics] = []
+_search_metrics_lock = threading.Lock()
+# collect_search_metrics() のブロック内で記録されたメトリクスの収集先（スレッド・タスクごと）
+_search_metrics_scope: ContextVar[Optional[List[SearchMetrics]]] = ContextVar("search_metrics_scope", default=None)
+
+def _record_search_metrics(metrics: SearchMetrics) -> None:
+    """メトリクスを全体のログと、実行中の collect_search_metrics() の収集先に記録"""
+    with _search_metrics_lock:
+        _search_metrics_log.append(metrics)
+    scope = _search_metrics_scope.get()
+    if scope is not None:
+        scope.append(metrics)
+
+@contextmanager
+def collect_search_metrics() -> Iterator[List[SearchMetrics]]:
+    """
+    評価用: ブロック内（同じスレッド・タスク）で実行した検索のメトリクスだけを収集
+
+    並列に評価すると get_search_metrics()[-1] は別のテストケースの検索になり得るため、
+    テストケースごとのメトリクスはこのブロックで取得します。
+
+    Yields:
+        ブロック内で記録された SearchMetrics のリスト
+    """
+    collected: List[SearchMetrics] = []
+    token = _search_metrics_scope.set(collected)
+    try:
+        yield collected
+    finally:
+        _search_metrics_scope.reset(token)
+
+@contextmanager
+def _stage(metrics: SearchMetrics, name: str) -> Iterator[None]:
+    """検索の段階の所要時間を metrics.stage_ms とトレースのスパン（helper_tracing）に記録"""
+    start: float = time.perf_counter()
+    with span(name):
+        try:
+            yield
+        finally:
+            metrics.stage_ms[name] = metrics.stage_ms.get(name, 0.0) + (time.perf_counter() - start) * 1000.0
 
 def get_search_metrics() -> List[SearchMetrics]:
     """評価用: 収集したメトリクスを取得"""
-    return _search_metrics_log.copy()
+    with _search_metrics_lock:
+        return _search_metrics_log.copy()
 
 def clear_search_metrics() -> None:
     """評価用: メトリクスをクリア"""
-    _search_metrics_log.clear()
+    with _search_metrics_lock:
+        _search_metrics_log.clear()
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    """評価用: 検索キャッシュのヒット率（収集したメトリクス基準 + キャッシュ全体）"""
+    n = len(_search_metrics_log)
+    stats = dict(get_search_cache().stats())
+    stats["searches"] = n
+    stats["metrics_vector_hit_rate"] = sum(m.vector_cache_hit for m in _search_metrics_log) / n if n else 0.0
+    stats["metrics_result_hit_rate"] = sum(m.result_cache_hit for m in _search_metrics_log) / n if n else 0.0
+    return stats
 
 def export_metrics_to_dict() -> List[Dict[str, Any]]:
     """メトリクスを辞書形式でエクスポート"""
@@ -88,8 +161,7 @@ def list_rag_collections() -> str:
     """
     logger.info("ツールアクション: コレクション一覧を取得中...")
     try:
-        collections_response = client.get_collections()
-        collections: List[str] = [c.name for c in collections_response.collections]
+        collections: List[CollectionInfo] = collection_registry.all()
 
         if not collections:
             logger.info("Qdrantに利用可能なコレクションがありません。")
@@ -97,16 +169,10 @@ def list_rag_collections() -> str:
 
         result_lines: List[str] = ["利用可能なコレクション一覧:"]
         for c in collections:
-            try:
-                info = client.get_collection(c)
-                count: int = info.points_count
-                result_lines.append(f"- {c} ({count} documents)")
-            except (UnexpectedResponse, ResponseHandlingException) as e:
-                logger.warning(f"コレクション '{c}' の情報取得エラー: {e}")
-                result_lines.append(f"- {c} (情報取得エラー)")
-            except Exception as e:
-                logger.error(f"不明なエラー: コレクション '{c}' の情報取得中にエラーが発生しました: {e}", exc_info=True)
-                result_lines.append(f"- {c} (不明なエラー)")
+            if c.error is not None:
+                result_lines.append(f"- {c.name} (情報取得エラー)")
+            else:
+                result_lines.append(f"- {c.name} ({c.points_count} documents)")
 
         logger.info(f"コレクション一覧取得完了: {len(collections)}件")
         return "\n".join(result_lines)
@@ -116,31 +182,64 @@ def list_rag_collections() -> str:
         raise QdrantConnectionError(f"Qdrant接続エラー、またはコレクション一覧の取得に失敗しました: {str(e)}")
 
 
+def _resolve_collections(collection_name: Optional[str], collection_names: Optional[List[str]]) -> List[str]:
+    """検索対象のコレクション名（重複を除き指定順、未指定はデフォルト）"""
+    names: List[str] = []
+    if collection_name:
+        names.append(collection_name)
+    for name in collection_names or []:
+        names.append(str(name))
+    if not names:
+        names.append(AgentConfig.RAG_DEFAULT_COLLECTION)
+    return list(dict.fromkeys(names))
+
+
+def _relevance_score(result: Dict[str, Any]) -> Optional[float]:
+    """閾値と比較するスコア（Hybrid検索は dense_score）
+
+    Hybrid検索で Sparse検索のみがヒットした結果はコサイン類似度を持たないため None を返し、
+    閾値の対象外とする。
+    """
+    if "dense_score" in result:
+        return result["dense_score"]
+    return result.get("score", 0.0)
+
+
+def _passes_score_threshold(result: Dict[str, Any]) -> bool:
+    """結果が RAG_SCORE_THRESHOLD を満たすか（閾値の対象外の結果は採用）"""
+    relevance = _relevance_score(result)
+    return relevance is None or relevance >= AgentConfig.RAG_SCORE_THRESHOLD
+
+
 def search_rag_knowledge_base(
     query: str,
-    collection_name: Optional[str] = None
+    collection_name: Optional[str] = None,
+    collection_names: Optional[List[str]] = None
 ) -> str:
     """
     Qdrantデータベースから専門的な知識を検索します。
     ユーザーが「仕様」「設定」「Wikipediaの知識」「事実確認」など、
     外部知識が必要な詳細について質問した場合にこのツールを使用してください。
+    どのコレクションに情報があるか判断できない場合は、collection_names に複数のコレクションを
+    指定すると、1回の呼び出しで同時に検索し、統合した上位の結果を返します。
     
     **重要: 一般的なプログラミング言語の文法や使い方に関する質問には、このツールを使用しないでください。**
     Args:
         query: 検索したいキーワードや質問文。
         collection_name: 検索対象のQdrantコレクション名。
+        collection_names: 同時に検索する複数のQdrantコレクション名のリスト。
     Returns:
         str: 検索されたドキュメントの内容（質問と回答のペア）。
     """
-    if collection_name is None:
-        collection_name = AgentConfig.RAG_DEFAULT_COLLECTION
+    names: List[str] = _resolve_collections(collection_name, collection_names)
+    collection_label: str = ", ".join(names)
 
     start_time: float = time.time()
-    logger.info(f"ツールアクション: RAG検索を実行: query='{query}', collection='{collection_name}'")
+    logger.info(f"ツールアクション: RAG検索を実行: query='{query}', collection='{collection_label}'")
 
     metrics: SearchMetrics = SearchMetrics(
         query=query,
-        collection_name=collection_name,
+        collection_name=collection_label,
         latency_ms=0.0,
         total_results=0,
         filtered_results=0,
@@ -148,71 +247,149 @@ def search_rag_knowledge_base(
     )
 
     try:
-        if not check_qdrant_health():
-            raise QdrantConnectionError("Qdrantサーバーに接続できません。")
-
-        existing_collections: List[str] = [c.name for c in client.get_collections().collections]
-        if collection_name not in existing_collections:
-            error_msg: str = f"コレクション '{collection_name}' はQdrantサーバーに存在しません。利用可能なコレクション: {existing_collections}"
+        # コレクションの存在確認・ベクトル構成はレジストリから取得（期限切れ時のみQdrantに問い合わせ）
+        infos: Dict[str, CollectionInfo] = {}
+        with _stage(metrics, "registry.lookup"):
+            try:
+                for name in names:
+                    info: Optional[CollectionInfo] = collection_registry.get(name)
+                    if info is not None:
+                        infos[name] = info
+            except Exception as e:
+                raise QdrantConnectionError(f"Qdrantサーバーに接続できません: {e}")
+        missing: List[str] = [name for name in names if name not in infos]
+        if missing:
+            existing_collections: List[str] = collection_registry.names()
+            error_msg: str = f"コレクション '{', '.join(missing)}' はQdrantサーバーに存在しません。利用可能なコレクション: {existing_collections}"
             logger.warning(error_msg)
-            raise CollectionNotFoundError(error_msg)
-
-        query_vector: List[float] = embed_query(query) # Assuming embed_query returns List[float]
-        if query_vector is None:
-            raise EmbeddingError("クエリの埋め込み生成に失敗しました。")
-            
-        # Sparse Vector生成 (Hybrid Search用)
-        # 常に生成するが、検索時にコレクション側が対応していなければ無視される可能性がある
-        # エラーハンドリングは qdrant_client_wrapper 側で吸収することを期待
-        sparse_vector = embed_sparse_query_unified(query)
-
-        results: List[Dict[str, Any]] = search_collection( # Assuming search_collection returns List[Dict[str, Any]]
-            client=client,
-            collection_name=collection_name,
-            query_vector=query_vector,
-            sparse_vector=sparse_vector,
-            limit=AgentConfig.RAG_SEARCH_LIMIT
-        )
+            if not infos:
+                raise CollectionNotFoundError(error_msg)
+            names = [name for name in names if name in infos]
+
+        # 2段目: 検索結果キャッシュ（ヒット時はEmbedding・検索を省略）
+        cache = get_search_cache() if RAG_CACHE_ENABLED else None
+        results: Optional[List[Dict[str, Any]]] = None
+        if cache is not None:
+            version = tuple(
+                cache.collection_version(client, name, points_count=infos[name].points_count) for name in names
+            )
+            result_key = cache.result_key(",".join(names), version, query, AgentConfig.RAG_SEARCH_LIMIT)
+            results = cache.results.get(result_key)
+            metrics.result_cache_hit = results is not None
+
+        if results is None:
+            # 1段目: クエリベクトルキャッシュ
+            # Sparse Vector (Hybrid Search用) は常に生成するが、検索時にコレクション側が対応していなければ
+            # 無視される可能性がある。エラーハンドリングは qdrant_client_wrapper 側で吸収することを期待
+            def embed_both(text: str):
+                with _stage(metrics, "embed.dense"):
+                    dense = embed_query(text)
+                with _stage(metrics, "embed.sparse"):
+                    sparse = embed_sparse_query_unified(text)
+                return dense, sparse
+
+            if cache is not None:
+                query_vector, sparse_vector, metrics.vector_cache_hit = cache.get_vectors(query, embed_both)
+            else:
+                query_vector, sparse_vector = embed_both(query)
+            if query_vector is None:
+                raise EmbeddingError("クエリの埋め込み生成に失敗しました。")
+
+            # 検索エラー（Dense のみへのフォールバックを含む）の結果はキャッシュしない
+            search_failed: List[str] = []
+
+            def on_search_error(name: str) -> None:
+                search_failed.append(name)
+                collection_registry.invalidate(name)
+
+            with _stage(metrics, "qdrant.query"):
+                if len(names) == 1:
+                    results = search_collection( # Assuming search_collection returns List[Dict[str, Any]]
+                        client=_search_client(),
+                        collection_name=names[0],
+                        query_vector=query_vector,
+                        sparse_vector=sparse_vector,
+                        limit=AgentConfig.RAG_SEARCH_LIMIT,
+                        capabilities=infos[names[0]].capabilities,
+                        on_error=lambda e: on_search_error(names[0])
+                    )
+                else:
+                    # 複数コレクション: 同時に検索し、コレクションごとに正規化したスコアで統合
+                    # （閾値は上位 RAG_SEARCH_LIMIT 件に切る前に適用する）
+                    below_threshold: List[Dict[str, Any]] = []
+
+                    def score_filter(hit: Dict[str, Any]) -> bool:
+                        if _passes_score_threshold(hit):
+                            return True
+                        below_threshold.append(hit)
+                        return False
+
+                    results = search_collections(
+                        client=_search_client(),
+                        collection_names=names,
+                        query_vector=query_vector,
+                        sparse_vector=sparse_vector,
+                        limit=AgentConfig.RAG_SEARCH_LIMIT,
+                        capabilities={name: info.capabilities for name, info in infos.items()},
+                        on_error=lambda name, e: on_search_error(name),
+                        score_filter=score_filter
+                    )
+                    if not results and below_threshold:
+                        # 閾値未満の結果しかない場合は、そのことを返すために上位を残す
+                        below_threshold.sort(key=_relevance_score, reverse=True)
+                        results = below_threshold[:AgentConfig.RAG_SEARCH_LIMIT]
+            if cache is not None and results and not search_failed:
+                cache.results.put(result_key, results)
 
         metrics.total_results = len(results) if results else 0
 
         # 結果がない場合の詳細フィードバック
         if not results:
             metrics.latency_ms = (time.time() - start_time) * 1000.0
-            _search_metrics_log.append(metrics)
+            _record_search_metrics(metrics)
             logger.info("検索結果: 0件")
             return (
                 f"[[NO_RAG_RESULT]] 検索結果が見つかりませんでした。"
-                f"コレクション: '{collection_name}'。"
+                f"コレクション: '{collection_label}'。"
                 f"クエリ: '{query}'。"
             )
 
-        scores: List[float] = [res.get("score", 0.0) for res in results]
+        # 閾値は Dense検索のスコア（コサイン類似度）に適用する。Hybrid検索の統合スコア（RRF など）や
+        # 複数コレクションの正規化スコアは順位付け用で、閾値と尺度が揃わないため使わない
+        relevances: List[Optional[float]] = [_relevance_score(res) for res in results]
+        scores: List[float] = [
+            relevance if relevance is not None else res.get("score", 0.0)
+            for res, relevance in zip(results, relevances)
+        ]
         metrics.scores = scores
         metrics.top_score = max(scores) if scores else 0.0
 
         formatted_results: List[str] = []
-        for i, res in enumerate(results, 1):
-            score: float = res.get("score", 0.0)
-
-            if score < AgentConfig.RAG_SCORE_THRESHOLD:
-                continue
-
-            payload: Dict[str, Any] = res.get("payload", {})
-            q: str = payload.get("question", "N/A")
-            a: str = payload.get("answer", "N/A")
-            source: str = payload.get("source", "unknown")
-
-            formatted_results.append(
-                f"Result {i} (Score: {score:.2f}):\n"
-                f"Q: {q}\n"
-                f"A: {a}\n"
-                f"Source: {source}"
-            )
+        with _stage(metrics, "format_results"):
+            for i, res in enumerate(results, 1):
+                score: float = res.get("score", 0.0)
+
+                if not _passes_score_threshold(res):
+                    continue
+
+                payload: Dict[str, Any] = res.get("payload", {})
+                q: str = payload.get("question", "N/A")
+                a: str = payload.get("answer", "N/A")
+                source: str = payload.get("source", "unknown")
+
+                lines: List[str] = [
+                    f"Result {i} (Score: {score:.2f}):",
+                    f"Q: {q}",
+                    f"A: {a}",
+                    f"Source: {source}",
+                ]
+                if "collection" in res:
+                    lines.append(f"Collection: {', '.join([res['collection']] + res.get('also_in', []))}")
+                formatted_results.append("\n".join(lines))
 
         metrics.filtered_results = len(formatted_results)
         metrics.latency_ms = (time.time() - start_time) * 1000.0
-        _search_metrics_log.append(metrics)
+        _record_search_metrics(metrics)
 
         logger.info(
             f"検索完了: {metrics.filtered_results}/{metrics.total_results} results, "
@@ -224,7 +401,7 @@ def search_rag_knowledge_base(
             first_q = results[0].get("payload", {}).get("question", "N/A") if results else "N/A"
             return (
                 f"[[NO_RAG_RESULT_LOW_SCORE]] 検索結果は見つかりましたが、関連性スコアが低すぎたため採用しませんでした。"
-                f"コレクション: '{collection_name}'。"
+                f"コレクション: '{collection_label}'。"
                 f"ヒット数 (閾値未満): {metrics.total_results}件。"
                 f"最高スコア: {metrics.top_score:.2f}。"
                 f"参考 (最高スコアのQ): '{first_q[:50]}...'。"
@@ -237,19 +414,21 @@ def search_rag_knowledge_base(
         logger.error(f"RAGツールエラー: {e}", exc_info=True)
         metrics.error = str(e)
         metrics.latency_ms = (time.time() - start_time) * 1000.0
-        _search_metrics_log.append(metrics)
+        _record_search_metrics(metrics)
         return f"[[RAG_TOOL_ERROR]] エラーが発生しました: {str(e)}"
     except UnexpectedResponse as e:
+        for name in names:
+            collection_registry.invalidate(name)
         error_msg: str = f"Qdrantサーバーからの予期せぬ応答: {str(e)}"
         logger.error(error_msg, exc_info=True)
         metrics.error = error_msg
         metrics.latency_ms = (time.time() - start_time) * 1000.0
-        _search_metrics_log.append(metrics)
+        _record_search_metrics(metrics)
         return f"[[RAG_TOOL_ERROR]] 検索中にQdrantサーバーエラーが発生しました: {str(e)}"
     except Exception as e:
         error_msg: str = f"予期せぬエラーが発生しました: {str(e)}"
         logger.error(error_msg, exc_info=True)
         metrics.error = error_msg
         metrics.latency_ms = (time.time() - start_time) * 1000.0
-        _search_metrics_log.append(metrics)
-        return f"[[RAG_TOOL_ERROR]] 検索中に予期せぬエラーが発生しました: {str(e)}"
\ No newline at end of file
+        _record_search_metrics(metrics)
+        return f"[[RAG_TOOL_ERROR]] 検索中に予期せぬエラーが発生しました: {str(e)}"
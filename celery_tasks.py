@@ -13,8 +13,11 @@ celery_tasks.py
 import os
 import json
 import logging
-from typing import List, Dict
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
 from celery import Celery
+from celery.signals import worker_process_init
 from dotenv import load_dotenv
 # 環境変数読み込み
 load_dotenv()
@@ -23,16 +26,21 @@ load_dotenv()
 # noqa: E402
 from models import QAPairsResponse
 # noqa: E402
-from config import ModelConfig, CeleryConfig
+from config import ModelConfig, CeleryConfig, RateLimitConfig
 
 # =====================================================
 # Gemini 3 Migration: 抽象化レイヤー
 # =====================================================
-from helper_llm import create_llm_client
+from helper_client_registry import get_llm_client, prewarm_clients
+from helper_rate_limiter import RateLimitTimeout, acquire_rate_limit
+from helper_token_estimator import get_token_estimator
 
 # デフォルトプロバイダー（環境変数で設定可能）
 DEFAULT_LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")  # "gemini" or "openai"
 
+# プロバイダー別のデフォルトモデル（helper_llm の各クライアントのデフォルトと同じ）
+PROVIDER_DEFAULT_MODELS = {"gemini": "gemini-2.0-flash", "openai": "gpt-4o-mini"}
+
 # ログ設定
 logging.basicConfig(
     level=logging.INFO,
@@ -66,6 +74,12 @@ app.conf.update(
 )
 
 
+@worker_process_init.connect
+def _prewarm_worker_clients(**kwargs):
+    """ワーカープロセス起動時にLLMクライアントを事前生成"""
+    prewarm_clients(llm_providers=[os.getenv('LLM_PROVIDER', 'gemini')])
+
+
 # ===========================================
 # モデル別パラメータ制約（config.pyから参照）
 # ===========================================
@@ -97,6 +111,32 @@ def determine_qa_count(chunk_data: Dict, config: Dict) -> int:
         return base_qa_count
 
 
+def _quota_deadline() -> float:
+    """タスク内のレート制限待機の期限（ソフトタイムリミットの半分、time.monotonic 基準）"""
+    return time.monotonic() + CeleryConfig.TASK_SOFT_TIME_LIMIT / 2
+
+
+def _acquire_llm_quota(provider: str, model: str, prompt: str, deadline: Optional[float] = None) -> None:
+    """
+    LLM呼び出し前にRPM/TPMを取得（ワーカー間で共有するトークンバケット）
+
+    Args:
+        provider: "gemini" or "openai"
+        model: 使用するモデル（Noneの場合はプロバイダーのデフォルト）
+        prompt: 送信するプロンプト（入力トークン数の推定に使用）
+        deadline: 待機の期限（_quota_deadline、None=今からソフトタイムリミットの半分）
+
+    Raises:
+        RateLimitTimeout: 期限までに取得できなかった場合
+    """
+    effective_model = model or PROVIDER_DEFAULT_MODELS.get(provider, "gemini-2.0-flash")
+    tokens = get_token_estimator().count(prompt, model=effective_model) + RateLimitConfig.DEFAULT_OUTPUT_TOKENS
+    # ソフトタイムリミット内に収まらない待機はタイムアウトさせてリトライに回す
+    # （1タスク内の複数回の呼び出しで期限を共有し、待機の合計がリミットに近づかないようにする）
+    timeout = max(0.0, (deadline or _quota_deadline()) - time.monotonic())
+    acquire_rate_limit(provider, effective_model, tokens=tokens, timeout=timeout)
+
+
 def _extract_parsed_response(response, model: str) -> QAPairsResponse:
     """
     responses.parse() API のレスポンスから解析済みデータを抽出
@@ -302,15 +342,6 @@ def generate_qa_unified_async(
     try:
         provider = provider or DEFAULT_LLM_PROVIDER
 
-        # レート制限対策: Gemini API呼び出し前に短い遅延を追加（短縮版）
-        if provider == "gemini":
-            import time
-            import random
-            # ワーカー増強に伴い、初期遅延を短縮してスループットを向上
-            # エラー時は指数バックオフで調整する方針
-            delay = random.uniform(0.1, 0.5)
-            time.sleep(delay)
-
         # Geminiプロバイダー使用時にOpenAIモデル名が渡された場合はデフォルトモデルを使用
         if provider == "gemini" and model and ("gpt" in model.lower() or "o1" in model.lower() or "o3" in model.lower() or "o4" in model.lower()):
             logger.warning(f"[統合タスク] OpenAIモデル '{model}' はGeminiプロバイダーで使用できません。デフォルトモデルを使用します。")
@@ -352,11 +383,13 @@ Text:
 Output in JSON format:
 {{"qa_pairs": [{{"question": "question text", "answer": "answer text", "question_type": "fact/reason/comparison/application"}}]}}"""
 
-        # 統合LLMクライアントを使用
-        llm_client = create_llm_client(provider=str(provider))
+        # 統合LLMクライアントを使用（ワーカープロセス内で共有）
+        llm_client = get_llm_client(provider=str(provider))
 
         # 構造化出力を試行
+        quota_deadline = _quota_deadline()
         try:
+            _acquire_llm_quota(str(provider), model, f"{system_instruction}\n\n{prompt}", quota_deadline)
             result = llm_client.generate_structured(
                 prompt=f"{system_instruction}\n\n{prompt}",
                 response_schema=QAPairsResponse,
@@ -377,10 +410,14 @@ Output in JSON format:
                 }
                 qa_pairs.append(qa)
 
+        except RateLimitTimeout:
+            # レート制限の待機切れはフォールバックせず、タスクごとリトライする
+            raise
         except Exception as e:
             logger.warning(f"構造化出力失敗、テキスト生成にフォールバック: {str(e)[:100]}")
 
             # フォールバック: テキスト生成してJSON解析
+            _acquire_llm_quota(str(provider), model, f"{system_instruction}\n\n{prompt}", quota_deadline)
             response_text = llm_client.generate_content(
                 prompt=f"{system_instruction}\n\n{prompt}",
                 model=model
@@ -521,287 +558,302 @@ def submit_parallel_qa_generation(chunks: List[Dict], config: Dict, model: str =
     return tasks
 
 
-def collect_results(tasks: List, timeout: int = 300) -> List[Dict]:
-    """
-    並列処理の結果を収集（簡素化版：Redis直接アクセスで確実な結果取得）
-
-    問題: 以前のバージョンは複雑すぎて一部のタスク結果を取得できなかった
-    解決: シンプルな2フェーズ方式に変更
-      - Phase 1: タスク完了を待つ（ポーリング）
-      - Phase 2: Redisから全結果を一括取得
-
-    Args:
-        tasks: Celeryタスクのリスト
-        timeout: タイムアウト（秒）
-
-    Returns:
-        Q/Aペアのリスト
-    """
-    import time
+# ===========================================
+# 結果収集（イベント駆動）
+# ===========================================
+RESULT_KEY_PREFIX = "celery-task-meta-"
+READY_STATES = ("SUCCESS", "FAILURE")
+
+
+@dataclass
+class CollectionStats:
+    """結果収集の統計（件数・スループット・遅延タスク）"""
+    total: int
+    success: int = 0
+    failed: int = 0
+    errors: int = 0
+    qa_pairs: int = 0
+    elapsed: float = 0.0
+    failed_chunks: List[str] = field(default_factory=list)
+    stragglers: List[str] = field(default_factory=list)
+    completion_times: List[float] = field(default_factory=list)
+
+    @property
+    def done(self) -> int:
+        return self.success + self.failed + self.errors
+
+    @property
+    def throughput(self) -> float:
+        """完了タスク数/秒"""
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def completion_percentile(self, q: float) -> float:
+        """タスク完了時刻（収集開始からの秒数）のパーセンタイル"""
+        if not self.completion_times:
+            return 0.0
+        ordered = sorted(self.completion_times)
+        idx = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+        return ordered[idx]
+
+
+def _create_result_redis_client():
+    """結果バックエンド（Redis）への接続"""
     import redis
-    import json
-
-    total_tasks = len(tasks)
-    logger.info("=" * 60)
-    logger.info(f"結果収集開始: {total_tasks}個のタスク (タイムアウト: {timeout}秒)")
-    logger.info("=" * 60)
 
-    # タスクIDリストを作成
-    task_ids = [task.id for task in tasks]
-    logger.info(f"タスクID例: {task_ids[0][:20]}... (全{len(task_ids)}個)")
-
-    # 診断用：タスクIDのセットを保持
-    submitted_task_ids = set(task_ids)
-    logger.info(f"[診断] 投入タスクID数: {len(submitted_task_ids)} (重複なし確認)")
-    logger.info(f"[診断] 最初の5個: {task_ids[:5]}")
-    logger.info(f"[診断] 最後の5個: {task_ids[-5:]}")
-
-    # Redis接続を確立
-    redis_client = redis.Redis(
+    return redis.Redis(
         host=os.getenv('REDIS_HOST', 'localhost'),
         port=int(os.getenv('REDIS_PORT', 6379)),
         db=int(os.getenv('REDIS_DB', 0)),
         decode_responses=True
     )
 
-    # 接続テスト
-    try:
-        redis_client.ping()
-        logger.info("✓ Redis接続成功")
-    except Exception as e:
-        logger.error(f"✗ Redis接続失敗: {e}")
-        return []
-
-    start_time = time.time()
-    last_log_time = start_time
-
-    # ======================================
-    # Phase 1: タスク完了を待つ
-    # ======================================
-    logger.info("=" * 60)
-    logger.info("Phase 1: タスク完了待機中...")
-    logger.info("=" * 60)
-
-    while True:
-        current_time = time.time()
-        elapsed = current_time - start_time
-
-        # タイムアウトチェック
-        if elapsed > timeout:
-            logger.warning(f"⚠️ Phase 1 タイムアウト: {elapsed:.1f}秒経過")
-            break
-
-        # Redisで完了タスク数をカウント
-        completed_count = 0
-        pending_count = 0
-        failed_count = 0
 
-        for task_id in task_ids:
-            redis_key = f"celery-task-meta-{task_id}"
-            redis_data = redis_client.get(redis_key)
-
-            if redis_data:
-                try:
-                    task_result = json.loads(redis_data)
-                    status = task_result.get('status', 'UNKNOWN')
-                    if status == 'SUCCESS':
-                        completed_count += 1
-                    elif status == 'FAILURE':
-                        failed_count += 1
-                    else:
-                        pending_count += 1
-                except json.JSONDecodeError:
-                    pending_count += 1
-            else:
-                pending_count += 1
-
-        # 5秒ごとに進捗ログ（UI進捗バー用のフォーマット）
-        if current_time - last_log_time >= 5:
-            # UIの進捗バー用（正規表現 "進捗.*?完了[=:：\s]*(\d+)\s*/\s*(\d+)" にマッチ）
-            logger.info(f"進捗: 完了={completed_count + failed_count}/{total_tasks}")
-            logger.info(f"  [Phase 1] 詳細: 成功={completed_count}, 失敗={failed_count}, "
-                       f"処理中={pending_count}, 経過={elapsed:.1f}秒")
-            last_log_time = current_time
-
-        # 全タスク完了チェック
-        if completed_count + failed_count >= total_tasks:
-            logger.info(f"✓ Phase 1 完了: 全タスク終了 (完了={completed_count}, 失敗={failed_count})")
-            break
-
-        # 待機
-        time.sleep(1.0)
-
-    phase1_time = time.time() - start_time
-    logger.info(f"Phase 1 所要時間: {phase1_time:.1f}秒")
-
-    # Phase 1終了時の詳細診断
-    logger.info(f"[Phase 1 診断] 最終カウント: SUCCESS={completed_count}, FAILURE={failed_count}, PENDING={pending_count}")
-    if pending_count > 0:
-        # 未完了タスクの詳細を出力
-        logger.warning(f"[Phase 1 診断] {pending_count}個のタスクが未完了状態")
-        pending_task_details = []
-        for task_id in task_ids:
-            redis_key = f"celery-task-meta-{task_id}"
-            redis_data = redis_client.get(redis_key)
-            if not redis_data:
-                pending_task_details.append(f"{task_id[:12]}...(NO_DATA)")
-            else:
-                try:
-                    task_result = json.loads(redis_data)
-                    status = task_result.get('status', 'UNKNOWN')
-                    if status not in ['SUCCESS', 'FAILURE']:
-                        pending_task_details.append(f"{task_id[:12]}...({status})")
-                except Exception:
-                    pending_task_details.append(f"{task_id[:12]}...(JSON_ERROR)")
-
-        if pending_task_details:
-            logger.warning(f"[Phase 1 診断] 未完了タスク詳細（最初の10個）: {pending_task_details[:10]}")
-
-    # ======================================
-    # Phase 2: Redisから全結果を一括取得
-    # ======================================
-    logger.info("=" * 60)
-    logger.info("Phase 2: Redisから結果を一括取得中...")
-    logger.info("=" * 60)
-
-    all_qa_pairs = []
-    success_count = 0
-    failed_count = 0
-    error_count = 0
-    failed_chunks = []
+class ResultCollector:
+    """
+    Celeryタスク結果のストリーミング収集
 
-    # 診断用：取得成功/失敗したタスクIDを追跡
-    collected_task_ids = set()
-    failed_task_ids = []
-    error_task_ids = []
+    Redis結果バックエンドは結果保存時にキー名と同じチャネルへPUBLISHするため、
+    pub/sub で完了通知を受け取り、完了したタスクのQ/Aペアを到着順に返す。
+    通知の取りこぼしに備えて、未完了タスクのみを MGET でまとめて定期確認する。
 
-    for i, task_id in enumerate(task_ids):
-        redis_key = f"celery-task-meta-{task_id}"
+    メモリ上に保持するのは未完了タスクIDのみで、結果は受信次第呼び出し側へ渡す。
+    """
 
+    def __init__(
+        self,
+        tasks: List,
+        timeout: float = 300,
+        redis_client=None,
+        mget_batch_size: int = 1000,
+        sweep_interval: float = 10.0,
+        log_interval: float = 5.0,
+        use_pubsub: bool = True,
+        on_result: Optional[Callable[[Dict], None]] = None
+    ):
+        """
+        Args:
+            tasks: Celeryタスク（AsyncResult）またはタスクIDのリスト
+            timeout: タイムアウト（秒）
+            redis_client: Redisクライアント（Noneの場合は環境変数から接続）
+            mget_batch_size: MGET 1回あたりのキー数
+            sweep_interval: MGETによる一括確認の間隔（秒、pub/sub使用時）
+            log_interval: 進捗ログの間隔（秒）
+            use_pubsub: pub/subによる完了通知を使用するか
+            on_result: タスクの結果（success, chunk_id, qa_pairs, error を持つ辞書）ごとに呼ぶ関数
+                       （ジャーナルへの記録用）
+        """
+        task_ids = [t if isinstance(t, str) else t.id for t in tasks]
+        # 投入順を保持（dictは挿入順）
+        self.pending: Dict[str, None] = dict.fromkeys(task_ids)
+        self.timeout = timeout
+        self.redis_client = redis_client or _create_result_redis_client()
+        self.mget_batch_size = mget_batch_size
+        self.sweep_interval = sweep_interval
+        self.log_interval = log_interval
+        self.use_pubsub = use_pubsub
+        self.on_result = on_result
+        self.stats = CollectionStats(total=len(self.pending))
+        self._start = 0.0
+
+    def _handle(self, task_id: str, raw) -> List[Dict]:
+        """結果1件を処理し、完了していればQ/Aペアを返す（未完了ならNone扱いで保留）"""
+        if not raw or task_id not in self.pending:
+            return []
         try:
-            redis_data = redis_client.get(redis_key)
-
-            if not redis_data:
-                logger.warning(f"[{i+1}/{total_tasks}] タスク {task_id[:12]}... Redisにデータなし")
-                error_count += 1
-                error_task_ids.append(task_id)
-                continue
-
+            task_result = json.loads(raw)
+        except (TypeError, json.JSONDecodeError):
+            return []
+
+        status = task_result.get('status')
+        if status not in READY_STATES:
+            # STARTED / RETRY などの中間状態
+            return []
+
+        del self.pending[task_id]
+        self.stats.completion_times.append(time.time() - self._start)
+
+        if status == 'FAILURE':
+            self.stats.failed += 1
+            logger.debug(f"Celeryタスク失敗: {task_id[:12]}... {str(task_result.get('traceback'))[:100]}")
+            return []
+
+        result = task_result.get('result')
+        if not isinstance(result, dict):
+            self.stats.errors += 1
+            logger.warning(f"タスク {task_id[:12]}... 不正な結果: {type(result)}")
+            return []
+
+        if self.on_result is not None:
             try:
-                task_result = json.loads(str(redis_data))
-            except json.JSONDecodeError as e:
-                logger.warning(f"[{i+1}/{total_tasks}] タスク {task_id[:12]}... JSONデコードエラー: {str(e)[:50]}")
-                error_count += 1
-                continue
-
-            status = task_result.get('status', 'UNKNOWN')
-
-            if status == 'SUCCESS':
-                result = task_result.get('result')
-
-                if result is None:
-                    logger.warning(f"[{i+1}/{total_tasks}] タスク {task_id[:12]}... result=None")
-                    error_count += 1
-                    continue
+                self.on_result(result)
+            except Exception as e:
+                logger.error(f"結果コールバックでエラー: {e}")
+
+        if not result.get('success'):
+            # タスク自体は成功だが、Q/A生成が失敗
+            self.stats.failed += 1
+            if 'chunk_id' in result:
+                self.stats.failed_chunks.append(result['chunk_id'])
+            elif 'chunk_ids' in result:
+                self.stats.failed_chunks.extend(result.get('chunk_ids', []))
+            return []
+
+        qa_pairs = result.get('qa_pairs', [])
+        self.stats.success += 1
+        self.stats.qa_pairs += len(qa_pairs)
+        return qa_pairs
+
+    def _sweep(self) -> Iterator[Dict]:
+        """未完了タスクの結果をMGETでまとめて確認"""
+        pending_ids = list(self.pending)
+        for i in range(0, len(pending_ids), self.mget_batch_size):
+            batch = pending_ids[i:i + self.mget_batch_size]
+            values = self.redis_client.mget([f"{RESULT_KEY_PREFIX}{tid}" for tid in batch])
+            for task_id, raw in zip(batch, values):
+                yield from self._handle(task_id, raw)
+
+    def _open_pubsub(self):
+        """完了通知の購読を開始（失敗時はNoneでMGETのみの確認に切り替え）"""
+        if not self.use_pubsub:
+            return None
+        try:
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.psubscribe(f"{RESULT_KEY_PREFIX}*")
+            return pubsub
+        except Exception as e:
+            logger.warning(f"pub/sub購読に失敗しました（MGET確認に切り替え）: {e}")
+            return None
+
+    def _log_progress(self) -> None:
+        elapsed = time.time() - self._start
+        # UIの進捗バー用（正規表現 "進捗.*?完了[=:：\s]*(\d+)\s*/\s*(\d+)" にマッチ）
+        logger.info(f"進捗: 完了={self.stats.done}/{self.stats.total}")
+        logger.info(f"  詳細: 成功={self.stats.success}, 失敗={self.stats.failed}, "
+                    f"処理中={len(self.pending)}, Q/A={self.stats.qa_pairs}, "
+                    f"スループット={self.stats.done / elapsed if elapsed else 0:.2f}タスク/秒, "
+                    f"経過={elapsed:.1f}秒")
+
+    def stream(self) -> Iterator[Dict]:
+        """
+        完了したタスクのQ/Aペアを到着順に返すジェネレータ
+
+        Yields:
+            Q/Aペア（辞書）
+        """
+        self._start = time.time()
+        last_log = self._start
+        last_sweep = self._start
+        logger.info(f"結果収集開始: {self.stats.total}個のタスク (タイムアウト: {self.timeout}秒)")
+
+        # 購読開始後に一括確認することで、購読前に完了したタスクも取りこぼさない
+        pubsub = self._open_pubsub()
+        try:
+            yield from self._sweep()
+
+            while self.pending:
+                now = time.time()
+                remaining = self.timeout - (now - self._start)
+                if remaining <= 0:
+                    logger.warning(f"⚠️ タイムアウト: {now - self._start:.1f}秒経過")
+                    break
+
+                if pubsub is not None:
+                    message = pubsub.get_message(timeout=min(1.0, remaining))
+                    # 到着済みの通知をまとめて処理
+                    while message is not None:
+                        if message.get('type') == 'pmessage':
+                            channel = message['channel']
+                            yield from self._handle(channel[len(RESULT_KEY_PREFIX):], message['data'])
+                        message = pubsub.get_message(timeout=0)
+                    if time.time() - last_sweep >= self.sweep_interval:
+                        yield from self._sweep()
+                        last_sweep = time.time()
+                else:
+                    time.sleep(min(1.0, remaining))
+                    yield from self._sweep()
+
+                if time.time() - last_log >= self.log_interval:
+                    self._log_progress()
+                    last_log = time.time()
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+            self.stats.elapsed = time.time() - self._start
+            self.stats.stragglers = list(self.pending)
+            self._log_summary()
+
+    def _log_summary(self) -> None:
+        stats = self.stats
+        total = stats.total or 1
+        logger.info("=" * 60)
+        logger.info("結果収集完了 - サマリー")
+        logger.info("=" * 60)
+        logger.info(f"  総タスク数     : {stats.total}")
+        logger.info(f"  成功           : {stats.success} ({100 * stats.success / total:.1f}%)")
+        logger.info(f"  失敗           : {stats.failed}")
+        logger.info(f"  エラー         : {stats.errors}")
+        logger.info(f"  未完了         : {len(stats.stragglers)}")
+        logger.info(f"  生成Q/Aペア    : {stats.qa_pairs}個")
+        logger.info(f"  所要時間       : {stats.elapsed:.1f}秒 ({stats.throughput:.2f}タスク/秒)")
+        logger.info(f"  完了時刻 p50/p95/max: {stats.completion_percentile(50):.1f}/"
+                    f"{stats.completion_percentile(95):.1f}/{stats.completion_percentile(100):.1f}秒")
+        logger.info("=" * 60)
+
+        if stats.stragglers:
+            logger.warning(f"[診断] 未完了タスク数: {len(stats.stragglers)}")
+            logger.warning(f"[診断] 未完了タスクID（最初の10個）: {stats.stragglers[:10]}")
+        if stats.failed_chunks:
+            logger.warning(f"失敗チャンク（最初の5個）: {stats.failed_chunks[:5]}")
+        if stats.success < stats.total * 0.9:
+            logger.warning(f"⚠️ 成功率が90%未満です: {100 * stats.success / total:.1f}%")
+
+
+def iter_results(tasks: List, timeout: int = 300, **kwargs) -> Iterator[Dict]:
+    """
+    並列処理の結果をストリーミングで取得
 
-                if not isinstance(result, dict):
-                    logger.warning(f"[{i+1}/{total_tasks}] タスク {task_id[:12]}... resultが辞書でない: {type(result)}")
-                    error_count += 1
-                    continue
+    Args:
+        tasks: Celeryタスクのリスト
+        timeout: タイムアウト（秒）
+        **kwargs: ResultCollector に渡すオプション
 
-                if result.get('success'):
-                    # 成功：Q/Aペアを取得
-                    qa_pairs = result.get('qa_pairs', [])
-                    all_qa_pairs.extend(qa_pairs)
-                    success_count += 1
-                    collected_task_ids.add(task_id)  # 診断用
-
-                    # 100タスクごとに進捗ログ
-                    if (i + 1) % 100 == 0 or i == total_tasks - 1:
-                        logger.info(f"[Phase 2] {i+1}/{total_tasks} 処理済み "
-                                   f"(成功={success_count}, 失敗={failed_count}, エラー={error_count}, "
-                                   f"Q/A合計={len(all_qa_pairs)})")
-                else:
-                    # タスク自体は成功だが、Q/A生成が失敗
-                    failed_count += 1
-                    failed_task_ids.append(task_id)  # 診断用
-                    error_msg = result.get('error', 'Unknown error')
-                    logger.debug(f"[{i+1}/{total_tasks}] Q/A生成失敗: {error_msg[:100]}")
-
-                    if 'chunk_id' in result:
-                        failed_chunks.append(result['chunk_id'])
-                    elif 'chunk_ids' in result:
-                        failed_chunks.extend(result.get('chunk_ids', []))
-
-            elif status == 'FAILURE':
-                failed_count += 1
-                traceback_info = task_result.get('traceback', 'no traceback')
-                logger.debug(f"[{i+1}/{total_tasks}] Celeryタスク失敗: {str(traceback_info)[:100]}")
+    Yields:
+        Q/Aペア（完了したタスクから順に）
+    """
+    yield from ResultCollector(tasks, timeout=timeout, **kwargs).stream()
 
-            else:
-                # PENDING, STARTED, etc.
-                logger.warning(f"[{i+1}/{total_tasks}] タスク {task_id[:12]}... 状態={status} (未完了)")
-                error_count += 1
 
-        except Exception as e:
-            logger.error(f"[{i+1}/{total_tasks}] タスク {task_id[:12]}... 例外: {str(e)[:100]}")
-            error_count += 1
-
-    # ======================================
-    # 結果サマリー
-    # ======================================
-    total_time = time.time() - start_time
-    logger.info("=" * 60)
-    logger.info("結果収集完了 - サマリー")
-    logger.info("=" * 60)
-    logger.info(f"  総タスク数     : {total_tasks}")
-    logger.info(f"  成功           : {success_count} ({100*success_count/total_tasks:.1f}%)")
-    logger.info(f"  失敗           : {failed_count}")
-    logger.info(f"  エラー         : {error_count}")
-    logger.info(f"  生成Q/Aペア    : {len(all_qa_pairs)}個")
-    logger.info(f"  所要時間       : {total_time:.1f}秒")
-    logger.info("=" * 60)
-
-    # ======================================
-    # 診断ログ：取得できなかったタスクの詳細
-    # ======================================
-    missing_task_ids = submitted_task_ids - collected_task_ids
-    if missing_task_ids:
-        logger.warning(f"[診断] 取得できなかったタスク数: {len(missing_task_ids)}")
-        logger.warning("[診断] 取得できなかったタスクID（最初の10個）:")
-        for tid in list(missing_task_ids)[:10]:
-            # Redisの状態を再確認
-            redis_key = f"celery-task-meta-{tid}"
-            redis_data = redis_client.get(redis_key)
-            if redis_data:
-                try:
-                    task_result = json.loads(redis_data)
-                    status = task_result.get('status', 'UNKNOWN')
-                    result = task_result.get('result', {})
-                    success = result.get('success', 'N/A') if isinstance(result, dict) else 'N/A'
-                    logger.warning(f"  - {tid[:20]}... status={status}, success={success}")
-                except Exception:
-                    logger.warning(f"  - {tid[:20]}... (JSONデコード失敗)")
-            else:
-                logger.warning(f"  - {tid[:20]}... (Redisにデータなし)")
-    else:
-        logger.info(f"[診断] ✓ 全タスク取得成功 ({len(collected_task_ids)}/{total_tasks})")
+def collect_results(tasks: List, timeout: int = 300,
+                    on_result: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    """
+    並列処理の結果を収集
 
-    if failed_task_ids:
-        logger.warning(f"[診断] Q/A生成失敗タスク数: {len(failed_task_ids)}")
-        logger.warning(f"[診断] 失敗タスクID（最初の5個）: {failed_task_ids[:5]}")
+    pub/sub による完了通知と MGET による一括確認で結果を取得する
+    （タスクごとのGETポーリングは行わない）。
 
-    if error_task_ids:
-        logger.warning(f"[診断] エラータスク数: {len(error_task_ids)}")
-        logger.warning(f"[診断] エラータスクID（最初の5個）: {error_task_ids[:5]}")
+    Args:
+        tasks: Celeryタスクのリスト
+        timeout: タイムアウト（秒）
+        on_result: タスクの結果ごとに呼ぶ関数（ResultCollector参照）
 
-    if failed_chunks:
-        logger.warning(f"失敗チャンク（最初の5個）: {failed_chunks[:5]}")
+    Returns:
+        Q/Aペアのリスト
+    """
+    if not tasks:
+        return []
 
-    if success_count < total_tasks * 0.9:
-        logger.warning(f"⚠️ 成功率が90%未満です: {100*success_count/total_tasks:.1f}%")
+    try:
+        collector = ResultCollector(tasks, timeout=timeout, on_result=on_result)
+        collector.redis_client.ping()
+        logger.info("✓ Redis接続成功")
+    except Exception as e:
+        logger.error(f"✗ Redis接続失敗: {e}")
+        return []
 
-    return all_qa_pairs
+    return list(collector.stream())
 
 
 if __name__ == "__main__":
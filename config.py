@@ -367,6 +367,35 @@ class CeleryConfig:
     WORKER_PREFETCH_MULTIPLIER: int = 1
 
 
+# ===================================================================
+# APIレート制限設定
+# ===================================================================
+
+class RateLimitConfig:
+    """APIレート制限設定（RPM/TPMトークンバケット）"""
+
+    # "redis"（ワーカー間で共有）/ "memory"（プロセス内のみ）/ "auto"（Redis接続不可ならmemory）
+    BACKEND: str = "auto"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    KEY_PREFIX: str = "ratelimit"
+
+    # Geminiのモデル別上限（プロジェクトのクォータに合わせて調整）
+    # OpenAIの上限は celery_config.OPENAI_CONFIG を参照
+    GEMINI_LIMITS: Dict[str, Dict[str, int]] = {
+        "gemini-2.0-flash": {"rpm_limit": 2000, "tpm_limit": 4000000},
+        "gemini-embedding-001": {"rpm_limit": 3000, "tpm_limit": 1000000},
+    }
+
+    # 未登録モデルの上限
+    DEFAULT_LIMITS: Dict[str, int] = {"rpm_limit": 500, "tpm_limit": 200000}
+
+    # 上限に対する使用率（429回避のためのマージン）
+    SAFETY_FACTOR: float = 0.9
+
+    # LLM呼び出し時に予約する出力トークン数
+    DEFAULT_OUTPUT_TOKENS: int = 1024
+
+
 # ===================================================================
 # Gemini API設定
 # ===================================================================
@@ -453,6 +482,12 @@ class AgentConfig:
     RAG_SEARCH_LIMIT: int = 3
     RAG_SCORE_THRESHOLD: float = 0.50  # 検索結果として採用する最小スコア (0.7 -> 0.5に緩和)
 
+    # RAG検索キャッシュ（helper_search_cache）
+    RAG_QUERY_CACHE_SIZE: int = 1024      # クエリベクトル（Dense + Sparse）の最大件数
+    RAG_QUERY_CACHE_TTL: float = 3600.0   # 秒
+    RAG_RESULT_CACHE_SIZE: int = 512      # 検索結果の最大件数
+    RAG_RESULT_CACHE_TTL: float = 300.0   # 秒（他プロセスでの登録を反映するまでの上限）
+
     # エージェントモデル設定
     MODEL_NAME: str = GeminiConfig.DEFAULT_MODEL
 
@@ -0,0 +1,175 @@
+# eval/cassette.py
+"""
+評価用のLLM・ツール応答の記録と再生（record / replay）
+
+record: 実際のGeminiセッション・ツールを呼び、テストケースごとに
+    - LLMの応答（テキスト / function_call）
+    - ツールの戻り値
+    - 検索メトリクス（SearchMetrics）
+  を記録してJSON（カセット）に保存します。
+replay: カセットの応答を順に返すため、APIキー・Qdrantなしで数秒で評価できます。
+  入力が記録時と異なるテストケースは CassetteMismatchError になります（カセットを記録し直してください）。
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from agent_tools import AgentAbort
+from helper_qa_journal import write_atomic
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMismatchError(AgentAbort):
+    """カセットにテストケースがない・記録時と入力や呼び出しが異なる（エージェントのターンを中断する）"""
+    pass
+
+
+@dataclass
+class RecordedCase:
+    """1テストケース分の記録"""
+    input: str
+    llm: List[List[Dict[str, Any]]] = field(default_factory=list)   # send_message ごとの応答パーツ
+    tools: List[Dict[str, Any]] = field(default_factory=list)       # ツール呼び出し（name, args, result）
+    search_metrics: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class Cassette:
+    """テストケースIDごとの記録を保持するJSONファイル（スレッドセーフ）"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: カセットのJSONファイル（存在すれば読み込む）
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._cases: Dict[str, RecordedCase] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data: Dict[str, Any] = json.load(f)
+            self._cases = {case_id: RecordedCase(**case) for case_id, case in data.get("cases", {}).items()}
+            logger.info(f"カセットを読み込みました: {path} ({len(self._cases)}件)")
+
+    def __len__(self) -> int:
+        return len(self._cases)
+
+    def get(self, case_id: str) -> Optional[RecordedCase]:
+        with self._lock:
+            return self._cases.get(case_id)
+
+    def put(self, case_id: str, recorded: RecordedCase) -> None:
+        with self._lock:
+            self._cases[case_id] = recorded
+
+    def save(self) -> None:
+        """カセットを書き出す（記録済みのテストケースは上書き、他は保持）"""
+        with self._lock:
+            data = {
+                "version": CASSETTE_VERSION,
+                "cases": {case_id: asdict(case) for case_id, case in sorted(self._cases.items())},
+            }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        payload = json.dumps(data, ensure_ascii=False, indent=2, default=str)
+        write_atomic(self.path, payload.encode("utf-8"))
+        logger.info(f"カセットを保存しました: {self.path} ({len(data['cases'])}件)")
+
+
+# ============ 応答の記録 ============
+
+def serialize_response(response: Any) -> List[Dict[str, Any]]:
+    """Geminiの応答を run_agent_turn が参照する部分（text / function_call）だけに変換"""
+    parts: List[Dict[str, Any]] = []
+    for part in response.parts:
+        function_call = None
+        if part.function_call:
+            fc = part.function_call
+            # proto の args（MapComposite / RepeatedComposite）を JSON にできる値に変換
+            args = type(fc).to_dict(fc).get("args", {}) if hasattr(type(fc), "to_dict") else dict(fc.args)
+            function_call = {"name": fc.name, "args": args}
+        parts.append({"text": part.text if not function_call else "", "function_call": function_call})
+    return parts
+
+
+class RecordingChatSession:
+    """実セッションの応答を RecordedCase に記録するラッパー"""
+
+    def __init__(self, session: Any, recorded: RecordedCase):
+        self._session = session
+        self._recorded = recorded
+
+    def send_message(self, content: Any) -> Any:
+        response = self._session.send_message(content)
+        self._recorded.llm.append(serialize_response(response))
+        return response
+
+
+def recording_tools(tools: Dict[str, Callable[..., Any]], recorded: RecordedCase) -> Dict[str, Callable[..., Any]]:
+    """ツールの戻り値を RecordedCase に記録するラッパー"""
+    def wrap(name: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        def call(**kwargs: Any) -> Any:
+            result = fn(**kwargs)
+            recorded.tools.append({"name": name, "args": kwargs, "result": result})
+            return result
+        return call
+    return {name: wrap(name, fn) for name, fn in tools.items()}
+
+
+# ============ 応答の再生 ============
+
+@dataclass
+class _FunctionCall:
+    name: str
+    args: Dict[str, Any]
+
+
+@dataclass
+class _Part:
+    text: str = ""
+    function_call: Optional[_FunctionCall] = None
+
+
+@dataclass
+class _Response:
+    parts: List[_Part]
+
+
+class ReplayChatSession:
+    """記録済みの応答を順に返すチャットセッション（APIを呼ばない）"""
+
+    def __init__(self, recorded: RecordedCase):
+        self._responses = list(recorded.llm)
+
+    def send_message(self, content: Any) -> _Response:
+        if not self._responses:
+            raise CassetteMismatchError("記録より多くLLMが呼ばれました")
+        parts = self._responses.pop(0)
+        return _Response(parts=[
+            _Part(text=p.get("text") or "", function_call=_FunctionCall(**p["function_call"]) if p.get("function_call") else None)
+            for p in parts
+        ])
+
+
+class ReplayTools:
+    """記録済みのツールの戻り値を順に返すツール表（run_agent_turn の tools に渡す）"""
+
+    def __init__(self, recorded: RecordedCase):
+        self._calls = list(recorded.tools)
+        self._names = {call["name"] for call in recorded.tools}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def __getitem__(self, name: str) -> Callable[..., Any]:
+        def call(**kwargs: Any) -> Any:
+            if not self._calls or self._calls[0]["name"] != name:
+                raise CassetteMismatchError(f"記録にないツール呼び出しです: {name}")
+            return self._calls.pop(0)["result"]
+        return call
@@ -0,0 +1,166 @@
+# eval/parallel_runner.py
+"""
+評価の並列実行
+
+テストケースを ThreadPoolExecutor で並列に実行します（並列数は workers で制限）。
+
+    - live   : 事前に作成したチャットセッションのプールを使い回す（テストケースごとに履歴をリセット）。
+               genai.configure と GenerativeModel の作成は1回だけ
+    - record : live と同じく実行し、LLM・ツールの応答をカセットに記録
+    - replay : カセットの応答を再生（APIキー・Qdrant不要）
+
+検索メトリクスは agent_tools.collect_search_metrics() でテストケースごとに収集し、
+tool_info["search_metrics"] として run_single_test に渡します。
+
+環境変数:
+    EVAL_WORKERS : 並列数（既定 4）
+"""
+import logging
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from eval.cassette import (
+    Cassette,
+    CassetteMismatchError,
+    RecordedCase,
+    RecordingChatSession,
+    ReplayChatSession,
+    ReplayTools,
+    recording_tools,
+)
+from eval.evaluator import TestCase, TestResult, run_single_test
+from agent_main import create_agent_model, run_agent_turn, setup_agent, tools_map
+from agent_tools import SearchMetrics, collect_search_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "4"))
+EVAL_MODES = ("live", "record", "replay")
+
+
+class AgentSessionPool:
+    """事前に作成したチャットセッションのプール（返却時に履歴をリセットして再利用）"""
+
+    def __init__(self, size: int, session_factory: Optional[Callable[[], Any]] = None):
+        """
+        Args:
+            size: セッション数（並列数と同じにする）
+            session_factory: セッションを作る関数（None=共有モデルから setup_agent）
+        """
+        if session_factory is None:
+            model = create_agent_model()
+            session_factory = lambda: setup_agent(model)
+        self._sessions: "queue.Queue[Any]" = queue.Queue()
+        for _ in range(size):
+            self._sessions.put(session_factory())
+
+    @contextmanager
+    def session(self) -> Iterator[Any]:
+        """空きセッションを借りる（なければ返却を待つ）"""
+        chat = self._sessions.get()
+        try:
+            yield chat
+        finally:
+            chat.history = []
+            self._sessions.put(chat)
+
+
+class EvaluationRunner:
+    """テストケースを並列に実行する評価ランナー"""
+
+    def __init__(
+        self,
+        mode: str = "live",
+        workers: int = DEFAULT_EVAL_WORKERS,
+        cassette: Optional[Cassette] = None,
+        session_factory: Optional[Callable[[], Any]] = None,
+        tools: Optional[Dict[str, Callable[..., Any]]] = None
+    ):
+        """
+        Args:
+            mode: live / record / replay
+            workers: 並列数
+            cassette: record / replay で使うカセット
+            session_factory: チャットセッションを作る関数（None=setup_agent）
+            tools: ツール表（None=agent_main.tools_map）
+        """
+        if mode not in EVAL_MODES:
+            raise ValueError(f"未対応のモードです: {mode}（{', '.join(EVAL_MODES)}）")
+        if mode != "live" and cassette is None:
+            raise ValueError(f"{mode} にはカセットが必要です")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.cassette = cassette
+        self.session_factory = session_factory
+        self.tools = tools if tools is not None else tools_map
+        self._pool: Optional[AgentSessionPool] = None
+
+    def _replay(self, test_case: TestCase, user_input: str) -> Tuple[str, Dict[str, Any]]:
+        recorded = self.cassette.get(test_case.id)
+        if recorded is None:
+            raise CassetteMismatchError(f"カセットに {test_case.id} の記録がありません")
+        if recorded.input != user_input:
+            raise CassetteMismatchError(f"{test_case.id} の入力が記録時と異なります")
+        response, tool_info = run_agent_turn(
+            ReplayChatSession(recorded), user_input, return_tool_info=True, tools=ReplayTools(recorded)
+        )
+        tool_info["search_metrics"] = [SearchMetrics(**m) for m in recorded.search_metrics]
+        return response, tool_info
+
+    def _run_agent(self, test_case: TestCase, user_input: str) -> Tuple[str, Dict[str, Any]]:
+        """run_single_test に渡すエージェント関数（テストケースごと）"""
+        if self.mode == "replay":
+            return self._replay(test_case, user_input)
+
+        with self._pool.session() as chat, collect_search_metrics() as metrics:
+            tools = self.tools
+            recorded = None
+            if self.mode == "record":
+                recorded = RecordedCase(input=user_input)
+                chat = RecordingChatSession(chat, recorded)
+                tools = recording_tools(tools, recorded)
+            response, tool_info = run_agent_turn(chat, user_input, return_tool_info=True, tools=tools)
+            tool_info["search_metrics"] = list(metrics)
+
+        if recorded is not None:
+            recorded.search_metrics = [asdict(m) for m in metrics]
+            self.cassette.put(test_case.id, recorded)
+        return response, tool_info
+
+    def run(
+        self,
+        test_cases: List[TestCase],
+        on_result: Optional[Callable[[int, TestResult], None]] = None
+    ) -> List[TestResult]:
+        """
+        テストケースを並列に実行
+
+        Args:
+            test_cases: テストケース
+            on_result: 完了ごとに (完了数, TestResult) で呼ばれる関数
+
+        Returns:
+            TestResult のリスト（test_cases と同じ順）
+        """
+        if self.mode != "replay" and self._pool is None:
+            self._pool = AgentSessionPool(min(self.workers, len(test_cases)) or 1, self.session_factory)
+
+        results: List[Optional[TestResult]] = [None] * len(test_cases)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {
+                executor.submit(run_single_test, tc, lambda text, tc=tc: self._run_agent(tc, text)): i
+                for i, tc in enumerate(test_cases)
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results[futures[future]] = result
+                if on_result:
+                    on_result(done, result)
+
+        if self.mode == "record":
+            self.cassette.save()
+        return results  # type: ignore[return-value]
@@ -1,29 +1,33 @@
 # eval/run_evaluation.py
 """
 評価実行スクリプト
-Usage: python -m eval.run_evaluation
+Usage:
+    python -m eval.run_evaluation                        # 並列実行（EVAL_WORKERS、既定 4）
+    python -m eval.run_evaluation --workers 8
+    python -m eval.run_evaluation --mode record          # LLM・ツールの応答をカセットに記録
+    python -m eval.run_evaluation --mode replay          # カセットを再生（オフライン・APIキー不要）
 """
+import argparse
+import json
 import sys
 import logging
 from pathlib import Path
-import os
-from typing import List, Dict, Any, Callable, Tuple # Added Callable, Tuple
-from google.generativeai import ChatSession # Corrected import
+from typing import List, Dict, Any, Optional
 
 # プロジェクトルートをパスに追加
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from eval.evaluator import (
     load_test_cases,
-    run_single_test,
     generate_report,
     save_report,
     print_report_summary,
     TestCase, # Import TestCase for type hinting
     TestResult # Import TestResult for type hinting
 )
-from agent_main import setup_agent, run_agent_turn
-from agent_tools import get_search_metrics, clear_search_metrics, SearchMetrics # Import SearchMetrics for type hinting
+from eval.cassette import Cassette
+from eval.parallel_runner import DEFAULT_EVAL_WORKERS, EVAL_MODES, EvaluationRunner
+from agent_tools import clear_search_metrics, get_search_cache_stats
 
 # Configure logging
 logging.basicConfig(
@@ -32,25 +36,39 @@ logging.basicConfig(
 )
 logger: logging.Logger = logging.getLogger(__name__)
 
+DEFAULT_CASSETTE_PATH: str = "eval/cassettes/agent_responses.json"
 
-def agent_wrapper(user_input: str) -> Tuple[str, Dict[str, Any]]:
-    """
-    Evaluator用のエージェントラッパー関数
-    """
-    chat: ChatSession = setup_agent()
-    # run_agent_turn は (response_text, tool_info_dict) を返す
-    response_text: str
-    tool_info: Dict[str, Any]
-    response_text, tool_info = run_agent_turn(chat, user_input, return_tool_info=True) # type: ignore
-    return response_text, tool_info
+
+def save_traces(results: List[TestResult], path: str) -> None:
+    """テストケースごとのスパン木をJSONLに保存"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for r in results:
+            if r.trace:
+                f.write(json.dumps({"test_case_id": r.test_case_id, **r.trace}, ensure_ascii=False) + "\n")
+    logger.info(f"Traces saved to {path}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="エージェント評価")
+    parser.add_argument("--test-cases", default="eval/test_cases.json", help="テストケースのJSON")
+    parser.add_argument("--workers", type=int, default=DEFAULT_EVAL_WORKERS, help="並列数")
+    parser.add_argument("--mode", choices=EVAL_MODES, default="live",
+                        help="live: 実行 / record: 実行して応答を記録 / replay: 記録を再生")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE_PATH, help="record / replay のカセット")
+    parser.add_argument("--output", default="eval/results/report.json", help="レポートの出力先")
+    parser.add_argument("--trace-file", default="eval/results/traces.jsonl",
+                        help="テストケースごとのスパン木（JSONL、空文字で出力しない）")
+    return parser.parse_args()
 
 
 def main() -> None:
     """評価メイン処理"""
-    logger.info("評価プロセスを開始します...")
+    args: argparse.Namespace = parse_args()
+    logger.info(f"評価プロセスを開始します... (mode={args.mode}, workers={args.workers})")
 
     # テストケース読み込み
-    test_cases_path: str = "eval/test_cases.json"
+    test_cases_path: str = args.test_cases
     logger.info(f"テストケースを読み込み中: {test_cases_path}")
     test_cases: List[TestCase] = load_test_cases(test_cases_path)
     
@@ -64,30 +82,36 @@ def main() -> None:
     clear_search_metrics()
 
     # テスト実行
-    results: List[TestResult] = []
+    cassette: Optional[Cassette] = Cassette(args.cassette) if args.mode != "live" else None
+    runner: EvaluationRunner = EvaluationRunner(mode=args.mode, workers=args.workers, cassette=cassette)
     total: int = len(test_cases)
-    
-    for i, tc in enumerate(test_cases, 1):
-        logger.info(f"[{i}/{total}] Running Test: {tc.id} - {tc.description}")
-        logger.info(f"  Input: {tc.input}")
-        
-        result: TestResult = run_single_test(tc, agent_wrapper, get_search_metrics) # type: ignore
-        results.append(result)
 
+    def log_result(done: int, result: TestResult) -> None:
         status: str = "✅ PASS" if result.passed else "❌ FAIL"
-        logger.info(f"  Result: {status}")
+        logger.info(f"[{done}/{total}] {result.test_case_id}: {status} ({result.latency_ms:.0f}ms)")
         if not result.passed:
             logger.warning(f"  Reason: {result.failure_reason}")
             logger.info(f"  Response: {result.response[:100]}...")
 
+    results: List[TestResult] = runner.run(test_cases, on_result=log_result)
+
+    if args.trace_file:
+        save_traces(results, args.trace_file)
+
     # レポート生成
     report: Dict[str, Any] = generate_report(results)
+    report["search_cache"] = get_search_cache_stats()
 
     # 保存
-    save_report(report)
+    save_report(report, args.output)
     
     # サマリー出力
     print_report_summary(report)
+    cache_stats: Dict[str, Any] = report["search_cache"]
+    logger.info(
+        f"検索キャッシュ: 結果ヒット率={cache_stats['metrics_result_hit_rate']:.1%}, "
+        f"ベクトルヒット率={cache_stats['metrics_vector_hit_rate']:.1%} ({cache_stats['searches']}回)"
+    )
 
     # 終了コード（CI用）
     if report["summary"]["accuracy"] < 0.9:
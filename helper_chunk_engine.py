@@ -0,0 +1,215 @@
+"""
+文書チャンク分割エンジン（プロセス並列）
+
+SemanticCoverage によるセマンティック分割を複数プロセスで実行します。
+
+    - ワーカープロセスごとに分割器（SemanticCoverage）を1つだけ生成して使い回す
+    - 入力は文書のイテレータ（DataFrame全体を展開しない）、送信中のタスク数は上限付き
+    - 出力は入力順（チャンクIDは文書ID + 文書内の連番で決まる）
+    - workers=1 の場合はプロセスを起動せず同一プロセスで実行
+
+使用例:
+    engine = ChunkingEngine(max_tokens=300, workers=8)
+    for doc, chunks in engine.iter_documents(docs):
+        ...
+
+環境変数:
+    CHUNK_WORKERS : ワーカープロセス数（未設定時は CPU コア数）
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkDocument(NamedTuple):
+    """分割対象の文書"""
+    doc_id: str
+    doc_idx: Any
+    text: str
+
+
+def create_default_analyzer():
+    """既定の分割器（SemanticCoverage）を生成"""
+    from helper_rag_qa import SemanticCoverage
+    return SemanticCoverage(embedding_model="gemini-embedding-001")
+
+
+_default_analyzer = None
+_default_analyzer_lock = threading.Lock()
+
+
+def get_default_analyzer():
+    """プロセス内で共有する既定の分割器を取得"""
+    global _default_analyzer
+    if _default_analyzer is None:
+        with _default_analyzer_lock:
+            if _default_analyzer is None:
+                _default_analyzer = create_default_analyzer()
+    return _default_analyzer
+
+
+def chunk_document(analyzer, text: str, max_tokens: int = 200, min_tokens: int = 50,
+                   chunk_id_prefix: str = "chunk") -> List[Dict]:
+    """
+    1文書を段落優先のセマンティック分割でチャンクに分割
+
+    Args:
+        analyzer: SemanticCoverage（create_semantic_chunks と tokenizer を持つオブジェクト）
+        text: 分割対象テキスト
+        max_tokens: チャンクの最大トークン数
+        min_tokens: 最小トークン数（小さすぎるチャンクは自動マージ）
+        chunk_id_prefix: チャンクIDのプレフィックス
+
+    Returns:
+        チャンクのリスト（id, text, tokens, type, sentences）
+    """
+    semantic_chunks = analyzer.create_semantic_chunks(
+        document=text,
+        max_tokens=max_tokens,
+        min_tokens=min_tokens,
+        prefer_paragraphs=True,
+        verbose=False
+    )
+
+    chunks = []
+    for i, semantic_chunk in enumerate(semantic_chunks):
+        chunk_text = semantic_chunk['text']
+        chunks.append({
+            'id': f"{chunk_id_prefix}_{i}",
+            'text': chunk_text,
+            'tokens': len(analyzer.tokenizer.encode(chunk_text)),
+            'type': semantic_chunk.get('type', 'unknown'),  # paragraph/sentence_group/forced_split
+            'sentences': semantic_chunk.get('sentences', [])
+        })
+    return chunks
+
+
+def _chunk_one(analyzer, doc: ChunkDocument, max_tokens: int, min_tokens: int) -> Tuple[List[Dict], Optional[str]]:
+    """1文書を分割（例外は文字列で返し、呼び出し元でログ出力）"""
+    try:
+        return chunk_document(analyzer, doc.text, max_tokens, min_tokens, f"{doc.doc_id}_chunk"), None
+    except Exception as e:
+        return [], f"{type(e).__name__}: {e}"
+
+
+# ワーカープロセス内の状態（_init_worker で設定）
+_worker_analyzer = None
+_worker_params: Tuple[int, int] = (200, 50)
+
+
+def _init_worker(analyzer_factory: Callable[[], Any], max_tokens: int, min_tokens: int) -> None:
+    global _worker_analyzer, _worker_params
+    _worker_analyzer = analyzer_factory()
+    _worker_params = (max_tokens, min_tokens)
+
+
+def _chunk_batch(docs: List[ChunkDocument]) -> List[Tuple[List[Dict], Optional[str]]]:
+    max_tokens, min_tokens = _worker_params
+    return [_chunk_one(_worker_analyzer, doc, max_tokens, min_tokens) for doc in docs]
+
+
+def default_worker_count() -> int:
+    """ワーカー数の既定値（CHUNK_WORKERS、未設定ならCPUコア数）"""
+    env = os.getenv("CHUNK_WORKERS")
+    if env and env.isdigit() and int(env) > 0:
+        return int(env)
+    return os.cpu_count() or 1
+
+
+class ChunkingEngine:
+    """プロセス並列のチャンク分割エンジン"""
+
+    def __init__(
+        self,
+        max_tokens: int = 200,
+        min_tokens: int = 50,
+        workers: Optional[int] = None,
+        docs_per_task: int = 16,
+        max_pending_tasks: Optional[int] = None,
+        analyzer_factory: Callable[[], Any] = create_default_analyzer,
+        mp_start_method: str = "spawn"
+    ):
+        """
+        Args:
+            max_tokens: チャンクの最大トークン数
+            min_tokens: チャンクの最小トークン数
+            workers: ワーカープロセス数（None=default_worker_count()、1=同一プロセス）
+            docs_per_task: 1タスクにまとめる文書数（プロセス間通信の回数を削減）
+            max_pending_tasks: 送信中タスクの上限（None=workers*2）
+            analyzer_factory: 分割器を生成する関数（ワーカーごとに1回呼ばれる、pickle可能であること）
+            mp_start_method: プロセス起動方式（gRPCクライアント等を持つ親プロセスからのforkを避けるため既定はspawn）
+        """
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+        self.workers = workers or default_worker_count()
+        self.docs_per_task = max(1, docs_per_task)
+        self.max_pending_tasks = max_pending_tasks or self.workers * 2
+        self.analyzer_factory = analyzer_factory
+        self.mp_start_method = mp_start_method
+
+    def iter_documents(self, documents: Iterable[ChunkDocument]) -> Iterator[Tuple[ChunkDocument, List[Dict]]]:
+        """
+        文書を分割し、入力順に (文書, チャンクのリスト) を返す
+
+        分割に失敗した文書は警告ログを出し、空のリストを返す。
+
+        Args:
+            documents: ChunkDocument のイテラブル
+
+        Yields:
+            (ChunkDocument, チャンクのリスト)
+        """
+        if self.workers <= 1:
+            yield from self._iter_in_process(documents)
+        else:
+            yield from self._iter_in_pool(documents)
+
+    def _iter_in_process(self, documents: Iterable[ChunkDocument]) -> Iterator[Tuple[ChunkDocument, List[Dict]]]:
+        analyzer = get_default_analyzer() if self.analyzer_factory is create_default_analyzer else self.analyzer_factory()
+        for doc in documents:
+            chunks, error = _chunk_one(analyzer, doc, self.max_tokens, self.min_tokens)
+            if error:
+                logger.warning(f"チャンク作成エラー (doc {doc.doc_idx}): {error}")
+            yield doc, chunks
+
+    def _iter_in_pool(self, documents: Iterable[ChunkDocument]) -> Iterator[Tuple[ChunkDocument, List[Dict]]]:
+        pending: Deque[Tuple[List[ChunkDocument], Future]] = deque()
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(self.mp_start_method),
+            initializer=_init_worker,
+            initargs=(self.analyzer_factory, self.max_tokens, self.min_tokens),
+        )
+
+        def drain_one() -> Iterator[Tuple[ChunkDocument, List[Dict]]]:
+            batch, future = pending.popleft()
+            for doc, (chunks, error) in zip(batch, future.result()):
+                if error:
+                    logger.warning(f"チャンク作成エラー (doc {doc.doc_idx}): {error}")
+                yield doc, chunks
+
+        try:
+            batch: List[ChunkDocument] = []
+            for doc in documents:
+                batch.append(doc)
+                if len(batch) >= self.docs_per_task:
+                    pending.append((batch, executor.submit(_chunk_batch, batch)))
+                    batch = []
+                    # 送信中タスクが上限に達したら最も古いタスクの結果を先に返す（入力順を維持）
+                    while len(pending) >= self.max_pending_tasks:
+                        yield from drain_one()
+            if batch:
+                pending.append((batch, executor.submit(_chunk_batch, batch)))
+            while pending:
+                yield from drain_one()
+        finally:
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True, cancel_futures=True)
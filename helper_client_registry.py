@@ -0,0 +1,193 @@
+"""
+クライアントレジストリ（プロセス共有）
+
+EmbeddingClient / LLMClient をプロバイダーと初期化パラメータをキーにして
+プロセス内で共有します。genai.Client の生成や FastEmbed / SPLADE の ONNX モデル
+ロードをクエリごとに行わないようにするためのものです。
+
+    - スレッドセーフ（キーごとのロックで同一クライアントの二重生成を防止）
+    - 遅延初期化（初回取得時に生成）
+    - prewarm_clients() でワーカー / エージェント起動時に事前生成・ウォームアップ
+
+使用例:
+    from helper_client_registry import get_embedding_client, get_llm_client
+
+    embedding = get_embedding_client("gemini")
+    llm = get_llm_client("gemini")
+
+    # 起動時の事前ウォームアップ
+    prewarm_clients(embedding_providers=["gemini"], llm_providers=["gemini"])
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from helper_embedding import DEFAULT_EMBEDDING_PROVIDER, EmbeddingClient, create_embedding_client
+from helper_llm import DEFAULT_LLM_PROVIDER, LLMClient, create_llm_client
+
+logger = logging.getLogger(__name__)
+
+
+def _make_key(kind: str, provider: str, kwargs: Dict[str, Any]) -> Tuple[Hashable, ...]:
+    """レジストリのキー（種別, プロバイダー, 初期化パラメータ）"""
+    return (kind, provider, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+
+
+class ClientRegistry:
+    """スレッドセーフな遅延初期化クライアントレジストリ"""
+
+    def __init__(self):
+        self._clients: Dict[Tuple[Hashable, ...], Any] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Tuple[Hashable, ...], threading.Lock] = {}
+
+    def get_or_create(self, key: Tuple[Hashable, ...], factory: Callable[[], Any]) -> Any:
+        """
+        キーに対応するクライアントを取得（未生成なら factory で生成）
+
+        Args:
+            key: レジストリのキー
+            factory: クライアント生成関数
+
+        Returns:
+            クライアントインスタンス
+        """
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # 生成はキー単位でロック（別キーのクライアント生成はブロックしない）
+        with key_lock:
+            client = self._clients.get(key)
+            if client is None:
+                start = time.perf_counter()
+                client = factory()
+                self._clients[key] = client
+                logger.info(
+                    f"クライアント生成: {'/'.join(map(str, key))} ({(time.perf_counter() - start) * 1000:.1f}ms)"
+                )
+            return client
+
+    def clear(self) -> None:
+        """登録済みクライアントを破棄（テスト・設定変更用）"""
+        with self._lock:
+            self._clients.clear()
+            self._key_locks.clear()
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def __contains__(self, key: Tuple[Hashable, ...]) -> bool:
+        return key in self._clients
+
+
+_registry = ClientRegistry()
+
+
+def get_client_registry() -> ClientRegistry:
+    """プロセス共有のレジストリを取得"""
+    return _registry
+
+
+def get_embedding_client(
+    provider: Optional[str] = None,
+    cached: bool = False,
+    **kwargs
+) -> EmbeddingClient:
+    """
+    共有EmbeddingClientを取得
+
+    Args:
+        provider: "openai", "gemini", or "fastembed"（Noneの場合はデフォルト）
+        cached: Trueの場合は永続キャッシュ付きクライアント（helper_embedding_cache）
+        **kwargs: create_embedding_client に渡す初期化パラメータ
+
+    Returns:
+        EmbeddingClientインスタンス
+    """
+    provider = (provider or DEFAULT_EMBEDDING_PROVIDER).lower()
+    kind = "embedding_cached" if cached else "embedding"
+
+    def factory() -> EmbeddingClient:
+        if cached:
+            from helper_embedding_cache import create_cached_embedding_client
+            return create_cached_embedding_client(provider=provider, **kwargs)
+        return create_embedding_client(provider=provider, **kwargs)
+
+    return _registry.get_or_create(_make_key(kind, provider, kwargs), factory)
+
+
+def get_llm_client(provider: Optional[str] = None, **kwargs) -> LLMClient:
+    """
+    共有LLMClientを取得
+
+    Args:
+        provider: "openai" or "gemini"（Noneの場合はデフォルト）
+        **kwargs: create_llm_client に渡す初期化パラメータ
+
+    Returns:
+        LLMClientインスタンス
+    """
+    provider = (provider or DEFAULT_LLM_PROVIDER).lower()
+    return _registry.get_or_create(
+        _make_key("llm", provider, kwargs),
+        lambda: create_llm_client(provider=provider, **kwargs)
+    )
+
+
+def prewarm_clients(
+    embedding_providers: Iterable[str] = (),
+    llm_providers: Iterable[str] = (),
+    sparse_model: Optional[str] = None,
+    warmup_text: str = "warmup"
+) -> Dict[str, float]:
+    """
+    クライアントを事前生成してウォームアップ（ワーカー / エージェント起動時用）
+
+    ローカルモデル（FastEmbed / Sparse）は1回推論してONNXセッションを温めます。
+    生成に失敗したクライアントは警告ログのみで継続します。
+
+    Args:
+        embedding_providers: 事前生成するEmbeddingプロバイダー
+        llm_providers: 事前生成するLLMプロバイダー
+        sparse_model: Sparseモデル名（Noneの場合はSparseを生成しない）
+        warmup_text: ウォームアップ推論用テキスト
+
+    Returns:
+        {"embedding:gemini": 経過ms, ...}（失敗したものは含まない）
+    """
+    timings: Dict[str, float] = {}
+
+    def _warm(label: str, fn: Callable[[], None]) -> None:
+        start = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            logger.warning(f"クライアントの事前生成に失敗しました ({label}): {e}")
+            return
+        timings[label] = (time.perf_counter() - start) * 1000
+
+    for provider in embedding_providers:
+        def _embedding(provider=provider):
+            client = get_embedding_client(provider)
+            if provider == "fastembed":
+                client.embed_text(warmup_text)
+        _warm(f"embedding:{provider}", _embedding)
+
+    for provider in llm_providers:
+        _warm(f"llm:{provider}", lambda provider=provider: get_llm_client(provider))
+
+    if sparse_model:
+        def _sparse():
+            from helper_embedding_sparse import get_sparse_embedding_client
+            get_sparse_embedding_client(sparse_model).embed_text(warmup_text)
+        _warm(f"sparse:{sparse_model}", _sparse)
+
+    if timings:
+        logger.info(f"クライアント事前生成完了: {timings}")
+    return timings
@@ -0,0 +1,235 @@
+"""
+Qdrantコレクションのメタデータレジストリ
+
+コレクションの存在・ポイント数・ベクトル設定・Sparseベクトルの有無をメモリに保持し、
+検索時のQdrantへの呼び出しを検索1回だけにします。エントリはコレクションごとに ttl 秒で
+期限切れになり、invalidate(name) でそのコレクションだけを破棄します。
+"""
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from qdrant_client_wrapper import CollectionCapabilities, parse_collection_capabilities
+
+logger = logging.getLogger(__name__)
+
+
+# コレクションごとのメタデータ・一覧の有効期限（秒）
+DEFAULT_REGISTRY_TTL = float(os.getenv("QDRANT_REGISTRY_TTL", "60"))
+# バックグラウンド更新の間隔（秒、0 = 更新スレッドなし）
+DEFAULT_REFRESH_INTERVAL = float(os.getenv("QDRANT_REGISTRY_REFRESH_INTERVAL", "0"))
+
+
+@dataclass(frozen=True)
+class CollectionInfo:
+    """コレクションのメタデータ"""
+    name: str
+    points_count: Optional[int] = None
+    vector_size: Optional[int] = None
+    distance: Optional[str] = None
+    dense_name: Optional[str] = None   # None = 名前なしのDenseベクトル
+    sparse_name: Optional[str] = None  # None = Sparseベクトルなし
+    error: Optional[str] = None        # get_collection に失敗した場合のエラー
+
+    @property
+    def capabilities(self) -> CollectionCapabilities:
+        return CollectionCapabilities(dense_name=self.dense_name, sparse_name=self.sparse_name)
+
+    @property
+    def hybrid(self) -> bool:
+        return self.sparse_name is not None
+
+    @classmethod
+    def from_collection(cls, name: str, info: Any) -> "CollectionInfo":
+        """get_collection の戻り値から作成"""
+        params = getattr(getattr(info, "config", None), "params", None)
+        capabilities = parse_collection_capabilities(params)
+        vectors = getattr(params, "vectors", None)
+        if isinstance(vectors, dict):
+            vectors = vectors.get(capabilities.dense_name) if vectors else None
+        distance = getattr(vectors, "distance", None)
+        return cls(
+            name=name,
+            points_count=getattr(info, "points_count", None),
+            vector_size=getattr(vectors, "size", None),
+            distance=getattr(distance, "value", distance),
+            dense_name=capabilities.dense_name,
+            sparse_name=capabilities.sparse_name,
+        )
+
+
+class CollectionRegistry:
+    """コレクションのメタデータをメモリに保持するレジストリ（スレッドセーフ）"""
+
+    def __init__(
+        self,
+        client: Any,
+        ttl: float = DEFAULT_REGISTRY_TTL,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            client: Qdrantクライアント
+            ttl: コレクションごとのメタデータ・一覧の有効期限（秒）
+            clock: 時刻関数（テスト用）
+        """
+        self.client = client
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._collections: Dict[str, CollectionInfo] = {}
+        self._fetched_at: Dict[str, float] = {}
+        self._loaded_at: Optional[float] = None
+        self._stop_event: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0
+        self.lookups = 0
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and self._clock() - self._loaded_at < self.ttl
+
+    def _fetch(self, name: str) -> CollectionInfo:
+        try:
+            return CollectionInfo.from_collection(name, self.client.get_collection(name))
+        except Exception as e:
+            logger.warning(f"コレクション '{name}' の情報取得エラー: {e}")
+            return CollectionInfo(name=name, error=str(e))
+
+    def refresh(self) -> Dict[str, CollectionInfo]:
+        """
+        全コレクションのメタデータを取得し直す（同時に呼ばれた場合は1回だけ取得）
+
+        Returns:
+            コレクション名 → CollectionInfo
+
+        Raises:
+            Exception: get_collections に失敗した場合（Qdrantに接続できないなど）
+        """
+        started = self._clock()
+        with self._refresh_lock:
+            # 待っている間に他のスレッドが取得し直していれば、それを使う
+            with self._lock:
+                if self._loaded_at is not None and self._loaded_at >= started:
+                    return dict(self._collections)
+
+            names = [c.name for c in self.client.get_collections().collections]
+            collections = {name: self._fetch(name) for name in names}
+            with self._lock:
+                self._collections = collections
+                self._loaded_at = self._clock()
+                self._fetched_at = {name: self._loaded_at for name in collections}
+                self.refreshes += 1
+        logger.info(f"コレクションレジストリを更新しました: {len(collections)}件")
+        return dict(collections)
+
+    def _snapshot(self) -> Dict[str, CollectionInfo]:
+        with self._lock:
+            if self._is_fresh():
+                return self._collections
+        return self.refresh()
+
+    def get(self, name: str) -> Optional[CollectionInfo]:
+        """
+        コレクションのメタデータを取得（期限切れ・未取得なら、そのコレクションだけを取得し直す）
+
+        Args:
+            name: コレクション名
+
+        Returns:
+            CollectionInfo（コレクションがなければ None）
+
+        Raises:
+            Exception: 取得できず、一覧の get_collections にも失敗した場合（Qdrantに接続できないなど）
+        """
+        with self._lock:
+            self.lookups += 1
+            cached = self._collections.get(name)
+            fetched_at = self._fetched_at.get(name)
+            if cached is not None and cached.error is None and fetched_at is not None \
+                    and self._clock() - fetched_at < self.ttl:
+                return cached
+
+        info = self._fetch(name)
+        if info.error is None:
+            with self._lock:
+                self._collections = {**self._collections, name: info}
+                self._fetched_at[name] = self._clock()
+            return info
+
+        # 取得できないコレクションは一覧で存在を確認する（Qdrantに接続できなければ例外）
+        listed = self._snapshot().get(name)
+        if listed is None or listed.error is not None:
+            return None
+        return listed
+
+    def names(self) -> List[str]:
+        """コレクション名の一覧"""
+        return list(self._snapshot())
+
+    def all(self) -> List[CollectionInfo]:
+        """全コレクションのメタデータ"""
+        return list(self._snapshot().values())
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """
+        メタデータを破棄（検索エラー・コレクションの作成/削除・ポイントの登録/削除後に呼ぶ）
+
+        Args:
+            name: 対象コレクション（None=スナップショット全体を期限切れにする）
+        """
+        with self._lock:
+            # コレクションの作成・削除で一覧も変わりうるため、一覧は期限切れにする
+            self._loaded_at = None
+            if name is None:
+                self._fetched_at = {}
+            else:
+                self._collections = {k: v for k, v in self._collections.items() if k != name}
+                self._fetched_at.pop(name, None)
+
+    def start_background_refresh(self, interval: float = DEFAULT_REFRESH_INTERVAL) -> None:
+        """
+        別スレッドで interval 秒ごとに取得し直す（ttl は interval より長くしておく）
+
+        Args:
+            interval: 更新間隔（秒、0以下なら何もしない）
+        """
+        if interval <= 0 or self._thread is not None:
+            return
+        self._stop_event = threading.Event()
+
+        def loop(stop_event: threading.Event) -> None:
+            while not stop_event.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.warning(f"コレクションレジストリのバックグラウンド更新に失敗しました: {e}")
+
+        self._thread = threading.Thread(
+            target=loop, args=(self._stop_event,), name="collection-registry-refresh", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"コレクションレジストリのバックグラウンド更新を開始しました（{interval}秒ごと）")
+
+    def stop_background_refresh(self) -> None:
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._stop_event = None
+
+    def stats(self) -> Dict[str, Any]:
+        """更新回数・参照回数・スナップショットの経過秒数"""
+        with self._lock:
+            age = self._clock() - self._loaded_at if self._loaded_at is not None else None
+            return {
+                "collections": len(self._collections),
+                "refreshes": self.refreshes,
+                "lookups": self.lookups,
+                "age_seconds": age,
+            }
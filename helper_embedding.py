@@ -16,9 +16,13 @@ OpenAI Embeddings API と Gemini Embeddings API の両方に対応する統一
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
 import os
 import logging
+import random
+import threading
 import time
 
 from dotenv import load_dotenv
@@ -27,6 +31,9 @@ from dotenv import load_dotenv
 from openai import OpenAI
 from google import genai
 
+from helper_rate_limiter import acquire_rate_limit
+from helper_token_estimator import get_token_estimator
+
 load_dotenv()
 
 logger = logging.getLogger(__name__)
@@ -36,6 +43,27 @@ logger = logging.getLogger(__name__)
 DEFAULT_GEMINI_EMBEDDING_DIMS = 3072
 DEFAULT_OPENAI_EMBEDDING_DIMS = 1536
 
+# Gemini Embeddingの同時送信バッチ数
+DEFAULT_GEMINI_EMBEDDING_MAX_IN_FLIGHT = int(os.getenv("GEMINI_EMBEDDING_MAX_IN_FLIGHT", "4"))
+
+
+class EmbeddingBatchError(RuntimeError):
+    """バッチEmbeddingがリトライ上限に達した場合の例外"""
+
+    def __init__(self, start: int, size: int, cause: Optional[Exception]):
+        self.start = start
+        self.size = size
+        self.cause = cause
+        super().__init__(f"Embedding batch failed at index {start} (size={size}): {cause}")
+
+
+def _is_rate_limit_error(error: Exception) -> bool:
+    """429 / RESOURCE_EXHAUSTED エラーか判定"""
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message
+
 
 class EmbeddingClient(ABC):
     """Embeddingクライアント抽象基底クラス"""
@@ -77,6 +105,24 @@ class EmbeddingClient(ABC):
         """
         pass
 
+    def iter_embed_batches(
+        self,
+        texts: List[str],
+        batch_size: int = 100
+    ) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        バッチ単位でEmbeddingを逐次返すジェネレータ（入力順）
+
+        Args:
+            texts: 入力テキストのリスト
+            batch_size: バッチサイズ
+
+        Yields:
+            (バッチ先頭のインデックス, そのバッチのEmbeddingベクトル)
+        """
+        for i in range(0, len(texts), batch_size):
+            yield i, self.embed_texts(texts[i:i + batch_size], batch_size=batch_size)
+
 
 class OpenAIEmbedding(EmbeddingClient):
     """OpenAI Embeddings API実装"""
@@ -146,17 +192,26 @@ class OpenAIEmbedding(EmbeddingClient):
 class GeminiEmbedding(EmbeddingClient):
     """Gemini Embeddings API実装（3072次元: Gemini 3アドバンテージ）"""
 
+    # Gemini APIの1リクエストあたりの最大テキスト数
+    MAX_BATCH_SIZE = 100
+
     def __init__(
         self,
         api_key: Optional[str] = None,
         model: str = "gemini-embedding-001",
-        dims: int = DEFAULT_GEMINI_EMBEDDING_DIMS
+        dims: int = DEFAULT_GEMINI_EMBEDDING_DIMS,
+        max_in_flight: int = DEFAULT_GEMINI_EMBEDDING_MAX_IN_FLIGHT,
+        max_retries: int = 5,
+        retry_base_delay: float = 1.0
     ):
         """
         Args:
             api_key: Gemini APIキー（Noneの場合は環境変数から取得）
             model: 使用モデル
             dims: Embedding次元数（3072推奨: Gemini 3最大精度）
+            max_in_flight: 同時に送信中にするバッチ数
+            max_retries: バッチごとの最大リトライ回数
+            retry_base_delay: リトライ待機の基準秒数（指数バックオフ）
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
@@ -165,15 +220,29 @@ class GeminiEmbedding(EmbeddingClient):
         self.client = genai.Client(api_key=self.api_key)
         self.model = model
         self._dims = dims
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+
+        # 429発生時は全スレッド共通でクールダウン（適応的バックオフ）
+        self._backoff_lock = threading.Lock()
+        self._backoff = 0.0
+        self._cooldown_until = 0.0
 
-        logger.info(f"GeminiEmbedding initialized: model={model}, dims={dims}")
+        logger.info(f"GeminiEmbedding initialized: model={model}, dims={dims}, max_in_flight={self.max_in_flight}")
 
     @property
     def dimensions(self) -> int:
         return self._dims
 
+    def _acquire_quota(self, texts: List[str]) -> None:
+        """API呼び出し前にRPM/TPMを取得（必要なら待機）"""
+        tokens = sum(get_token_estimator().count_batch(texts, model=self.model))
+        acquire_rate_limit("gemini", self.model, tokens=tokens)
+
     def embed_text(self, text: str) -> List[float]:
         """単一テキストのEmbedding生成（3072次元）"""
+        self._acquire_quota([text])
         response = self.client.models.embed_content(
             model=self.model,
             contents=text,
@@ -181,6 +250,109 @@ class GeminiEmbedding(EmbeddingClient):
         )
         return response.embeddings[0].values
 
+    def _wait_for_cooldown(self) -> None:
+        """429によるクールダウン中なら待機"""
+        with self._backoff_lock:
+            wait = self._cooldown_until - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+    def _on_rate_limited(self) -> float:
+        """429発生時: 共通クールダウンを倍増して設定"""
+        with self._backoff_lock:
+            self._backoff = min(60.0, max(self.retry_base_delay, self._backoff * 2))
+            self._cooldown_until = max(self._cooldown_until, time.time() + self._backoff)
+            return self._backoff
+
+    def _on_success(self) -> None:
+        """成功時: クールダウンを徐々に縮小"""
+        with self._backoff_lock:
+            self._backoff = self._backoff / 2 if self._backoff > self.retry_base_delay else 0.0
+
+    def _embed_batch(self, batch_texts: List[str], start: int) -> List[List[float]]:
+        """
+        1バッチをEmbedding（失敗時はバッチ単位でリトライ）
+
+        Raises:
+            EmbeddingBatchError: リトライ上限に達した場合
+        """
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_cooldown()
+            try:
+                self._acquire_quota(batch_texts)
+                response = self.client.models.embed_content(
+                    model=self.model,
+                    contents=batch_texts,
+                    config={"output_dimensionality": self._dims}
+                )
+
+                # response.embeddings は ContentEmbedding オブジェクトのリスト
+                embeddings = getattr(response, "embeddings", None) or []
+                if len(embeddings) != len(batch_texts):
+                    raise ValueError(
+                        f"Embedding件数が一致しません: expected={len(batch_texts)}, actual={len(embeddings)}"
+                    )
+                self._on_success()
+                return [e.values for e in embeddings]
+
+            except Exception as e:
+                last_error = e
+                if attempt >= self.max_retries:
+                    break
+                if _is_rate_limit_error(e):
+                    delay = self._on_rate_limited()
+                    logger.warning(f"[Embedding] 429 at index {start}: {delay:.1f}秒クールダウン後にリトライ ({attempt + 1}/{self.max_retries})")
+                else:
+                    delay = self.retry_base_delay * (2 ** attempt) * random.uniform(1.0, 1.5)
+                    logger.warning(f"[Embedding] Batch error at index {start}: {e} - {delay:.1f}秒後にリトライ ({attempt + 1}/{self.max_retries})")
+                    time.sleep(delay)
+
+        raise EmbeddingBatchError(start, len(batch_texts), last_error)
+
+    def iter_embed_batches(
+        self,
+        texts: List[str],
+        batch_size: int = 100
+    ) -> Iterator[Tuple[int, List[List[float]]]]:
+        """
+        バッチを並列送信し、完了したものから入力順に返すジェネレータ
+
+        同時送信数は max_in_flight まで（呼び出し側の消費が遅い場合は送信も止まる）。
+
+        Yields:
+            (バッチ先頭のインデックス, そのバッチのEmbeddingベクトル)
+
+        Raises:
+            EmbeddingBatchError: いずれかのバッチがリトライ上限に達した場合
+        """
+        if batch_size > self.MAX_BATCH_SIZE:
+            logger.warning(f"[Embedding] Batch size {batch_size} exceeds Gemini limit ({self.MAX_BATCH_SIZE}). Clamping to {self.MAX_BATCH_SIZE}.")
+            batch_size = self.MAX_BATCH_SIZE
+
+        starts = iter(range(0, len(texts), batch_size))
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="gemini-embed") as executor:
+            in_flight: Deque[Tuple[int, Future]] = deque()
+
+            def submit_next() -> None:
+                start = next(starts, None)
+                if start is not None:
+                    in_flight.append((start, executor.submit(self._embed_batch, texts[start:start + batch_size], start)))
+
+            for _ in range(self.max_in_flight):
+                submit_next()
+
+            try:
+                while in_flight:
+                    start, future = in_flight.popleft()
+                    vectors = future.result()
+                    submit_next()
+                    yield start, vectors
+            finally:
+                # 途中終了・エラー時は未着手のバッチを取り消す
+                for _, future in in_flight:
+                    future.cancel()
+
     def embed_texts(
         self,
         texts: List[str],
@@ -189,55 +361,23 @@ class GeminiEmbedding(EmbeddingClient):
         """
         バッチEmbedding生成
 
-        Gemini APIのバッチ機能（contentsにリストを渡す）を使用して高速化
+        Gemini APIのバッチ機能（contentsにリストを渡す）を複数バッチ並列で送信する。
+        失敗したバッチはバッチ単位でリトライし、ゼロベクトルで埋めることはしない。
+
+        Raises:
+            EmbeddingBatchError: いずれかのバッチがリトライ上限に達した場合
         """
         all_embeddings: List[List[float]] = []
         total = len(texts)
         start_time = time.time()
 
         # 開始ログ
-        logger.info(f"[Embedding] 開始: {total}件のテキストを処理します (Batch Size: {batch_size})")
-
-        # Gemini API restriction: max 100 per batch
-        if batch_size > 100:
-            logger.warning(f"[Embedding] Batch size {batch_size} exceeds Gemini limit (100). Clamping to 100.")
-            batch_size = 100
-
-        for i in range(0, total, batch_size):
-            batch_texts = texts[i : i + batch_size]
-            
-            try:
-                response = self.client.models.embed_content(
-                    model=self.model,
-                    contents=batch_texts,
-                    config={"output_dimensionality": self._dims}
-                )
-                
-                # レスポンスからベクトルを抽出
-                # response.embeddings は ContentEmbedding オブジェクトのリスト
-                if hasattr(response, "embeddings") and response.embeddings:
-                    batch_embeddings = [e.values for e in response.embeddings]
-                    all_embeddings.extend(batch_embeddings)
-                else:
-                    raise ValueError("No embeddings returned in response")
-
-                # 進捗ログ
-                current_count = min(i + batch_size, total)
-                elapsed = time.time() - start_time
-                logger.info(f"[Embedding] 進捗: {current_count}/{total} (Batch {i // batch_size + 1}) 経過={elapsed:.1f}秒")
+        logger.info(f"[Embedding] 開始: {total}件のテキストを処理します (Batch Size: {batch_size}, 並列: {self.max_in_flight})")
 
-                # レート制限への配慮 (バッチ間は少し待機)
-                time.sleep(0.5)
-
-            except Exception as e:
-                logger.error(f"[Embedding] Batch error at index {i}: {e}")
-                logger.warning("Error batch filled with zero vectors to maintain alignment.")
-                # エラー時はゼロ埋めして整合性を保つ
-                zeros = [[0.0] * self._dims] * len(batch_texts)
-                all_embeddings.extend(zeros)
-                
-                # 連続エラーを防ぐため少し長く待機
-                time.sleep(2.0)
+        for start, vectors in self.iter_embed_batches(texts, batch_size=batch_size):
+            all_embeddings.extend(vectors)
+            elapsed = time.time() - start_time
+            logger.info(f"[Embedding] 進捗: {start + len(vectors)}/{total} 経過={elapsed:.1f}秒")
 
         elapsed_total = time.time() - start_time
         logger.info(f"[Embedding] 完了: {total}件, 所要時間={elapsed_total:.1f}秒")
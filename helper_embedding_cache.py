@@ -0,0 +1,484 @@
+"""
+Embeddingキャッシュ（永続・コンテンツアドレス方式）
+
+helper_embedding.py の EmbeddingClient をラップし、同じテキストの再Embeddingを防ぎます。
+キャッシュキーは (provider, model, dims, テキストのSHA-256) で、
+キャッシュミスのテキストのみAPIに送信されます。
+
+保存形式:
+    - インデックス: SQLite（キー → スロット番号、最終アクセス時刻）
+    - ベクトル本体: 名前空間 (provider, model, dims) ごとの float32 メモリマップファイル
+    - 上限件数を超えた場合は最終アクセスが古いものから追い出し（LRU）
+
+使用例:
+    from helper_embedding_cache import create_cached_embedding_client
+
+    embedding = create_cached_embedding_client(provider="gemini")
+    vectors = embedding.embed_texts(texts)      # 初回: API呼び出し
+    vectors = embedding.embed_texts(texts)      # 2回目: キャッシュヒット
+    print(embedding.cache_stats())
+
+環境変数:
+    EMBEDDING_CACHE_ENABLED     : "0" で無効化（デフォルト: 有効）
+    EMBEDDING_CACHE_DIR         : キャッシュディレクトリ（デフォルト: ./cache/embeddings）
+    EMBEDDING_CACHE_MAX_ENTRIES : 名前空間あたりの最大件数（デフォルト: 500000）
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from helper_embedding import EmbeddingClient, create_embedding_client
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    str(Path(__file__).parent / "cache" / "embeddings")
+)
+DEFAULT_EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "500000"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+
+def text_hash(text: str) -> str:
+    """テキストのコンテンツハッシュ（SHA-256）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_namespace(provider: str, model: str, dims: int) -> str:
+    """キャッシュの名前空間キー"""
+    return f"{provider}:{model}:{dims}"
+
+
+class EmbeddingCache:
+    """SQLiteインデックス + float32メモリマップによる永続Embeddingキャッシュ"""
+
+    _GROWTH_MIN_ROWS = 1024
+
+    def __init__(
+        self,
+        cache_dir: str = DEFAULT_EMBEDDING_CACHE_DIR,
+        max_entries: int = DEFAULT_EMBEDDING_CACHE_MAX_ENTRIES
+    ):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ
+            max_entries: 名前空間あたりの最大保持件数（超過分はLRUで追い出し）
+        """
+        if max_entries <= 0:
+            raise ValueError("max_entries は1以上を指定してください")
+
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            str(self.cache_dir / "index.sqlite3"),
+            timeout=30.0,
+            check_same_thread=False,
+            isolation_level=None,  # 明示的にトランザクションを管理
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS namespaces (
+                namespace TEXT PRIMARY KEY,
+                dims      INTEGER NOT NULL,
+                file_name TEXT NOT NULL,
+                next_slot INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace   TEXT NOT NULL,
+                text_hash   TEXT NOT NULL,
+                slot        INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, text_hash)
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (namespace, last_access);
+            """
+        )
+
+        self._memmaps: Dict[str, np.memmap] = {}
+
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # 内部ユーティリティ
+    # ------------------------------------------------------------------
+
+    def _get_namespace(self, namespace: str, dims: int) -> Tuple[str, int]:
+        """名前空間を取得（なければ登録）して (file_name, next_slot) を返す"""
+        row = self._conn.execute(
+            "SELECT dims, file_name, next_slot FROM namespaces WHERE namespace = ?",
+            (namespace,)
+        ).fetchone()
+        if row is None:
+            file_name = f"{hashlib.sha1(namespace.encode('utf-8')).hexdigest()[:16]}.f32"
+            self._conn.execute(
+                "INSERT OR IGNORE INTO namespaces (namespace, dims, file_name, next_slot) VALUES (?, ?, ?, 0)",
+                (namespace, dims, file_name)
+            )
+            return file_name, 0
+        if row[0] != dims:
+            raise ValueError(f"名前空間 {namespace} の次元数が一致しません: {row[0]} != {dims}")
+        return row[1], row[2]
+
+    def _memmap(self, file_name: str, dims: int, min_rows: int = 0) -> np.ndarray:
+        """ベクトルファイルのメモリマップを取得（必要に応じて拡張）"""
+        path = self.cache_dir / file_name
+        row_bytes = dims * 4
+        current_rows = path.stat().st_size // row_bytes if path.exists() else 0
+
+        if current_rows < min_rows:
+            new_rows = min(
+                max(min_rows, current_rows * 2, self._GROWTH_MIN_ROWS),
+                self.max_entries
+            )
+            with open(path, "ab") as f:
+                f.truncate(new_rows * row_bytes)
+            current_rows = new_rows
+            self._memmaps.pop(file_name, None)
+
+        mm = self._memmaps.get(file_name)
+        if mm is None or mm.shape[0] < current_rows:
+            if current_rows == 0:
+                return np.zeros((0, dims), dtype=np.float32)
+            mm = np.memmap(path, dtype=np.float32, mode="r+", shape=(current_rows, dims))
+            self._memmaps[file_name] = mm
+        return mm
+
+    # ------------------------------------------------------------------
+    # 公開API
+    # ------------------------------------------------------------------
+
+    def get_many(self, namespace: str, dims: int, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        ハッシュのリストに対応するキャッシュ済みベクトルを取得
+
+        Returns:
+            {text_hash: float32ベクトル}（ヒットしたもののみ）
+        """
+        if not hashes:
+            return {}
+
+        with self._lock:
+            file_name, _ = self._get_namespace(namespace, dims)
+            unique_hashes = list(dict.fromkeys(hashes))
+            slots: Dict[str, int] = {}
+            # SQLiteのプレースホルダ上限を考慮して分割
+            for i in range(0, len(unique_hashes), 500):
+                part = unique_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(part))
+                for h, slot in self._conn.execute(
+                    f"SELECT text_hash, slot FROM entries WHERE namespace = ? AND text_hash IN ({placeholders})",
+                    (namespace, *part)
+                ):
+                    slots[h] = slot
+
+            found: Dict[str, np.ndarray] = {}
+            if slots:
+                mm = self._memmap(file_name, dims, min_rows=max(slots.values()) + 1)
+                for h, slot in slots.items():
+                    found[h] = np.array(mm[slot], dtype=np.float32)
+
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE entries SET last_access = ? WHERE namespace = ? AND text_hash = ?",
+                    [(now, namespace, h) for h in slots]
+                )
+
+            hit_count = sum(1 for h in hashes if h in found)
+            self.hits += hit_count
+            self.misses += len(hashes) - hit_count
+            return found
+
+    def put_many(self, namespace: str, dims: int, items: Sequence[Tuple[str, Sequence[float]]]) -> int:
+        """
+        ベクトルを保存（上限超過時はLRUで追い出し）
+
+        Args:
+            namespace: 名前空間キー
+            dims: 次元数
+            items: (text_hash, ベクトル) のリスト
+
+        Returns:
+            保存件数
+        """
+        # 同一ハッシュは最後の値を採用、ゼロベクトル（API失敗時の埋め草）は保存しない
+        pending: Dict[str, np.ndarray] = {}
+        for h, vec in items:
+            arr = np.asarray(vec, dtype=np.float32)
+            if arr.shape != (dims,) or not np.any(arr):
+                continue
+            pending[h] = arr
+        if not pending:
+            return 0
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                file_name, next_slot = self._get_namespace(namespace, dims)
+
+                existing: Dict[str, int] = {}
+                keys = list(pending)
+                for i in range(0, len(keys), 500):
+                    part = keys[i:i + 500]
+                    placeholders = ",".join("?" * len(part))
+                    for h, slot in self._conn.execute(
+                        f"SELECT text_hash, slot FROM entries WHERE namespace = ? AND text_hash IN ({placeholders})",
+                        (namespace, *part)
+                    ):
+                        existing[h] = slot
+
+                new_keys = [h for h in keys if h not in existing][:self.max_entries]
+                assignments: Dict[str, int] = dict(existing)
+
+                # 空きスロットを新規割り当て
+                fresh = min(len(new_keys), self.max_entries - next_slot)
+                for h in new_keys[:fresh]:
+                    assignments[h] = next_slot
+                    next_slot += 1
+
+                # 残りはLRUで追い出したスロットを再利用
+                remaining = new_keys[fresh:]
+                if remaining:
+                    victims = self._conn.execute(
+                        "SELECT text_hash, slot FROM entries WHERE namespace = ? "
+                        "ORDER BY last_access ASC LIMIT ?",
+                        (namespace, len(remaining) + len(existing))
+                    ).fetchall()
+                    # 今回更新対象の既存エントリは追い出さない
+                    victims = [v for v in victims if v[0] not in existing][:len(remaining)]
+                    self._conn.executemany(
+                        "DELETE FROM entries WHERE namespace = ? AND text_hash = ?",
+                        [(namespace, h) for h, _ in victims]
+                    )
+                    self.evictions += len(victims)
+                    for h, (_, slot) in zip(remaining, victims):
+                        assignments[h] = slot
+
+                if not assignments:
+                    self._conn.execute("COMMIT")
+                    return 0
+
+                mm = self._memmap(file_name, dims, min_rows=max(assignments.values()) + 1)
+                for h, slot in assignments.items():
+                    mm[slot] = pending[h]
+                mm.flush()
+
+                now = time.time()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (namespace, text_hash, slot, last_access) VALUES (?, ?, ?, ?)",
+                    [(namespace, h, slot, now) for h, slot in assignments.items()]
+                )
+                self._conn.execute(
+                    "UPDATE namespaces SET next_slot = ? WHERE namespace = ?",
+                    (next_slot, namespace)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+            return len(assignments)
+
+    def get_or_embed(
+        self,
+        namespace: str,
+        dims: int,
+        texts: Sequence[str],
+        embed_fn: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[float]]:
+        """
+        キャッシュを参照し、ミスしたテキストのみ embed_fn でEmbeddingして保存
+
+        Args:
+            namespace: 名前空間キー
+            dims: 次元数
+            texts: 入力テキスト
+            embed_fn: ミスしたテキスト（重複除去済み）をEmbeddingする関数
+
+        Returns:
+            入力順のEmbeddingベクトルのリスト
+        """
+        hashes = [text_hash(t) for t in texts]
+        found = self.get_many(namespace, dims, hashes)
+
+        miss_texts: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            if h not in found and h not in miss_texts:
+                miss_texts[h] = t
+
+        computed: Dict[str, List[float]] = {}
+        if miss_texts:
+            miss_keys = list(miss_texts)
+            vectors = embed_fn([miss_texts[h] for h in miss_keys])
+            if len(vectors) != len(miss_keys):
+                raise ValueError(
+                    f"Embedding件数が一致しません: expected={len(miss_keys)}, actual={len(vectors)}"
+                )
+            computed = dict(zip(miss_keys, vectors))
+            self.put_many(namespace, dims, list(computed.items()))
+
+        results: List[List[float]] = []
+        for h in hashes:
+            if h in found:
+                results.append(found[h].tolist())
+            else:
+                results.append(list(computed[h]))
+        return results
+
+    def stats(self) -> Dict[str, float]:
+        """ヒット・ミス件数とエントリ数"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+    def clear(self) -> None:
+        """キャッシュを全削除"""
+        with self._lock:
+            rows = self._conn.execute("SELECT file_name FROM namespaces").fetchall()
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM namespaces")
+            self._memmaps.clear()
+            for (file_name,) in rows:
+                try:
+                    (self.cache_dir / file_name).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def close(self) -> None:
+        """接続を閉じる"""
+        with self._lock:
+            for mm in self._memmaps.values():
+                mm.flush()
+            self._memmaps.clear()
+            self._conn.close()
+
+
+def _describe_client(client: EmbeddingClient) -> Tuple[str, str]:
+    """EmbeddingClientから (provider, model) を推定"""
+    class_name = type(client).__name__.lower()
+    if "openai" in class_name:
+        provider = "openai"
+    elif "gemini" in class_name:
+        provider = "gemini"
+    elif "fastembed" in class_name:
+        provider = "fastembed"
+    else:
+        provider = class_name
+    model = getattr(client, "model", None) or getattr(client, "model_name", None) or "unknown"
+    return provider, str(model)
+
+
+class CachedEmbeddingClient(EmbeddingClient):
+    """任意のEmbeddingClientをラップする永続キャッシュ付きクライアント"""
+
+    def __init__(
+        self,
+        client: EmbeddingClient,
+        cache: Optional[EmbeddingCache] = None,
+        provider: Optional[str] = None,
+        model: Optional[str] = None
+    ):
+        """
+        Args:
+            client: ラップするEmbeddingClient
+            cache: EmbeddingCache（Noneの場合は共有インスタンス）
+            provider: キャッシュキー用のプロバイダー名（Noneの場合は推定）
+            model: キャッシュキー用のモデル名（Noneの場合は推定）
+        """
+        self.client = client
+        self.cache = cache or get_shared_embedding_cache()
+        detected_provider, detected_model = _describe_client(client)
+        self.provider = provider or detected_provider
+        self.model = model or detected_model
+
+    @property
+    def dimensions(self) -> int:
+        return self.client.dimensions
+
+    @property
+    def namespace(self) -> str:
+        return make_namespace(self.provider, self.model, self.dimensions)
+
+    def embed_text(self, text: str) -> List[float]:
+        """単一テキストのEmbedding生成（キャッシュ優先）"""
+        return self.cache.get_or_embed(
+            self.namespace, self.dimensions, [text],
+            lambda miss: [self.client.embed_text(miss[0])]
+        )[0]
+
+    def embed_texts(
+        self,
+        texts: List[str],
+        batch_size: int = 100
+    ) -> List[List[float]]:
+        """バッチEmbedding生成（キャッシュミスのみAPIへ送信）"""
+        if not texts:
+            return []
+        return self.cache.get_or_embed(
+            self.namespace, self.dimensions, texts,
+            lambda miss: self.client.embed_texts(miss, batch_size=batch_size)
+        )
+
+    def cache_stats(self) -> Dict[str, float]:
+        """キャッシュ統計"""
+        return self.cache.stats()
+
+
+_shared_cache: Optional[EmbeddingCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_embedding_cache() -> EmbeddingCache:
+    """プロセス共有のEmbeddingCacheを取得"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
+
+
+def create_cached_embedding_client(
+    provider: str = "gemini",
+    cache: Optional[EmbeddingCache] = None,
+    **kwargs
+) -> EmbeddingClient:
+    """
+    キャッシュ付きEmbeddingクライアントのファクトリ関数
+
+    EMBEDDING_CACHE_ENABLED=0 の場合はキャッシュなしのクライアントを返す。
+
+    Args:
+        provider: "openai", "gemini", or "fastembed"
+        cache: 使用するEmbeddingCache（Noneの場合は共有インスタンス）
+        **kwargs: create_embedding_client に渡す初期化パラメータ
+
+    Returns:
+        EmbeddingClientインスタンス
+    """
+    client = create_embedding_client(provider=provider, **kwargs)
+    if not EMBEDDING_CACHE_ENABLED:
+        return client
+    return CachedEmbeddingClient(client, cache=cache, provider=(provider or "gemini").lower())
@@ -14,6 +14,7 @@ FastEmbedライブラリを使用し、ローカルCPUで高速に動作しま
 
 import logging
 from typing import List, Dict, Any, Iterable
+import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -94,6 +95,7 @@ class SparseEmbeddingClient:
 
 # シングルトン的な利用のためのファクトリ
 _sparse_client_instance = None
+_sparse_client_lock = threading.Lock()
 
 def get_sparse_embedding_client(model_name: str = DEFAULT_SPARSE_MODEL) -> SparseEmbeddingClient:
     # Handle explicit None passed from callers
@@ -101,8 +103,10 @@ def get_sparse_embedding_client(model_name: str = DEFAULT_SPARSE_MODEL) -> Spars
         model_name = DEFAULT_SPARSE_MODEL
 
     global _sparse_client_instance
-    if _sparse_client_instance is None:
-        _sparse_client_instance = SparseEmbeddingClient(model_name=model_name)
-    elif _sparse_client_instance.model_name != model_name:
-        _sparse_client_instance = SparseEmbeddingClient(model_name=model_name)
-    return _sparse_client_instance
+    instance = _sparse_client_instance
+    if instance is not None and instance.model_name == model_name:
+        return instance
+    with _sparse_client_lock:
+        if _sparse_client_instance is None or _sparse_client_instance.model_name != model_name:
+            _sparse_client_instance = SparseEmbeddingClient(model_name=model_name)
+        return _sparse_client_instance
@@ -0,0 +1,227 @@
+"""
+キーワードスコアリングエンジン（1パス出現回数計測 + 文字種の事前コンパイル判定）
+
+候補キーワード全体から Aho–Corasick オートマトンを1つ作り、テキストの1回の走査で
+全キーワードの出現回数・被覆範囲を求めます（pyahocorasick があればそれを使用）。
+"""
+
+import logging
+from collections import deque
+from functools import lru_cache
+import re
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ahocorasick  # pyahocorasick（任意）
+except ImportError:
+    ahocorasick = None
+
+
+# 純Pythonオートマトンを使うキーワード数の下限（これ未満は str.count の方が速い）
+AUTOMATON_MIN_KEYWORDS = 256
+
+
+# ===================================================================
+# 文字種判定
+# ===================================================================
+
+KATAKANA_TERM = re.compile(r'[ァ-ヴー]{3,}')
+UPPER_TERM = re.compile(r'[A-Z]{2,}')
+ACRONYM_TERM = re.compile(r'[A-Z]{2,}[A-Z0-9]*')
+KANJI_TERM = re.compile(r'[一-龥]{4,}')
+ALNUM_TERM = re.compile(r'[A-Za-z]+[A-Za-z0-9]*')
+
+
+class CharType:
+    """キーワードの文字種フラグ"""
+    KATAKANA = 1   # カタカナ3文字以上
+    UPPER = 2      # 英大文字2文字以上
+    ACRONYM = 4    # 英大文字で始まる略語（数字を含む）
+    KANJI = 8      # 漢字4文字以上
+    ALNUM = 16     # 英単語
+
+
+@lru_cache(maxsize=65536)
+def keyword_char_type(keyword: str) -> int:
+    """
+    キーワードの文字種フラグを取得（同じキーワードはメモから返す）
+
+    Args:
+        keyword: キーワード
+
+    Returns:
+        CharType のフラグの論理和
+    """
+    flags = 0
+    if KATAKANA_TERM.fullmatch(keyword):
+        flags |= CharType.KATAKANA
+    if KANJI_TERM.fullmatch(keyword):
+        flags |= CharType.KANJI
+    if ALNUM_TERM.fullmatch(keyword):
+        flags |= CharType.ALNUM
+        if ACRONYM_TERM.fullmatch(keyword):
+            flags |= CharType.ACRONYM
+            if UPPER_TERM.fullmatch(keyword):
+                flags |= CharType.UPPER
+    return flags
+
+
+# ===================================================================
+# オートマトン
+# ===================================================================
+
+class KeywordAutomaton:
+    """Aho–Corasick オートマトン（純Python実装）"""
+
+    def __init__(self, keywords: Iterable[str]):
+        """
+        Args:
+            keywords: 検索するキーワード（空文字列は無視）
+        """
+        self.keywords = list(dict.fromkeys(k for k in keywords if k))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        for kid, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state] += (kid,)
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] += out[fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        テキスト中のすべての出現を返す（重なる出現を含む、終了位置の昇順）
+
+        Yields:
+            (終了位置（含む）, キーワード番号)
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for kid in out[state]:
+                yield i, kid
+
+
+def _iter_all_matches(text: str, keywords: List[str]) -> Iterator[Tuple[int, int]]:
+    """(終了位置, キーワード番号) を終了位置の昇順で返す（利用可能な最速の実装を選択）"""
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        for kid, keyword in enumerate(keywords):
+            automaton.add_word(keyword, kid)
+        automaton.make_automaton()
+        return automaton.iter(text)
+    return KeywordAutomaton(keywords).iter_matches(text)
+
+
+def _use_automaton(keywords: Sequence[str]) -> bool:
+    """オートマトンで走査するか（純Python実装はキーワードが少ないと str.count より遅い）"""
+    return ahocorasick is not None or len(keywords) >= AUTOMATON_MIN_KEYWORDS
+
+
+def count_keywords(text: str, keywords: Iterable[str]) -> Dict[str, int]:
+    """
+    全キーワードの出現回数を1回の走査で計測
+
+    各キーワードの回数は text.count(keyword) と同じ（左から数えた重ならない出現の数）。
+
+    Args:
+        text: 対象テキスト
+        keywords: キーワードのイテラブル
+
+    Returns:
+        キーワード → 出現回数
+    """
+    unique = list(dict.fromkeys(keywords))
+    counts = {k: 0 for k in unique}
+    if '' in counts:
+        counts[''] = len(text) + 1
+    words = [k for k in unique if k]
+    if not text or not words:
+        return counts
+
+    if not _use_automaton(words):
+        for keyword in words:
+            counts[keyword] = text.count(keyword)
+        return counts
+
+    next_free = [0] * len(words)
+    for end, kid in _iter_all_matches(text, words):
+        start = end - len(words[kid]) + 1
+        if start >= next_free[kid]:
+            counts[words[kid]] += 1
+            next_free[kid] = end + 1
+    return counts
+
+
+def covered_mask(text: str, keywords: Iterable[str]) -> bytearray:
+    """
+    キーワードの出現（重なる出現を含む）が被覆する文字位置のマスク
+
+    Args:
+        text: 対象テキスト
+        keywords: キーワードのイテラブル
+
+    Returns:
+        文字位置ごとに被覆されていれば1のbytearray
+    """
+    mask = bytearray(len(text))
+    words = list(dict.fromkeys(k for k in keywords if k))
+    if not text or not words:
+        return mask
+
+    if _use_automaton(words):
+        for end, kid in _iter_all_matches(text, words):
+            length = len(words[kid])
+            mask[end - length + 1:end + 1] = b'\x01' * length
+        return mask
+
+    for keyword in words:
+        length = len(keyword)
+        fill = b'\x01' * length
+        pos = text.find(keyword)
+        while pos != -1:
+            mask[pos:pos + length] = fill
+            pos = text.find(keyword, pos + 1)
+    return mask
+
+
+def keyword_coverage(text: str, keywords: Iterable[str]) -> float:
+    """
+    キーワードが被覆する文字の割合
+
+    Args:
+        text: 対象テキスト
+        keywords: キーワードのイテラブル
+
+    Returns:
+        被覆率（0.0-1.0）
+    """
+    if not text:
+        return 0.0
+    return min(1.0, covered_mask(text, keywords).count(1) / len(text))
@@ -138,16 +138,24 @@ class GeminiClient(LLMClient):
             raise ValueError("GOOGLE_API_KEY is not set")
         genai.configure(api_key=self.api_key)
         self.default_model = default_model
+        self._models: Dict[str, Any] = {}
+
+    def _get_model(self, model_name: str):
+        """GenerativeModelをモデル名ごとに再利用"""
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._models.setdefault(model_name, genai.GenerativeModel(model_name))
+        return model
 
     def generate_content(self, prompt: str, model: Optional[str] = None, **kwargs) -> str:
         model_name = model or self.default_model
-        model = genai.GenerativeModel(model_name)
+        model = self._get_model(model_name)
         response = model.generate_content(prompt, **kwargs)
         return response.text
 
     def generate_structured(self, prompt: str, response_schema: Type[BaseModel], model: Optional[str] = None, **kwargs) -> BaseModel:
         model_name = model or self.default_model
-        model = genai.GenerativeModel(model_name)
+        model = self._get_model(model_name)
         
         # Gemini JSON mode
         generation_config = {"response_mime_type": "application/json"}
@@ -163,7 +171,7 @@ class GeminiClient(LLMClient):
 
     def count_tokens(self, text: str, model: Optional[str] = None) -> int:
         model_name = model or self.default_model
-        model = genai.GenerativeModel(model_name)
+        model = self._get_model(model_name)
         return model.count_tokens(text).total_tokens
 
 def create_llm_client(provider: str = "gemini", **kwargs) -> LLMClient:
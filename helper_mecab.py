@@ -0,0 +1,238 @@
+"""
+MeCab形態素解析サービス（Taggerの再利用 + 解析結果のLRUメモ）
+
+スレッドごとに1つの MeCab.Tagger を使い回し、キーワード抽出・文分割のすべての呼び出し元で
+共有します。MeCab未インストール時は is_available() が False になります。
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# 解析結果メモの最大件数（0で無効）
+DEFAULT_CACHE_SIZE = int(os.getenv("MECAB_CACHE_SIZE", "4096"))
+# これより長いテキストはメモしない（文書全体などでメモリを圧迫しないため）
+DEFAULT_MAX_CACHED_CHARS = 2000
+
+SENTENCE_TERMINATORS = frozenset(['。', '．', '？', '！', '?', '!'])
+
+
+# ===================================================================
+# 品詞ID
+# ===================================================================
+
+_pos_ids: Dict[str, int] = {}
+_pos_names: List[str] = []
+_pos_lock = threading.Lock()
+
+
+def pos_id(name: str) -> int:
+    """品詞名（大分類）を品詞IDに変換（初出の品詞は登録）"""
+    pid = _pos_ids.get(name)
+    if pid is None:
+        with _pos_lock:
+            pid = _pos_ids.get(name)
+            if pid is None:
+                if len(_pos_names) >= 255:
+                    return 255
+                pid = len(_pos_names)
+                _pos_names.append(name)
+                _pos_ids[name] = pid
+    return pid
+
+
+def pos_name(pid: int) -> str:
+    """品詞IDを品詞名に変換"""
+    return _pos_names[pid] if pid < len(_pos_names) else "その他"
+
+
+POS_NOUN = pos_id("名詞")
+
+
+class Tokens(NamedTuple):
+    """1テキストの解析結果（表層形と品詞IDの並び）"""
+    surfaces: Tuple[str, ...]
+    pos: bytes
+
+    def __len__(self) -> int:
+        return len(self.surfaces)
+
+
+EMPTY_TOKENS = Tokens((), b"")
+
+
+def compound_nouns_from_tokens(tokens: Tokens) -> List[str]:
+    """解析結果から連続する名詞を結合した複合名詞を抽出"""
+    compounds = []
+    buffer: List[str] = []
+    for surface, pid in zip(tokens.surfaces, tokens.pos):
+        if pid == POS_NOUN:
+            buffer.append(surface)
+        elif buffer:
+            compounds.append(''.join(buffer))
+            buffer = []
+    if buffer:
+        compounds.append(''.join(buffer))
+    return compounds
+
+
+def sentences_from_tokens(tokens: Tokens) -> List[str]:
+    """解析結果を句点・疑問符・感嘆符で文に分割"""
+    sentences = []
+    current: List[str] = []
+    for surface in tokens.surfaces:
+        current.append(surface)
+        if surface in SENTENCE_TERMINATORS:
+            sentence = ''.join(current).strip()
+            if sentence:
+                sentences.append(sentence)
+            current = []
+    if current:
+        sentence = ''.join(current).strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+# ===================================================================
+# トークナイザー
+# ===================================================================
+
+class MeCabTokenizer:
+    """スレッドごとのTaggerとLRUメモを持つMeCabトークナイザー"""
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE, max_cached_chars: int = DEFAULT_MAX_CACHED_CHARS,
+                 tagger_args: str = ""):
+        """
+        Args:
+            cache_size: 解析結果メモの最大件数（0で無効）
+            max_cached_chars: メモ対象とするテキストの最大文字数
+            tagger_args: MeCab.Tagger に渡す引数
+        """
+        self.cache_size = cache_size
+        self.max_cached_chars = max_cached_chars
+        self.tagger_args = tagger_args
+        self._local = threading.local()
+        self._memo: "OrderedDict[str, Tokens]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._available: Optional[bool] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def available(self) -> bool:
+        """MeCabが利用可能か（プロセス内で1回だけ確認）"""
+        if self._available is None:
+            try:
+                self._tagger().parse("テスト")
+                self._available = True
+            except (ImportError, RuntimeError) as e:
+                logger.debug(f"MeCabを利用できません: {e}")
+                self._available = False
+        return self._available
+
+    def _tagger(self):
+        """現在のスレッドのTaggerを取得（fork後の子プロセスでは作り直す）"""
+        local = self._local
+        pid = os.getpid()
+        if getattr(local, "pid", None) != pid:
+            import MeCab
+            local.tagger = MeCab.Tagger(self.tagger_args) if self.tagger_args else MeCab.Tagger()
+            local.pid = pid
+        return local.tagger
+
+    def _parse_uncached(self, text: str) -> Tokens:
+        surfaces = []
+        pos = bytearray()
+        node = self._tagger().parseToNode(text)
+        while node:
+            surface = node.surface
+            if surface:
+                surfaces.append(surface)
+                pos.append(pos_id(node.feature.split(',', 1)[0]))
+            node = node.next
+        return Tokens(tuple(surfaces), bytes(pos))
+
+    def parse(self, text: str) -> Tokens:
+        """
+        テキストを形態素解析
+
+        Args:
+            text: 解析対象テキスト
+
+        Returns:
+            Tokens（BOS/EOSを除く表層形と品詞ID）
+        """
+        if not text:
+            return EMPTY_TOKENS
+        if self.cache_size <= 0 or len(text) > self.max_cached_chars:
+            return self._parse_uncached(text)
+
+        with self._memo_lock:
+            tokens = self._memo.get(text)
+            if tokens is not None:
+                self._memo.move_to_end(text)
+                self.hits += 1
+                return tokens
+            self.misses += 1
+
+        tokens = self._parse_uncached(text)
+        with self._memo_lock:
+            self._memo[text] = tokens
+            while len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        return tokens
+
+    def parse_many(self, texts: Iterable[str]) -> List[Tokens]:
+        """
+        複数テキストを形態素解析（同一Taggerで連続処理）
+
+        Args:
+            texts: 解析対象テキストのイテラブル
+
+        Returns:
+            入力順の Tokens のリスト
+        """
+        return [self.parse(text) for text in texts]
+
+    def compound_nouns(self, text: str) -> List[str]:
+        """連続する名詞を結合した複合名詞を抽出"""
+        return compound_nouns_from_tokens(self.parse(text))
+
+    def split_sentences(self, text: str) -> List[str]:
+        """句点・疑問符・感嘆符で文に分割"""
+        return sentences_from_tokens(self.parse(text))
+
+    def cache_info(self) -> Dict[str, int]:
+        """メモのヒット数・件数"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._memo), "maxsize": self.cache_size}
+
+    def clear_cache(self) -> None:
+        with self._memo_lock:
+            self._memo.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+_tokenizer: Optional[MeCabTokenizer] = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_mecab_tokenizer() -> MeCabTokenizer:
+    """プロセス共有のMeCabTokenizerを取得"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = MeCabTokenizer()
+    return _tokenizer
+
+
+def is_mecab_available() -> bool:
+    """MeCabが利用可能か"""
+    return get_mecab_tokenizer().available
@@ -0,0 +1,145 @@
+"""
+Q/A生成リクエストのトークン予算によるチャンク詰め込み
+
+チャンクを入力順に、1リクエストの入力 + 出力（見込みQ/A数 × 1Q/Aあたりのトークン数）が
+予算に収まるまで詰め込みます。予算を超える1チャンクは切り詰めずに単独のリクエストにします。
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from helper_llm import get_llm_model_limits
+from helper_qa_executor import PROMPT_OVERHEAD_TOKENS
+
+logger = logging.getLogger(__name__)
+
+
+# 1リクエストの入力 + 出力トークン予算（0 = モデル上限）
+DEFAULT_TOKEN_BUDGET = int(os.getenv("QA_BATCH_TOKEN_BUDGET", "0"))
+# 1Q/Aあたりの出力トークン数の見込み（質問・回答・タイプ・テキスト番号のJSON）
+# 日本語は1文字あたりのトークン数が多く、質問40字・回答80字程度で150-200トークンになるため
+# 日本語に合わせて見込む
+OUTPUT_TOKENS_PER_QA = 200
+# 出力のJSON外枠などの見込みトークン数
+OUTPUT_OVERHEAD_TOKENS = 100
+# 出力上限に対する使用率（リクエストの max_output_tokens は見込みの2倍とするため、
+# 2倍してもモデルの出力上限に収まるように半分まで）
+OUTPUT_SAFETY_FACTOR = 0.5
+# 1リクエストの max_output_tokens の下限（詰め込み導入前の固定値）
+MIN_BATCH_OUTPUT_TOKENS = 4000
+MIN_CHUNK_OUTPUT_TOKENS = 1000
+# 上限が未登録のモデルに使う値
+FALLBACK_LIMITS = {"max_tokens": 32000, "max_output": 4000}
+
+
+def estimate_output_tokens(num_pairs: int) -> int:
+    """Q/A数から出力トークン数を見込む"""
+    return num_pairs * OUTPUT_TOKENS_PER_QA + OUTPUT_OVERHEAD_TOKENS
+
+
+def request_output_tokens(model: str, num_pairs: int, batch: bool = True) -> int:
+    """
+    1リクエストの max_output_tokens（見込みの2倍、下限は従来の固定値、上限はモデルの出力上限）
+
+    Args:
+        model: 対象モデル
+        num_pairs: リクエストで生成するQ/A数
+        batch: 複数チャンクのリクエストか（False=単一チャンク）
+
+    Returns:
+        max_output_tokens
+    """
+    floor = MIN_BATCH_OUTPUT_TOKENS if batch else MIN_CHUNK_OUTPUT_TOKENS
+    return min(max(floor, estimate_output_tokens(num_pairs) * 2), model_limits(model)["max_output"])
+
+
+def model_limits(model: str) -> Dict[str, int]:
+    """モデルの入力（コンテキスト）・出力トークン上限（未登録モデルは FALLBACK_LIMITS）"""
+    limits = get_llm_model_limits(model)
+    if not limits.get("max_tokens") or not limits.get("max_output"):
+        return dict(FALLBACK_LIMITS)
+    return limits
+
+
+@dataclass
+class PackedBatch:
+    """1リクエスト分のチャンク"""
+    chunks: List[Dict] = field(default_factory=list)
+    qa_counts: List[int] = field(default_factory=list)
+    input_tokens: int = PROMPT_OVERHEAD_TOKENS
+
+    @property
+    def total_pairs(self) -> int:
+        return sum(self.qa_counts)
+
+    @property
+    def output_tokens(self) -> int:
+        return estimate_output_tokens(self.total_pairs)
+
+
+class TokenBudgetPacker:
+    """チャンクをトークン予算まで1リクエストに詰め込む"""
+
+    def __init__(
+        self,
+        model: str = "gemini-2.0-flash",
+        token_budget: Optional[int] = None,
+        max_chunks: Optional[int] = None
+    ):
+        """
+        Args:
+            model: 対象モデル（get_llm_model_limits の上限を使う）
+            token_budget: 1リクエストの入力 + 出力トークン予算（None/0=モデル上限）
+            max_chunks: 1リクエストの最大チャンク数（None=制限なし）
+        """
+        limits = model_limits(model)
+        if token_budget is None:
+            token_budget = DEFAULT_TOKEN_BUDGET
+        self.model = model
+        self.token_budget = min(token_budget or limits["max_tokens"], limits["max_tokens"])
+        self.output_budget = min(int(limits["max_output"] * OUTPUT_SAFETY_FACTOR), self.token_budget)
+        self.max_output_tokens = limits["max_output"]
+        self.max_chunks = max_chunks
+
+    def _fits(self, batch: PackedBatch, tokens: int, qa_count: int) -> bool:
+        if self.max_chunks and len(batch.chunks) >= self.max_chunks:
+            return False
+        output_tokens = estimate_output_tokens(batch.total_pairs + qa_count)
+        if output_tokens > self.output_budget:
+            return False
+        return batch.input_tokens + tokens + output_tokens <= self.token_budget
+
+    def pack(self, chunks: List[Dict], qa_counts: List[int], token_counts: List[int]) -> List[PackedBatch]:
+        """
+        チャンクを入力順にリクエストへ詰め込む
+
+        Args:
+            chunks: チャンクのリスト
+            qa_counts: チャンクごとのQ/A数（determine_qa_count）
+            token_counts: チャンクごとのトークン数
+
+        Returns:
+            PackedBatch のリスト（入力順）
+        """
+        batches: List[PackedBatch] = []
+        current = PackedBatch()
+        for chunk, qa_count, tokens in zip(chunks, qa_counts, token_counts):
+            if current.chunks and not self._fits(current, tokens, qa_count):
+                batches.append(current)
+                current = PackedBatch()
+            current.chunks.append(chunk)
+            current.qa_counts.append(qa_count)
+            current.input_tokens += tokens
+        if current.chunks:
+            batches.append(current)
+
+        if batches:
+            total_pairs = sum(b.total_pairs for b in batches)
+            logger.info(
+                f"トークン予算による詰め込み: {len(chunks)}チャンク → {len(batches)}リクエスト "
+                f"（平均 {len(chunks) / len(batches):.1f}チャンク・{total_pairs / len(batches):.1f}Q/A/リクエスト, "
+                f"予算 {self.token_budget} / 出力 {self.output_budget}トークン）"
+            )
+        return batches
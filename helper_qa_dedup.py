@@ -0,0 +1,483 @@
+"""
+Q/Aの近似重複検出（文字シングルの MinHash + LSH バンディング）
+
+正規化した質問・回答の文字 k-gram 集合から MinHash 署名を作り、LSH で候補に絞った組だけを
+Jaccard 係数（必要に応じて Embedding のコサイン類似度）で確認して、ほぼ線形時間で重複除去します。
+"""
+
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# 重複とみなす Jaccard 係数の閾値
+DEFAULT_THRESHOLD = float(os.getenv("QA_DEDUP_THRESHOLD", "0.7"))
+# MinHash のハッシュ関数の数
+DEFAULT_NUM_PERM = int(os.getenv("QA_DEDUP_NUM_PERM", "128"))
+DEFAULT_SHINGLE_SIZE = 3
+DEFAULT_COSINE_THRESHOLD = 0.9
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+# ===================================================================
+# シングル
+# ===================================================================
+
+def normalize_text(text: str) -> str:
+    """NFKC正規化・小文字化し、空白と記号を除く"""
+    return NON_WORD_PATTERN.sub('', unicodedata.normalize('NFKC', str(text)).lower())
+
+
+def char_shingles(text: str, k: int = DEFAULT_SHINGLE_SIZE) -> Set[str]:
+    """
+    正規化したテキストの文字 k-gram の集合
+
+    Args:
+        text: 対象テキスト
+        k: シングルの文字数
+
+    Returns:
+        シングルの集合（k文字未満のテキストはテキスト全体の1要素、空なら空集合）
+    """
+    normalized = normalize_text(text)
+    if len(normalized) <= k:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + k] for i in range(len(normalized) - k + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    """集合の Jaccard 係数"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+# ===================================================================
+# MinHash / LSH
+# ===================================================================
+
+class MinHasher:
+    """MinHash 署名の計算（ハッシュ関数は (a·x + b) mod p の族）"""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        """
+        Args:
+            num_perm: ハッシュ関数の数（署名の長さ）
+            seed: ハッシュ関数の係数の乱数シード
+        """
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        # a, b < 2^32 なので a·x + b（x < 2^32）は uint64 に収まる
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: Iterable[str]) -> np.ndarray:
+        """
+        シングル集合の MinHash 署名
+
+        Args:
+            shingles: シングルのイテラブル
+
+        Returns:
+            長さ num_perm の uint64 配列（空集合は全要素が MAX_HASH）
+        """
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+    def signatures(self, shingle_sets: Sequence[Set[str]], block_shingles: int = 65536) -> np.ndarray:
+        """
+        複数のシングル集合の署名（シングルをまとめてハッシュし、テキストごとの最小値を reduceat で取る）
+
+        Args:
+            shingle_sets: シングル集合のリスト
+            block_shingles: 1回に処理するシングル数の目安（メモリ使用量 = この値 × num_perm × 8バイト）
+
+        Returns:
+            (件数, num_perm) の uint64 配列（空集合の行は全要素が MAX_HASH）
+        """
+        result = np.full((len(shingle_sets), self.num_perm), MAX_HASH, dtype=np.uint64)
+        start = 0
+        while start < len(shingle_sets):
+            end, size = start, 0
+            while end < len(shingle_sets) and (size == 0 or size + len(shingle_sets[end]) <= block_shingles):
+                size += len(shingle_sets[end])
+                end += 1
+            rows = [i for i in range(start, end) if shingle_sets[i]]
+            if rows:
+                hashes = np.fromiter(
+                    (zlib.crc32(sh.encode('utf-8')) for i in rows for sh in shingle_sets[i]),
+                    dtype=np.uint64, count=size
+                )
+                offsets = np.cumsum([0] + [len(shingle_sets[i]) for i in rows[:-1]])
+                permuted = (np.outer(hashes, self._a) + self._b) % MERSENNE_PRIME & MAX_HASH
+                result[rows] = np.minimum.reduceat(permuted, offsets, axis=0)
+            start = end
+        return result
+
+
+def optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    偽陽性・偽陰性の面積の和が最小になるバンド数・行数
+
+    類似度 s の組が候補になる確率は 1 - (1 - s^r)^b。閾値未満でこれを積分したものを
+    偽陽性、閾値以上で 1 からの不足を積分したものを偽陰性とする。
+
+    Args:
+        threshold: Jaccard 係数の閾値
+        num_perm: 署名の長さ
+
+    Returns:
+        (バンド数, 1バンドの行数)
+    """
+    def area(lo: float, hi: float, fn: Callable[[np.ndarray], np.ndarray]) -> float:
+        xs = np.linspace(lo, hi, 64)
+        ys = fn(xs)
+        return float(((ys[1:] + ys[:-1]) / 2 * np.diff(xs)).sum())
+
+    best, best_error = (1, num_perm), float('inf')
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        if rows == 0:
+            break
+        prob = lambda s, b=bands, r=rows: 1 - (1 - s ** r) ** b
+        error = area(0.0, threshold, prob) + area(threshold, 1.0, lambda s: 1 - prob(s))
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHashLSH:
+    """署名のバンドごとのバケットから候補の組を求める"""
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, num_perm: int = DEFAULT_NUM_PERM):
+        """
+        Args:
+            threshold: Jaccard 係数の閾値（バンド数・行数の決定に使う）
+            num_perm: 署名の長さ
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = optimal_bands(threshold, num_perm)
+
+    def candidate_pairs(self, signatures: np.ndarray, skip: Optional[Set[int]] = None) -> Set[Tuple[int, int]]:
+        """
+        いずれかのバンドが一致する (i, j) の組（i < j）
+
+        同じバケットのメンバー全組ではなく、先頭および直前のメンバーとの組だけを返す
+        （完全一致が多いバケットで組の数が2乗で増えないようにするため。クラスタは推移的に連結される）。
+
+        Args:
+            signatures: (件数, num_perm) の署名
+            skip: 候補にしない行番号（空テキストなど）
+
+        Returns:
+            候補の組の集合
+        """
+        skip = skip or set()
+        pairs: Set[Tuple[int, int]] = set()
+        for band in range(self.bands):
+            start = band * self.rows
+            buckets: Dict[bytes, List[int]] = {}
+            for i, key in enumerate(signatures[:, start:start + self.rows]):
+                if i not in skip:
+                    buckets.setdefault(key.tobytes(), []).append(i)
+            for members in buckets.values():
+                for prev, cur in zip(members, members[1:]):
+                    pairs.add((prev, cur))
+                    pairs.add((members[0], cur))
+        return pairs
+
+
+# ===================================================================
+# 重複除去
+# ===================================================================
+
+@dataclass
+class DuplicateCluster:
+    """重複クラスタ（keep を残し removed を削除）"""
+    keep: int
+    removed: List[int]
+    similarity: float  # クラスタ内で確認した組の最小 Jaccard 係数
+
+
+@dataclass
+class DedupReport:
+    """重複除去のレポート"""
+    total: int = 0
+    removed: int = 0
+    candidates: int = 0
+    confirmed: int = 0
+    clusters: List[Dict] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.total}件 → {self.total - self.removed}件（重複 {self.removed}件・{len(self.clusters)}クラスタ削除, "
+            f"候補 {self.candidates}組 / 確認 {self.confirmed}組, {self.elapsed:.2f}秒）"
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "kept": self.total - self.removed,
+            "removed": self.removed,
+            "candidates": self.candidates,
+            "confirmed": self.confirmed,
+            "elapsed": round(self.elapsed, 3),
+            "clusters": self.clusters,
+        }
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # 小さい行番号（先に出現した行）を代表にする
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+class QADeduplicator:
+    """MinHash + LSH によるQ/Aの近似重複除去"""
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        cosine_threshold: float = DEFAULT_COSINE_THRESHOLD,
+        seed: int = 1
+    ):
+        """
+        Args:
+            threshold: 重複とみなすシングル集合の Jaccard 係数の閾値
+            num_perm: MinHash のハッシュ関数の数
+            shingle_size: シングルの文字数
+            embed_fn: テキストのリストからEmbeddingを返す関数（指定時はコサイン類似度でも確認）
+            cosine_threshold: Embedding のコサイン類似度の閾値
+            seed: MinHash の乱数シード
+        """
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.embed_fn = embed_fn
+        self.cosine_threshold = cosine_threshold
+        self.hasher = MinHasher(num_perm, seed=seed)
+        self.lsh = MinHashLSH(threshold, num_perm)
+
+    def _confirm_with_embeddings(self, texts: Sequence[str],
+                                 pairs: List[Tuple[int, int, float]]) -> List[Tuple[int, int, float]]:
+        """Jaccard で確認した組のうち、Embedding のコサイン類似度も閾値以上の組"""
+        indices = sorted({i for i, _, _ in pairs} | {j for _, j, _ in pairs})
+        vectors = np.asarray(self.embed_fn([texts[i] for i in indices]), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        position = {idx: n for n, idx in enumerate(indices)}
+        return [
+            (i, j, sim) for i, j, sim in pairs
+            if float(vectors[position[i]] @ vectors[position[j]]) >= self.cosine_threshold
+        ]
+
+    def find_duplicate_pairs(self, texts: Sequence[str]) -> Tuple[List[Tuple[int, int, float]], int]:
+        """
+        重複する組を検出
+
+        Args:
+            texts: 対象テキスト
+
+        Returns:
+            ([(i, j, Jaccard係数), ...]（i < j）, LSH の候補の組の数)
+        """
+        shingles = [char_shingles(t, self.shingle_size) for t in texts]
+        empty = {i for i, s in enumerate(shingles) if not s}
+        if len(texts) - len(empty) < 2:
+            return [], 0
+
+        signatures = self.hasher.signatures(shingles)
+        candidates = self.lsh.candidate_pairs(signatures, skip=empty)
+
+        pairs = []
+        for i, j in sorted(candidates):
+            sim = jaccard(shingles[i], shingles[j])
+            if sim >= self.threshold:
+                pairs.append((i, j, sim))
+
+        if pairs and self.embed_fn is not None:
+            pairs = self._confirm_with_embeddings(texts, pairs)
+        return pairs, len(candidates)
+
+    def cluster(self, texts: Sequence[str]) -> Tuple[List[DuplicateCluster], DedupReport]:
+        """
+        重複クラスタを求める（各クラスタは最初に出現した行を残す）
+
+        Args:
+            texts: 対象テキスト
+
+        Returns:
+            (クラスタのリスト, レポート（clusters は未設定）)
+        """
+        start = time.monotonic()
+        pairs, n_candidates = self.find_duplicate_pairs(texts)
+
+        uf = _UnionFind(len(texts))
+        for i, j, _ in pairs:
+            uf.union(i, j)
+
+        members: Dict[int, List[int]] = {}
+        min_sim: Dict[int, float] = {}
+        for i, j, sim in pairs:
+            root = uf.find(i)
+            min_sim[root] = min(min_sim.get(root, 1.0), sim)
+        for idx in sorted({i for i, _, _ in pairs} | {j for _, j, _ in pairs}):
+            members.setdefault(uf.find(idx), []).append(idx)
+
+        clusters = [
+            DuplicateCluster(keep=root, removed=[m for m in group if m != root], similarity=min_sim[root])
+            for root, group in sorted(members.items())
+        ]
+        report = DedupReport(
+            total=len(texts),
+            removed=sum(len(c.removed) for c in clusters),
+            candidates=n_candidates,
+            confirmed=len(pairs),
+            elapsed=time.monotonic() - start,
+        )
+        return clusters, report
+
+    def deduplicate(
+        self,
+        df: pd.DataFrame,
+        columns: Sequence[str] = ("question", "answer"),
+        source_column: Optional[str] = None
+    ) -> Tuple[pd.DataFrame, DedupReport]:
+        """
+        DataFrame の重複行を削除
+
+        Args:
+            df: Q/AのDataFrame
+            columns: 比較に使う列（複数指定時は改行で連結）。質問だけでは「一人称/二人称」のように
+                     1語だけ違う定型の質問が重複と判定されやすいため、既定は質問 + 回答
+            source_column: レポートに含める出典の列（ファイル横断時など）
+
+        Returns:
+            (重複を除いたDataFrame（元のインデックスを保持）, レポート)
+        """
+        joined = df[columns[0]].astype(str)
+        for column in columns[1:]:
+            joined = joined + "\n" + df[column].astype(str)
+        texts = joined.tolist()
+        clusters, report = self.cluster(texts)
+
+        def describe(pos: int) -> Dict:
+            row = df.iloc[pos]
+            entry = {"row": int(pos), "text": texts[pos][:200]}
+            if source_column and source_column in df.columns:
+                entry["source"] = str(row[source_column])
+            return entry
+
+        report.clusters = [
+            {
+                "keep": describe(c.keep),
+                "removed": [describe(r) for r in c.removed],
+                "similarity": round(c.similarity, 4),
+            }
+            for c in clusters
+        ]
+        removed = {r for c in clusters for r in c.removed}
+        kept = df.iloc[[i for i in range(len(df)) if i not in removed]]
+        logger.info(f"Q/A重複除去: {report.summary()}")
+        return kept, report
+
+
+# ===================================================================
+# CSVファイル
+# ===================================================================
+
+def load_qa_csv(path: str) -> pd.DataFrame:
+    """Q/A CSVを読み込む（列名は a42_qdrant_registration.load_csv と同じマッピング）"""
+    from qdrant_ingest_pipeline import CSV_COLUMN_MAPPINGS
+    return pd.read_csv(path).rename(columns=CSV_COLUMN_MAPPINGS).fillna("")
+
+
+def dedup_csv_files(
+    paths: Sequence[str],
+    output_dir: Optional[str] = None,
+    cross_file: bool = False,
+    question_only: bool = False,
+    deduplicator: Optional[QADeduplicator] = None
+) -> Dict[str, DedupReport]:
+    """
+    Q/A CSVファイルの重複を除去し、重複除去後のCSVとレポート（JSON）を書き出す
+
+    Args:
+        paths: CSVパスのリスト
+        output_dir: 出力先（None=入力ファイルと同じディレクトリ）
+        cross_file: True=全ファイルを横断して重複除去（先に指定したファイルの行を残す）
+        question_only: True=question 列だけで比較（既定は question + answer）
+        deduplicator: 使用する QADeduplicator（None=既定の設定）
+
+    Returns:
+        ファイルパス（cross_file 時は "*"）→ レポート
+    """
+    dedup = deduplicator or QADeduplicator()
+    columns = ("question",) if question_only else ("question", "answer")
+    frames = {path: load_qa_csv(path) for path in paths}
+
+    def output_paths(path: str) -> Tuple[Path, Path]:
+        src = Path(path)
+        directory = Path(output_dir) if output_dir else src.parent
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{src.stem}_dedup.csv", directory / f"{src.stem}_dedup_report.json"
+
+    def write_report(report: DedupReport, report_path: Path) -> None:
+        with open(report_path, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+
+    reports: Dict[str, DedupReport] = {}
+    if cross_file:
+        combined = pd.concat(
+            [df.assign(_source=path) for path, df in frames.items()], ignore_index=True
+        )
+        kept, report = dedup.deduplicate(combined, columns=columns, source_column="_source")
+        for path in paths:
+            csv_path, _ = output_paths(path)
+            kept[kept["_source"] == path].drop(columns="_source").to_csv(csv_path, index=False, encoding="utf-8")
+        _, report_path = output_paths(paths[0])
+        write_report(report, report_path.with_name("cross_file_dedup_report.json"))
+        reports["*"] = report
+        return reports
+
+    for path, df in frames.items():
+        kept, report = dedup.deduplicate(df, columns=columns)
+        csv_path, report_path = output_paths(path)
+        kept.to_csv(csv_path, index=False, encoding="utf-8")
+        write_report(report, report_path)
+        logger.info(f"{path}: {report.summary()} → {csv_path}")
+        reports[path] = report
+    return reports
@@ -0,0 +1,211 @@
+"""
+Q/A生成の非同期実行器（Celeryなしの同時実行 + レート制限 + チェックポイント）
+
+Redis + Celery を起動せずに、同一プロセス内で複数バッチを上限付きで同時に処理します。
+呼び出し前にモデルごとの RPM / TPM を取得し、失敗はバックオフしてリトライします。
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from helper_qa_journal import QAJournal, chunk_key
+from helper_rate_limiter import RateLimiter, RateLimitTimeout, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+
+# 同時実行数の既定値
+DEFAULT_CONCURRENCY = int(os.getenv("QA_CONCURRENCY", "4"))
+# プロンプト（指示文・出力形式）のトークン数の見込み
+PROMPT_OVERHEAD_TOKENS = 400
+
+
+# ===================================================================
+# 実行器
+# ===================================================================
+
+@dataclass
+class ExecutorStats:
+    """実行統計"""
+    batches: int = 0
+    generated: int = 0
+    resumed: int = 0
+    retries: int = 0
+    failed: int = 0
+    qa_pairs: int = 0
+    rate_limit_wait: float = 0.0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"バッチ {self.batches}件（生成 {self.generated} / 再開スキップ {self.resumed} / 失敗 {self.failed}）, "
+            f"Q/A {self.qa_pairs}件, リトライ {self.retries}回, "
+            f"レート制限待機 {self.rate_limit_wait:.1f}秒, 所要 {self.elapsed:.1f}秒"
+        )
+
+
+class AsyncQAExecutor:
+    """同時実行数・レート制限付きのQ/A生成実行器"""
+
+    def __init__(
+        self,
+        generate_fn: Callable[[List[Dict]], List[Dict]],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        provider: str = "gemini",
+        model: str = "gemini-2.0-flash",
+        max_retries: int = 3,
+        retry_base_delay: float = 1.0,
+        output_tokens: Optional[int] = None,
+        output_tokens_fn: Optional[Callable[[List[Dict]], int]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        token_count_fn: Optional[Callable[[List[str]], List[int]]] = None,
+        journal: Optional[QAJournal] = None,
+        max_pending: Optional[int] = None
+    ):
+        """
+        Args:
+            generate_fn: 1バッチ（チャンクのリスト）からQ/Aのリストを生成する同期関数
+            concurrency: 同時に実行するLLM呼び出しの上限
+            provider: レート制限のプロバイダー
+            model: レート制限・トークン推定の対象モデル
+            max_retries: 1バッチの最大試行回数
+            retry_base_delay: リトライ待機の基準秒数（試行ごとに2倍）
+            output_tokens: 1呼び出しで予約する出力トークン数（None=RateLimitConfig.DEFAULT_OUTPUT_TOKENS）
+            output_tokens_fn: バッチから出力トークン数を見込む関数（指定時は output_tokens より優先）
+            rate_limiter: レート制限（None=プロセス共有の RateLimiter）
+            token_count_fn: テキストのリストからトークン数を返す関数（None=ローカル推定器）
+            journal: ジャーナル（完了済みチャンクのみのバッチはスキップ、結果・失敗を記録）
+            max_pending: 先読みして投入するバッチ数の上限（None=concurrency*4）
+        """
+        self.generate_fn = generate_fn
+        self.concurrency = max(1, concurrency)
+        self.provider = provider
+        self.model = model
+        self.max_retries = max(1, max_retries)
+        self.retry_base_delay = retry_base_delay
+        if output_tokens is None:
+            try:
+                from config import RateLimitConfig
+                output_tokens = RateLimitConfig.DEFAULT_OUTPUT_TOKENS
+            except ImportError:
+                output_tokens = 1024
+        self.output_tokens = output_tokens
+        self.output_tokens_fn = output_tokens_fn
+        self.rate_limiter = rate_limiter
+        self.token_count_fn = token_count_fn
+        self.journal = journal
+        self.max_pending = max_pending or self.concurrency * 4
+        self.stats = ExecutorStats()
+
+    def _estimate_tokens(self, batch: List[Dict]) -> int:
+        """1呼び出しの見込みトークン数（入力 + 出力）"""
+        if self.token_count_fn is None:
+            from helper_token_estimator import get_token_estimator
+            self.token_count_fn = lambda texts: get_token_estimator().count_batch(texts, model=self.model)
+        output_tokens = self.output_tokens_fn(batch) if self.output_tokens_fn else self.output_tokens
+        return sum(self.token_count_fn([c['text'] for c in batch])) + PROMPT_OVERHEAD_TOKENS + output_tokens
+
+    async def _process(self, batch: List[Dict], semaphore: asyncio.Semaphore,
+                       pool: ThreadPoolExecutor) -> List[Dict]:
+        loop = asyncio.get_running_loop()
+        limiter = self.rate_limiter or get_rate_limiter()
+        tokens = self._estimate_tokens(batch)
+
+        for attempt in range(self.max_retries):
+            qa_pairs: List[Dict] = []
+            async with semaphore:
+                try:
+                    self.stats.rate_limit_wait += await limiter.acquire_async(self.provider, self.model, tokens=tokens)
+                    qa_pairs = await loop.run_in_executor(pool, self.generate_fn, batch)
+                except RateLimitTimeout:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Q/A生成エラー ({len(batch)}チャンク, 試行 {attempt + 1}/{self.max_retries}): {e}")
+            if qa_pairs:
+                if self.journal is not None:
+                    self.journal.record(batch, qa_pairs)
+                self.stats.generated += 1
+                return qa_pairs
+            if attempt < self.max_retries - 1:
+                self.stats.retries += 1
+                delay = self.retry_base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+                await asyncio.sleep(delay)
+
+        self.stats.failed += 1
+        chunk_ids = [chunk_key(c) for c in batch]
+        logger.error(f"Q/A生成失敗（{self.max_retries}回試行）: {chunk_ids}")
+        if self.journal is not None:
+            self.journal.record_failure(chunk_ids, f"failed after {self.max_retries} attempts")
+        return []
+
+    async def iter_results(self, batches: Iterable[List[Dict]]) -> AsyncIterator[Tuple[int, List[Dict]]]:
+        """
+        バッチを同時実行し、入力順に (バッチ番号, Q/Aのリスト) を返す
+
+        Args:
+            batches: チャンクのリストのイテラブル
+
+        Yields:
+            (バッチ番号, Q/Aのリスト)
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="qa-exec")
+        pending: Deque[Tuple[int, asyncio.Future]] = deque()
+        start = time.monotonic()
+
+        async def drain_one() -> Tuple[int, List[Dict]]:
+            index, future = pending.popleft()
+            qa_pairs = await future
+            self.stats.qa_pairs += len(qa_pairs)
+            return index, qa_pairs
+
+        try:
+            for index, batch in enumerate(batches):
+                self.stats.batches += 1
+                if self.journal is not None and all(self.journal.is_done(c) for c in batch):
+                    self.stats.resumed += 1
+                    future = asyncio.get_running_loop().create_future()
+                    future.set_result(self.journal.pairs_for(batch))
+                else:
+                    future = asyncio.ensure_future(self._process(batch, semaphore, pool))
+                pending.append((index, future))
+                while len(pending) >= self.max_pending:
+                    yield await drain_one()
+            while pending:
+                yield await drain_one()
+        finally:
+            for _, future in pending:
+                future.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+            self.stats.elapsed = time.monotonic() - start
+
+    def run(self, batches: Iterable[List[Dict]],
+            progress_callback: Optional[Callable[[int, List[Dict]], None]] = None) -> List[Dict]:
+        """
+        全バッチを処理してQ/Aを入力順に連結して返す（同期呼び出し用）
+
+        Args:
+            batches: チャンクのリストのイテラブル
+            progress_callback: バッチ完了ごとに (バッチ番号, Q/Aのリスト) で呼ばれる関数
+
+        Returns:
+            Q/Aのリスト
+        """
+        async def collect() -> List[Dict]:
+            results: List[Dict] = []
+            async for index, qa_pairs in self.iter_results(batches):
+                results.extend(qa_pairs)
+                if progress_callback:
+                    progress_callback(index, qa_pairs)
+            return results
+
+        results = asyncio.run(collect())
+        logger.info(f"Q/A生成実行器: {self.stats.summary()}")
+        return results
@@ -0,0 +1,245 @@
+"""
+Q/A生成ジャーナル（チャンクID単位の追記ログ + 再開 + 定期コンパクション）
+
+完了したチャンクのQ/Aを完了次第JSONLに追記し、中断後の再開では pending() で
+未完了・失敗（本文が変わったものを含む）チャンクだけを返します。
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def chunk_key(chunk: Dict) -> str:
+    """ジャーナルでチャンクを識別するキー"""
+    return str(chunk.get('id') or chunk.get('source_chunk_id') or '')
+
+
+def chunk_digest(chunk: Dict) -> str:
+    """チャンク本文のダイジェスト（本文が変わったチャンクを検出するため）"""
+    return hashlib.blake2b(chunk.get('text', '').encode('utf-8'), digest_size=8).hexdigest()
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """一時ファイルに書いて fsync してから置き換える"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class QAJournal:
+    """完了チャンクのQ/Aを記録する追記ログ"""
+
+    def __init__(
+        self,
+        path: str,
+        resume: bool = True,
+        fsync: bool = True,
+        meta: Optional[Dict] = None,
+        compact_every: int = 0,
+        snapshot_fn: Optional[Callable[[List[Dict]], None]] = None
+    ):
+        """
+        Args:
+            path: ジャーナルファイルのパス
+            resume: True=既存の記録を読み込んで再開、False=既存ファイルを退避して新規開始
+            fsync: 記録ごとに fsync するか
+            meta: 実行条件（データセット・モデル等）。再開時に前回と異なれば警告
+            compact_every: 完了チャンクがこの件数増えるごとに compact()（0で無効）
+            snapshot_fn: compact() 時に全Q/Aを渡して呼ぶ関数（途中経過のJSON/CSV出力用）
+        """
+        self.path = path
+        self.fsync = fsync
+        self.meta = meta or {}
+        self.compact_every = compact_every
+        self.snapshot_fn = snapshot_fn
+        self.completed: Dict[str, List[Dict]] = {}
+        self.failed: Dict[str, str] = {}
+        self._digests: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._since_compact = 0
+        self._fd: Optional[int] = None
+        self._torn_tail = False
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(path):
+            if resume:
+                self._load()
+            else:
+                backup = f"{path}.{datetime.now().strftime('%Y%m%d_%H%M%S')}.bak"
+                os.replace(path, backup)
+                logger.info(f"既存のジャーナルを退避しました: {backup}")
+
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size == 0:
+            self._append([{"type": "meta", "created": time.time(), **self.meta}])
+        elif self._torn_tail:
+            # 書き込み途中の行と次の記録が連結されないよう改行で区切る
+            os.write(self._fd, b"\n")
+
+    # ------------------------------------------------------------------
+    # 読み込み
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        broken = 0
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                self._torn_tail = not line.endswith("\n")
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    broken += 1
+                    continue
+                self._apply(record)
+        if broken:
+            logger.warning(f"ジャーナルの壊れた行を{broken}行スキップしました: {self.path}")
+        logger.info(f"ジャーナル読み込み: 完了 {len(self.completed)}チャンク / 失敗 {len(self.failed)}チャンク ({self.path})")
+
+    def _apply(self, record: Dict) -> None:
+        kind = record.get("type")
+        if kind == "meta":
+            previous = {k: v for k, v in record.items() if k in self.meta}
+            if previous and previous != {k: self.meta[k] for k in previous}:
+                logger.warning(f"ジャーナルの実行条件が異なります（前回: {previous}, 今回: {self.meta}）")
+            return
+        key = record.get("chunk_id")
+        if not key:
+            return
+        if kind == "done":
+            self.completed[key] = record.get("qa_pairs", [])
+            self._digests[key] = record.get("digest", "")
+            self.failed.pop(key, None)
+        elif kind == "failed" and key not in self.completed:
+            self.failed[key] = record.get("error", "")
+
+    # ------------------------------------------------------------------
+    # 参照
+    # ------------------------------------------------------------------
+
+    def is_done(self, chunk: Dict) -> bool:
+        """チャンクが完了済みか（本文が変わっていれば未完了）"""
+        key = chunk_key(chunk)
+        return key in self.completed and self._digests.get(key) in ("", chunk_digest(chunk))
+
+    def pending(self, chunks: Iterable[Dict]) -> List[Dict]:
+        """未完了（未処理・失敗・本文変更）のチャンク"""
+        return [c for c in chunks if not self.is_done(c)]
+
+    def pairs_for(self, chunks: Iterable[Dict]) -> List[Dict]:
+        """完了済みチャンクのQ/Aを入力順に取得"""
+        pairs: List[Dict] = []
+        for chunk in chunks:
+            pairs.extend(self.completed.get(chunk_key(chunk), []))
+        return pairs
+
+    def all_pairs(self, chunks: Optional[Iterable[Dict]] = None) -> List[Dict]:
+        """全Q/A（chunks 指定時はその順、未指定時は記録順）"""
+        if chunks is not None:
+            return self.pairs_for(chunks)
+        return [qa for pairs in self.completed.values() for qa in pairs]
+
+    # ------------------------------------------------------------------
+    # 記録
+    # ------------------------------------------------------------------
+
+    def _append(self, records: List[Dict]) -> None:
+        """記録をまとめて1回の write で追記"""
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        with self._lock:
+            os.write(self._fd, data)
+            if self.fsync:
+                os.fsync(self._fd)
+
+    def record(self, chunks: List[Dict], qa_pairs: List[Dict]) -> None:
+        """
+        バッチの結果を記録（Q/Aが1件もないチャンクは失敗として記録）
+
+        Args:
+            chunks: バッチのチャンク
+            qa_pairs: 生成されたQ/A（source_chunk_id でチャンクに振り分け）
+        """
+        by_chunk: Dict[str, List[Dict]] = {chunk_key(c): [] for c in chunks}
+        for qa in qa_pairs:
+            key = str(qa.get('source_chunk_id', ''))
+            if key in by_chunk:
+                by_chunk[key].append(qa)
+
+        records = []
+        for chunk in chunks:
+            key = chunk_key(chunk)
+            if by_chunk[key]:
+                records.append({"type": "done", "chunk_id": key, "digest": chunk_digest(chunk),
+                                "qa_pairs": by_chunk[key]})
+            else:
+                records.append({"type": "failed", "chunk_id": key, "error": "no qa pairs"})
+        self._commit(records)
+
+    def record_failure(self, chunk_ids: Iterable[str], error: str) -> None:
+        """チャンクの失敗を記録（再開時に再投入される）"""
+        self._commit([{"type": "failed", "chunk_id": str(cid), "error": error[:500]} for cid in chunk_ids])
+
+    def _commit(self, records: List[Dict]) -> None:
+        if not records:
+            return
+        with self._lock:
+            self._append(records)
+            done = 0
+            for record in records:
+                self._apply(record)
+                done += record["type"] == "done"
+            self._since_compact += done
+            if self.compact_every and self._since_compact >= self.compact_every:
+                self.compact()
+
+    # ------------------------------------------------------------------
+    # コンパクション
+    # ------------------------------------------------------------------
+
+    def compact(self) -> None:
+        """ジャーナルを各チャンクの最新の記録だけに書き直し、スナップショットを出力"""
+        with self._lock:
+            records = [{"type": "meta", "created": time.time(), **self.meta}]
+            records += [
+                {"type": "done", "chunk_id": key, "digest": self._digests.get(key, ""), "qa_pairs": pairs}
+                for key, pairs in self.completed.items()
+            ]
+            records += [{"type": "failed", "chunk_id": key, "error": err} for key, err in self.failed.items()]
+            data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+
+            os.close(self._fd)
+            write_atomic(self.path, data)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND)
+            self._since_compact = 0
+
+            if self.snapshot_fn is not None:
+                try:
+                    self.snapshot_fn(self.all_pairs())
+                except Exception as e:
+                    logger.warning(f"スナップショット出力に失敗しました: {e}")
+        logger.info(f"ジャーナルをコンパクションしました: 完了 {len(self.completed)}チャンク ({self.path})")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self) -> "QAJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -9,7 +9,7 @@ QAOptimizedExtractor
 """
 
 from regex_mecab import KeywordExtractor
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Tuple, Optional, Any, Union
 import re
 import math
 import json
@@ -19,6 +19,12 @@ import numpy as np
 import tiktoken
 from helper_llm import create_llm_client
 from helper_embedding import create_embedding_client, get_embedding_dimensions
+from helper_client_registry import get_embedding_client, get_llm_client
+from helper_token_estimator import get_token_estimator
+from helper_mecab import is_mecab_available
+from helper_text_analysis import AnalyzedDocument, analyze_text
+from helper_keyword_scoring import CharType, keyword_char_type, keyword_coverage
+from helper_qa_dedup import QADeduplicator
 from pydantic import BaseModel
 import spacy
 
@@ -62,6 +68,14 @@ load_dotenv()
 class BestKeywordSelector:
     """3手法から最良のキーワードを選択するクラス"""
 
+    # 専門性の重み（文字種フラグ, 重み）
+    TECHNICAL_WEIGHTS = (
+        (CharType.KATAKANA, 1.0),  # カタカナ3文字以上
+        (CharType.ACRONYM, 1.2),   # 英大文字（略語）
+        (CharType.KANJI, 0.9),     # 漢字4文字以上
+        (CharType.ALNUM, 0.8),     # 英単語
+    )
+
     def __init__(self, prefer_mecab: bool = True):
         """
         Args:
@@ -78,13 +92,13 @@ class BestKeywordSelector:
             'length_balance': 0.15 # 長さのバランス
         }
 
-    def evaluate_keywords(self, keywords: List[str], text: str) -> Dict[str, float]:
+    def evaluate_keywords(self, keywords: List[str], text: Union[str, AnalyzedDocument]) -> Dict[str, float]:
         """
         キーワードセットの品質を多面的に評価
 
         Args:
             keywords: 評価対象のキーワードリスト
-            text: 元のテキスト
+            text: 元のテキスト（AnalyzedDocument の場合はその解析結果を使う）
 
         Returns:
             評価指標の辞書
@@ -94,8 +108,9 @@ class BestKeywordSelector:
 
         metrics = {}
 
-        # 1. カバレージ率（キーワードがテキストに存在する割合）
-        coverage_count = sum(1 for kw in keywords if kw in text)
+        # 1. カバレージ率（キーワードがテキストに存在する割合、出現回数は解析結果のメモを共有）
+        counts = analyze_text(text).count_many(keywords)
+        coverage_count = sum(1 for kw in keywords if counts[kw] > 0)
         metrics['coverage'] = coverage_count / len(keywords)
 
         # 2. 多様性（文字数の分散）
@@ -109,19 +124,12 @@ class BestKeywordSelector:
         else:
             metrics['diversity'] = 0.5
 
-        # 3. 専門性（カタカナ・英語・漢字複合語の割合）
-        technical_patterns = [
-            (r'^[ァ-ヴー]{3,}$', 1.0),      # カタカナ3文字以上
-            (r'^[A-Z]{2,}[A-Z0-9]*$', 1.2), # 英大文字（略語）
-            (r'^[一-龥]{4,}$', 0.9),        # 漢字4文字以上
-            (r'^[A-Za-z]+[A-Za-z0-9]*$', 0.8) # 英単語
-        ]
-
+        # 3. 専門性（カタカナ・英語・漢字複合語の割合、文字種は事前コンパイル済みの判定を使用）
         tech_score = 0
         for kw in keywords:
             kw_tech = 0
-            for pattern, weight in technical_patterns:
-                if re.match(pattern, kw):
+            for flag, weight in self.TECHNICAL_WEIGHTS:
+                if keyword_char_type(kw) & flag:
                     kw_tech = max(kw_tech, weight)
             tech_score += kw_tech
         metrics['technicality'] = min(1.0, tech_score / len(keywords))
@@ -158,21 +166,24 @@ class BestKeywordSelector:
                    for metric, weight in self.weights.items())
         return min(1.0, total)
 
-    def extract_best(self, text: str, top_n: int = 10,
+    def extract_best(self, text: Union[str, AnalyzedDocument], top_n: int = 10,
                      return_details: bool = False) -> Dict[str, Any]:
         """
         3つの手法で抽出し、最良の結果を選択
 
         Args:
-            text: 分析対象テキスト
+            text: 分析対象テキスト（AnalyzedDocument の場合はその解析結果を使う）
             top_n: 抽出するキーワード数
             return_details: 詳細情報を返すか
 
         Returns:
             最良のキーワードと選択理由
         """
+        # 抽出と評価で同じ解析結果を使う
+        doc = analyze_text(text)
+
         # 各手法で抽出
-        all_results = self.extractor.extract_with_details(text, top_n)
+        all_results = self.extractor.extract_with_details(doc, top_n)
 
         # 各手法の評価
         evaluations = {}
@@ -180,7 +191,7 @@ class BestKeywordSelector:
             keywords = [kw for kw, _ in keywords_scores[:top_n]]
 
             # 評価指標を計算
-            metrics = self.evaluate_keywords(keywords, text)
+            metrics = self.evaluate_keywords(keywords, doc)
             total_score = self.calculate_total_score(metrics)
 
             evaluations[method] = {
@@ -281,7 +292,7 @@ class SmartKeywordSelector(BestKeywordSelector):
 
     def find_optimal_by_coverage(
         self,
-        text: str,
+        text: Union[str, AnalyzedDocument],
         target_coverage: float = 0.7,
         min_n: int = 3,
         max_n: int = 20
@@ -294,19 +305,23 @@ class SmartKeywordSelector(BestKeywordSelector):
         """
         best_n = min_n
         best_coverage = 0
+        # 各 top_n の抽出で同じ解析結果を使う
+        doc = analyze_text(text)
+        text_length = len(doc.text)
 
         for n in range(min_n, max_n + 1):
             # 3手法で抽出して最良を選択
-            result = self.extract_best(text, n, return_details=False)
+            result = self.extract_best(doc, n, return_details=False)
             keywords = result['keywords']
 
             # カバレッジ計算（キーワードがカバーする文字数の割合）
             covered_chars = 0
+            counts = doc.count_many(keywords)
             for keyword in keywords:
-                occurrences = text.count(keyword)
+                occurrences = counts[keyword]
                 covered_chars += len(keyword) * occurrences
 
-            coverage = covered_chars / len(text) if len(text) > 0 else 0
+            coverage = covered_chars / text_length if text_length > 0 else 0
 
             if coverage >= target_coverage:
                 return n, coverage
@@ -319,7 +334,7 @@ class SmartKeywordSelector(BestKeywordSelector):
 
     def find_optimal_by_diminishing_returns(
         self,
-        text: str,
+        text: Union[str, AnalyzedDocument],
         min_n: int = 3,
         max_n: int = 20,
         threshold: float = 0.05
@@ -336,9 +351,10 @@ class SmartKeywordSelector(BestKeywordSelector):
         scores = []
         previous_score = 0
         optimal_n = min_n
+        doc = analyze_text(text)
 
         for n in range(min_n, max_n + 1):
-            result = self.extract_best(text, n, return_details=False)
+            result = self.extract_best(doc, n, return_details=False)
             current_score = result['total_score']
             scores.append(current_score)
 
@@ -385,6 +401,7 @@ class SmartKeywordSelector(BestKeywordSelector):
         Returns:
             抽出結果と決定根拠
         """
+        doc = analyze_text(text)
         analysis = {
             "mode": mode,
             "text_length": len(text),
@@ -402,7 +419,7 @@ class SmartKeywordSelector(BestKeywordSelector):
 
         elif mode == "coverage":
             top_n, achieved_coverage = self.find_optimal_by_coverage(
-                text, target_coverage, min_keywords, max_keywords
+                doc, target_coverage, min_keywords, max_keywords
             )
             analysis["decision_reason"] = f"カバレッジ {achieved_coverage:.1%} 達成"
             analysis["target_coverage"] = target_coverage
@@ -410,7 +427,7 @@ class SmartKeywordSelector(BestKeywordSelector):
 
         elif mode == "diminishing":
             top_n, final_score, score_progression = self.find_optimal_by_diminishing_returns(
-                text, min_keywords, max_keywords
+                doc, min_keywords, max_keywords
             )
             analysis["decision_reason"] = f"収穫逓減点: n={top_n}"
             analysis["score_progression"] = score_progression
@@ -425,7 +442,7 @@ class SmartKeywordSelector(BestKeywordSelector):
         analysis["selected_top_n"] = top_n
 
         # 最良の手法でキーワード抽出
-        result = self.extract_best(text, top_n, return_details=True)
+        result = self.extract_best(doc, top_n, return_details=True)
 
         # 結果に分析情報を追加
         result["optimization"] = analysis
@@ -482,7 +499,7 @@ class QACountOptimizer:
 
     def __init__(self, llm_model: str = "gemini-2.0-flash"):
         self.llm_model_for_token_count = llm_model
-        self.unified_client = create_llm_client(provider="gemini", default_model=self.llm_model_for_token_count)
+        self.token_estimator = get_token_estimator()
 
     def calculate_optimal_qa_count(self, document: str, mode: str = "auto") -> Dict[str, Any]:
         """
@@ -536,7 +553,7 @@ class QACountOptimizer:
         sentences = [s.strip() for s in sentences if s.strip()]
 
         # トークン数の計算
-        token_count = self.unified_client.count_tokens(document, model=self.llm_model_for_token_count)
+        token_count = self.token_estimator.count(document, model=self.llm_model_for_token_count)
 
         # キーワード候補の抽出
         technical_terms = re.findall(r'[ァ-ヴー]{3,}|[A-Z]{2,}[A-Z0-9]*|[一-龥]{4,}', document)
@@ -787,8 +804,8 @@ class QAOptimizedExtractor(SmartKeywordSelector):
 
     def classify_difficulty(self, keyword: str, text: str) -> str:
         """キーワードの難易度を判定"""
-        frequency = text.count(keyword)
-        is_acronym = bool(re.match(r'^[A-Z]{2,}[A-Z0-9]*$', keyword))
+        frequency = analyze_text(text).count(keyword)
+        is_acronym = bool(keyword_char_type(keyword) & CharType.ACRONYM)
         is_complex = len(keyword) >= 8
         has_explanation = any([
             f"{keyword}とは" in text,
@@ -925,7 +942,7 @@ class QAOptimizedExtractor(SmartKeywordSelector):
             'best_context': best_context_sentence,
             'difficulty': difficulty,
             'category': category,
-            'frequency': text.count(keyword)
+            'frequency': analyze_text(text).count(keyword)
         }
 
     def _calculate_sentence_importance(self, sentence: str, keyword: str, full_text: str) -> float:
@@ -1336,24 +1353,8 @@ class QAOptimizedExtractor(SmartKeywordSelector):
         if not keywords or not text:
             return 0.0
 
-        # キーワードがカバーする文字数を計算
-        covered_positions = set()
-
-        for keyword in keywords:
-            # すべての出現位置を見つける
-            start = 0
-            while True:
-                pos = text.find(keyword, start)
-                if pos == -1:
-                    break
-                # この位置の文字をマーク
-                for i in range(pos, pos + len(keyword)):
-                    covered_positions.add(i)
-                start = pos + 1
-
-        # カバレッジ率を計算
-        coverage = len(covered_positions) / len(text) if len(text) > 0 else 0
-        return min(1.0, coverage)
+        # キーワードがカバーする文字数を計算（全キーワードの出現位置を1回の走査で求める）
+        return keyword_coverage(text, keywords)
 
     def calculate_qa_quality_score(self, qa_pair: Dict) -> float:
         """Q/Aペアの品質スコアを計算"""
@@ -1402,42 +1403,24 @@ class QAOptimizedExtractor(SmartKeywordSelector):
             return 100 <= actual_length <= 250
         return True
 
-    def detect_duplicate_qa(self, qa_pairs: List[Dict]) -> List[Tuple[int, int]]:
-        """重複するQ/Aペアを検出"""
-        duplicates = []
-
-        for i in range(len(qa_pairs)):
-            for j in range(i + 1, len(qa_pairs)):
-                # 質問の類似度をチェック
-                q1 = qa_pairs[i].get('question', '')
-                q2 = qa_pairs[j].get('question', '')
-
-                if self._are_similar_questions(q1, q2):
-                    duplicates.append((i, j))
-
-        return duplicates
-
-    def _are_similar_questions(self, q1: str, q2: str) -> bool:
-        """2つの質問が類似しているかチェック"""
-        # 完全一致
-        if q1 == q2:
-            return True
-
-        # キーワードの重複率
-        words1 = set(q1.split())
-        words2 = set(q2.split())
-
-        if len(words1) == 0 or len(words2) == 0:
-            return False
+    def detect_duplicate_qa(self, qa_pairs: List[Dict], threshold: Optional[float] = None) -> List[Tuple[int, int]]:
+        """
+        重複するQ/Aペアを検出（文字シングルの MinHash + LSH、helper_qa_dedup）
 
-        overlap = len(words1 & words2)
-        union = len(words1 | words2)
+        全組の比較はせず、LSH の候補だけを Jaccard 係数で確認する。同じクラスタの行は
+        先頭・直前の行との組として返す（全組ではない）。
 
-        if union == 0:
-            return False
+        Args:
+            qa_pairs: Q/Aペアのリスト（質問 + 回答で比較）
+            threshold: 重複とみなす Jaccard 係数（None=QA_DEDUP_THRESHOLD）
 
-        jaccard_similarity = overlap / union
-        return jaccard_similarity > 0.7
+        Returns:
+            重複する (i, j) の組のリスト（i < j）
+        """
+        dedup = QADeduplicator() if threshold is None else QADeduplicator(threshold=threshold)
+        texts = [f"{qa.get('question', '')}\n{qa.get('answer', '')}" for qa in qa_pairs]
+        pairs, _ = dedup.find_duplicate_pairs(texts)
+        return [(i, j) for i, j, _ in pairs]
 
     def generate_qa_pairs(self, extraction_output: Dict) -> List[Dict]:
         """抽出結果から実際のQ&Aペアを生成"""
@@ -1488,12 +1471,13 @@ class SemanticCoverage:
 
     def __init__(self, embedding_model="gemini-embedding-001"):
         self.embedding_model = embedding_model
-        # Gemini埋め込みクライアントを使用
-        self.embedding_client = create_embedding_client(provider="gemini")
+        # Embedding / LLM クライアントは初回アクセス時に取得（チャンク分割のみの用途では作らない）
+        self._embedding_client = None
+        self._unified_client = None
         self.embedding_dims = get_embedding_dimensions("gemini")  # 3072
-        # トークンカウント用のLLMクライアント (decode機能がないためtiktokenを併用)
-        self.unified_client = create_llm_client(provider="gemini") 
         self.tokenizer = tiktoken.get_encoding("cl100k_base") # 強制分割・デコード用にtiktokenを使用
+        # チャンク分割時のトークン数はローカル推定（リモートのcount_tokensは呼ばない）
+        self.token_estimator = get_token_estimator()
         
         # APIキーの有無フラグ（クライアント作成成功ならTrue）
         self.has_api_key = True
@@ -1501,17 +1485,31 @@ class SemanticCoverage:
         # MeCab利用可否チェック
         self.mecab_available = self._check_mecab_availability()
 
+    @property
+    def embedding_client(self):
+        """Gemini埋め込みクライアント（永続キャッシュ経由でカバレージ再分析時のAPI呼び出しを削減）"""
+        if self._embedding_client is None:
+            self._embedding_client = get_embedding_client("gemini", cached=True)
+        return self._embedding_client
+
+    @embedding_client.setter
+    def embedding_client(self, client):
+        self._embedding_client = client
+
+    @property
+    def unified_client(self):
+        """トークンカウント用のLLMクライアント (decode機能がないためtiktokenを併用)"""
+        if self._unified_client is None:
+            self._unified_client = get_llm_client(provider="gemini")
+        return self._unified_client
+
+    @unified_client.setter
+    def unified_client(self, client):
+        self._unified_client = client
 
     def _check_mecab_availability(self) -> bool:
-        """MeCabの利用可能性をチェック"""
-        try:
-            import MeCab
-            # 実際にインスタンス化して動作確認
-            tagger = MeCab.Tagger()
-            tagger.parse("テスト")
-            return True
-        except (ImportError, RuntimeError):
-            return False
+        """MeCabの利用可能性をチェック（共有トークナイザーでプロセス内1回のみ確認）"""
+        return is_mecab_available()
 
     def create_semantic_chunks(self, document: str, max_tokens: int = 200, min_tokens: int = 50,
                                prefer_paragraphs: bool = True, verbose: bool = True) -> List[Dict]:
@@ -1571,13 +1569,11 @@ class SemanticCoverage:
             current_chunk = []
             current_tokens = 0
 
-            for i, sentence in enumerate(sentences):
-                sentence_tokens = self.unified_client.count_tokens(sentence, model=self.embedding_model)
+            sentence_token_counts = self.token_estimator.count_batch(sentences, model=self.embedding_model)
 
+            for i, (sentence, sentence_tokens) in enumerate(zip(sentences, sentence_token_counts)):
                 # 現在のチャンクにこの文を追加すべきか判断
                 if current_tokens + sentence_tokens > max_tokens and current_chunk:
-                    # Use unified client for token counting when forming chunks
-                    chunk_text_tokens = self.unified_client.count_tokens(" ".join(current_chunk), model=self.embedding_model)
                     # チャンクを保存
                     chunk_text = " ".join(current_chunk)
                     chunks.append({
@@ -1643,8 +1639,9 @@ class SemanticCoverage:
         paragraphs = self._split_into_paragraphs(text)
         chunks = []
 
-        for para in paragraphs:
-            para_tokens = self.unified_client.count_tokens(para, model=self.embedding_model)
+        para_token_counts = self.token_estimator.count_batch(paragraphs, model=self.embedding_model)
+
+        for para, para_tokens in zip(paragraphs, para_token_counts):
 
             if para_tokens <= max_tokens:
                 # 段落がそのままチャンクとして適切
@@ -1655,8 +1652,9 @@ class SemanticCoverage:
                 current_chunk = []
                 current_tokens = 0
 
-                for sent in sentences:
-                    sent_tokens = self.unified_client.count_tokens(sent, model=self.embedding_model)
+                sent_token_counts = self.token_estimator.count_batch(sentences, model=self.embedding_model)
+
+                for sent, sent_tokens in zip(sentences, sent_token_counts):
 
                     if sent_tokens > max_tokens:
                         # 単一文が上限超過 → 強制分割
@@ -1719,56 +1717,25 @@ class SemanticCoverage:
     def _split_into_sentences(self, text: str) -> List[str]:
         """文単位で分割（言語自動判定・MeCab優先対応）"""
 
-        # 日本語判定（最初の100文字で判定）
-        is_japanese = bool(re.search(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]', text[:100]))
+        # 解析結果（MeCabの解析・文分割）はキーワード抽出と共有
+        doc = analyze_text(text)
 
-        if is_japanese and self.mecab_available:
+        if doc.is_japanese and self.mecab_available:
             # 日本語の場合、MeCab利用を優先（セマンティック精度向上）
             try:
-                sentences = self._split_sentences_mecab(text)
+                sentences = self._split_sentences_mecab(doc)
                 if sentences:
                     return sentences
             except Exception:
                 pass  # フォールバック
 
         # 英語 or MeCab失敗時: 正規表現
-        sentences = re.split(r'(?<=[。．.!?])\s*', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        return sentences
-
-    def _split_sentences_mecab(self, text: str) -> List[str]:
-        """MeCabを使った文分割（日本語用）"""
-        import MeCab
-
-        tagger = MeCab.Tagger()
-        node = tagger.parseToNode(text)
+        return list(doc.regex_sentences)
 
-        sentences = []
-        current_sentence = []
-
-        while node:
-            surface = node.surface
-            node.feature.split(',')
-
-            if surface:
-                current_sentence.append(surface)
-
-                # 文末判定：句点（。）、疑問符（？）、感嘆符（！）
-                if surface in ['。', '．', '？', '！', '?', '!']:
-                    sentence = ''.join(current_sentence).strip()
-                    if sentence:
-                        sentences.append(sentence)
-                    current_sentence = []
-
-            node = node.next
-
-        # 最後の文を追加
-        if current_sentence:
-            sentence = ''.join(current_sentence).strip()
-            if sentence:
-                sentences.append(sentence)
-
-        return sentences if sentences else []
+    def _split_sentences_mecab(self, text) -> List[str]:
+        """MeCabを使った文分割（日本語用、チャンクの解析結果を共有）"""
+        # 文末判定：句点（。）、疑問符（？）、感嘆符（！）
+        return list(analyze_text(text).sentences)
 
     def _adjust_chunks_for_topic_continuity(self, chunks: List[Dict], min_tokens: int = 50) -> List[Dict]:
         """
@@ -1785,15 +1752,18 @@ class SemanticCoverage:
         """
         adjusted_chunks = []
 
-        for i, chunk in enumerate(chunks):
-            chunk_tokens = self.unified_client.count_tokens(chunk["text"], model=self.embedding_model)
+        chunk_token_counts = self.token_estimator.count_batch(
+            [chunk["text"] for chunk in chunks], model=self.embedding_model
+        )
+
+        for i, (chunk, chunk_tokens) in enumerate(zip(chunks, chunk_token_counts)):
 
             # 最小トークン数以下の短いチャンクの場合
             if i > 0 and chunk_tokens < min_tokens:
                 # 前のチャンクとマージを検討
                 prev_chunk = adjusted_chunks[-1]
                 combined_text = prev_chunk["text"] + " " + chunk["text"]
-                combined_tokens = self.unified_client.count_tokens(combined_text, model=self.embedding_model)
+                combined_tokens = self.token_estimator.count(combined_text, model=self.embedding_model)
 
                 # マージしても最大トークン数（300）を超えない場合はマージ
                 if combined_tokens < 300:
@@ -0,0 +1,370 @@
+"""
+APIレート制限（RPM / TPM トークンバケット）
+
+LLM / Embedding API 呼び出しの前に acquire() して、プロバイダー・モデルごとの
+リクエスト数/分（RPM）とトークン数/分（TPM）の上限内に収めます。
+
+    - RedisTokenBucket   : Luaスクリプトで2つのバケットを原子的に更新（Celeryワーカー間で共有）
+    - InMemoryTokenBucket: プロセス内のみのバケット（テスト・Redisなし環境用）
+
+上限は OpenAI が celery_config.OPENAI_CONFIG、Gemini が config.RateLimitConfig から取得します。
+
+使用例:
+    from helper_rate_limiter import acquire_rate_limit
+
+    acquire_rate_limit("gemini", "gemini-2.0-flash", tokens=1200)   # 必要なら待機
+    response = client.generate_content(...)
+
+環境変数:
+    RATE_LIMIT_BACKEND : "redis" / "memory" / "auto"
+    RATE_LIMIT_REDIS_URL（未設定時は REDIS_URL）
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+try:
+    from config import RateLimitConfig
+except ImportError:
+    RateLimitConfig = None
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitTimeout(TimeoutError):
+    """レート制限の待機がタイムアウトした場合の例外"""
+    pass
+
+
+@dataclass(frozen=True)
+class RateLimits:
+    """1分あたりの上限"""
+    rpm: int
+    tpm: int
+
+
+def _limits_from_table(table: Dict[str, Dict[str, int]], model: str) -> Optional[Dict[str, int]]:
+    """完全一致、なければ最長の前方一致でモデルの上限を引く"""
+    if model in table:
+        return table[model]
+    prefixes = [k for k in table if model.startswith(k)]
+    if prefixes:
+        return table[max(prefixes, key=len)]
+    return None
+
+
+def get_rate_limits(provider: str, model: Optional[str]) -> RateLimits:
+    """
+    プロバイダー・モデルの上限を取得（安全係数適用済み）
+
+    Args:
+        provider: "gemini" / "openai" など
+        model: モデル名
+
+    Returns:
+        RateLimits
+    """
+    model = model or ""
+    entry = None
+    if provider == "openai":
+        try:
+            from celery_config import OPENAI_CONFIG
+            entry = _limits_from_table(OPENAI_CONFIG.get("models", {}), model)
+        except Exception as e:
+            logger.debug(f"OPENAI_CONFIG を読み込めません: {e}")
+    elif RateLimitConfig is not None:
+        entry = _limits_from_table(RateLimitConfig.GEMINI_LIMITS, model)
+
+    if entry is None:
+        entry = RateLimitConfig.DEFAULT_LIMITS if RateLimitConfig else {"rpm_limit": 500, "tpm_limit": 200000}
+
+    factor = RateLimitConfig.SAFETY_FACTOR if RateLimitConfig else 1.0
+    return RateLimits(
+        rpm=max(1, int(entry["rpm_limit"] * factor)),
+        tpm=max(1, int(entry["tpm_limit"] * factor)),
+    )
+
+
+class TokenBucket(ABC):
+    """RPM/TPM 2バケットのレート制限（抽象基底クラス）"""
+
+    @abstractmethod
+    def try_acquire(self, key: str, limits: RateLimits, requests: int, tokens: int) -> float:
+        """
+        両バケットから取得を試みる（両方足りる場合のみ消費）
+
+        Returns:
+            0.0（取得成功）または再試行までの待機秒数
+        """
+        pass
+
+    def acquire(
+        self,
+        key: str,
+        limits: RateLimits,
+        tokens: int = 0,
+        requests: int = 1,
+        timeout: Optional[float] = None
+    ) -> float:
+        """
+        取得できるまで待機
+
+        Args:
+            key: バケットのキー（プロバイダー:モデル）
+            limits: 上限
+            tokens: 消費トークン数
+            requests: 消費リクエスト数
+            timeout: 最大待機秒数（Noneの場合は無制限）
+
+        Returns:
+            待機した秒数
+
+        Raises:
+            RateLimitTimeout: timeout 内に取得できなかった場合
+        """
+        # バケット容量を超える要求は永久に満たせないため容量に丸める
+        requests = min(max(requests, 0), limits.rpm)
+        tokens = min(max(tokens, 0), limits.tpm)
+
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(key, limits, requests, tokens)
+            if wait <= 0:
+                return time.monotonic() - start
+            waited = time.monotonic() - start
+            if timeout is not None and waited + wait > timeout:
+                raise RateLimitTimeout(f"レート制限の待機がタイムアウトしました: {key} ({waited:.1f}秒)")
+            # 同時に待機したワーカーが一斉に再試行しないようジッターを加える
+            time.sleep(min(wait, 5.0) * random.uniform(1.0, 1.2))
+
+
+    async def acquire_async(
+        self,
+        key: str,
+        limits: RateLimits,
+        tokens: int = 0,
+        requests: int = 1,
+        timeout: Optional[float] = None
+    ) -> float:
+        """acquire() の非同期版（待機中にイベントループをブロックしない）"""
+        requests = min(max(requests, 0), limits.rpm)
+        tokens = min(max(tokens, 0), limits.tpm)
+
+        start = time.monotonic()
+        while True:
+            wait = self.try_acquire(key, limits, requests, tokens)
+            if wait <= 0:
+                return time.monotonic() - start
+            waited = time.monotonic() - start
+            if timeout is not None and waited + wait > timeout:
+                raise RateLimitTimeout(f"レート制限の待機がタイムアウトしました: {key} ({waited:.1f}秒)")
+            await asyncio.sleep(min(wait, 5.0) * random.uniform(1.0, 1.2))
+
+
+class InMemoryTokenBucket(TokenBucket):
+    """プロセス内のトークンバケット"""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (リクエスト残量, トークン残量, 最終更新時刻)
+        self._state: Dict[str, Tuple[float, float, float]] = {}
+
+    def try_acquire(self, key: str, limits: RateLimits, requests: int, tokens: int) -> float:
+        with self._lock:
+            now = self._clock()
+            req_level, tok_level, last = self._state.get(key, (limits.rpm, limits.tpm, now))
+            elapsed = max(0.0, now - last)
+            req_level = min(limits.rpm, req_level + elapsed * limits.rpm / 60.0)
+            tok_level = min(limits.tpm, tok_level + elapsed * limits.tpm / 60.0)
+
+            if req_level >= requests and tok_level >= tokens:
+                self._state[key] = (req_level - requests, tok_level - tokens, now)
+                return 0.0
+
+            self._state[key] = (req_level, tok_level, now)
+            req_wait = (requests - req_level) * 60.0 / limits.rpm if req_level < requests else 0.0
+            tok_wait = (tokens - tok_level) * 60.0 / limits.tpm if tok_level < tokens else 0.0
+            return max(req_wait, tok_wait)
+
+
+# KEYS[1]: バケットのハッシュキー
+# ARGV: rpm, tpm, 要求リクエスト数, 要求トークン数
+# 戻り値: 0（取得成功）または待機ミリ秒
+_TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local req = tonumber(ARGV[3])
+local tok = tonumber(ARGV[4])
+
+local state = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts')
+local req_level = tonumber(state[1]) or rpm
+local tok_level = tonumber(state[2]) or tpm
+local last = tonumber(state[3]) or now
+local elapsed = math.max(0, now - last)
+
+req_level = math.min(rpm, req_level + elapsed * rpm / 60000)
+tok_level = math.min(tpm, tok_level + elapsed * tpm / 60000)
+
+local wait = 0
+if req_level >= req and tok_level >= tok then
+    req_level = req_level - req
+    tok_level = tok_level - tok
+else
+    if req_level < req then
+        wait = math.max(wait, (req - req_level) * 60000 / rpm)
+    end
+    if tok_level < tok then
+        wait = math.max(wait, (tok - tok_level) * 60000 / tpm)
+    end
+end
+
+redis.call('HSET', KEYS[1], 'req', tostring(req_level), 'tok', tostring(tok_level), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], 120000)
+return math.ceil(wait)
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """Redis + Luaスクリプトによる分散トークンバケット"""
+
+    def __init__(self, redis_client, key_prefix: str = "ratelimit"):
+        """
+        Args:
+            redis_client: redis.Redis インスタンス
+            key_prefix: Redisキーの接頭辞
+        """
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self._script = redis_client.register_script(_TOKEN_BUCKET_LUA)
+
+    def try_acquire(self, key: str, limits: RateLimits, requests: int, tokens: int) -> float:
+        wait_ms = self._script(
+            keys=[f"{self.key_prefix}:{key}"],
+            args=[limits.rpm, limits.tpm, requests, tokens]
+        )
+        return int(wait_ms) / 1000.0
+
+
+class RateLimiter:
+    """プロバイダー・モデル単位のレート制限（Redis障害時はプロセス内バケットに切り替え）"""
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self._fallback = InMemoryTokenBucket()
+
+    def acquire(
+        self,
+        provider: str,
+        model: Optional[str],
+        tokens: int = 0,
+        requests: int = 1,
+        timeout: Optional[float] = None
+    ) -> float:
+        """
+        API呼び出し前にRPM/TPMを取得（必要なら待機）
+
+        Args:
+            provider: "gemini" / "openai" など
+            model: モデル名
+            tokens: 見込み消費トークン数（入力 + 出力）
+            requests: リクエスト数
+            timeout: 最大待機秒数
+
+        Returns:
+            待機した秒数
+        """
+        limits = get_rate_limits(provider, model)
+        key = f"{provider}:{model or 'default'}"
+        try:
+            waited = self.bucket.acquire(key, limits, tokens=tokens, requests=requests, timeout=timeout)
+        except RateLimitTimeout:
+            raise
+        except Exception as e:
+            logger.warning(f"レート制限バックエンドエラー（プロセス内バケットで継続）: {e}")
+            self.bucket = self._fallback
+            waited = self.bucket.acquire(key, limits, tokens=tokens, requests=requests, timeout=timeout)
+        if waited > 0.5:
+            logger.debug(f"レート制限で待機: {key} {waited:.1f}秒 (tokens={tokens})")
+        return waited
+
+
+    async def acquire_async(
+        self,
+        provider: str,
+        model: Optional[str],
+        tokens: int = 0,
+        requests: int = 1,
+        timeout: Optional[float] = None
+    ) -> float:
+        """acquire() の非同期版（asyncio の実行器から使用）"""
+        limits = get_rate_limits(provider, model)
+        key = f"{provider}:{model or 'default'}"
+        try:
+            waited = await self.bucket.acquire_async(key, limits, tokens=tokens, requests=requests, timeout=timeout)
+        except RateLimitTimeout:
+            raise
+        except Exception as e:
+            logger.warning(f"レート制限バックエンドエラー（プロセス内バケットで継続）: {e}")
+            self.bucket = self._fallback
+            waited = await self.bucket.acquire_async(key, limits, tokens=tokens, requests=requests, timeout=timeout)
+        if waited > 0.5:
+            logger.debug(f"レート制限で待機: {key} {waited:.1f}秒 (tokens={tokens})")
+        return waited
+
+
+def _create_bucket() -> TokenBucket:
+    """設定に応じたバケットを生成"""
+    backend = os.getenv("RATE_LIMIT_BACKEND", RateLimitConfig.BACKEND if RateLimitConfig else "auto")
+    if backend == "memory":
+        return InMemoryTokenBucket()
+
+    redis_url = os.getenv(
+        "RATE_LIMIT_REDIS_URL",
+        os.getenv("REDIS_URL", RateLimitConfig.REDIS_URL if RateLimitConfig else "redis://localhost:6379/0")
+    )
+    try:
+        import redis
+
+        client = redis.Redis.from_url(redis_url, socket_connect_timeout=1.0)
+        client.ping()
+        return RedisTokenBucket(client, RateLimitConfig.KEY_PREFIX if RateLimitConfig else "ratelimit")
+    except Exception as e:
+        if backend == "redis":
+            raise
+        logger.info(f"Redisに接続できないためプロセス内レート制限を使用します: {e}")
+        return InMemoryTokenBucket()
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """プロセス共有のRateLimiterを取得"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(_create_bucket())
+    return _rate_limiter
+
+
+def acquire_rate_limit(
+    provider: str,
+    model: Optional[str],
+    tokens: int = 0,
+    requests: int = 1,
+    timeout: Optional[float] = None
+) -> float:
+    """共有RateLimiterでRPM/TPMを取得（RateLimiter.acquire参照）"""
+    return get_rate_limiter().acquire(provider, model, tokens=tokens, requests=requests, timeout=timeout)
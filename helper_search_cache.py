@@ -0,0 +1,269 @@
+"""
+RAG検索の2段キャッシュ（クエリベクトル / 検索結果）
+
+エージェントや評価ハーネスは同じ（正規化すると同じ）クエリを繰り返し検索するため、
+Embedding API と SPLADE の呼び出し、Qdrant検索をキャッシュで省略します。
+
+    - 1段目: 正規化クエリ → (Denseベクトル, Sparseベクトル)
+    - 2段目: (コレクション, バージョン, 正規化クエリ, limit) → 検索結果（ヒット一覧）
+      バージョンはコレクションのポイント数とプロセス内の更新カウンタから作るため、
+      登録・削除でポイント数が変わると古い結果は参照されなくなる
+    - 登録・削除・作り直しの後は notify_collection_changed(name) を呼ぶ。更新カウンタを進めるため、
+      ポイント数が変わらない置き換え（差分登録）でもこのプロセスの古い結果は参照されなくなる。
+      他プロセスでの更新は result_ttl で反映される
+
+どちらも件数上限付きLRU + TTLで、ヒット率を stats() で取得できます。
+
+環境変数:
+    RAG_CACHE_ENABLED : "false" でキャッシュ無効
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+RAG_CACHE_ENABLED = os.getenv("RAG_CACHE_ENABLED", "true").lower() not in ("false", "0", "no")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """
+    キャッシュキー用にクエリを正規化（NFKC・小文字化・空白の統一）
+
+    Args:
+        query: 検索クエリ
+
+    Returns:
+        正規化済みクエリ
+    """
+    text = unicodedata.normalize("NFKC", query or "")
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+class TTLCache:
+    """件数上限付きLRU + TTLのキャッシュ（スレッドセーフ）"""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            maxsize: 最大件数（超えると最も古く使われたものから削除）
+            ttl: 有効期限（秒）
+            clock: 時刻関数（テスト用）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """値を取得（期限切れ・未登録は None）"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > self._clock():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """値を登録"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        """値を削除（未登録なら何もしない）"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SearchCache:
+    """クエリベクトルと検索結果の2段キャッシュ"""
+
+    def __init__(
+        self,
+        vector_maxsize: int = 1024,
+        vector_ttl: float = 3600.0,
+        result_maxsize: int = 512,
+        result_ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            vector_maxsize: クエリベクトルの最大件数
+            vector_ttl: クエリベクトルの有効期限（秒）
+            result_maxsize: 検索結果の最大件数
+            result_ttl: 検索結果の有効期限（秒、他プロセスでの更新を反映するまでの上限）
+            clock: 時刻関数（テスト用）
+        """
+        self.vectors = TTLCache(vector_maxsize, vector_ttl, clock)
+        self.results = TTLCache(result_maxsize, result_ttl, clock)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_vectors(self, query: str, embed_fn: Callable[[str], Tuple[Any, Any]]) -> Tuple[Any, Any, bool]:
+        """
+        クエリの (Dense, Sparse) ベクトルを取得（キャッシュミス時は embed_fn で生成）
+
+        Args:
+            query: 検索クエリ
+            embed_fn: クエリ → (Denseベクトル, Sparseベクトル)
+
+        Returns:
+            (Denseベクトル, Sparseベクトル, キャッシュヒットか)
+        """
+        key = normalize_query(query)
+        cached = self.vectors.get(key)
+        if cached is not None:
+            return cached[0], cached[1], True
+        dense, sparse = embed_fn(query)
+        if dense is not None:
+            self.vectors.put(key, (dense, sparse))
+        return dense, sparse, False
+
+    def collection_version(self, client, collection_name: str, points_count: Optional[int] = None) -> Tuple[Any, int]:
+        """
+        コレクションのバージョン（ポイント数 + プロセス内の更新カウンタ）
+
+        Args:
+            client: Qdrantクライアント
+            collection_name: コレクション名
+            points_count: 取得済みのポイント数（CollectionRegistry など。None=get_collection で取得）
+
+        Returns:
+            バージョンを表すタプル
+        """
+        if points_count is None:
+            points_count = getattr(client.get_collection(collection_name), "points_count", None)
+        return points_count, self._generations.get(collection_name, 0)
+
+    def bump_version(self, collection_name: str) -> None:
+        """コレクション更新時に呼び出し、このプロセスの結果キャッシュを無効化"""
+        with self._lock:
+            self._generations[collection_name] = self._generations.get(collection_name, 0) + 1
+
+    def result_key(
+        self,
+        collection_name: str,
+        version: Hashable,
+        query: str,
+        limit: int
+    ) -> Tuple:
+        """
+        検索結果キャッシュのキー
+
+        クエリベクトルは正規化クエリから決まるため、ベクトルの代わりに正規化クエリをキーにする
+        （ヒット時にEmbeddingを生成せずに済む）。スコア閾値の適用は結果の整形時に行う。
+        """
+        return (collection_name, version, normalize_query(query), limit)
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット率・件数"""
+        return {
+            "vector_hits": self.vectors.hits,
+            "vector_misses": self.vectors.misses,
+            "vector_hit_rate": self.vectors.hit_rate,
+            "vector_entries": len(self.vectors),
+            "result_hits": self.results.hits,
+            "result_misses": self.results.misses,
+            "result_hit_rate": self.results.hit_rate,
+            "result_entries": len(self.results),
+        }
+
+    def clear(self) -> None:
+        self.vectors.clear()
+        self.results.clear()
+
+
+_search_cache: Optional[SearchCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> SearchCache:
+    """プロセス共有のSearchCacheを取得（サイズ・TTLは AgentConfig）"""
+    global _search_cache
+    if _search_cache is None:
+        with _search_cache_lock:
+            if _search_cache is None:
+                try:
+                    from config import AgentConfig
+                    _search_cache = SearchCache(
+                        vector_maxsize=AgentConfig.RAG_QUERY_CACHE_SIZE,
+                        vector_ttl=AgentConfig.RAG_QUERY_CACHE_TTL,
+                        result_maxsize=AgentConfig.RAG_RESULT_CACHE_SIZE,
+                        result_ttl=AgentConfig.RAG_RESULT_CACHE_TTL,
+                    )
+                except (ImportError, AttributeError):
+                    _search_cache = SearchCache()
+    return _search_cache
+
+
+# ============ コレクション更新の通知 ============
+
+_change_listeners: List[Callable[[str], None]] = []
+_change_listeners_lock = threading.Lock()
+
+
+def add_collection_change_listener(listener: Callable[[str], None]) -> None:
+    """コレクション更新時にコレクション名を受け取る関数を登録（ベクトル構成キャッシュ・レジストリの破棄用）"""
+    with _change_listeners_lock:
+        if listener not in _change_listeners:
+            _change_listeners.append(listener)
+
+
+def remove_collection_change_listener(listener: Callable[[str], None]) -> None:
+    with _change_listeners_lock:
+        if listener in _change_listeners:
+            _change_listeners.remove(listener)
+
+
+def notify_collection_changed(collection_name: str) -> None:
+    """
+    コレクションのポイントを書き込み・削除した後（作り直し・削除を含む）に呼ぶ
+
+    検索結果キャッシュのバージョンを進め（bump_version）、登録されたリスナーに通知する。
+
+    Args:
+        collection_name: 更新したコレクション名
+    """
+    get_search_cache().bump_version(collection_name)
+    with _change_listeners_lock:
+        listeners = list(_change_listeners)
+    for listener in listeners:
+        try:
+            listener(collection_name)
+        except Exception as e:
+            logger.warning(f"コレクション更新の通知に失敗しました ({collection_name}): {e}")
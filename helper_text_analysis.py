@@ -0,0 +1,236 @@
+"""
+チャンク単位の形態素解析結果（1回の解析を全処理で共有）
+
+AnalyzedDocument は文分割・キーワード候補・出現回数・トークン数などを初回アクセス時に1回だけ
+計算して保持します。analyze_text() は同じテキストに対して同じ AnalyzedDocument を返します。
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from functools import cached_property
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from helper_mecab import (DEFAULT_MAX_CACHED_CHARS, EMPTY_TOKENS, Tokens, compound_nouns_from_tokens,
+                          get_mecab_tokenizer, sentences_from_tokens)
+
+logger = logging.getLogger(__name__)
+
+
+# メモに保持するテキストの合計文字数（解析結果はおおむね文字数に比例する）
+DEFAULT_CACHE_CHARS = int(os.getenv("TEXT_ANALYSIS_CACHE_CHARS", "1000000"))
+
+JAPANESE_CHAR_PATTERN = re.compile(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF]')
+SENTENCE_SPLIT_PATTERN = re.compile(r'(?<=[。．.!?])\s*')
+# カタカナ語、漢字複合語、英数字（KeywordExtractor の正規表現版と同じ）
+KEYWORD_PATTERN = re.compile(r'[ァ-ヴー]{2,}|[一-龥]{2,}|[A-Za-z]{2,}[A-Za-z0-9]*')
+# 専門用語候補（analyze_chunk_complexity と同じ）
+TECHNICAL_TERM_PATTERNS = {
+    'ja': re.compile(r'[ァ-ヴー]{4,}|[一-龥]{4,}'),
+    'en': re.compile(r'[A-Z][a-z]+(?:[A-Z][a-z]+)+|\b\w{10,}\b'),
+}
+
+
+class AnalyzedDocument:
+    """1テキストの解析結果（各項目は初回アクセス時に1回だけ計算）"""
+
+    def __init__(self, text: str, token_count: Optional[int] = None):
+        """
+        Args:
+            text: 解析対象テキスト
+            token_count: 既知のトークン数（チャンク作成時に計測済みの場合）
+        """
+        self.text = text
+        self._counts: Dict[str, int] = {}
+        if token_count is not None:
+            self.__dict__['token_count'] = token_count
+
+    @cached_property
+    def is_japanese(self) -> bool:
+        """日本語テキストか（最初の100文字で判定）"""
+        return bool(JAPANESE_CHAR_PATTERN.search(self.text[:100]))
+
+    @cached_property
+    def tokens(self) -> Tokens:
+        """MeCabの解析結果（MeCab未使用時は空）"""
+        tokenizer = get_mecab_tokenizer()
+        if not self.text or not tokenizer.available:
+            return EMPTY_TOKENS
+        return tokenizer.parse(self.text)
+
+    @cached_property
+    def compound_nouns(self) -> Tuple[str, ...]:
+        """連続する名詞を結合した複合名詞（出現順）"""
+        return tuple(compound_nouns_from_tokens(self.tokens))
+
+    @cached_property
+    def regex_terms(self) -> Tuple[str, ...]:
+        """正規表現によるキーワード候補（出現順）"""
+        return tuple(KEYWORD_PATTERN.findall(self.text))
+
+    @cached_property
+    def term_frequencies(self) -> Counter:
+        """キーワード候補（複合名詞 + 正規表現）ごとのテキスト中の出現回数"""
+        return Counter(self.count_many(set(self.compound_nouns) | set(self.regex_terms)))
+
+    @cached_property
+    def regex_sentences(self) -> Tuple[str, ...]:
+        """正規表現による文分割"""
+        return tuple(s.strip() for s in SENTENCE_SPLIT_PATTERN.split(self.text) if s.strip())
+
+    @cached_property
+    def sentences(self) -> Tuple[str, ...]:
+        """文分割（日本語はMeCab優先、失敗時・英語は正規表現）"""
+        if self.is_japanese and self.tokens:
+            sentences = sentences_from_tokens(self.tokens)
+            if sentences:
+                return tuple(sentences)
+        return self.regex_sentences
+
+    @cached_property
+    def token_count(self) -> int:
+        """tiktoken（cl100k_base）のトークン数"""
+        from helper_token_estimator import get_token_estimator
+        return get_token_estimator().count_raw_batch([self.text])[0]
+
+    def technical_terms(self, lang: str = "ja") -> Tuple[str, ...]:
+        """専門用語候補（出現順、重複あり）"""
+        key = f"_technical_terms_{lang}"
+        terms = self.__dict__.get(key)
+        if terms is None:
+            pattern = TECHNICAL_TERM_PATTERNS['ja' if lang == 'ja' else 'en']
+            terms = self.__dict__[key] = tuple(pattern.findall(self.text))
+        return terms
+
+    def count(self, term: str) -> int:
+        """テキスト中の出現回数（str.count と同じ、結果をメモ化）"""
+        n = self._counts.get(term)
+        if n is None:
+            n = self._counts[term] = self.text.count(term)
+        return n
+
+    def count_many(self, terms: Iterable[str]) -> Dict[str, int]:
+        """複数語の出現回数（未計測の語は1回の走査でまとめて計測）"""
+        terms = list(terms)
+        missing = [t for t in terms if t not in self._counts]
+        if missing:
+            from helper_keyword_scoring import count_keywords
+            self._counts.update(count_keywords(self.text, missing))
+        return {t: self._counts[t] for t in terms}
+
+    def contains(self, term: str) -> bool:
+        """テキストに term を含むか"""
+        return self.count(term) > 0
+
+
+def _text_key(text: str) -> bytes:
+    """メモのキー（テキストのハッシュ）"""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class TextAnalysisCache:
+    """テキストのハッシュ → AnalyzedDocument の LRU メモ（合計文字数で上限）"""
+
+    def __init__(self, max_total_chars: int = DEFAULT_CACHE_CHARS, max_cached_chars: int = DEFAULT_MAX_CACHED_CHARS):
+        """
+        Args:
+            max_total_chars: 保持するテキストの合計文字数（0で無効）
+            max_cached_chars: メモ対象とするテキストの最大文字数
+        """
+        self.max_total_chars = max_total_chars
+        self.max_cached_chars = max_cached_chars
+        self._docs: "OrderedDict[bytes, AnalyzedDocument]" = OrderedDict()
+        self._total_chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str, token_count: Optional[int] = None) -> AnalyzedDocument:
+        """テキストの AnalyzedDocument を取得（なければ生成して登録）"""
+        if len(text) > min(self.max_cached_chars, self.max_total_chars):
+            return AnalyzedDocument(text, token_count)
+
+        key = _text_key(text)
+        with self._lock:
+            doc = self._docs.get(key)
+            if doc is not None and doc.text == text:
+                self._docs.move_to_end(key)
+                self.hits += 1
+                if token_count is not None and 'token_count' not in doc.__dict__:
+                    doc.__dict__['token_count'] = token_count
+                return doc
+            self.misses += 1
+            if doc is not None:
+                # ハッシュ衝突: 古い方を置き換える
+                self._total_chars -= len(self._docs.pop(key).text)
+            doc = self._docs[key] = AnalyzedDocument(text, token_count)
+            self._total_chars += len(text)
+            while self._total_chars > self.max_total_chars:
+                _, evicted = self._docs.popitem(last=False)
+                self._total_chars -= len(evicted.text)
+        return doc
+
+    def cache_info(self) -> Dict[str, int]:
+        """メモのヒット数・件数・合計文字数"""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._docs),
+                "total_chars": self._total_chars, "max_total_chars": self.max_total_chars}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._docs.clear()
+            self._total_chars = 0
+            self.hits = 0
+            self.misses = 0
+
+
+_cache: Optional[TextAnalysisCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_text_analysis_cache() -> TextAnalysisCache:
+    """プロセス共有の TextAnalysisCache を取得"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TextAnalysisCache()
+    return _cache
+
+
+def analyze_text(text, token_count: Optional[int] = None) -> AnalyzedDocument:
+    """
+    テキストの AnalyzedDocument を取得（同じテキストには同じオブジェクトを返す）
+
+    Args:
+        text: 解析対象テキスト（AnalyzedDocument の場合はそのまま返す）
+        token_count: 既知のトークン数
+
+    Returns:
+        AnalyzedDocument
+    """
+    if isinstance(text, AnalyzedDocument):
+        return text
+    return get_text_analysis_cache().get(text or "", token_count)
+
+
+def analyze_texts(texts: Iterable[str]) -> List[AnalyzedDocument]:
+    """
+    複数テキストの AnalyzedDocument を取得（トークン数はまとめて計測）
+
+    Args:
+        texts: 解析対象テキストのイテラブル
+
+    Returns:
+        入力順の AnalyzedDocument のリスト
+    """
+    docs = [analyze_text(t) for t in texts]
+    pending = [d for d in docs if 'token_count' not in d.__dict__]
+    if pending:
+        from helper_token_estimator import get_token_estimator
+        counts = get_token_estimator().count_raw_batch([d.text for d in pending])
+        for doc, n in zip(pending, counts):
+            doc.__dict__['token_count'] = n
+    return docs
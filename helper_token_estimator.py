@@ -0,0 +1,269 @@
+"""
+ローカル・トークン数推定（キャリブレーション付き）
+
+tiktoken（取得できない環境では文字種比率による簡易推定）でローカルにトークン数を数え、
+モデルごとの補正係数を掛けて対象モデルのトークン数を推定します。
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+import tiktoken
+
+from helper_text import DEFAULT_ENCODING, estimate_tokens_simple
+
+logger = logging.getLogger(__name__)
+
+
+# モデル別補正係数（ローカル計測値 × 係数 = 対象モデルの推定トークン数）
+# 未登録のモデルは 1.0。calibrate() / load_corrections() で更新される。
+DEFAULT_MODEL_CORRECTIONS: Dict[str, float] = {}
+
+# 補正テーブル（JSON）のパス。指定時は起動時に読み込み、ensure_calibrated() の学習結果を保存する
+TOKEN_CORRECTIONS_PATH = os.getenv("TOKEN_CORRECTIONS_PATH")
+# バッチエンコードのスレッド数
+DEFAULT_ENCODE_THREADS = int(os.getenv("TOKEN_ENCODE_THREADS", "8"))
+
+
+class TokenEstimator:
+    """tiktoken / 文字種比率ベースのローカルトークン数推定器"""
+
+    def __init__(
+        self,
+        encoding_name: str = DEFAULT_ENCODING,
+        corrections: Optional[Dict[str, float]] = None,
+        num_threads: int = DEFAULT_ENCODE_THREADS
+    ):
+        """
+        Args:
+            encoding_name: tiktokenのエンコーディング名
+            corrections: モデル別補正係数（Noneの場合はデフォルトテーブル）
+            num_threads: バッチエンコード時のスレッド数
+        """
+        self.encoding_name = encoding_name
+        self.corrections: Dict[str, float] = dict(
+            DEFAULT_MODEL_CORRECTIONS if corrections is None else corrections
+        )
+        self.num_threads = num_threads
+        self._encoding = None
+        self._encoding_failed = False
+        self._lock = threading.Lock()
+
+    def _get_encoding(self):
+        """エンコーディングを遅延取得（取得できない環境ではNone）"""
+        if self._encoding is None and not self._encoding_failed:
+            with self._lock:
+                if self._encoding is None and not self._encoding_failed:
+                    try:
+                        self._encoding = tiktoken.get_encoding(self.encoding_name)
+                    except Exception as e:
+                        logger.warning(f"tiktokenエンコーディング取得失敗（簡易推定を使用）: {e}")
+                        self._encoding_failed = True
+        return self._encoding
+
+    def correction_for(self, model: Optional[str]) -> float:
+        """
+        モデルの補正係数を取得
+
+        完全一致がなければ最長の前方一致（例: "gemini-2.0" → "gemini-2.0-flash-exp"）を使う。
+        """
+        if not model:
+            return 1.0
+        if model in self.corrections:
+            return self.corrections[model]
+        prefixes = [k for k in self.corrections if model.startswith(k)]
+        if prefixes:
+            return self.corrections[max(prefixes, key=len)]
+        return 1.0
+
+    def has_correction(self, model: Optional[str]) -> bool:
+        """モデルの補正係数が登録済みか（前方一致を含む）"""
+        return bool(model) and any(model.startswith(k) for k in self.corrections)
+
+    def count_raw_batch(self, texts: Sequence[str], num_threads: Optional[int] = None) -> List[int]:
+        """補正前のローカルトークン数（バッチ、num_threads=None は self.num_threads）"""
+        encoding = self._get_encoding()
+        if encoding is None:
+            return [estimate_tokens_simple(t) if t else 0 for t in texts]
+        encoded = encoding.encode_ordinary_batch(
+            [t or "" for t in texts], num_threads=num_threads or self.num_threads
+        )
+        return [len(tokens) for tokens in encoded]
+
+    def count_chunks(
+        self,
+        chunks: Sequence[Dict],
+        model: Optional[str] = None,
+        key: str = "tokens",
+        num_threads: Optional[int] = None
+    ) -> List[int]:
+        """
+        チャンクのトークン数を取得（計測済みの chunk[key] を再利用）
+
+        未計測のチャンクだけを1回のバッチエンコードで計測し、補正前の値を chunk[key] に保存する。
+
+        Args:
+            chunks: チャンク（text を持つ辞書）のリスト
+            model: 対象モデル名（補正係数の選択に使用、None=補正なし）
+            key: トークン数を保持するキー
+            num_threads: バッチエンコードのスレッド数（None=self.num_threads）
+
+        Returns:
+            推定トークン数のリスト（入力順）
+        """
+        missing = [c for c in chunks if not isinstance(c.get(key), int)]
+        if missing:
+            counts = self.count_raw_batch([c.get('text', '') for c in missing], num_threads=num_threads)
+            for chunk, n in zip(missing, counts):
+                chunk[key] = n
+        raw = [c[key] for c in chunks]
+        ratio = self.correction_for(model)
+        if ratio == 1.0:
+            return raw
+        return [int(round(n * ratio)) for n in raw]
+
+    def count_batch(self, texts: Sequence[str], model: Optional[str] = None) -> List[int]:
+        """
+        複数テキストのトークン数を推定
+
+        Args:
+            texts: 対象テキストのリスト
+            model: 対象モデル名（補正係数の選択に使用）
+
+        Returns:
+            推定トークン数のリスト（入力順）
+        """
+        if not texts:
+            return []
+        ratio = self.correction_for(model)
+        raw = self.count_raw_batch(texts)
+        if ratio == 1.0:
+            return raw
+        return [int(round(n * ratio)) for n in raw]
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        """単一テキストのトークン数を推定"""
+        if not text:
+            return 0
+        return self.count_batch([text], model=model)[0]
+
+    def calibrate(
+        self,
+        model: str,
+        texts: Sequence[str],
+        remote_count_fn: Callable[[str], int],
+        sample_size: int = 50,
+        seed: int = 0
+    ) -> float:
+        """
+        リモート計測値をサンプリングして補正係数を学習
+
+        係数は Σremote / Σlocal（原点を通る回帰）で求め、テーブルに登録する。
+
+        Args:
+            model: 対象モデル名
+            texts: サンプル元のテキスト
+            remote_count_fn: リモートのトークン数計測関数（例: LLMClient.count_tokens）
+            sample_size: サンプル数
+            seed: サンプリングの乱数シード
+
+        Returns:
+            学習した補正係数
+        """
+        candidates = [t for t in texts if t and t.strip()]
+        if not candidates:
+            raise ValueError("キャリブレーション用のテキストがありません")
+
+        rng = random.Random(seed)
+        samples = rng.sample(candidates, min(sample_size, len(candidates)))
+
+        local_total = sum(self.count_raw_batch(samples))
+        remote_total = 0
+        for text in samples:
+            remote_total += remote_count_fn(text)
+
+        if local_total == 0:
+            raise ValueError("ローカル計測のトークン数が0です")
+
+        ratio = remote_total / local_total
+        self.corrections[model] = ratio
+        logger.info(
+            f"トークン補正係数を学習: {model} = {ratio:.4f} "
+            f"(samples={len(samples)}, local={local_total}, remote={remote_total})"
+        )
+        return ratio
+
+    def save_corrections(self, path: str) -> None:
+        """補正テーブルをJSONで保存"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.corrections, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    def load_corrections(self, path: str) -> None:
+        """補正テーブルをJSONから読み込み（既存のテーブルに上書きマージ）"""
+        with open(path, "r", encoding="utf-8") as f:
+            loaded = json.load(f)
+        self.corrections.update({str(k): float(v) for k, v in loaded.items()})
+
+
+_estimator: Optional[TokenEstimator] = None
+_estimator_lock = threading.Lock()
+
+
+def get_token_estimator() -> TokenEstimator:
+    """プロセス共有のTokenEstimatorを取得"""
+    global _estimator
+    if _estimator is None:
+        with _estimator_lock:
+            if _estimator is None:
+                estimator = TokenEstimator()
+                if TOKEN_CORRECTIONS_PATH and os.path.exists(TOKEN_CORRECTIONS_PATH):
+                    try:
+                        estimator.load_corrections(TOKEN_CORRECTIONS_PATH)
+                    except Exception as e:
+                        logger.warning(f"トークン補正テーブルの読み込みに失敗: {e}")
+                _estimator = estimator
+    return _estimator
+
+
+def ensure_calibrated(
+    model: str,
+    texts: Sequence[str],
+    remote_count_fn: Callable[[str], int],
+    path: Optional[str] = None,
+    force: bool = False
+) -> Optional[float]:
+    """
+    補正テーブルの保存先があり、モデルが未学習の場合だけ共有推定器を calibrate() して保存
+
+    Args:
+        model: 対象モデル名
+        texts: サンプル元のテキスト
+        remote_count_fn: リモートのトークン数計測関数
+        path: 補正テーブルの保存先（None=TOKEN_CORRECTIONS_PATH）
+        force: 学習済み・保存先なしでも学習する
+
+    Returns:
+        学習した補正係数（学習しなかった場合は None）
+    """
+    estimator = get_token_estimator()
+    path = path or TOKEN_CORRECTIONS_PATH
+    if not force and (not path or estimator.has_correction(model)):
+        return None
+    ratio = estimator.calibrate(model, texts, remote_count_fn)
+    if path:
+        estimator.save_corrections(path)
+    return ratio
+
+
+def estimate_tokens(text: str, model: Optional[str] = None) -> int:
+    """共有推定器でトークン数を推定"""
+    return get_token_estimator().count(text, model=model)
+
+
+def estimate_tokens_batch(texts: Sequence[str], model: Optional[str] = None) -> List[int]:
+    """共有推定器で複数テキストのトークン数を推定"""
+    return get_token_estimator().count_batch(texts, model=model)
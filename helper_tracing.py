@@ -0,0 +1,248 @@
+"""
+エージェント1ターンのレイテンシ内訳（スパン）トレース
+
+チャットのレイテンシが悪化したとき、Gemini の生成・embed_query・SPLADE・コレクションの
+存在確認・Qdrant検索のどれが原因かを切り分けるため、処理ごとの所要時間をスパンの木として記録します。
+
+    - trace(name) でルートスパン（1ターン）を開始し、その中の span(name) を子スパンとして記録
+    - 現在のスパンは ContextVar で保持するため、並列に実行したターンは混ざらない
+    - ルートスパンの外で span() を呼んだ場合は何も記録しない（オーバーヘッドはほぼなし）
+    - 終了したルートスパンは登録したエクスポーター（JSONLTraceExporter など）に渡す
+    - summarize_traces でスパン名ごとの1ターンあたり合計時間のパーセンタイルを集計
+
+使用例:
+    with trace("agent_turn", input=user_input) as turn:
+        with span("llm.generate"):
+            response = chat.send_message(user_input)
+    print(turn.to_dict())
+
+環境変数:
+    AGENT_TRACE_FILE : 終了したターンのスパン木を追記するJSONLファイル（agent_main で使用、空=出力しない）
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+AGENT_TRACE_FILE = os.getenv("AGENT_TRACE_FILE", "")
+# summarize_traces で集計するパーセンタイル
+SUMMARY_PERCENTILES = (50, 95, 99)
+
+
+@dataclass
+class Span:
+    """処理1つ分の所要時間"""
+    name: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start: float = field(default_factory=time.perf_counter)
+    end: Optional[float] = None
+    children: List["Span"] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000.0
+
+    def set(self, **attributes: Any) -> None:
+        """属性を追加（ヒット件数・キャッシュヒットなど）"""
+        self.attributes.update(attributes)
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        """
+        スパン木を辞書に変換
+
+        Args:
+            origin: start_ms の基準時刻（None=このスパンの開始）
+
+        Returns:
+            name, start_ms, duration_ms, attributes, (error), children の辞書
+        """
+        if origin is None:
+            origin = self.start
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000.0, 3),
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+        }
+        if self.error:
+            data["error"] = self.error
+        data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_exporters: List[Callable[[Dict[str, Any]], None]] = []
+_exporters_lock = threading.Lock()
+
+
+def current_span() -> Optional[Span]:
+    """実行中のスパン（トレース外は None）"""
+    return _current_span.get()
+
+
+@contextmanager
+def _activate(span_: Span) -> Iterator[Span]:
+    token = _current_span.set(span_)
+    try:
+        yield span_
+    except BaseException as e:
+        span_.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        span_.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+@contextmanager
+def trace(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    ルートスパンを開始し、終了時にエクスポーターへ渡す
+
+    トレース中に呼ばれた場合は子スパンとして扱う（ネストしたターンを二重に出力しない）。
+
+    Args:
+        name: スパン名
+        **attributes: 属性
+
+    Yields:
+        ルートスパン
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        with span(name, **attributes) as child:
+            yield child
+        return
+
+    root = Span(name=name, attributes=dict(attributes))
+    with _activate(root):
+        yield root
+    _export(root)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    実行中のスパンの子スパンを記録（トレース外では何もしない）
+
+    Args:
+        name: スパン名（"llm.generate", "embed.dense", "qdrant.query" など）
+        **attributes: 属性
+
+    Yields:
+        子スパン（トレース外は None）
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name=name, attributes=dict(attributes))
+    parent.children.append(child)
+    with _activate(child):
+        yield child
+
+
+def add_trace_exporter(exporter: Callable[[Dict[str, Any]], None]) -> None:
+    """終了したルートスパン（to_dict + trace_id, timestamp）を受け取る関数を登録"""
+    with _exporters_lock:
+        _exporters.append(exporter)
+
+
+def remove_trace_exporter(exporter: Callable[[Dict[str, Any]], None]) -> None:
+    with _exporters_lock:
+        if exporter in _exporters:
+            _exporters.remove(exporter)
+
+
+def _export(root: Span) -> None:
+    with _exporters_lock:
+        exporters = list(_exporters)
+    if not exporters:
+        return
+    data = root.to_dict()
+    data["trace_id"] = uuid.uuid4().hex
+    data["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    for exporter in exporters:
+        try:
+            exporter(data)
+        except Exception as e:
+            logger.warning(f"トレースの出力に失敗しました: {e}")
+
+
+class JSONLTraceExporter:
+    """ルートスパンを1行1ターンでJSONLファイルに追記（スレッドセーフ）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, data: Dict[str, Any]) -> None:
+        line = json.dumps(data, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+# ============ 集計 ============
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """線形補間のパーセンタイル（sorted_values は昇順）"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def _stage_totals(node: Dict[str, Any], totals: Dict[str, float]) -> None:
+    totals[node["name"]] = totals.get(node["name"], 0.0) + node["duration_ms"]
+    for child in node.get("children", []):
+        _stage_totals(child, totals)
+
+
+def summarize_traces(traces: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """
+    スパン名ごとに1ターンあたりの合計時間を集計
+
+    同じターンで複数回現れるスパン（ReActの各イテレーションの llm.generate など）は合計します。
+
+    Args:
+        traces: ルートスパンの辞書（Span.to_dict）のリスト
+
+    Returns:
+        スパン名 → {"turns": 現れたターン数, "mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms"}
+    """
+    per_stage: Dict[str, List[float]] = {}
+    for root in traces:
+        totals: Dict[str, float] = {}
+        _stage_totals(root, totals)
+        for name, total in totals.items():
+            per_stage.setdefault(name, []).append(total)
+
+    summary: Dict[str, Dict[str, float]] = {}
+    for name, values in per_stage.items():
+        values.sort()
+        stats: Dict[str, float] = {
+            "turns": len(values),
+            "mean_ms": round(sum(values) / len(values), 2),
+        }
+        for q in SUMMARY_PERCENTILES:
+            stats[f"p{q}_ms"] = round(_percentile(values, q), 2)
+        stats["max_ms"] = round(values[-1], 2)
+        summary[name] = stats
+    return summary
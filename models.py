@@ -45,6 +45,10 @@ class QAPair(BaseModel):
         default=None,
         description="ソースチャンクID"
     )
+    text_index: Optional[int] = Field(
+        default=None,
+        description="複数テキストから生成した場合の元テキスト番号（【テキストN】のN、1始まり）"
+    )
     dataset_type: Optional[str] = Field(
         default=None,
         description="データセットタイプ"
@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+qdrant_client_async.py - AsyncQdrantClient による検索・スクロール・アップサート
+==============================================================================
+AsyncQdrantClient 版の検索・スクロール・アップサートと、同期コードから呼ぶための共有イベントループを
+提供します。qdrant_client_wrapper / services.qdrant_service の関数は AsyncQdrantClient を渡すと
+このモジュールに委譲します。
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import socket
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from urllib.parse import urlparse
+
+import httpx
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http import models
+
+from helper_search_cache import notify_collection_changed
+from helper_tracing import span
+from qdrant_client_wrapper import (
+    HYBRID_PREFETCH_FACTOR,
+    QDRANT_CONFIG,
+    CollectionCapabilities,
+    batched,
+    cached_collection_capabilities,
+    fuse_hybrid_results,
+    hit_to_dict,
+    hybrid_batch_requests,
+    invalidate_collection_capabilities,
+    merge_collection_results,
+    remember_collection_capabilities,
+    resolve_hybrid_fusion,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+# ===================================================================
+# 設定
+# ===================================================================
+
+# agent_tools・検索画面の検索に AsyncQdrantClient を使う
+QDRANT_USE_ASYNC = os.getenv("QDRANT_USE_ASYNC", "false").lower() in ("true", "1", "yes")
+# auto / true / false（auto = grpcio があり gRPC ポートに接続できれば gRPC）
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "auto").lower()
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+# REST 接続で HTTP/2 を使う（h2 がなければ HTTP/1.1）
+QDRANT_HTTP2 = os.getenv("QDRANT_HTTP2", "true").lower() not in ("false", "0", "no")
+# 並行して送信するアップサートのバッチ数
+ASYNC_UPSERT_CONCURRENCY = int(os.getenv("QDRANT_ASYNC_UPSERT_CONCURRENCY", "4"))
+# REST の接続プールの上限
+ASYNC_POOL_SIZE = int(os.getenv("QDRANT_ASYNC_POOL_SIZE", "10"))
+# 待機中の接続を保持する秒数
+KEEPALIVE_EXPIRY = 30.0
+# gRPC ポートの接続確認のタイムアウト（秒）
+GRPC_PROBE_TIMEOUT = 1.0
+
+
+def _module_available(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+
+def resolve_prefer_grpc(url: str, grpc_port: int = QDRANT_GRPC_PORT, setting: str = QDRANT_PREFER_GRPC) -> bool:
+    """
+    gRPC で接続するかを判定
+
+    Args:
+        url: QdrantサーバーURL
+        grpc_port: gRPC ポート
+        setting: auto / true / false
+
+    Returns:
+        gRPC を使うかどうか（grpcio がなければ常に False）
+    """
+    if setting in ("false", "0", "no"):
+        return False
+    if not _module_available("grpc"):
+        if setting != "auto":
+            logger.warning("grpcio がインストールされていないため REST で接続します")
+        return False
+    if setting != "auto":
+        return True
+
+    host = urlparse(url).hostname or QDRANT_CONFIG["host"]
+    try:
+        with socket.create_connection((host, grpc_port), timeout=GRPC_PROBE_TIMEOUT):
+            return True
+    except OSError:
+        logger.debug(f"gRPC ポート {host}:{grpc_port} に接続できないため REST で接続します")
+        return False
+
+
+def create_async_qdrant_client(
+    url: Optional[str] = None,
+    timeout: int = 30,
+    prefer_grpc: Optional[bool] = None,
+    http2: Optional[bool] = None
+) -> AsyncQdrantClient:
+    """
+    AsyncQdrantClient を作成
+
+    Args:
+        url: QdrantサーバーURL（デフォルト: QDRANT_CONFIG["url"]）
+        timeout: タイムアウト秒数
+        prefer_grpc: gRPC を使うか（None=resolve_prefer_grpc で判定）
+        http2: REST 接続で HTTP/2 を使うか（None=QDRANT_HTTP2、h2 がなければ無効）
+
+    Returns:
+        AsyncQdrantClientインスタンス
+    """
+    url = url or QDRANT_CONFIG["url"]
+    if prefer_grpc is None:
+        prefer_grpc = resolve_prefer_grpc(url)
+    if http2 is None:
+        http2 = QDRANT_HTTP2
+    if http2 and not _module_available("h2"):
+        logger.warning("h2 がインストールされていないため HTTP/1.1 で接続します（pip install 'httpx[http2]'）")
+        http2 = False
+
+    # qdrant-client は localhost への接続で keep-alive を無効にするため、接続を再利用するよう明示する
+    limits = httpx.Limits(
+        max_connections=ASYNC_POOL_SIZE,
+        max_keepalive_connections=ASYNC_POOL_SIZE,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    logger.info(f"AsyncQdrantClient: url={url}, prefer_grpc={prefer_grpc}, http2={http2}")
+    return AsyncQdrantClient(
+        url=url, timeout=timeout, prefer_grpc=prefer_grpc, grpc_port=QDRANT_GRPC_PORT, http2=http2, limits=limits
+    )
+
+
+# ===================================================================
+# 共有イベントループ
+# ===================================================================
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_lock = threading.Lock()
+
+_async_clients: Dict[str, AsyncQdrantClient] = {}
+_async_clients_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """共有イベントループ（初回呼び出し時に専用スレッドで開始）"""
+    global _loop, _loop_thread
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _loop_thread = threading.Thread(target=loop.run_forever, name="qdrant-async-loop", daemon=True)
+                _loop_thread.start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    コルーチンを共有イベントループで実行し、完了を待つ（同期コードからの呼び出し用）
+
+    呼び出し元のコンテキスト（トレースのスパンなど）はコルーチンに引き継がれます。
+
+    Args:
+        coro: 実行するコルーチン
+        timeout: 待ち時間の上限（秒、None=無制限）
+
+    Returns:
+        コルーチンの戻り値
+
+    Raises:
+        RuntimeError: 共有イベントループのスレッドから呼ばれた場合（await すること）
+    """
+    loop = get_event_loop()
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("共有イベントループ内では run_sync ではなく await してください")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result(timeout)
+
+
+def get_async_client(url: Optional[str] = None, timeout: int = 30) -> AsyncQdrantClient:
+    """
+    URL ごとに共有する AsyncQdrantClient（共有イベントループ上で作成）
+
+    Args:
+        url: QdrantサーバーURL（デフォルト: QDRANT_CONFIG["url"]）
+        timeout: タイムアウト秒数（初回作成時のみ有効）
+
+    Returns:
+        AsyncQdrantClientインスタンス
+    """
+    url = url or QDRANT_CONFIG["url"]
+    with _async_clients_lock:
+        client = _async_clients.get(url)
+        if client is None:
+            # gRPC のチャネルはイベントループに紐づくため、ループ上で作成する
+            async def create() -> AsyncQdrantClient:
+                return create_async_qdrant_client(url, timeout=timeout)
+            client = run_sync(create())
+            _async_clients[url] = client
+    return client
+
+
+def close_async_clients() -> None:
+    """共有している AsyncQdrantClient をすべて閉じる"""
+    with _async_clients_lock:
+        clients = list(_async_clients.values())
+        _async_clients.clear()
+    for client in clients:
+        try:
+            run_sync(client.close())
+        except Exception as e:
+            logger.warning(f"AsyncQdrantClient のクローズに失敗しました: {e}")
+
+
+# ===================================================================
+# 検索
+# ===================================================================
+
+async def get_collection_capabilities_async(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    refresh: bool = False
+) -> CollectionCapabilities:
+    """get_collection_capabilities の async 版（キャッシュは同期版と共有）"""
+    if not refresh:
+        cached = cached_collection_capabilities(collection_name)
+        if cached is not None:
+            return cached
+
+    with span("qdrant.get_collection", collection=collection_name):
+        info = await client.get_collection(collection_name)
+    return remember_collection_capabilities(collection_name, info.config.params)
+
+
+async def _dense_search_async(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    query_vector: List[float],
+    capabilities: CollectionCapabilities,
+    limit: int
+) -> List[Dict[str, Any]]:
+    response = await client.query_points(
+        collection_name=collection_name,
+        query=query_vector,
+        using=capabilities.dense_name,
+        limit=limit
+    )
+    return [hit_to_dict(h) for h in response.points]
+
+
+async def _hybrid_search_async(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    query_vector: List[float],
+    sparse_vector: models.SparseVector,
+    capabilities: CollectionCapabilities,
+    limit: int,
+    hybrid_alpha: float,
+    fusion: str
+) -> List[Dict[str, Any]]:
+    dense_response, sparse_response = await client.query_batch_points(
+        collection_name=collection_name,
+        requests=hybrid_batch_requests(query_vector, sparse_vector, capabilities, limit),
+    )
+    return fuse_hybrid_results(
+        [hit_to_dict(h) for h in dense_response.points],
+        [hit_to_dict(h) for h in sparse_response.points],
+        alpha=hybrid_alpha,
+        method=fusion,
+        limit=limit,
+    )
+
+
+async def search_collection_async(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    query_vector: List[float],
+    sparse_vector: Optional[models.SparseVector] = None,
+    limit: int = 5,
+    hybrid_alpha: float = 0.5,
+    fusion: Optional[str] = None,
+    capabilities: Optional[CollectionCapabilities] = None,
+    on_error: Optional[Callable[[Exception], None]] = None
+) -> List[Dict[str, Any]]:
+    """
+    コレクションを検索（search_collection の async 版、引数・戻り値・エラー時の再試行は同じ）
+
+    Args:
+        client: AsyncQdrantClient
+        collection_name: コレクション名
+        query_vector: クエリベクトル (Dense)
+        sparse_vector: クエリSparseベクトル (Optional) - 指定された場合Hybrid検索
+        limit: 結果数上限
+        hybrid_alpha: Hybrid検索時のDenseの重み
+        fusion: Hybrid検索の統合方法（rrf / weighted / dbsf）
+        capabilities: 呼び出し側で保持しているベクトル構成
+        on_error: 検索が失敗したときに例外を渡して呼ぶ関数
+
+    Returns:
+        検索結果のリスト
+    """
+    fusion = resolve_hybrid_fusion(fusion)
+    logger.info(
+        f"search_collection_async: collection='{collection_name}', limit={limit}, "
+        f"sparse={sparse_vector is not None}, fusion={fusion}"
+    )
+
+    try:
+        if capabilities is None:
+            capabilities = await get_collection_capabilities_async(client, collection_name)
+        if sparse_vector is not None and capabilities.hybrid:
+            return await _hybrid_search_async(
+                client, collection_name, query_vector, sparse_vector,
+                capabilities, limit, hybrid_alpha, fusion,
+            )
+        return await _dense_search_async(client, collection_name, query_vector, capabilities, limit)
+
+    except Exception as e:
+        logger.error(f"Search failed: {e}")
+        invalidate_collection_capabilities(collection_name)
+        if on_error is not None:
+            on_error(e)
+        if sparse_vector is None:
+            return []
+        logger.info("Falling back to dense-only search due to error.")
+        try:
+            capabilities = await get_collection_capabilities_async(client, collection_name, refresh=True)
+            return await _dense_search_async(client, collection_name, query_vector, capabilities, limit)
+        except Exception as fallback_e:
+            logger.error(f"Fallback search also failed: {fallback_e}")
+            return []
+
+
+async def search_collections_async(
+    client: AsyncQdrantClient,
+    collection_names: List[str],
+    query_vector: List[float],
+    sparse_vector: Optional[models.SparseVector] = None,
+    limit: int = 5,
+    hybrid_alpha: float = 0.5,
+    fusion: Optional[str] = None,
+    capabilities: Optional[Dict[str, CollectionCapabilities]] = None,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+    normalize: str = "minmax",
+    score_filter: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> List[Dict[str, Any]]:
+    """
+    複数のコレクションを asyncio.gather で同時に検索し、統合した上位 limit 件を返す
+    （search_collections の async 版）
+
+    Args:
+        client: AsyncQdrantClient
+        collection_names: コレクション名のリスト
+        query_vector: クエリベクトル (Dense)
+        sparse_vector: クエリSparseベクトル (Optional)
+        limit: 統合後の結果数上限
+        hybrid_alpha: Hybrid検索時のDenseの重み
+        fusion: Hybrid検索の統合方法
+        capabilities: コレクション名 → ベクトル構成
+        on_error: 検索が失敗したときに (コレクション名, 例外) で呼ぶ関数
+        normalize: コレクションごとのスコア正規化方法（minmax / dbsf）
+        score_filter: 上限で切る前に結果を絞り込む関数（merge_collection_results を参照）
+
+    Returns:
+        統合後の検索結果（merge_collection_results を参照）
+    """
+    capabilities = capabilities or {}
+    fetch_limit = limit * HYBRID_PREFETCH_FACTOR
+    names = list(dict.fromkeys(collection_names))
+
+    async def search_one(name: str) -> List[Dict[str, Any]]:
+        with span("qdrant.query.collection", collection=name):
+            return await search_collection_async(
+                client, name, query_vector, sparse_vector,
+                limit=fetch_limit, hybrid_alpha=hybrid_alpha, fusion=fusion,
+                capabilities=capabilities.get(name),
+                on_error=(lambda e: on_error(name, e)) if on_error else None,
+            )
+
+    results = await asyncio.gather(*(search_one(name) for name in names))
+    results_by_collection = dict(zip(names, results))
+    return merge_collection_results(
+        results_by_collection, limit=limit, normalize=normalize, score_filter=score_filter
+    )
+
+
+# ===================================================================
+# スクロール・アップサート
+# ===================================================================
+
+async def scroll_points_async(
+    client: AsyncQdrantClient,
+    collection_name: str,
+    batch_size: int = 100,
+    with_vectors: bool = False,
+    progress_callback: Optional[Callable[[int, Optional[int]], None]] = None
+) -> List[models.Record]:
+    """
+    コレクションの全ポイントを取得
+
+    Args:
+        client: AsyncQdrantClient
+        collection_name: コレクション名
+        batch_size: 1回のスクロールで取得する件数
+        with_vectors: ベクトルも取得するか
+        progress_callback: 進捗コールバック (取得済み件数, 総件数)
+
+    Returns:
+        全ポイントのリスト
+    """
+    total_points = None
+    if progress_callback:
+        total_points = (await client.get_collection(collection_name)).points_count
+
+    all_points: List[models.Record] = []
+    offset = None
+    while True:
+        points, offset = await client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        all_points.extend(points)
+        if progress_callback:
+            progress_callback(len(all_points), total_points)
+        if not points or offset is None:
+            break
+    return all_points
+
+
+async def upsert_points_async(
+    client: AsyncQdrantClient,
+    collection: str,
+    points: List[models.PointStruct],
+    batch_size: int = 128,
+    max_concurrency: int = ASYNC_UPSERT_CONCURRENCY
+) -> int:
+    """
+    ポイントをバッチに分け、最大 max_concurrency バッチを並行してアップサート
+
+    Args:
+        client: AsyncQdrantClient
+        collection: コレクション名
+        points: ポイントリスト
+        batch_size: バッチサイズ
+        max_concurrency: 同時に送信するバッチ数の上限
+
+    Returns:
+        アップサートされたポイント数
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def send(chunk: List[models.PointStruct]) -> int:
+        async with semaphore:
+            await client.upsert(collection_name=collection, points=chunk)
+            return len(chunk)
+
+    counts = await asyncio.gather(*(send(chunk) for chunk in batched(points, batch_size)))
+    notify_collection_changed(collection)
+    return sum(counts)
+
+
+__all__ = [
+    "QDRANT_USE_ASYNC",
+    "QDRANT_PREFER_GRPC",
+    "QDRANT_GRPC_PORT",
+    "QDRANT_HTTP2",
+    "ASYNC_UPSERT_CONCURRENCY",
+    "ASYNC_POOL_SIZE",
+    "resolve_prefer_grpc",
+    "create_async_qdrant_client",
+    "get_event_loop",
+    "run_sync",
+    "get_async_client",
+    "close_async_clients",
+    "get_collection_capabilities_async",
+    "search_collection_async",
+    "search_collections_async",
+    "scroll_points_async",
+    "upsert_points_async",
+]
@@ -11,29 +11,35 @@ Qdrantベクトルデータベースとの操作を一元管理
 - a50_rag_search_local_qdrant.py
 """
 
+import contextvars
 import os
 import logging
 import socket
+import threading
 import time
 import traceback
-from typing import Dict, List, Optional, Any, Tuple, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Any, Tuple, Iterable, Union
 from datetime import datetime, timezone
 
 import pandas as pd
 import tiktoken
-from qdrant_client import QdrantClient
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.exceptions import UnexpectedResponse
 
 # Gemini 3 Migration: Embedding抽象化レイヤー
 from helper_embedding import (
-    create_embedding_client,
     get_embedding_dimensions,
-    EmbeddingClient,
     DEFAULT_GEMINI_EMBEDDING_DIMS,
     DEFAULT_OPENAI_EMBEDDING_DIMS,
 )
+from helper_client_registry import get_embedding_client
 from helper_embedding_sparse import get_sparse_embedding_client
+from helper_search_cache import TTLCache, add_collection_change_listener, normalize_query, notify_collection_changed
+from helper_tracing import span
+from qdrant_ingest_pipeline import qa_point_ids
 
 # 共通モジュール
 try:
@@ -342,6 +348,7 @@ def delete_all_collections(client: QdrantClient, excluded: List[str] = None) ->
     for col in to_delete:
         try:
             client.delete_collection(collection_name=col["name"])
+            notify_collection_changed(col["name"])
             deleted_count += 1
         except Exception as e:
             logger.error(f"コレクション削除エラー {col['name']}: {e}")
@@ -402,6 +409,8 @@ def create_or_recreate_collection(
                 sparse_vectors_config=sparse_vectors_config
             )
 
+    notify_collection_changed(name)
+
     # ペイロード索引を作成
     try:
         client.create_payload_index(
@@ -546,7 +555,8 @@ def embed_texts_unified(
         vectors = embed_texts_unified(texts, provider="openai")
     """
     provider = provider or DEFAULT_EMBEDDING_PROVIDER
-    embedding_client = create_embedding_client(provider=provider)
+    # 共有クライアント + 永続キャッシュ経由（登録済みテキストの再Embeddingを回避）
+    embedding_client = get_embedding_client(provider, cached=True)
 
     # 空文字列・空白のみの文字列を除外して処理
     valid_texts = []
@@ -599,7 +609,8 @@ def embed_query_unified(
         vector = embed_query_unified("検索クエリ", provider="gemini")
     """
     provider = provider or DEFAULT_EMBEDDING_PROVIDER
-    embedding_client = create_embedding_client(provider=provider)
+    # 共有クライアントを使用（クエリごとのクライアント生成を回避）
+    embedding_client = get_embedding_client(provider)
     return embedding_client.embed_text(text)
 
 
@@ -734,7 +745,8 @@ def build_points(
     df: pd.DataFrame,
     vectors: List[List[float]],
     domain: str,
-    source_file: str
+    source_file: str,
+    include_answer: bool = False
 ) -> List[models.PointStruct]:
     """
     Qdrantポイントを構築
@@ -744,6 +756,7 @@ def build_points(
         vectors: 埋め込みベクトル
         domain: ドメイン名
         source_file: ソースファイル名
+        include_answer: Embedding入力に回答を含めたか（ポイントIDに含める）
 
     Returns:
         PointStructのリスト
@@ -754,6 +767,7 @@ def build_points(
 
     now_iso = datetime.now(timezone.utc).isoformat()
     points: List[models.PointStruct] = []
+    ids = qa_point_ids(df, domain, source_file, include_answer=include_answer)
 
     for i, row in enumerate(df.itertuples(index=False)):
         payload = {
@@ -765,14 +779,13 @@ def build_points(
             "schema": "qa:v1",
         }
 
-        pid = abs(hash(f"{domain}-{source_file}-{i}")) & 0x7FFFFFFFFFFFFFFF
-        points.append(models.PointStruct(id=pid, vector=vectors[i], payload=payload))
+        points.append(models.PointStruct(id=ids[i], vector=vectors[i], payload=payload))
 
     return points
 
 
 def upsert_points(
-    client: QdrantClient,
+    client: Union[QdrantClient, AsyncQdrantClient],
     collection: str,
     points: List[models.PointStruct],
     batch_size: int = 128,
@@ -781,7 +794,7 @@ def upsert_points(
     ポイントをQdrantにアップサート
 
     Args:
-        client: Qdrantクライアント
+        client: Qdrantクライアント（AsyncQdrantClient の場合はバッチを並行して送信）
         collection: コレクション名
         points: ポイントリスト
         batch_size: バッチサイズ
@@ -789,10 +802,15 @@ def upsert_points(
     Returns:
         アップサートされたポイント数
     """
+    if isinstance(client, AsyncQdrantClient):
+        from qdrant_client_async import run_sync, upsert_points_async
+        return run_sync(upsert_points_async(client, collection, points, batch_size=batch_size))
+
     count = 0
     for chunk in batched(points, batch_size):
         client.upsert(collection_name=collection, points=chunk)
         count += len(chunk)
+    notify_collection_changed(collection)
     return count
 
 
@@ -992,131 +1010,511 @@ class QdrantDataFetcher:
 # 検索
 # ===================================================================
 
-def search_collection(
+# Hybrid検索の統合方法（いずれも Dense/Sparse を1回の query_batch_points で取得してクライアント側で統合）
+#   rrf      : 順位による RRF（Qdrant の FusionQuery と同じ式・定数）
+#   weighted : Min-Max 正規化したスコアを hybrid_alpha で加重平均
+#   dbsf     : DBSF（平均 ± 3σ で正規化）したスコアを hybrid_alpha で加重平均
+# 統合スコアは順位付け用で尺度が Dense のコサイン類似度と異なるため、各結果には
+# Dense検索のスコアを dense_score として残す（スコア閾値は dense_score に適用する）
+HYBRID_FUSION_METHODS = ("rrf", "weighted", "dbsf")
+DEFAULT_HYBRID_FUSION = os.getenv("QDRANT_HYBRID_FUSION", "rrf")
+# RRF の順位定数（Qdrant の RRF と同じ: 1 / (順位(0始まり) + 2)）
+RRF_RANKING_CONSTANT = 2
+# Hybrid検索で各ベクトルから取得する件数（limit の倍数）
+HYBRID_PREFETCH_FACTOR = 2
+# コレクションのベクトル構成キャッシュの有効期限（秒）
+CAPABILITY_CACHE_TTL = float(os.getenv("QDRANT_CAPABILITY_TTL", "300"))
+
+DEFAULT_DENSE_VECTOR_NAME = "default"
+DEFAULT_SPARSE_VECTOR_NAME = "text-sparse"
+
+
+@dataclass(frozen=True)
+class CollectionCapabilities:
+    """コレクションのベクトル構成（検索時に使うベクトル名）"""
+    dense_name: Optional[str] = None   # None = 名前なしのDenseベクトル
+    sparse_name: Optional[str] = None  # None = Sparseベクトルなし
+
+    @property
+    def hybrid(self) -> bool:
+        return self.sparse_name is not None
+
+
+_capability_cache = TTLCache(maxsize=256, ttl=CAPABILITY_CACHE_TTL)
+
+
+def parse_collection_capabilities(params: Any) -> CollectionCapabilities:
+    """
+    コレクション設定（get_collection(...).config.params）から検索に使うベクトル名を判定
+
+    Args:
+        params: コレクションのパラメータ（vectors, sparse_vectors）
+
+    Returns:
+        CollectionCapabilities
+    """
+    vectors = getattr(params, "vectors", None)
+    dense_name = None
+    if isinstance(vectors, dict) and vectors:
+        names = list(vectors)
+        dense_name = DEFAULT_DENSE_VECTOR_NAME if DEFAULT_DENSE_VECTOR_NAME in names else names[0]
+    sparse_vectors = getattr(params, "sparse_vectors", None)
+    sparse_name = None
+    if sparse_vectors:
+        names = list(sparse_vectors)
+        sparse_name = DEFAULT_SPARSE_VECTOR_NAME if DEFAULT_SPARSE_VECTOR_NAME in names else names[0]
+    return CollectionCapabilities(dense_name=dense_name, sparse_name=sparse_name)
+
+
+def get_collection_capabilities(
     client: QdrantClient,
     collection_name: str,
+    refresh: bool = False
+) -> CollectionCapabilities:
+    """
+    コレクションのDense/Sparseベクトル名を取得（CAPABILITY_CACHE_TTL 秒キャッシュ）
+
+    Args:
+        client: Qdrantクライアント
+        collection_name: コレクション名
+        refresh: キャッシュを使わずに取得し直す
+
+    Returns:
+        CollectionCapabilities
+    """
+    if not refresh:
+        cached = cached_collection_capabilities(collection_name)
+        if cached is not None:
+            return cached
+
+    with span("qdrant.get_collection", collection=collection_name):
+        params = client.get_collection(collection_name).config.params
+    return remember_collection_capabilities(collection_name, params)
+
+
+def cached_collection_capabilities(collection_name: str) -> Optional[CollectionCapabilities]:
+    """キャッシュ済みのベクトル構成（なければ None、AsyncQdrantClient の検索と共有）"""
+    return _capability_cache.get(collection_name)
+
+
+def remember_collection_capabilities(collection_name: str, params: Any) -> CollectionCapabilities:
+    """
+    コレクション設定からベクトル構成を判定してキャッシュ
+
+    Args:
+        collection_name: コレクション名
+        params: get_collection(...).config.params
+
+    Returns:
+        CollectionCapabilities
+    """
+    capabilities = parse_collection_capabilities(params)
+    _capability_cache.put(collection_name, capabilities)
+    logger.debug(f"collection capabilities: '{collection_name}' -> {capabilities}")
+    return capabilities
+
+
+def invalidate_collection_capabilities(collection_name: Optional[str] = None) -> None:
+    """
+    ベクトル構成キャッシュを破棄（コレクションの作成・削除後に呼ぶ）
+
+    Args:
+        collection_name: 対象コレクション（None=すべて）
+    """
+    if collection_name is None:
+        _capability_cache.clear()
+    else:
+        _capability_cache.discard(collection_name)
+
+
+# 登録・削除（notify_collection_changed）でベクトル構成キャッシュも破棄する
+add_collection_change_listener(invalidate_collection_capabilities)
+
+
+def hit_to_dict(hit) -> Dict[str, Any]:
+    """検索結果（ScoredPoint）を score, id, payload の辞書に変換"""
+    return {"score": hit.score, "id": hit.id, "payload": hit.payload}
+
+
+def _normalize_minmax(scores: List[float]) -> List[float]:
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    return [(s - low) / (high - low) for s in scores]
+
+
+def _normalize_dbsf(scores: List[float]) -> List[float]:
+    # Qdrant の DBSF と同じく 平均 ± 3σ を [0, 1] に写像し、範囲外は切り詰める
+    mean = sum(scores) / len(scores)
+    std = (sum((s - mean) ** 2 for s in scores) / len(scores)) ** 0.5
+    if std == 0:
+        return [1.0] * len(scores)
+    low, high = mean - 3 * std, mean + 3 * std
+    return [min(max((s - low) / (high - low), 0.0), 1.0) for s in scores]
+
+
+def fuse_hybrid_results(
+    dense_hits: List[Dict[str, Any]],
+    sparse_hits: List[Dict[str, Any]],
+    alpha: float = 0.5,
+    method: str = "weighted",
+    limit: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    Dense/Sparse の検索結果をクライアント側で統合
+
+    weighted / dbsf は各結果のスコアを正規化し、alpha * Dense + (1 - alpha) * Sparse で
+    並べ替えます（片方にしか現れない結果は、もう片方のスコアを 0 とします）。rrf は順位だけを
+    使い、両方の 1 / (順位 + RRF_RANKING_CONSTANT) を足します（alpha は使いません）。
+
+    Args:
+        dense_hits: Dense検索の結果（score, id, payload の辞書）
+        sparse_hits: Sparse検索の結果
+        alpha: Denseの重み（0.0-1.0、1.0でDenseのみ・0.0でSparseのみの順位）
+        method: "rrf"、"weighted"（Min-Max 正規化）または "dbsf"（平均 ± 3σ 正規化）
+        limit: 結果数上限
+
+    Returns:
+        統合後の検索結果（score は統合スコア、dense_score は Dense検索のスコアで
+        Dense検索に現れなかった結果は None）
+    """
+    if method not in HYBRID_FUSION_METHODS:
+        raise ValueError(f"クライアント側で統合できない方法です: {method}")
+
+    def contributions(hits: List[Dict[str, Any]], weight: float) -> List[float]:
+        if method == "rrf":
+            return [1.0 / (rank + RRF_RANKING_CONSTANT) for rank in range(len(hits))]
+        normalize = _normalize_dbsf if method == "dbsf" else _normalize_minmax
+        return [weight * score for score in normalize([h["score"] for h in hits])]
+
+    fused: Dict[Any, Dict[str, Any]] = {}
+    for hits, weight in ((dense_hits, alpha), (sparse_hits, 1.0 - alpha)):
+        if not hits:
+            continue
+        for hit, score in zip(hits, contributions(hits, weight)):
+            entry = fused.setdefault(
+                hit["id"], {"score": 0.0, "id": hit["id"], "payload": hit["payload"], "dense_score": None}
+            )
+            entry["score"] += score
+    for hit in dense_hits:
+        fused[hit["id"]]["dense_score"] = hit["score"]
+
+    return sorted(fused.values(), key=lambda h: h["score"], reverse=True)[:limit]
+
+
+def _dense_search(
+    client: QdrantClient,
+    collection_name: str,
+    query_vector: List[float],
+    capabilities: CollectionCapabilities,
+    limit: int
+) -> List[Any]:
+    try:
+        # 新API (v2.x/1.10+)
+        response = client.query_points(
+            collection_name=collection_name,
+            query=query_vector,
+            using=capabilities.dense_name,
+            limit=limit
+        )
+        return response.points
+    except AttributeError:
+        # 旧API (v1.x) へのフォールバック
+        import warnings
+        query = query_vector if capabilities.dense_name is None else (capabilities.dense_name, query_vector)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            return client.search(
+                collection_name=collection_name,
+                query_vector=query,
+                limit=limit
+            )
+
+
+def resolve_hybrid_fusion(fusion: Optional[str]) -> str:
+    """統合方法を検証（None=DEFAULT_HYBRID_FUSION）"""
+    fusion = (fusion or DEFAULT_HYBRID_FUSION).lower()
+    if fusion not in HYBRID_FUSION_METHODS:
+        raise ValueError(f"未対応の統合方法です: {fusion}（{', '.join(HYBRID_FUSION_METHODS)}）")
+    return fusion
+
+
+def hybrid_batch_requests(
+    query_vector: List[float],
+    sparse_vector: models.SparseVector,
+    capabilities: CollectionCapabilities,
+    limit: int
+) -> List[models.QueryRequest]:
+    """Hybrid検索の query_batch_points のリクエスト（Dense, Sparse の順）"""
+    prefetch_limit = limit * HYBRID_PREFETCH_FACTOR
+    return [
+        models.QueryRequest(
+            query=query_vector, using=capabilities.dense_name,
+            limit=prefetch_limit, with_payload=True,
+        ),
+        models.QueryRequest(
+            query=sparse_vector, using=capabilities.sparse_name,
+            limit=prefetch_limit, with_payload=True,
+        ),
+    ]
+
+
+def _hybrid_search(
+    client: QdrantClient,
+    collection_name: str,
+    query_vector: List[float],
+    sparse_vector: models.SparseVector,
+    capabilities: CollectionCapabilities,
+    limit: int,
+    hybrid_alpha: float,
+    fusion: str
+) -> List[Dict[str, Any]]:
+    # Dense と Sparse を1回の query_batch_points で取得し、クライアント側で統合（dense_score を残すため）
+    dense_response, sparse_response = client.query_batch_points(
+        collection_name=collection_name,
+        requests=hybrid_batch_requests(query_vector, sparse_vector, capabilities, limit),
+    )
+    return fuse_hybrid_results(
+        [hit_to_dict(h) for h in dense_response.points],
+        [hit_to_dict(h) for h in sparse_response.points],
+        alpha=hybrid_alpha,
+        method=fusion,
+        limit=limit,
+    )
+
+
+def search_collection(
+    client: Union[QdrantClient, AsyncQdrantClient],
+    collection_name: str,
     query_vector: List[float],
     sparse_vector: Optional[models.SparseVector] = None,
     limit: int = 5,
-    hybrid_alpha: float = 0.5
+    hybrid_alpha: float = 0.5,
+    fusion: Optional[str] = None,
+    capabilities: Optional[CollectionCapabilities] = None,
+    on_error: Optional[Callable[[Exception], None]] = None
 ) -> List[Dict[str, Any]]:
     """
     コレクションを検索（Dense または Hybrid）
 
+    コレクションのベクトル構成（Denseベクトル名・Sparseベクトルの有無）をキャッシュし、
+    Sparseベクトルのないコレクションには最初から Dense 検索だけを送ります。
+    検索が失敗した場合は構成を取得し直し、Hybrid なら Dense のみで1回だけ再試行します。
+
     Args:
-        client: Qdrantクライアント
+        client: Qdrantクライアント（AsyncQdrantClient の場合は search_collection_async を共有イベントループで実行）
         collection_name: コレクション名
         query_vector: クエリベクトル (Dense)
         sparse_vector: クエリSparseベクトル (Optional) - 指定された場合Hybrid検索
         limit: 結果数上限
-        hybrid_alpha: Hybrid検索時の重み (現状は単純なFusionロジックがないため未使用、将来用)
+        hybrid_alpha: Hybrid検索時のDenseの重み（fusion が weighted / dbsf のとき使用）
+        fusion: Hybrid検索の統合方法（rrf / weighted / dbsf、None=DEFAULT_HYBRID_FUSION）
+        capabilities: 呼び出し側で保持しているベクトル構成（指定時は構成の取得を省略）
+        on_error: 検索が失敗したときに例外を渡して呼ぶ関数（呼び出し側のキャッシュ破棄用）
 
     Returns:
         検索結果のリスト
     """
-    logger.info(f"search_collection: collection='{collection_name}', query_vec_dim={len(query_vector)}, limit={limit}, sparse={sparse_vector is not None}")
-    
+    if isinstance(client, AsyncQdrantClient):
+        # AsyncQdrantClient は共有イベントループで実行（呼び出し元のスレッドは結果を待つだけ）
+        from qdrant_client_async import run_sync, search_collection_async
+        return run_sync(search_collection_async(
+            client, collection_name, query_vector, sparse_vector, limit=limit,
+            hybrid_alpha=hybrid_alpha, fusion=fusion, capabilities=capabilities, on_error=on_error,
+        ))
+
+    fusion = resolve_hybrid_fusion(fusion)
+
+    logger.info(
+        f"search_collection: collection='{collection_name}', query_vec_dim={len(query_vector)}, "
+        f"limit={limit}, sparse={sparse_vector is not None}, fusion={fusion}"
+    )
+
     try:
-        if sparse_vector:
-            # Hybrid Search (Dense + Sparse)
-            # Qdrant 1.10+ の Query API を使用して RRF (Reciprocal Rank Fusion) を行うのが理想的だが
-            # 互換性のため、ここでは単純な Prefetch と Rescore、あるいはそれぞれの結果を取得する方式を検討
-            # 現時点では、Qdrant Client v1.10 の prefetch 機能を想定した実装にする
-            
-            # 注: Qdrantのバージョン依存が強いため、ここでは安全に
-            # search_batch で Dense と Sparse を別々に投げてPython側で統合するか、
-            # 新しい query_points API を使う。
-            
-            # query_points API (v1.10+) が使えると仮定
-            prefetch = [
-                models.Prefetch(
-                    query=query_vector,
-                    using="default", # Dense vector name (default)
-                    limit=limit * 2,
-                ),
-                models.Prefetch(
-                    query=sparse_vector,
-                    using="text-sparse", # Sparse vector name
-                    limit=limit * 2,
-                ),
-            ]
-            
-            response = client.query_points(
-                collection_name=collection_name,
-                prefetch=prefetch,
-                query=models.FusionQuery(
-                    fusion=models.Fusion.RRF, # Corrected parameter name from 'method' to 'fusion'
-                ),
-                limit=limit,
+        if capabilities is None:
+            capabilities = get_collection_capabilities(client, collection_name)
+        if sparse_vector is not None and capabilities.hybrid:
+            results = _hybrid_search(
+                client, collection_name, query_vector, sparse_vector,
+                capabilities, limit, hybrid_alpha, fusion,
             )
-            hits = response.points
-            
         else:
-            # Standard Dense Search
-            try:
-                # 新API (v2.x/1.10+)
-                response = client.query_points(
-                    collection_name=collection_name,
-                    query=query_vector,
-                    limit=limit
-                )
-                hits = response.points
-            except AttributeError:
-                # 旧API (v1.x) へのフォールバック
-                import warnings
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", DeprecationWarning)
-                    hits = client.search(
-                        collection_name=collection_name,
-                        query_vector=query_vector,
-                        limit=limit
-                    )
+            if sparse_vector is not None:
+                logger.info(f"'{collection_name}' にSparseベクトルがないため Dense 検索のみを実行します")
+            results = [hit_to_dict(h) for h in _dense_search(
+                client, collection_name, query_vector, capabilities, limit
+            )]
 
     except Exception as e:
         logger.error(f"Search failed: {e}")
-        # フォールバック: Denseのみで再試行
-        if sparse_vector:
-            logger.info("Falling back to dense-only search due to error.")
-            # 再帰呼び出しではなく、直接Dense検索を実行して無限ループや再帰エラーを防ぐ
-            # また、"Vector with name default is not configured" エラーへの対策として
-            # 名前付きベクトル ("default") を指定しないシンプルな検索を行う
-            try:
-                # v1.10+ / v1.16+ client: search() is removed/deprecated in favor of query_points
-                # For single vector (unnamed), pass the list[float] directly to query
-                response = client.query_points(
-                    collection_name=collection_name,
-                    query=query_vector,
-                    limit=limit
+        # コレクションが作り直された可能性があるため、構成を取得し直して Dense のみで再試行
+        invalidate_collection_capabilities(collection_name)
+        if on_error is not None:
+            on_error(e)
+        if sparse_vector is None:
+            return []
+        logger.info("Falling back to dense-only search due to error.")
+        try:
+            capabilities = get_collection_capabilities(client, collection_name, refresh=True)
+            results = [hit_to_dict(h) for h in _dense_search(
+                client, collection_name, query_vector, capabilities, limit
+            )]
+            logger.info(f"search_collection (fallback): found {len(results)} hits")
+            return results
+        except Exception as fallback_e:
+            logger.error(f"Fallback search also failed: {fallback_e}")
+            return []
+
+    logger.info(f"search_collection: found {len(results)} hits")
+    return results
+
+
+# 複数コレクション検索（search_collections）の並列数
+MULTI_SEARCH_WORKERS = int(os.getenv("QDRANT_MULTI_SEARCH_WORKERS", "8"))
+# コレクションごとのスコア正規化方法
+MULTI_SEARCH_NORMALIZATIONS = ("minmax", "dbsf")
+
+_fanout_executor: Optional[ThreadPoolExecutor] = None
+_fanout_executor_lock = threading.Lock()
+
+
+def _get_fanout_executor() -> ThreadPoolExecutor:
+    global _fanout_executor
+    if _fanout_executor is None:
+        with _fanout_executor_lock:
+            if _fanout_executor is None:
+                _fanout_executor = ThreadPoolExecutor(
+                    max_workers=MULTI_SEARCH_WORKERS, thread_name_prefix="qdrant-fanout"
                 )
-                hits = response.points
-                
-                # PointStruct -> Dict 変換 (下流の処理と合わせる)
-                results = []
-                for h in hits:
-                    results.append({
-                        "score": h.score,
-                        "id": h.id,
-                        "payload": h.payload
-                    })
-                logger.info(f"search_collection (fallback): found {len(results)} hits")
-                return results
-                
-            except Exception as fallback_e:
-                 logger.error(f"Fallback search also failed: {fallback_e}")
-                 return []
-        return []
-
-    logger.info(f"search_collection: found {len(hits)} hits")
-    
-    results = []
-    for h in hits:
-        results.append({
-            "score": h.score,
-            "id": h.id,
-            "payload": h.payload
-        })
+    return _fanout_executor
 
-    return results
+
+def _result_dedup_key(hit: Dict[str, Any]) -> Tuple:
+    payload = hit.get("payload") or {}
+    question, answer = payload.get("question"), payload.get("answer")
+    if question is None and answer is None:
+        return ("id", hit.get("collection"), hit.get("id"))
+    return ("qa", normalize_query(str(question or "")), normalize_query(str(answer or "")))
+
+
+def merge_collection_results(
+    results_by_collection: Dict[str, List[Dict[str, Any]]],
+    limit: int = 5,
+    normalize: str = "minmax",
+    score_filter: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> List[Dict[str, Any]]:
+    """
+    コレクションごとの検索結果を、コレクション内で正規化したスコアで1つの順位に統合
+
+    コレクションによってEmbeddingモデルや統合方法（RRF など）が違いスコアの尺度が揃わないため、
+    コレクションごとに正規化したスコア（normalized_score）で並べます。同じQ/A（正規化した
+    question + answer が一致）は最上位の1件だけを残し、他のコレクションは also_in に記録します。
+
+    Args:
+        results_by_collection: コレクション名 → 検索結果（score, id, payload の辞書）
+        limit: 結果数上限
+        normalize: "minmax" または "dbsf"
+        score_filter: 元のスコアで結果を採用するか判定する関数（正規化後、上限で切る前に適用）
+
+    Returns:
+        統合後の検索結果（collection, normalized_score, also_in を追加、score は元のスコア）
+    """
+    if normalize not in MULTI_SEARCH_NORMALIZATIONS:
+        raise ValueError(f"未対応の正規化方法です: {normalize}（{', '.join(MULTI_SEARCH_NORMALIZATIONS)}）")
+    normalize_fn = _normalize_dbsf if normalize == "dbsf" else _normalize_minmax
+
+    candidates: List[Dict[str, Any]] = []
+    for name, hits in results_by_collection.items():
+        if not hits:
+            continue
+        for hit, normalized in zip(hits, normalize_fn([h["score"] for h in hits])):
+            if score_filter is not None and not score_filter(hit):
+                continue
+            candidates.append(dict(hit, collection=name, normalized_score=normalized, also_in=[]))
+    candidates.sort(key=lambda h: (h["normalized_score"], h["score"]), reverse=True)
+
+    merged: Dict[Tuple, Dict[str, Any]] = {}
+    for hit in candidates:
+        key = _result_dedup_key(hit)
+        if key in merged:
+            if hit["collection"] != merged[key]["collection"] and hit["collection"] not in merged[key]["also_in"]:
+                merged[key]["also_in"].append(hit["collection"])
+            continue
+        merged[key] = hit
+    return list(merged.values())[:limit]
+
+
+def search_collections(
+    client: Union[QdrantClient, AsyncQdrantClient],
+    collection_names: List[str],
+    query_vector: List[float],
+    sparse_vector: Optional[models.SparseVector] = None,
+    limit: int = 5,
+    hybrid_alpha: float = 0.5,
+    fusion: Optional[str] = None,
+    capabilities: Optional[Dict[str, CollectionCapabilities]] = None,
+    on_error: Optional[Callable[[str, Exception], None]] = None,
+    normalize: str = "minmax",
+    score_filter: Optional[Callable[[Dict[str, Any]], bool]] = None
+) -> List[Dict[str, Any]]:
+    """
+    複数のコレクションを並列に検索し、統合した上位 limit 件を返す
+
+    クエリベクトルは呼び出し側で1回だけ生成し、各コレクションの search_collection を
+    スレッドプール（MULTI_SEARCH_WORKERS）で同時に実行します。正規化の母数を確保するため
+    各コレクションからは limit * HYBRID_PREFETCH_FACTOR 件を取得します。
+
+    Args:
+        client: Qdrantクライアント（AsyncQdrantClient の場合はスレッドプールを使わず asyncio.gather で並行実行）
+        collection_names: コレクション名のリスト
+        query_vector: クエリベクトル (Dense)
+        sparse_vector: クエリSparseベクトル (Optional)
+        limit: 統合後の結果数上限
+        hybrid_alpha: Hybrid検索時のDenseの重み
+        fusion: Hybrid検索の統合方法
+        capabilities: コレクション名 → ベクトル構成（指定されたコレクションは構成の取得を省略）
+        on_error: 検索が失敗したときに (コレクション名, 例外) で呼ぶ関数
+        normalize: コレクションごとのスコア正規化方法（minmax / dbsf）
+        score_filter: 上限で切る前に結果を絞り込む関数（merge_collection_results を参照）
+
+    Returns:
+        統合後の検索結果（merge_collection_results を参照）
+    """
+    if isinstance(client, AsyncQdrantClient):
+        from qdrant_client_async import run_sync, search_collections_async
+        return run_sync(search_collections_async(
+            client, collection_names, query_vector, sparse_vector, limit=limit, hybrid_alpha=hybrid_alpha,
+            fusion=fusion, capabilities=capabilities, on_error=on_error, normalize=normalize,
+            score_filter=score_filter,
+        ))
+
+    capabilities = capabilities or {}
+    fetch_limit = limit * HYBRID_PREFETCH_FACTOR
+
+    def search_one(name: str) -> List[Dict[str, Any]]:
+        with span("qdrant.query.collection", collection=name):
+            return search_collection(
+                client, name, query_vector, sparse_vector,
+                limit=fetch_limit, hybrid_alpha=hybrid_alpha, fusion=fusion,
+                capabilities=capabilities.get(name),
+                on_error=(lambda e, name=name: on_error(name, e)) if on_error else None,
+            )
+
+    executor = _get_fanout_executor()
+    # トレースのスパンをワーカースレッドでも親につなげるため、呼び出し元のコンテキストで実行
+    futures = {
+        name: executor.submit(contextvars.copy_context().run, search_one, name)
+        for name in dict.fromkeys(collection_names)
+    }
+    results_by_collection = {name: future.result() for name, future in futures.items()}
+    merged = merge_collection_results(
+        results_by_collection, limit=limit, normalize=normalize, score_filter=score_filter
+    )
+    logger.info(
+        f"search_collections: {len(futures)} collections, "
+        f"{sum(len(r) for r in results_by_collection.values())} hits -> {len(merged)} merged"
+    )
+    return merged
 
 
 # ===================================================================
@@ -1183,7 +1581,22 @@ __all__ = [
     "QdrantDataFetcher",
 
     # 検索
+    "HYBRID_FUSION_METHODS",
+    "DEFAULT_HYBRID_FUSION",
+    "CollectionCapabilities",
+    "parse_collection_capabilities",
+    "get_collection_capabilities",
+    "cached_collection_capabilities",
+    "remember_collection_capabilities",
+    "invalidate_collection_capabilities",
+    "hit_to_dict",
+    "resolve_hybrid_fusion",
+    "hybrid_batch_requests",
+    "fuse_hybrid_results",
     "search_collection",
+    "MULTI_SEARCH_NORMALIZATIONS",
+    "merge_collection_results",
+    "search_collections",
 
     # 後方互換性エイリアス
     "embed_texts_for_qdrant",
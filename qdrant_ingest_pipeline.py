@@ -0,0 +1,481 @@
+"""
+Qdrant登録のストリーミングパイプライン（読み込み → Embedding → ポイント構築 → アップサート）
+
+データをバッチ単位で流し、同時に保持するバッチ数と送信中のアップサート数を上限で抑えます。
+run_delta_ingest は既存のポイントIDと比較して、新規・変更行の登録と消えた行の削除だけを行います。
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+import pandas as pd
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from helper_search_cache import notify_collection_changed
+
+# Qdrant のポイントID（UUID文字列 または 整数）
+PointId = Union[int, str]
+
+logger = logging.getLogger(__name__)
+
+
+# CSV列名の正規化（load_csv と同じマッピング）
+CSV_COLUMN_MAPPINGS: Dict[str, str] = {
+    "Question": "question",
+    "Response": "answer",
+    "Answer": "answer",
+    "correct_answer": "answer",
+}
+
+# ポイントID（UUIDv5）の名前空間（変更すると既存コレクションのIDと一致しなくなる）
+POINT_ID_NAMESPACE = uuid.UUID("6f1c3e2a-8b4d-5a7e-9c0f-2d3b4a5c6e7f")
+
+
+# ===================================================================
+# ポイントID
+# ===================================================================
+
+def make_point_id(*parts: Any) -> str:
+    """
+    内容から決まるポイントID（UUIDv5）を生成
+
+    hash() はプロセスごとにソルトが変わるため、再実行で同じIDにならない。
+    UUIDv5 は同じ入力なら常に同じIDになり、衝突も実用上起きない。
+
+    Args:
+        *parts: IDの元になる値（ドメイン・ソース名・質問・回答など）
+
+    Returns:
+        UUID文字列
+    """
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, "\x1f".join(str(p) for p in parts)))
+
+
+def content_point_ids(df: pd.DataFrame, columns: Sequence[str], scope: Sequence[Any] = ()) -> List[str]:
+    """
+    DataFrameの各行のポイントIDを生成
+
+    Args:
+        df: DataFrame
+        columns: IDに含める列（例: question, answer）
+        scope: 全行に共通の値（例: ドメイン, ソースファイル名）
+
+    Returns:
+        行順のID一覧
+    """
+    return [
+        make_point_id(*scope, *values)
+        for values in df[list(columns)].itertuples(index=False, name=None)
+    ]
+
+
+def qa_point_ids(
+    df: pd.DataFrame,
+    domain: str,
+    source_file: str,
+    include_answer: bool = False,
+    data_type: str = "qa"
+) -> List[str]:
+    """
+    登録ポイントのID（CLI・サービス・ラッパーのすべての登録経路で共通の規則）
+
+    キー: ドメイン / ソースファイル名 / Embedding入力の種類 / 内容
+        - Embedding入力の種類: "q"（質問のみ）・"qa"（質問 + 回答）・"raw"（生テキスト）。
+          入力が変わるとベクトルも変わるため、include_answer を切り替えた差分登録では全件を登録し直す
+        - 内容: question, answer（data_type="raw" は text）
+        - generation_method はソースファイル名（a02_* / a03_* など）で区別されるため含めない
+
+    Args:
+        df: DataFrame
+        domain: ドメイン名
+        source_file: ソースファイルのパス（ファイル名のみ使用）
+        include_answer: Embedding入力に回答を含めるか
+        data_type: "qa" または "raw"
+
+    Returns:
+        行順のID一覧
+    """
+    if data_type == "raw":
+        return content_point_ids(df, ("text",), (domain, os.path.basename(source_file), "raw"))
+    variant = "qa" if include_answer else "q"
+    return content_point_ids(df, ("question", "answer"), (domain, os.path.basename(source_file), variant))
+
+
+# ===================================================================
+# 入力
+# ===================================================================
+
+def iter_csv_batches(
+    path: str,
+    batch_size: int = 256,
+    required: Sequence[str] = ("question", "answer"),
+    limit: int = 0
+) -> Iterator[pd.DataFrame]:
+    """
+    CSVをバッチ単位で読み込むジェネレータ
+
+    load_csv と同じ列名マッピング・欠損値補完・重複除去を行い、
+    インデックスは重複除去後の通し番号（全件読み込み時と同じ値）になる。
+
+    Args:
+        path: CSVパス
+        batch_size: 1バッチの行数
+        required: 必須列
+        limit: 最大行数（0=全件）
+
+    Yields:
+        DataFrame（インデックスは通し番号）
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"CSV not found: {path}")
+
+    seen: set = set()
+    next_index = 0
+    for raw in pd.read_csv(path, chunksize=batch_size):
+        df = raw.rename(columns=CSV_COLUMN_MAPPINGS)
+        for col in required:
+            if col not in df.columns:
+                raise ValueError(f"{path} には '{col}' 列が必要です（列: {list(df.columns)}）")
+        df = df.fillna("")
+
+        # ファイル全体での重複除去（行全体ではなくハッシュのみ保持）
+        keys = [
+            hashlib.blake2b("\x1f".join(str(v) for v in values).encode("utf-8"), digest_size=8).digest()
+            for values in df[list(required)].itertuples(index=False, name=None)
+        ]
+        keep = []
+        for key in keys:
+            if key in seen:
+                keep.append(False)
+            else:
+                seen.add(key)
+                keep.append(True)
+        df = df[keep]
+
+        if limit and limit > 0:
+            df = df.head(limit - next_index)
+        if df.empty:
+            if limit and next_index >= limit:
+                return
+            continue
+
+        df.index = range(next_index, next_index + len(df))
+        next_index += len(df)
+        yield df
+
+        if limit and next_index >= limit:
+            return
+
+
+def iter_dataframe_batches(df: pd.DataFrame, batch_size: int = 256) -> Iterator[pd.DataFrame]:
+    """読み込み済みDataFrameをバッチに分割（インデックスは通し番号）"""
+    df = df.reset_index(drop=True)
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start:start + batch_size]
+
+
+# ===================================================================
+# メトリクス
+# ===================================================================
+
+@dataclass
+class IngestStats:
+    """ステージ別の処理時間と件数"""
+    rows: int = 0
+    batches: int = 0
+    points: int = 0
+    read_seconds: float = 0.0
+    dense_seconds: float = 0.0
+    sparse_seconds: float = 0.0
+    build_seconds: float = 0.0
+    upsert_seconds: float = 0.0
+    backpressure_seconds: float = 0.0
+    elapsed: float = 0.0
+    max_pending_upserts: int = 0
+    skipped: int = 0
+    deleted: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, name: str, seconds: float) -> None:
+        """ステージ時間を加算（スレッドセーフ）"""
+        with self._lock:
+            setattr(self, name, getattr(self, name) + seconds)
+
+    @property
+    def throughput(self) -> float:
+        """全体スループット（行/秒）"""
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def stage_throughput(self) -> Dict[str, float]:
+        """ステージ別スループット（行/秒、ステージ単体の処理時間基準）"""
+        result = {}
+        for stage in ("read", "dense", "sparse", "build", "upsert"):
+            seconds = getattr(self, f"{stage}_seconds")
+            if seconds > 0:
+                result[stage] = self.rows / seconds
+        return result
+
+    def summary(self) -> str:
+        stages = ", ".join(f"{k}={v:.1f}/s" for k, v in self.stage_throughput().items())
+        return (
+            f"rows={self.rows:,}, points={self.points:,}, skipped={self.skipped:,}, deleted={self.deleted:,}, "
+            f"batches={self.batches}, "
+            f"elapsed={self.elapsed:.1f}s ({self.throughput:.1f} rows/s), stages[{stages}], "
+            f"backpressure={self.backpressure_seconds:.1f}s, max_pending_upserts={self.max_pending_upserts}"
+        )
+
+
+# ===================================================================
+# パイプライン
+# ===================================================================
+
+def _timed(stats: IngestStats, name: str, fn: Callable, *args) -> Any:
+    start = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        stats.add(name, time.perf_counter() - start)
+
+
+def run_ingest_pipeline(
+    client: QdrantClient,
+    collection: str,
+    batches: Iterable[pd.DataFrame],
+    text_fn: Callable[[pd.DataFrame], List[str]],
+    embed_dense: Callable[[List[str]], Any],
+    build_points: Callable[[pd.DataFrame, Any, Optional[List[models.SparseVector]], int], List[models.PointStruct]],
+    embed_sparse: Optional[Callable[[List[str]], List[models.SparseVector]]] = None,
+    upsert_batch_size: int = 128,
+    max_pending_upserts: int = 4,
+    prefetch_batches: int = 1,
+    progress_callback: Optional[Callable[[IngestStats], None]] = None
+) -> IngestStats:
+    """
+    バッチ単位で Embedding → ポイント構築 → アップサート を流す
+
+    同時に保持するバッチ数は (prefetch_batches + 1) + max_pending_upserts 程度に抑えられる。
+
+    Args:
+        client: Qdrantクライアント
+        collection: コレクション名
+        batches: DataFrameのイテラブル（iter_csv_batches など、インデックスは通し番号）
+        text_fn: DataFrameからEmbedding入力テキストを作る関数
+        embed_dense: Denseベクトル生成関数（build_points にそのまま渡す）
+        build_points: (df, dense, sparse, 先頭インデックス) → PointStructのリスト
+        embed_sparse: Sparseベクトル生成関数（Noneの場合はDenseのみ）
+        upsert_batch_size: 1回のupsertに含めるポイント数
+        max_pending_upserts: 送信中のupsertの上限（超えると完了を待つ）
+        prefetch_batches: 先読みしてEmbeddingを開始しておくバッチ数
+        progress_callback: バッチ完了ごとに呼ばれるコールバック
+
+    Returns:
+        IngestStats
+    """
+    stats = IngestStats()
+    start_time = time.perf_counter()
+    embed_workers = 2 if embed_sparse else 1
+
+    embed_pool = ThreadPoolExecutor(max_workers=embed_workers * (prefetch_batches + 1), thread_name_prefix="ingest-embed")
+    upsert_pool = ThreadPoolExecutor(max_workers=max(1, max_pending_upserts), thread_name_prefix="ingest-upsert")
+    pending_upserts: Deque[Future] = deque()
+
+    def submit_embedding(df: pd.DataFrame) -> Tuple[pd.DataFrame, Future, Optional[Future]]:
+        texts = text_fn(df)
+        dense_future = embed_pool.submit(_timed, stats, "dense_seconds", embed_dense, texts)
+        sparse_future = (
+            embed_pool.submit(_timed, stats, "sparse_seconds", embed_sparse, texts)
+            if embed_sparse else None
+        )
+        return df, dense_future, sparse_future
+
+    def upsert(points: List[models.PointStruct]) -> None:
+        # wait=False の書き込みは後続の wait=True で反映済みになる保証がないため、各リクエストで反映を待つ
+        # （並列度は upsert_pool のワーカー数で確保する）
+        client.upsert(collection_name=collection, points=points, wait=True)
+
+    def submit_upsert(points: List[models.PointStruct]) -> None:
+        # バックプレッシャー: 送信中が上限なら最も古いものの完了を待つ
+        while len(pending_upserts) >= max_pending_upserts:
+            wait_start = time.perf_counter()
+            pending_upserts.popleft().result()
+            stats.add("backpressure_seconds", time.perf_counter() - wait_start)
+        pending_upserts.append(upsert_pool.submit(_timed, stats, "upsert_seconds", upsert, points))
+        stats.max_pending_upserts = max(stats.max_pending_upserts, len(pending_upserts))
+
+    try:
+        in_embedding: Deque[Tuple[pd.DataFrame, Future, Optional[Future]]] = deque()
+        batch_iter = iter(batches)
+        exhausted = False
+
+        while True:
+            # 先読み: 現在のバッチに加えて prefetch_batches 個のEmbeddingを開始しておく
+            while not exhausted and len(in_embedding) <= prefetch_batches:
+                read_start = time.perf_counter()
+                df = next(batch_iter, None)
+                stats.add("read_seconds", time.perf_counter() - read_start)
+                if df is None:
+                    exhausted = True
+                elif not df.empty:
+                    in_embedding.append(submit_embedding(df))
+
+            if not in_embedding:
+                break
+
+            df, dense_future, sparse_future = in_embedding.popleft()
+            dense = dense_future.result()
+            sparse = sparse_future.result() if sparse_future is not None else None
+
+            points = _timed(stats, "build_seconds", build_points, df, dense, sparse, int(df.index[0]))
+            del dense, sparse
+
+            for i in range(0, len(points), upsert_batch_size):
+                submit_upsert(points[i:i + upsert_batch_size])
+
+            stats.rows += len(df)
+            stats.points += len(points)
+            stats.batches += 1
+            stats.elapsed = time.perf_counter() - start_time
+            logger.info(f"[Ingest] {collection}: {stats.rows:,}行 登録送信済み ({stats.throughput:.1f}行/秒)")
+            if progress_callback:
+                progress_callback(stats)
+
+        # バリア: 送信済みupsert（すべて wait=True）の完了を待つ。以降の削除・キャッシュ更新は反映後の状態に対して行う
+        while pending_upserts:
+            pending_upserts.popleft().result()
+        if stats.points:
+            notify_collection_changed(collection)
+    finally:
+        for future in pending_upserts:
+            future.cancel()
+        embed_pool.shutdown(wait=True, cancel_futures=True)
+        upsert_pool.shutdown(wait=True, cancel_futures=True)
+
+    stats.elapsed = time.perf_counter() - start_time
+    logger.info(f"[Ingest] 完了 {collection}: {stats.summary()}")
+    return stats
+
+
+# ===================================================================
+# 差分登録
+# ===================================================================
+
+def fetch_point_ids(
+    client: QdrantClient,
+    collection: str,
+    source: Optional[str] = None,
+    page_size: int = 10000
+) -> Set[PointId]:
+    """
+    コレクション内のポイントIDを取得（ペイロード・ベクトルは取得しない）
+
+    Args:
+        client: Qdrantクライアント
+        collection: コレクション名
+        source: 指定時はペイロードの source が一致するポイントのみ
+        page_size: scroll 1回あたりの件数
+
+    Returns:
+        IDの集合（Qdrant が返す型のまま: UUID は str、旧形式は int）
+    """
+    scroll_filter = None
+    if source:
+        scroll_filter = models.Filter(
+            must=[models.FieldCondition(key="source", match=models.MatchValue(value=source))]
+        )
+
+    ids: Set[PointId] = set()
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            scroll_filter=scroll_filter,
+            limit=page_size,
+            offset=offset,
+            with_payload=False,
+            with_vectors=False,
+        )
+        # 削除時にそのまま PointIdsList に渡すため、整数IDを文字列にしない
+        ids.update(p.id for p in points)
+        if offset is None:
+            break
+    return ids
+
+
+def run_delta_ingest(
+    client: QdrantClient,
+    collection: str,
+    batches: Iterable[pd.DataFrame],
+    id_fn: Callable[[pd.DataFrame], List[str]],
+    source: Optional[str] = None,
+    delete_removed: bool = True,
+    delete_batch_size: int = 1000,
+    truncated: bool = False,
+    **pipeline_kwargs
+) -> IngestStats:
+    """
+    差分登録: 既存IDにない行のみEmbedding・アップサートし、入力から消えた行を削除
+
+    IDは内容から決まるため、内容が変わった行は「新規ID + 旧IDの削除」として反映される。
+    旧形式（hash()由来の整数ID）のポイントは一致しないため、初回の差分登録で置き換わる。
+
+    Args:
+        client: Qdrantクライアント
+        collection: コレクション名（作成済みであること）
+        batches: DataFrameのイテラブル
+        id_fn: DataFrame → 行順のポイントID（build_points と同じ規則）
+        source: 差分の対象とするソース名（ペイロードの source）。Noneはコレクション全体
+        delete_removed: 入力にないポイントを削除するか
+        delete_batch_size: 1回の削除リクエストのID数
+        truncated: 入力が件数上限（limit）で切り詰められているか。True の場合は上限以降の行が
+            「消えた行」に見えるため削除を行わない
+        **pipeline_kwargs: run_ingest_pipeline に渡す引数
+
+    Returns:
+        IngestStats（skipped: 既存のためスキップした行数、deleted: 削除したポイント数）
+    """
+    existing = fetch_point_ids(client, collection, source=source)
+    logger.info(f"[Delta] {collection}: 既存 {len(existing):,} ポイント (source={source})")
+
+    seen: Set[PointId] = set()
+    skipped = 0
+
+    def new_rows() -> Iterator[pd.DataFrame]:
+        nonlocal skipped
+        for df in batches:
+            ids = id_fn(df)
+            seen.update(ids)
+            mask = [pid not in existing for pid in ids]
+            skipped += len(ids) - sum(mask)
+            yield df[mask]
+
+    stats = run_ingest_pipeline(client, collection, new_rows(), **pipeline_kwargs)
+    stats.skipped = skipped
+
+    removed = list(existing - seen)
+    if removed and truncated:
+        logger.warning(
+            f"[Delta] {collection}: 入力が件数上限で切り詰められているため、{len(removed):,} ポイントの削除を行いません"
+        )
+    elif delete_removed and removed:
+        for i in range(0, len(removed), delete_batch_size):
+            client.delete(
+                collection_name=collection,
+                points_selector=models.PointIdsList(points=removed[i:i + delete_batch_size]),
+                wait=True,
+            )
+        stats.deleted = len(removed)
+        notify_collection_changed(collection)
+
+    logger.info(
+        f"[Delta] {collection}: 追加/更新 {stats.points:,}, スキップ {stats.skipped:,}, 削除 {stats.deleted:,}"
+    )
+    return stats
@@ -2,9 +2,13 @@
 # MeCab複合名詞版と正規表現版を統合したロバストなキーワード抽出システム
 
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Union
 from collections import Counter
 
+from helper_mecab import is_mecab_available
+from helper_text_analysis import AnalyzedDocument, analyze_text
+from helper_keyword_scoring import CharType, keyword_char_type
+
 
 class KeywordExtractor:
     """
@@ -44,15 +48,8 @@ class KeywordExtractor:
             print("⚠️ MeCabが利用できません（正規表現モード）")
 
     def _check_mecab_availability(self) -> bool:
-        """MeCabの利用可能性をチェック"""
-        try:
-            import MeCab
-            # 実際にインスタンス化して動作確認
-            tagger = MeCab.Tagger()
-            tagger.parse("テスト")
-            return True
-        except (ImportError, RuntimeError):
-            return False
+        """MeCabの利用可能性をチェック（共有トークナイザーでプロセス内1回のみ確認）"""
+        return is_mecab_available()
 
     def extract(self, text: str, top_n: int = 5,
                 use_scoring: bool = True) -> List[str]:
@@ -81,36 +78,8 @@ class KeywordExtractor:
     def _extract_with_mecab(self, text: str, top_n: int,
                            use_scoring: bool) -> List[str]:
         """MeCabを使用した複合名詞抽出"""
-        import MeCab
-
-        tagger = MeCab.Tagger()
-        node = tagger.parseToNode(text)
-
-        # 複合名詞の抽出
-        compound_buffer = []
-        compound_nouns = []
-
-        while node:
-            features = node.feature.split(',')
-            pos = features[0]  # 品詞
-
-            if pos == '名詞':
-                compound_buffer.append(node.surface)
-            else:
-                # 名詞以外が来たらバッファをフラッシュ
-                if compound_buffer:
-                    compound_noun = ''.join(compound_buffer)
-                    if len(compound_noun) > 0:
-                        compound_nouns.append(compound_noun)
-                    compound_buffer = []
-
-            node = node.next
-
-        # 最後のバッファをフラッシュ
-        if compound_buffer:
-            compound_noun = ''.join(compound_buffer)
-            if len(compound_noun) > 0:
-                compound_nouns.append(compound_noun)
+        # 複合名詞の抽出（チャンクの解析結果を共有）
+        compound_nouns = analyze_text(text).compound_nouns
 
         # フィルタリングとスコアリング
         if use_scoring:
@@ -121,9 +90,8 @@ class KeywordExtractor:
     def _extract_with_regex(self, text: str, top_n: int,
                            use_scoring: bool) -> List[str]:
         """正規表現を使用したキーワード抽出"""
-        # カタカナ語、漢字複合語、英数字を抽出
-        pattern = r'[ァ-ヴー]{2,}|[一-龥]{2,}|[A-Za-z]{2,}[A-Za-z0-9]*'
-        words = re.findall(pattern, text)
+        # カタカナ語、漢字複合語、英数字を抽出（チャンクの解析結果を共有）
+        words = analyze_text(text).regex_terms
 
         # フィルタリングとスコアリング
         if use_scoring:
@@ -166,15 +134,16 @@ class KeywordExtractor:
             if word in self.important_keywords:
                 score += 0.5
 
-            # 4. 文字種スコア
+            # 4. 文字種スコア（事前コンパイル済みの判定）
+            char_type = keyword_char_type(word)
             # カタカナ3文字以上
-            if re.match(r'^[ァ-ヴー]{3,}$', word):
+            if char_type & CharType.KATAKANA:
                 score += 0.2
             # 英大文字2文字以上
-            elif re.match(r'^[A-Z]{2,}$', word):
+            elif char_type & CharType.UPPER:
                 score += 0.3
             # 漢字4文字以上
-            elif re.match(r'^[一-龥]{4,}$', word):
+            elif char_type & CharType.KANJI:
                 score += 0.2
 
             word_scores[word] = score
@@ -184,29 +153,36 @@ class KeywordExtractor:
 
         return [word for word, score in ranked[:top_n]]
 
-    def extract_with_details(self, text: str, top_n: int = 10) -> Dict[str, List[Tuple[str, float]]]:
+    def extract_with_details(self, text: Union[str, AnalyzedDocument],
+                             top_n: int = 10) -> Dict[str, List[Tuple[str, float]]]:
         """
         詳細情報付きでキーワードを抽出（比較分析用）
 
+        Args:
+            text: 分析対象テキスト（AnalyzedDocument の場合はその解析結果を使う）
+            top_n: 抽出するキーワード数
+
         Returns:
             各手法での抽出結果と詳細スコア
         """
         results = {}
+        # 3手法で同じ解析結果を使う（メモされない長いテキストでも解析・出現回数の計測は1回）
+        doc = analyze_text(text)
 
         # MeCab複合名詞版
         if self.mecab_available:
             try:
-                mecab_keywords = self._extract_with_mecab_scored(text, top_n)
+                mecab_keywords = self._extract_with_mecab_scored(doc, top_n)
                 results['MeCab複合名詞'] = mecab_keywords
             except Exception as e:
                 results['MeCab複合名詞'] = [(f"エラー: {e}", 0.0)]
 
         # 正規表現版
-        regex_keywords = self._extract_with_regex_scored(text, top_n)
+        regex_keywords = self._extract_with_regex_scored(doc, top_n)
         results['正規表現'] = regex_keywords
 
         # 統合版（デフォルト動作）
-        integrated_keywords = self._extract_integrated(text, top_n)
+        integrated_keywords = self._extract_integrated(doc, top_n)
         results['統合版'] = integrated_keywords
 
         return results
@@ -214,19 +190,23 @@ class KeywordExtractor:
     def _extract_with_mecab_scored(self, text: str, top_n: int) -> List[Tuple[str, float]]:
         """MeCab版（スコア付き）"""
         keywords = self._extract_with_mecab(text, top_n, use_scoring=True)
-        # スコアを再計算
+        # スコアを再計算（出現回数は全キーワード分を1回の走査で計測）
+        doc = analyze_text(text)
+        doc.count_many(keywords)
         scored = []
         for kw in keywords:
-            score = self._calculate_keyword_score(kw, text)
+            score = self._calculate_keyword_score(kw, doc)
             scored.append((kw, score))
         return scored
 
     def _extract_with_regex_scored(self, text: str, top_n: int) -> List[Tuple[str, float]]:
         """正規表現版（スコア付き）"""
         keywords = self._extract_with_regex(text, top_n, use_scoring=True)
+        doc = analyze_text(text)
+        doc.count_many(keywords)
         scored = []
         for kw in keywords:
-            score = self._calculate_keyword_score(kw, text)
+            score = self._calculate_keyword_score(kw, doc)
             scored.append((kw, score))
         return scored
 
@@ -246,24 +226,26 @@ class KeywordExtractor:
         regex_kws = self._extract_with_regex(text, top_n * 2, use_scoring=False)
         all_keywords.update(regex_kws)
 
-        # 統合スコアリング
+        # 統合スコアリング（出現回数は全キーワード分を1回の走査で計測）
+        doc = analyze_text(text)
+        doc.count_many(all_keywords)
         scored = []
         for kw in all_keywords:
             if kw in self.stopwords or len(kw) <= 1:
                 continue
-            score = self._calculate_keyword_score(kw, text)
+            score = self._calculate_keyword_score(kw, doc)
             scored.append((kw, score))
 
         # スコア降順でソート
         scored.sort(key=lambda x: x[1], reverse=True)
         return scored[:top_n]
 
-    def _calculate_keyword_score(self, keyword: str, text: str) -> float:
-        """キーワードの総合スコアを計算"""
+    def _calculate_keyword_score(self, keyword: str, text: Union[str, AnalyzedDocument]) -> float:
+        """キーワードの総合スコアを計算（出現回数は text の解析結果のメモから取得）"""
         score = 0.0
 
-        # 出現頻度
-        freq = text.count(keyword)
+        # 出現頻度（解析結果のメモから取得）
+        freq = analyze_text(text).count(keyword)
         freq_score = min(freq / 3.0, 1.0) * 0.3
         score += freq_score
 
@@ -276,11 +258,12 @@ class KeywordExtractor:
             score += 0.4
 
         # 文字種
-        if re.match(r'^[ァ-ヴー]{3,}$', keyword):
+        char_type = keyword_char_type(keyword)
+        if char_type & CharType.KATAKANA:
             score += 0.15
-        elif re.match(r'^[A-Z]{2,}$', keyword):
+        elif char_type & CharType.UPPER:
             score += 0.2
-        elif re.match(r'^[一-龥]{4,}$', keyword):
+        elif char_type & CharType.KANJI:
             score += 0.15
 
         return min(score, 1.0)
@@ -0,0 +1,139 @@
+# python sample_keyword_scoring_benchmark.py [--input article.txt] [--chars 50000] [--keywords 50 200 1000]
+# キーワードスコアリングのベンチマーク（キーワードごとの走査 vs helper_keyword_scoring）
+#
+# 長文（Wikipedia記事相当）に対して、次の3処理の旧実装と新実装の所要時間を比較します。
+#   - 出現回数: キーワードごとの text.count  vs  count_keywords（1回の走査）
+#   - カバレッジ: text.find + 位置の set     vs  keyword_coverage（bytearrayマスク）
+#   - 文字種判定: 未コンパイルの re.match     vs  keyword_char_type（事前コンパイル + メモ化）
+# 最後に KeywordExtractor / BestKeywordSelector を通した抽出全体の所要時間を表示します。
+
+import argparse
+import os
+import re
+import time
+from typing import Callable, Dict, List
+
+import helper_keyword_scoring
+from helper_keyword_scoring import count_keywords, keyword_char_type, keyword_coverage
+
+SAMPLE_PARAGRAPH = (
+    "人工知能（AI）は、機械学習や深層学習などの技術を用いて、人間の知的な振る舞いを"
+    "コンピュータ上で実現する研究分野である。自然言語処理ではトランスフォーマーを基盤とした"
+    "BERTやGPTなどの大規模言語モデルが登場し、医療診断や自動運転への応用が進んでいる。"
+    "一方で、学習データに含まれるバイアスや説明可能性の欠如といった倫理的課題も指摘されている。\n"
+)
+DEFAULT_INPUT = "OUTPUT/japanese_text_20251130_041517.txt"
+
+
+def load_article(path: str, chars: int) -> str:
+    """ベンチマーク用の長文を作成（ファイルがなければサンプル段落を繰り返す）"""
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = SAMPLE_PARAGRAPH
+    while len(text) < chars:
+        text += text
+    return text[:chars]
+
+
+def candidate_keywords(text: str, n: int) -> List[str]:
+    """テキストに出現する候補語（出現順・重複なし）"""
+    pattern = r'[ァ-ヴー]{2,}|[一-龥]{2,}|[A-Za-z]{2,}[A-Za-z0-9]*'
+    return list(dict.fromkeys(re.findall(pattern, text)))[:n]
+
+
+# 旧実装（キーワードごとにテキストを走査）
+
+def legacy_counts(text: str, keywords: List[str]) -> Dict[str, int]:
+    return {kw: text.count(kw) for kw in keywords}
+
+
+def legacy_coverage(text: str, keywords: List[str]) -> float:
+    covered_positions = set()
+    for keyword in keywords:
+        start = 0
+        while True:
+            pos = text.find(keyword, start)
+            if pos == -1:
+                break
+            for i in range(pos, pos + len(keyword)):
+                covered_positions.add(i)
+            start = pos + 1
+    return min(1.0, len(covered_positions) / len(text))
+
+
+def legacy_char_types(keywords: List[str]) -> int:
+    hits = 0
+    for kw in keywords:
+        for pattern in (r'^[ァ-ヴー]{3,}$', r'^[A-Z]{2,}$', r'^[一-龥]{4,}$'):
+            if re.match(pattern, kw):
+                hits += 1
+    return hits
+
+
+def new_char_types(keywords: List[str]) -> int:
+    return sum(1 for kw in keywords if keyword_char_type(kw))
+
+
+def run_extractors(text: str, top_n: int, repeat: int) -> None:
+    """KeywordExtractor / BestKeywordSelector を通した抽出全体の所要時間を表示"""
+    from regex_mecab import KeywordExtractor
+    from helper_rag_qa import BestKeywordSelector
+
+    extractor = KeywordExtractor()
+    selector = BestKeywordSelector()
+    rows = [
+        ("KeywordExtractor.extract_with_details", lambda: extractor.extract_with_details(text, top_n)),
+        ("BestKeywordSelector.extract_best", lambda: selector.extract_best(text, top_n)),
+    ]
+    print(f"\n{'抽出（top_n=' + str(top_n) + '）':<40}{'所要時間(ms)':>14}")
+    for name, fn in rows:
+        print(f"{name:<40}{timeit(fn, repeat):>14.2f}")
+
+
+def timeit(fn: Callable[[], object], repeat: int) -> float:
+    """最良の実行時間（ミリ秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="キーワードスコアリングのベンチマーク")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="記事テキストファイル（なければサンプル段落を使用）")
+    parser.add_argument("--chars", type=int, default=50000, help="テキスト長（文字数）")
+    parser.add_argument("--keywords", type=int, nargs="+", default=[50, 200, 1000], help="キーワード数")
+    parser.add_argument("--repeat", type=int, default=5, help="繰り返し回数（最良値を表示）")
+    parser.add_argument("--top-n", type=int, default=10, help="抽出全体のベンチマークのキーワード数")
+    args = parser.parse_args()
+
+    text = load_article(args.input, args.chars)
+    backend = "pyahocorasick" if helper_keyword_scoring.ahocorasick is not None else "pure-python / str.count"
+    print(f"テキスト長: {len(text):,}文字  走査実装: {backend}")
+    print(f"{'処理':<12}{'キーワード数':>12}{'旧(ms)':>12}{'新(ms)':>12}{'速度比':>10}")
+
+    for n in args.keywords:
+        keywords = candidate_keywords(text, n)
+        assert count_keywords(text, keywords) == legacy_counts(text, keywords)
+        assert abs(keyword_coverage(text, keywords) - legacy_coverage(text, keywords)) < 1e-9
+
+        keyword_char_type.cache_clear()
+        rows = [
+            ("出現回数", lambda: legacy_counts(text, keywords), lambda: count_keywords(text, keywords)),
+            ("カバレッジ", lambda: legacy_coverage(text, keywords), lambda: keyword_coverage(text, keywords)),
+            ("文字種判定", lambda: legacy_char_types(keywords), lambda: new_char_types(keywords)),
+        ]
+        for name, old_fn, new_fn in rows:
+            old_ms = timeit(old_fn, args.repeat)
+            new_ms = timeit(new_fn, args.repeat)
+            print(f"{name:<12}{len(keywords):>12}{old_ms:>12.2f}{new_ms:>12.2f}{old_ms / max(new_ms, 1e-9):>9.1f}x")
+
+    run_extractors(text, args.top_n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
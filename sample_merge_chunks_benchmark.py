@@ -0,0 +1,111 @@
+# python sample_merge_chunks_benchmark.py [--chunks 100000] [--threads 8]
+# チャンク統合のベンチマーク（統合中テキストの再エンコード vs トークン数の累計）
+#
+# 小さいチャンクが多い 100k チャンクに対して、次の3つの所要時間を比較します。
+#   - 旧実装:       チャンクごと・統合判定ごとに tiktoken で再エンコード
+#   - 新（初回）:   tokens のないチャンクをバッチエンコード（スレッド並列）してから累計で統合
+#   - 新（計測済）: チャンク作成時の tokens を再利用して累計で統合
+# tiktoken のエンコーディングを取得できない環境では、旧実装は正規表現の疑似エンコーダ、
+# 新（初回）は簡易推定で計測します（そのため統合後の件数は旧実装と一致しません）。
+
+import argparse
+import copy
+import random
+import re
+import time
+from typing import Callable, Dict, List
+
+import tiktoken
+
+from a02_make_qa_para import merge_small_chunks
+from helper_token_estimator import get_token_estimator
+
+WORDS = ["機械学習", "は", "データ", "から", "パターン", "を", "学習", "する", "。", "AI", "model", " ", "、"]
+PSEUDO_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]+|\s+")
+
+
+def make_chunks(n: int, seed: int = 0) -> List[Dict]:
+    """ベンチマーク用チャンク（1文書50チャンク、大半は統合対象の小さいチャンク）"""
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(n):
+        length = rng.choice([5, 10, 20, 40, 80]) if rng.random() < 0.8 else rng.randint(150, 300)
+        text = "".join(rng.choice(WORDS) for _ in range(length))
+        chunks.append({"id": f"c{i}", "text": text, "doc_id": f"d{i // 50}", "chunk_idx": i % 50})
+    return chunks
+
+
+def get_encoder() -> Callable[[str], List]:
+    try:
+        return tiktoken.get_encoding("cl100k_base").encode
+    except Exception:
+        print("tiktoken のエンコーディングを取得できないため、旧実装は疑似エンコーダで計測します")
+        return PSEUDO_TOKEN_PATTERN.findall
+
+
+def legacy_merge_small_chunks(chunks: List[Dict], encode: Callable[[str], List],
+                              min_tokens: int = 150, max_tokens: int = 400) -> List[Dict]:
+    """旧実装（統合中のテキストを判定のたびに再エンコード）"""
+    merged_chunks = []
+    current_merge = None
+    for chunk in chunks:
+        chunk_tokens = len(encode(chunk['text']))
+        if chunk_tokens >= min_tokens:
+            if current_merge:
+                merged_chunks.append(current_merge)
+                current_merge = None
+            merged_chunks.append(chunk)
+        elif current_merge is None:
+            current_merge = dict(chunk, merged=True, original_chunks=[chunk['id']])
+        elif (len(encode(current_merge['text'])) + chunk_tokens <= max_tokens
+              and current_merge.get('doc_id') == chunk.get('doc_id')):
+            current_merge['text'] += "\n\n" + chunk['text']
+            current_merge['original_chunks'].append(chunk['id'])
+            current_merge['chunk_idx'] = f"{current_merge['chunk_idx']}-{chunk['chunk_idx']}"
+        else:
+            merged_chunks.append(current_merge)
+            current_merge = dict(chunk, merged=True, original_chunks=[chunk['id']])
+    if current_merge:
+        merged_chunks.append(current_merge)
+    return merged_chunks
+
+
+def timed(fn: Callable[[], List[Dict]]):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="チャンク統合のベンチマーク")
+    parser.add_argument("--chunks", type=int, default=100000, help="チャンク数")
+    parser.add_argument("--threads", type=int, default=8, help="バッチエンコードのスレッド数")
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.chunks)
+    encode = get_encoder()
+    get_token_estimator()  # エンコーディングの取得を計測から除く
+
+    legacy_s, legacy = timed(lambda: legacy_merge_small_chunks(copy.deepcopy(chunks), encode))
+
+    fresh = copy.deepcopy(chunks)
+    first_s, merged = timed(lambda: merge_small_chunks(fresh, num_threads=args.threads))
+
+    # チャンク作成時と同じく、旧実装と同じエンコーダで計測済みの tokens を持たせる
+    created = copy.deepcopy(chunks)
+    for chunk in created:
+        chunk['tokens'] = len(encode(chunk['text']))
+    cached_s, cached = timed(lambda: merge_small_chunks(created))
+
+    print(f"チャンク数: {len(chunks):,}")
+    print(f"{'実装':<16}{'所要(秒)':>10}{'統合後':>10}{'速度比':>10}")
+    for name, seconds, result in (
+        ("旧実装", legacy_s, legacy),
+        ("新（初回計測）", first_s, merged),
+        ("新（計測済）", cached_s, cached),
+    ):
+        print(f"{name:<16}{seconds:>10.3f}{len(result):>10,}{legacy_s / max(seconds, 1e-9):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,7 @@ from services.qdrant_service import (
     create_or_recreate_collection_for_qdrant,
     build_points_for_qdrant,
     upsert_points_to_qdrant,
+    register_csv_streaming,
     embed_query_for_search,
     QDRANT_CONFIG,
     COLLECTION_EMBEDDINGS_SEARCH,
@@ -72,6 +73,7 @@ __all__ = [
     "create_or_recreate_collection_for_qdrant",
     "build_points_for_qdrant",
     "upsert_points_to_qdrant",
+    "register_csv_streaming",
     "embed_query_for_search",
     "QDRANT_CONFIG",
     "COLLECTION_EMBEDDINGS_SEARCH",
@@ -20,18 +20,29 @@ import logging
 import traceback
 import glob
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Optional, Tuple, Iterable
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Union
 
 import pandas as pd
 import tiktoken
 from helper_embedding import create_embedding_client, get_embedding_dimensions
+from helper_client_registry import get_embedding_client
+from helper_search_cache import notify_collection_changed
 from qdrant_client_wrapper import (
     embed_sparse_texts_unified, 
     create_or_recreate_collection
 )
-from qdrant_client import QdrantClient
+from qdrant_ingest_pipeline import (
+    IngestStats,
+    iter_csv_batches,
+    make_point_id,
+    qa_point_ids,
+    run_delta_ingest,
+    run_ingest_pipeline,
+)
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from qdrant_client.http import models
 from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client_async import run_sync, scroll_points_async, upsert_points_async
 
 logger = logging.getLogger(__name__)
 
@@ -536,6 +547,7 @@ def delete_all_collections(client: QdrantClient, excluded: List[str] = None) ->
     for col in to_delete:
         try:
             client.delete_collection(collection_name=col["name"])
+            notify_collection_changed(col["name"])
             deleted_count += 1
         except Exception as e:
             logger.error(f"コレクション削除エラー {col['name']}: {e}")
@@ -589,9 +601,9 @@ def build_inputs_for_embedding(df: pd.DataFrame, include_answer: bool) -> List[s
 def embed_texts_for_qdrant(
     texts: List[str], model: str = "gemini-embedding-001", batch_size: int = 100
 ) -> List[List[float]]:
-    """テキストをバッチ処理でEmbeddingに変換（Gemini API使用）"""
-    # Gemini Embeddingクライアントを使用
-    embedding_client = create_embedding_client(provider="gemini")
+    """テキストをバッチ処理でEmbeddingに変換（Gemini API使用、永続キャッシュ経由）"""
+    # Gemini Embeddingクライアントを使用（キャッシュミス分のみAPI呼び出し）
+    embedding_client = get_embedding_client("gemini", cached=True)
     dims = get_embedding_dimensions("gemini")  # 3072
 
     # 空文字列・空白のみの文字列を除外
@@ -680,14 +692,16 @@ def create_or_recreate_collection_for_qdrant(
                 vectors_config=vectors_config,
                 sparse_vectors_config=sparse_vectors_config
             )
+    notify_collection_changed(name)
 
-    # ペイロード索引を作成
-    try:
-        client.create_payload_index(
-            name, field_name="domain", field_schema=models.PayloadSchemaType.KEYWORD
-        )
-    except Exception:
-        pass
+    # ペイロード索引を作成（source は差分登録の既存ID取得に使用）
+    for field_name in ("domain", "source"):
+        try:
+            client.create_payload_index(
+                name, field_name=field_name, field_schema=models.PayloadSchemaType.KEYWORD
+            )
+        except Exception:
+            pass
 
 
 def build_points_for_qdrant(
@@ -695,7 +709,8 @@ def build_points_for_qdrant(
     vectors: List[List[float]], 
     domain: str, 
     source_file: str,
-    sparse_vectors: Optional[List[models.SparseVector]] = None
+    sparse_vectors: Optional[List[models.SparseVector]] = None,
+    include_answer: bool = False
 ) -> List[models.PointStruct]:
     """
     Qdrantポイントを構築
@@ -706,6 +721,7 @@ def build_points_for_qdrant(
         domain: ドメイン名
         source_file: ソースファイル名
         sparse_vectors: Sparse埋め込みベクトル (Optional)
+        include_answer: Embedding入力に回答を含めたか（ポイントIDに含める）
 
     Returns:
         PointStructのリスト
@@ -719,6 +735,7 @@ def build_points_for_qdrant(
 
     now_iso = datetime.now(timezone.utc).isoformat()
     points: List[models.PointStruct] = []
+    ids = qa_point_ids(df, domain, source_file, include_answer=include_answer)
 
     for i, row in enumerate(df.itertuples(index=False)):
         payload = {
@@ -730,7 +747,8 @@ def build_points_for_qdrant(
             "schema": "qa:v1",
         }
 
-        pid = abs(hash(f"{domain}-{source_file}-{i}")) & 0x7FFFFFFFFFFFFFFF
+        # 内容から決まるUUIDv5（再登録・差分登録で同じID）
+        pid = ids[i]
         
         # ベクトル構造の構築
         if sparse_vectors:
@@ -751,19 +769,88 @@ def build_points_for_qdrant(
 
 
 def upsert_points_to_qdrant(
-    client: QdrantClient,
+    client: Union[QdrantClient, AsyncQdrantClient],
     collection: str,
     points: List[models.PointStruct],
     batch_size: int = 128,
 ) -> int:
-    """ポイントをQdrantにアップサート"""
+    """ポイントをQdrantにアップサート（AsyncQdrantClient の場合はバッチを並行して送信）"""
+    if isinstance(client, AsyncQdrantClient):
+        return run_sync(upsert_points_async(client, collection, points, batch_size=batch_size))
+
     count = 0
     for chunk in batched(points, batch_size):
         client.upsert(collection_name=collection, points=chunk)
         count += len(chunk)
+    notify_collection_changed(collection)
     return count
 
 
+def register_csv_streaming(
+    client: QdrantClient,
+    collection: str,
+    csv_path: str,
+    domain: str,
+    include_answer: bool = False,
+    use_sparse: bool = False,
+    limit: int = 0,
+    read_batch_size: int = 1000,
+    upsert_batch_size: int = 128,
+    max_pending_upserts: int = 4,
+    incremental: bool = False,
+    progress_callback=None,
+) -> IngestStats:
+    """
+    CSVをストリーミングでQdrantに登録（読み込み → Embedding → アップサートをバッチ単位で並行処理）
+
+    CSV全体・全ベクトルをメモリに載せないため、大規模CSVでもピークメモリが一定になる。
+
+    Args:
+        client: Qdrantクライアント
+        collection: コレクション名（作成済みであること）
+        csv_path: CSVパス
+        domain: ドメイン名
+        include_answer: 回答もEmbedding入力に含めるか
+        use_sparse: Sparseベクトルも生成するか（Hybrid Search用）
+        limit: 最大行数（0=全件）
+        read_batch_size: 1度に読み込む行数
+        upsert_batch_size: 1回のupsertのポイント数
+        max_pending_upserts: 送信中のupsertの上限
+        incremental: 差分登録（既存IDにない行のみ登録し、CSVから消えた行を削除）
+        progress_callback: バッチ完了ごとに IngestStats を受け取るコールバック
+
+    Returns:
+        IngestStats
+    """
+    def build_batch(batch: pd.DataFrame, vectors, sparse_vectors, _start_index: int):
+        return build_points_for_qdrant(
+            batch, vectors, domain, csv_path, sparse_vectors=sparse_vectors, include_answer=include_answer
+        )
+
+    batches = iter_csv_batches(csv_path, batch_size=read_batch_size, limit=limit)
+    pipeline_kwargs = dict(
+        text_fn=lambda batch: build_inputs_for_embedding(batch, include_answer),
+        embed_dense=embed_texts_for_qdrant,
+        build_points=build_batch,
+        embed_sparse=embed_sparse_texts_unified if use_sparse else None,
+        upsert_batch_size=upsert_batch_size,
+        max_pending_upserts=max_pending_upserts,
+        progress_callback=progress_callback,
+    )
+
+    if incremental:
+        return run_delta_ingest(
+            client,
+            collection,
+            batches,
+            id_fn=lambda batch: qa_point_ids(batch, domain, csv_path, include_answer=include_answer),
+            truncated=limit > 0,  # limit 以降の行を削除しない
+            source=os.path.basename(csv_path),
+            **pipeline_kwargs,
+        )
+    return run_ingest_pipeline(client, collection, batches, **pipeline_kwargs)
+
+
 # ===================================================================
 # 検索関数
 # ===================================================================
@@ -794,7 +881,7 @@ def embed_query_for_search(
             
     logger.info(f"embed_query_for_search: query='{query}', model='{model}', dims={dims} -> provider='{provider}'")
     
-    embedding_client = create_embedding_client(provider=provider)
+    embedding_client = get_embedding_client(provider)
     vector = embedding_client.embed_text(query)
     
     logger.info(f"embed_query_for_search: generated vector dim={len(vector)}")
@@ -806,7 +893,7 @@ def embed_query_for_search(
 # ===================================================================
 
 def scroll_all_points_with_vectors(
-    client: QdrantClient,
+    client: Union[QdrantClient, AsyncQdrantClient],
     collection_name: str,
     batch_size: int = 100,
     progress_callback: Optional[callable] = None,
@@ -814,7 +901,7 @@ def scroll_all_points_with_vectors(
     """コレクションから全ポイント（ベクトル含む）を取得
 
     Args:
-        client: QdrantClient
+        client: QdrantClient（AsyncQdrantClient の場合は共有イベントループで取得）
         collection_name: コレクション名
         batch_size: 1回のスクロールで取得する件数
         progress_callback: 進捗コールバック (取得済み件数, 総件数)
@@ -822,6 +909,11 @@ def scroll_all_points_with_vectors(
     Returns:
         全ポイントのリスト
     """
+    if isinstance(client, AsyncQdrantClient):
+        return run_sync(scroll_points_async(
+            client, collection_name, batch_size=batch_size, with_vectors=True, progress_callback=progress_callback
+        ))
+
     all_points = []
     offset = None
 
@@ -910,16 +1002,14 @@ def merge_collections(
             result["points_per_collection"][src_collection] = len(points)
 
             # ポイントIDを再生成（重複回避）
-            for i, point in enumerate(points):
+            for point in points:
                 # 元のpayloadにソースコレクション情報を追加
                 payload = dict(point.payload) if point.payload else {}
                 payload["_source_collection"] = src_collection
                 payload["_original_id"] = point.id
 
-                # 新しいIDを生成
-                new_id = abs(
-                    hash(f"{target_collection}-{src_collection}-{point.id}-{i}")
-                ) & 0x7FFFFFFFFFFFFFFF
+                # 新しいIDを生成（統合先・元コレクション・元IDから決まるUUIDv5）
+                new_id = make_point_id(target_collection, src_collection, point.id)
 
                 all_points.append(
                     models.PointStruct(
@@ -948,6 +1038,7 @@ def merge_collections(
                         progress,
                         100,
                     )
+            notify_collection_changed(target_collection)
 
         result["success"] = True
 
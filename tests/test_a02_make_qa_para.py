@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_a02_make_qa_para.py - Q/A生成パイプラインのテスト
+=====================================================
+"""
+
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from a02_make_qa_para import (
+    CoverageSummary,
+    compute_coverage_summary,
+    multi_threshold_coverage,
+    analyze_chunk_characteristics_coverage,
+    generate_qa_for_dataset,
+    generate_qa_pairs_for_batch,
+    merge_small_chunks,
+    plan_qa_counts,
+)
+from helper_qa_journal import QAJournal
+from models import QAPair, QAPairsResponse
+
+
+def _dense_similarity(docs: np.ndarray, qas: np.ndarray) -> np.ndarray:
+    """比較用: 密なコサイン類似度行列"""
+    docs = docs / np.linalg.norm(docs, axis=1, keepdims=True)
+    qas = qas / np.linalg.norm(qas, axis=1, keepdims=True)
+    return docs @ qas.T
+
+
+class TestComputeCoverageSummary:
+    """compute_coverage_summaryのテスト"""
+
+    @pytest.fixture
+    def embeddings(self):
+        rng = np.random.default_rng(0)
+        docs = rng.normal(size=(37, 16))
+        qas = rng.normal(size=(53, 16))
+        return docs, qas
+
+    def test_matches_dense_matrix(self, embeddings):
+        """タイル計算の結果が密行列の結果と一致する"""
+        docs, qas = embeddings
+        thresholds = {"strict": 0.5, "standard": 0.3, "lenient": 0.1}
+
+        summary = compute_coverage_summary(
+            docs, qas, thresholds, row_block_size=8, col_block_size=10
+        )
+        dense = _dense_similarity(docs, qas)
+
+        np.testing.assert_allclose(summary.max_similarities, dense.max(axis=1), atol=1e-5)
+        np.testing.assert_array_equal(summary.best_qa_indices, dense.argmax(axis=1))
+        for level, threshold in thresholds.items():
+            np.testing.assert_array_equal(
+                summary.threshold_counts[level], (dense >= threshold).sum(axis=1)
+            )
+
+    def test_float32_output(self, embeddings):
+        """要約はfloat32で保持される"""
+        docs, qas = embeddings
+        summary = compute_coverage_summary(docs, qas)
+        assert summary.max_similarities.dtype == np.float32
+
+    def test_zero_vector_similarity(self):
+        """ゼロベクトルの類似度は0"""
+        docs = np.zeros((2, 4))
+        qas = np.eye(4)
+        summary = compute_coverage_summary(docs, qas)
+        np.testing.assert_array_equal(summary.max_similarities, [0.0, 0.0])
+
+
+class TestCoverageConsumers:
+    """カバレージ要約を利用する分析関数のテスト"""
+
+    @pytest.fixture
+    def summary(self):
+        return CoverageSummary(
+            max_similarities=np.array([0.9, 0.65, 0.4], dtype=np.float32),
+            best_qa_indices=np.array([0, 1, 1]),
+            threshold_counts={"standard": np.array([2, 0, 0])},
+            thresholds={"standard": 0.7}
+        )
+
+    @pytest.fixture
+    def chunks(self):
+        return [
+            {"id": "c0", "text": "短いテキスト"},
+            {"id": "c1", "text": "別のテキスト"},
+            {"id": "c2", "text": "さらに別のテキスト"},
+        ]
+
+    def test_multi_threshold_coverage(self, summary, chunks):
+        """閾値別のカバー数と未カバーチャンク"""
+        results = multi_threshold_coverage(
+            summary, chunks, [], {"standard": 0.7, "lenient": 0.6}
+        )
+
+        assert results["standard"]["covered_chunks"] == 1
+        assert results["standard"]["avg_matching_qa"] == pytest.approx(2 / 3)
+        assert [c["chunk_id"] for c in results["standard"]["uncovered_chunks"]] == ["c1", "c2"]
+        assert results["lenient"]["covered_chunks"] == 2
+
+    def test_chunk_characteristics(self, summary, chunks, monkeypatch):
+        """チャンク特性別分析が要約から集計される（作成時のトークン数を再利用）"""
+        fake_estimator = MagicMock()
+        fake_estimator.count_chunks.side_effect = lambda chunks: [len(c["text"]) for c in chunks]
+        monkeypatch.setattr("a02_make_qa_para.get_token_estimator", lambda: fake_estimator)
+
+        results = analyze_chunk_characteristics_coverage(chunks, summary, [], threshold=0.6)
+
+        assert results["by_length"]["short"]["count"] == 3
+        assert results["by_length"]["short"]["covered"] == 2
+        assert results["summary"]["total_chunks"] == 3
+
+
+class TestPlanQaCounts:
+    """plan_qa_countsのテスト"""
+
+    def test_counts_from_local_estimates(self, monkeypatch):
+        """トークン数はバッチでローカル推定され、Q/A数に反映される"""
+        fake_estimator = MagicMock()
+        fake_estimator.count_batch.return_value = [30, 150, 400]
+        monkeypatch.setattr("a02_make_qa_para.get_token_estimator", lambda: fake_estimator)
+
+        chunks = [
+            {"text": "a", "chunk_idx": 0},
+            {"text": "b", "chunk_idx": 1},
+            {"text": "c", "chunk_idx": 6},
+        ]
+        counts = plan_qa_counts(chunks, {"qa_per_chunk": 3}, model="gemini-2.0-flash")
+
+        assert counts == [2, 4, 7]
+        fake_estimator.count_batch.assert_called_once_with(["a", "b", "c"], model="gemini-2.0-flash")
+
+
+class TestGenerateQaPairsForBatch:
+    """generate_qa_pairs_for_batchのテスト"""
+
+    def test_full_text_and_given_counts(self):
+        """長いチャンクも切り詰めずに渡し、指定されたQ/A数でチャンクに割り当てる"""
+        long_text = "機械学習は" + "あ" * 3000 + "終わり"
+        chunks = [
+            {"id": "c0", "text": long_text},
+            {"id": "c1", "text": "短いテキスト"},
+        ]
+        client = MagicMock()
+        client.generate_structured.return_value = QAPairsResponse(qa_pairs=[
+            QAPair(question=f"Q{i}", answer="A", question_type="fact", text_index=index)
+            for i, index in enumerate([1, 1, 2])
+        ])
+
+        qa_pairs = generate_qa_pairs_for_batch(
+            chunks, {"lang": "ja", "qa_per_chunk": 3}, client=client, qa_counts=[2, 1]
+        )
+
+        prompt = client.generate_structured.call_args.kwargs["prompt"]
+        assert long_text in prompt
+        assert "合計3個" in prompt
+        assert "【テキスト1】（2個）" in prompt
+        assert [qa["source_chunk_id"] for qa in qa_pairs] == ["c0", "c0", "c1"]
+
+    def test_assigns_by_text_index_not_position(self):
+        """Q/Aは出力順ではなく text_index で元チャンクに割り当て、番号のないものは除外する"""
+        chunks = [{"id": "c0", "text": "前半"}, {"id": "c1", "text": "後半"}]
+        client = MagicMock()
+        client.generate_structured.return_value = QAPairsResponse(qa_pairs=[
+            QAPair(question="後半について", answer="A", text_index=2),
+            QAPair(question="前半について", answer="A", text_index=1),
+            QAPair(question="不明", answer="A"),
+            QAPair(question="範囲外", answer="A", text_index=3),
+        ])
+
+        qa_pairs = generate_qa_pairs_for_batch(
+            chunks, {"lang": "en", "qa_per_chunk": 1}, client=client, qa_counts=[1, 1]
+        )
+
+        assert [(qa["question"], qa["source_chunk_id"]) for qa in qa_pairs] == [
+            ("後半について", "c1"), ("前半について", "c0"),
+        ]
+
+
+class TestGenerateQaForDataset:
+    """generate_qa_for_dataset のテスト"""
+
+    def test_resume_sends_only_pending_chunks(self, tmp_path, monkeypatch):
+        """再開時は完了済みチャンクを送らず、結果には完了済みのQ/Aも入力順で含める"""
+        chunks = [{"id": f"c{i}", "text": f"本文{i}です。"} for i in range(4)]
+        journal = QAJournal(str(tmp_path / "journal.jsonl"), fsync=False)
+        journal.record([chunks[0]], [{"question": "記録済み", "answer": "A", "source_chunk_id": "c0"}])
+
+        prompts = []
+
+        def generate_structured(prompt, response_schema, model, max_output_tokens):
+            prompts.append(prompt)
+            n = prompt.count("【テキスト")
+            return QAPairsResponse(qa_pairs=[
+                QAPair(question=f"新規{i}", answer="A", text_index=i) for i in range(1, n + 1)
+            ])
+
+        client = MagicMock()
+        client.generate_structured.side_effect = generate_structured
+        fake_estimator = MagicMock()
+        fake_estimator.count_chunks.side_effect = lambda chunks, model=None: [20 for _ in chunks]
+        monkeypatch.setattr("a02_make_qa_para.get_llm_client", lambda provider: client)
+        monkeypatch.setattr("a02_make_qa_para.get_token_estimator", lambda: fake_estimator)
+
+        qa_pairs = generate_qa_for_dataset(
+            chunks, "test", merge_chunks=False, config={"lang": "ja", "qa_per_chunk": 1},
+            concurrency=1, journal=journal,
+        )
+
+        assert len(prompts) == 1
+        assert "本文0" not in prompts[0]
+        assert all(f"本文{i}" in prompts[0] for i in range(1, 4))
+        assert [qa["source_chunk_id"] for qa in qa_pairs] == ["c0", "c1", "c2", "c3"]
+        assert qa_pairs[0]["question"] == "記録済み"
+        journal.close()
+
+
+class TestMergeSmallChunks:
+    """merge_small_chunksのテスト"""
+
+    def _chunk(self, i, tokens, doc_id="d0"):
+        return {"id": f"c{i}", "text": f"t{i}", "tokens": tokens, "doc_id": doc_id, "chunk_idx": i}
+
+    def test_merges_with_running_totals(self, monkeypatch):
+        """作成時のトークン数の累計で統合し、再エンコードしない"""
+        fake_encoding = MagicMock()
+        monkeypatch.setattr("helper_token_estimator.tiktoken.get_encoding", lambda name: fake_encoding)
+        monkeypatch.setattr("helper_token_estimator._estimator", None)
+        chunks = [
+            self._chunk(0, 50), self._chunk(1, 60), self._chunk(2, 100),  # 50+1+60=111, +1+100 > 200
+            self._chunk(3, 300),                                          # 大きいチャンクはそのまま
+            self._chunk(4, 40), self._chunk(5, 40, doc_id="d1"),          # 文書が変われば別々
+        ]
+
+        merged = merge_small_chunks(chunks, min_tokens=150, max_tokens=200)
+
+        assert [m["id"] for m in merged] == ["c0", "c2", "c3", "c4", "c5"]
+        assert merged[0]["text"] == "t0\n\nt1"
+        assert merged[0]["tokens"] == 111
+        assert merged[0]["chunk_idx"] == "0-1"
+        assert merged[0]["original_chunks"] == ["c0", "c1"]
+        assert merged[1]["merged"] and merged[1]["chunk_idx"] == 2
+        assert merged[2] is chunks[3]
+        fake_encoding.encode_ordinary_batch.assert_not_called()
+        assert chunks[0]["text"] == "t0"
+
+    def test_counts_missing_tokens_once(self, monkeypatch):
+        """トークン数のないチャンクだけを1回のバッチで計測する"""
+        fake_encoding = MagicMock()
+        fake_encoding.encode_ordinary_batch.side_effect = lambda texts, num_threads: [list(t) for t in texts]
+        monkeypatch.setattr("helper_token_estimator.tiktoken.get_encoding", lambda name: fake_encoding)
+        monkeypatch.setattr("helper_token_estimator._estimator", None)
+        chunks = [{"id": "a", "text": "xx"}, {"id": "b", "text": "yyy", "tokens": 3}, {"id": "c", "text": "z"}]
+
+        merged = merge_small_chunks(chunks, min_tokens=10, max_tokens=100, num_threads=4)
+
+        fake_encoding.encode_ordinary_batch.assert_called_once_with(["xx", "z"], num_threads=4)
+        assert len(merged) == 1
+        assert merged[0]["tokens"] == 2 + 1 + 3 + 1 + 1
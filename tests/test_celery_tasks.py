@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_celery_tasks.py - Celery結果収集のテスト
+==============================================
+"""
+
+import json
+from collections import deque
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("celery")
+
+import celery_tasks
+from celery_tasks import RESULT_KEY_PREFIX, ResultCollector
+from helper_rate_limiter import RateLimitTimeout
+
+
+def _payload(status, result=None):
+    return json.dumps({"status": status, "result": result})
+
+
+def _success(qa_pairs):
+    return _payload("SUCCESS", {"success": True, "qa_pairs": qa_pairs})
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = messages
+        self.closed = False
+
+    def psubscribe(self, pattern):
+        self.pattern = pattern
+
+    def get_message(self, timeout=0):
+        return self.messages.popleft() if self.messages else None
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRedis:
+    """MGETとpub/subのみを持つテスト用Redis"""
+
+    def __init__(self, store=None, messages=None):
+        self.store = store or {}
+        self.messages = deque(messages or [])
+        self.mget_calls = 0
+        self.pubsub_client = FakePubSub(self.messages)
+
+    def mget(self, keys):
+        self.mget_calls += 1
+        return [self.store.get(k) for k in keys]
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        return self.pubsub_client
+
+
+def _message(task_id, data):
+    return {"type": "pmessage", "channel": f"{RESULT_KEY_PREFIX}{task_id}", "data": data}
+
+
+class TestResultCollector:
+    """ResultCollectorのテスト"""
+
+    def test_streams_results_from_sweep_and_pubsub(self):
+        """購読前の完了分はMGET、以降はpub/sub通知から取得"""
+        redis_client = FakeRedis(
+            store={f"{RESULT_KEY_PREFIX}t1": _success([{"question": "q1"}])},
+            messages=[
+                _message("t2", _payload("STARTED")),
+                _message("other-job", _success([{"question": "x"}])),
+                _message("t2", _success([{"question": "q2"}, {"question": "q3"}])),
+                _message("t3", _payload("FAILURE")),
+            ],
+        )
+        collector = ResultCollector(["t1", "t2", "t3"], timeout=5, redis_client=redis_client)
+
+        qa_pairs = list(collector.stream())
+
+        assert [qa["question"] for qa in qa_pairs] == ["q1", "q2", "q3"]
+        assert collector.stats.success == 2
+        assert collector.stats.failed == 1
+        assert collector.stats.stragglers == []
+        assert redis_client.mget_calls == 1
+        assert redis_client.pubsub_client.closed
+
+    def test_mget_batches(self):
+        """未完了タスクはバッチ単位のMGETで確認する"""
+        store = {f"{RESULT_KEY_PREFIX}t{i}": _success([{"i": i}]) for i in range(25)}
+        redis_client = FakeRedis(store=store)
+        collector = ResultCollector(
+            [f"t{i}" for i in range(25)], timeout=5, redis_client=redis_client,
+            mget_batch_size=10, use_pubsub=False
+        )
+
+        assert len(list(collector.stream())) == 25
+        assert redis_client.mget_calls == 3
+
+    def test_timeout_reports_stragglers(self):
+        """タイムアウト時は未完了タスクを遅延タスクとして報告"""
+        redis_client = FakeRedis(store={
+            f"{RESULT_KEY_PREFIX}done": _payload("SUCCESS", {"success": False, "chunk_id": "c9"})
+        })
+        collector = ResultCollector(["done", "slow"], timeout=0.01, redis_client=redis_client)
+
+        assert list(collector.stream()) == []
+        assert collector.stats.stragglers == ["slow"]
+        assert collector.stats.failed_chunks == ["c9"]
+
+
+class TestRateLimitTimeout:
+    """レート制限の待機切れのテスト"""
+
+    def test_timeout_retries_without_text_fallback(self, monkeypatch):
+        """構造化出力前の待機切れはテキスト生成にフォールバックせず、タスクのリトライに回す"""
+        deadlines = []
+
+        def acquire(provider, model, prompt, deadline=None):
+            deadlines.append(deadline)
+            raise RateLimitTimeout("quota")
+
+        llm_client = MagicMock()
+        monkeypatch.setattr(celery_tasks, "_acquire_llm_quota", acquire)
+        monkeypatch.setattr(celery_tasks, "get_llm_client", lambda provider: llm_client)
+
+        # 直接呼び出しでは self.retry が元の例外を送出する
+        with pytest.raises(RateLimitTimeout):
+            celery_tasks.generate_qa_unified_async.run(
+                {"id": "c0", "text": "テキスト", "tokens": 100}, {"lang": "ja", "qa_per_chunk": 2}, provider="gemini"
+            )
+
+        assert len(deadlines) == 1 and deadlines[0] is not None
+        llm_client.generate_structured.assert_not_called()
+        llm_client.generate_content.assert_not_called()
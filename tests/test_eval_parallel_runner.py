@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_eval_parallel_runner.py - 評価の並列実行・記録/再生のテスト
+================================================================
+"""
+
+import random
+import time
+
+import pytest
+
+pytest.importorskip("agent_main")
+
+import agent_tools
+from agent_tools import SearchMetrics
+from eval.cassette import Cassette, CassetteMismatchError, _FunctionCall, _Part, _Response
+from eval.evaluator import TestCase as EvalCase, generate_report
+from eval.parallel_runner import EvaluationRunner
+
+
+class FakeChatSession:
+    """「検索:」で始まる入力ではツールを呼び、ツールの結果を受けたら回答するセッション"""
+
+    def __init__(self):
+        self.history = []
+
+    def send_message(self, content):
+        if isinstance(content, str):
+            self.history.append(content)
+            if content.startswith("検索:"):
+                call = _FunctionCall(name="search_rag_knowledge_base", args={"query": content, "collection_name": "col"})
+                return _Response(parts=[_Part(function_call=call)])
+            return _Response(parts=[_Part(text=f"回答: {content}")])
+        return _Response(parts=[_Part(text=f"検索結果による回答 ({len(self.history)})")])
+
+
+def fake_search(query, collection_name):
+    """クエリの番号をスコアにしたメトリクスを記録する検索ツール（完了順をばらつかせる）"""
+    time.sleep(random.uniform(0, 0.01))
+    score = int(query.split(":")[1]) / 100
+    agent_tools._record_search_metrics(SearchMetrics(
+        query=query, collection_name=collection_name, latency_ms=1.0,
+        total_results=1, filtered_results=1, top_score=score,
+    ))
+    return f"Q{query}"
+
+
+def _cases(n):
+    return [
+        EvalCase(id=f"TC{i:03d}", category="rag", input=f"検索:{i}", expected_tool_use=True,
+                 expected_tool_name="search_rag_knowledge_base", expected_collection="col")
+        for i in range(1, n + 1)
+    ] + [EvalCase(id="TC900", category="chat", input="こんにちは", expected_tool_use=False)]
+
+
+class TestEvaluationRunner:
+    """EvaluationRunner のテスト"""
+
+    def test_parallel_metrics_are_attributed_per_case(self):
+        """並列実行でもテストケースごとの検索メトリクスが対応し、セッションは使い回される"""
+        sessions = []
+
+        def factory():
+            sessions.append(FakeChatSession())
+            return sessions[-1]
+
+        runner = EvaluationRunner(mode="live", workers=4, session_factory=factory,
+                                  tools={"search_rag_knowledge_base": fake_search})
+        cases = _cases(20)
+        results = runner.run(cases)
+
+        assert [r.test_case_id for r in results] == [tc.id for tc in cases]
+        assert all(r.passed for r in results)
+        assert [r.top_score for r in results[:20]] == pytest.approx([i / 100 for i in range(1, 21)])
+        assert results[20].top_score == 0.0
+        assert len(sessions) == 4
+        assert all(s.history == [] for s in sessions)
+
+        breakdown = generate_report(results)["latency_breakdown"]
+        assert breakdown["agent_turn"]["turns"] == 21
+        assert breakdown["tool"]["turns"] == 20
+        assert breakdown["llm.generate"]["turns"] == 21
+
+    def test_record_then_replay(self, tmp_path):
+        """記録した応答を再生すると、ツール・LLMを呼ばずに同じ結果になる"""
+        path = str(tmp_path / "cassette.json")
+        cases = _cases(3)
+        recorded = EvaluationRunner(
+            mode="record", workers=2, cassette=Cassette(path),
+            session_factory=FakeChatSession, tools={"search_rag_knowledge_base": fake_search},
+        ).run(cases)
+
+        replayed = EvaluationRunner(mode="replay", workers=2, cassette=Cassette(path), tools={}).run(cases)
+
+        assert [(r.response, r.actual_tool_name, r.actual_collection, r.top_score) for r in replayed] == \
+            [(r.response, r.actual_tool_name, r.actual_collection, r.top_score) for r in recorded]
+        assert all(r.passed for r in replayed)
+
+    def test_replay_missing_or_changed_case_fails(self, tmp_path):
+        """カセットにない・入力が変わったテストケースは失敗として報告する"""
+        path = str(tmp_path / "cassette.json")
+        cases = _cases(1)
+        EvaluationRunner(mode="record", cassette=Cassette(path), session_factory=FakeChatSession,
+                         tools={"search_rag_knowledge_base": fake_search}).run(cases)
+
+        changed = [EvalCase(id="TC001", category="rag", input="検索:2", expected_tool_use=True),
+                   EvalCase(id="TC404", category="rag", input="検索:3", expected_tool_use=True)]
+        results = EvaluationRunner(mode="replay", cassette=Cassette(path)).run(changed)
+
+        assert not any(r.passed for r in results)
+        assert "入力が記録時と異なります" in results[0].failure_reason
+        assert "TC404" in results[1].failure_reason
+
+    def test_tool_cassette_mismatch_is_not_swallowed(self):
+        """ツール再生時の CassetteMismatchError はツールのエラーとして握りつぶさず、テストケースを失敗させる"""
+        def stale_tool(**kwargs):
+            raise CassetteMismatchError("記録にないツール呼び出しです: search_rag_knowledge_base")
+
+        results = EvaluationRunner(mode="live", session_factory=FakeChatSession,
+                                   tools={"search_rag_knowledge_base": stale_tool}).run(_cases(1)[:1])
+
+        assert not results[0].passed
+        assert "記録にないツール呼び出しです" in results[0].failure_reason
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_chunk_engine.py - チャンク分割エンジンのテスト
+============================================================
+"""
+
+import os
+
+import pandas as pd
+import pytest
+
+import helper_chunk_engine
+from helper_chunk_engine import ChunkDocument, ChunkingEngine
+
+
+class FakeTokenizer:
+    def encode(self, text):
+        return text.split()
+
+
+class FakeAnalyzer:
+    """段落（空行）で分割するだけの分割器。生成回数をプロセスごとに数える"""
+    instances = 0
+
+    def __init__(self):
+        FakeAnalyzer.instances += 1
+        self.instance_no = FakeAnalyzer.instances
+        self.tokenizer = FakeTokenizer()
+
+    def create_semantic_chunks(self, document, max_tokens, min_tokens, prefer_paragraphs, verbose):
+        if document == "BOOM":
+            raise RuntimeError("broken document")
+        return [
+            # type に分割したプロセスと分割器の生成番号を記録
+            {"text": p, "type": f"{os.getpid()}:{self.instance_no}", "sentences": [p]}
+            for p in document.split("\n\n") if p
+        ]
+
+
+def _docs(n):
+    return [ChunkDocument(doc_id=f"wiki_{i}", doc_idx=i, text=f"para a{i}\n\npara b{i}") for i in range(n)]
+
+
+class TestChunkingEngine:
+    """ChunkingEngine のテスト"""
+
+    def test_in_process_order_and_ids(self):
+        """同一プロセス実行で入力順・安定したチャンクIDになる"""
+        engine = ChunkingEngine(workers=1, analyzer_factory=FakeAnalyzer)
+        results = list(engine.iter_documents(_docs(3)))
+        assert [doc.doc_idx for doc, _ in results] == [0, 1, 2]
+        assert [c["id"] for c in results[1][1]] == ["wiki_1_chunk_0", "wiki_1_chunk_1"]
+        assert results[0][1][0]["tokens"] == 2
+
+    def test_process_pool_preserves_order(self):
+        """プロセス並列でも入力順を保ち、分割器はワーカーごとに1つだけ生成される"""
+        engine = ChunkingEngine(workers=2, docs_per_task=3, max_pending_tasks=2, analyzer_factory=FakeAnalyzer)
+        results = list(engine.iter_documents(iter(_docs(20))))
+
+        assert [doc.doc_idx for doc, _ in results] == list(range(20))
+        assert results[7][1][1]["text"] == "para b7"
+        chunk_sources = {tuple(map(int, c["type"].split(":"))) for _, chunks in results for c in chunks}
+        assert all(inst == 1 for _, inst in chunk_sources)
+        assert os.getpid() not in {pid for pid, _ in chunk_sources}
+
+    def test_failed_document_yields_empty(self):
+        """分割に失敗した文書は空のチャンクリストになり、処理は継続する"""
+        docs = [ChunkDocument("d0", 0, "ok"), ChunkDocument("d1", 1, "BOOM"), ChunkDocument("d2", 2, "ok")]
+        results = list(ChunkingEngine(workers=1, analyzer_factory=FakeAnalyzer).iter_documents(docs))
+        assert [len(chunks) for _, chunks in results] == [1, 0, 1]
+
+
+class TestCreateDocumentChunks:
+    """a02.create_document_chunks のテスト"""
+
+    def test_metadata_and_ids(self, monkeypatch):
+        """文書ID・チャンクIDとメタデータが付与される"""
+        a02 = pytest.importorskip("a02_make_qa_para")
+        monkeypatch.setattr(helper_chunk_engine, "_default_analyzer", FakeAnalyzer())
+
+        df = pd.DataFrame({"title": ["東京", None], "text": ["p1\n\np2", "q1"]}, index=[10, 11])
+        config = {"text_column": "text", "title_column": "title", "chunk_size": 200, "lang": "ja"}
+        chunks = a02.create_document_chunks(df, "wiki", config=config)
+
+        assert [c["id"] for c in chunks] == ["wiki_10_東京_chunk_0", "wiki_10_東京_chunk_1", "wiki_11_chunk_0"]
+        assert [c["chunk_idx"] for c in chunks] == [0, 1, 0]
+        assert chunks[2]["doc_idx"] == 11 and chunks[2]["dataset_type"] == "wiki"
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_client_registry.py - クライアントレジストリのテスト
+================================================================
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+import helper_client_registry
+from helper_client_registry import ClientRegistry, get_embedding_client, prewarm_clients
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """テストごとに空のレジストリを使用"""
+    fresh = ClientRegistry()
+    monkeypatch.setattr(helper_client_registry, "_registry", fresh)
+    return fresh
+
+
+class TestClientRegistry:
+    """ClientRegistryのテスト"""
+
+    def test_factory_called_once_across_threads(self, registry):
+        """並行取得でもクライアントは1回だけ生成される"""
+        calls = []
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(registry.get_or_create(("k",), factory)))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert len(results) == 8
+        assert all(r is results[0] for r in results)
+
+    def test_embedding_client_keyed_by_provider_and_kwargs(self, registry, monkeypatch):
+        """プロバイダーと初期化パラメータごとに別インスタンス"""
+        factory = MagicMock(side_effect=lambda provider, **kwargs: object())
+        monkeypatch.setattr(helper_client_registry, "create_embedding_client", factory)
+
+        a = get_embedding_client("gemini")
+        b = get_embedding_client("GEMINI")
+        c = get_embedding_client("gemini", dims=1536)
+
+        assert a is b
+        assert a is not c
+        assert factory.call_count == 2
+
+    def test_prewarm_skips_failures(self, registry, monkeypatch):
+        """生成に失敗したクライアントは警告のみで継続"""
+        def factory(provider, **kwargs):
+            if provider == "openai":
+                raise ValueError("OPENAI_API_KEY is not set")
+            return MagicMock()
+
+        monkeypatch.setattr(helper_client_registry, "create_llm_client", factory)
+
+        timings = prewarm_clients(llm_providers=["gemini", "openai"])
+
+        assert set(timings) == {"llm:gemini"}
+        assert len(registry) == 1
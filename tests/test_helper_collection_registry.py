@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_collection_registry.py - コレクションレジストリのテスト
+===================================================================
+インメモリの Qdrant（QdrantClient(":memory:")）を使います。
+"""
+
+import warnings
+
+import pytest
+from qdrant_client import QdrantClient, models
+
+import qdrant_client_wrapper as wrapper
+from helper_collection_registry import CollectionRegistry
+from tests.test_qdrant_client_wrapper import CountingClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _create(client, name, use_sparse):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # ローカルモードのペイロード索引の警告
+        wrapper.create_or_recreate_collection(client, name, recreate=True, vector_size=3, use_sparse=use_sparse)
+    vector = {"": [1.0, 0.0, 0.0], "text-sparse": models.SparseVector(indices=[0], values=[1.0])} \
+        if use_sparse else [1.0, 0.0, 0.0]
+    client.upsert(collection_name=name, points=[models.PointStruct(id=1, vector=vector, payload={"question": "Q"})])
+
+
+@pytest.fixture
+def setup():
+    wrapper.invalidate_collection_capabilities()
+    raw = QdrantClient(":memory:")
+    _create(raw, "hybrid", use_sparse=True)
+    _create(raw, "dense", use_sparse=False)
+    client = CountingClient(raw)
+    clock = FakeClock()
+    yield client, CollectionRegistry(client, ttl=60, clock=clock), clock
+    wrapper.invalidate_collection_capabilities()
+
+
+class TestCollectionRegistry:
+    """CollectionRegistry のテスト"""
+
+    def test_metadata_and_ttl(self, setup):
+        """ポイント数・ベクトル構成を保持し、TTL内は問い合わせない"""
+        client, registry, clock = setup
+        info = registry.get("hybrid")
+
+        assert (info.points_count, info.vector_size, info.distance) == (1, 3, "Cosine")
+        assert info.hybrid and not registry.get("dense").hybrid
+        assert client.calls == ["get_collection", "get_collection"]
+
+        client.calls.clear()
+        registry.get("hybrid")
+        assert client.calls == []
+
+    def test_expired_lookup_refetches_only_that_collection(self, setup):
+        """期限切れ後の参照は、そのコレクションの get_collection 1回だけ（全コレクションを取得し直さない）"""
+        client, registry, clock = setup
+        registry.refresh()
+        client.calls.clear()
+
+        clock.now = 61
+        assert registry.get("hybrid").points_count == 1
+        assert client.calls == ["get_collection"]
+        registry.get("hybrid")
+        assert client.calls == ["get_collection"]
+
+    def test_missing_collection_checks_listing(self, setup):
+        """取得できないコレクションは一覧で確認し、一覧が有効な間は問い合わせない"""
+        client, registry, _ = setup
+        assert registry.get("missing") is None
+        assert client.calls == ["get_collection", "get_collections", "get_collection", "get_collection"]
+
+        client.calls.clear()
+        assert registry.get("missing") is None
+        assert client.calls == ["get_collection"]
+
+    def test_collection_change_invalidates_entry(self, setup, monkeypatch):
+        """ポイントの登録（notify_collection_changed）でそのコレクションのポイント数を取得し直す"""
+        import helper_search_cache
+        from helper_search_cache import (SearchCache, add_collection_change_listener, notify_collection_changed,
+                                         remove_collection_change_listener)
+        client, registry, _ = setup
+        monkeypatch.setattr(helper_search_cache, "_search_cache", SearchCache())
+        add_collection_change_listener(registry.invalidate)
+        try:
+            assert registry.get("dense").points_count == 1
+            client.upsert(collection_name="dense", points=[models.PointStruct(id=2, vector=[0.0, 1.0, 0.0])])
+            notify_collection_changed("dense")
+            client.calls.clear()
+
+            assert registry.get("dense").points_count == 2
+            assert client.calls == ["get_collection"]
+        finally:
+            remove_collection_change_listener(registry.invalidate)
+
+    def test_invalidate_refetches_one_collection(self, setup):
+        """コレクション単位の破棄では、そのコレクションの get_collection だけを行う"""
+        client, registry, _ = setup
+        registry.refresh()
+        client.calls.clear()
+
+        registry.invalidate("dense")
+        assert registry.get("dense").points_count == 1
+        assert client.calls == ["get_collection"]
+
+    def test_search_makes_one_data_plane_call(self, setup):
+        """レジストリのベクトル構成を渡すと、検索時のQdrant呼び出しは検索1回だけ"""
+        client, registry, _ = setup
+        registry.refresh()
+        client.calls.clear()
+
+        for name in ("hybrid", "dense"):
+            info = registry.get(name)
+            results = wrapper.search_collection(
+                client, name, [1.0, 0.0, 0.0], models.SparseVector(indices=[0], values=[1.0]),
+                limit=1, capabilities=info.capabilities,
+            )
+            assert [r["id"] for r in results] == [1]
+        assert client.calls == ["query_batch_points", "query_points"]
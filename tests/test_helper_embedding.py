@@ -242,18 +242,68 @@ class TestGeminiEmbedding:
         """バッチEmbedding"""
         client, mock_instance = mock_gemini_client
 
-        # モックレスポンス（embed_textが3回呼ばれる）
+        # モックレスポンス（3件を1バッチで送信）
         mock_embedding = Mock()
         mock_embedding.values = [0.1] * 3072
         mock_response = Mock()
-        mock_response.embeddings = [mock_embedding]
+        mock_response.embeddings = [mock_embedding] * 3
         mock_instance.models.embed_content.return_value = mock_response
 
         result = client.embed_texts(["Hello", "World", "Test"])
 
         assert len(result) == 3
         assert all(len(v) == 3072 for v in result)
-        assert mock_instance.models.embed_content.call_count == 3
+        assert mock_instance.models.embed_content.call_count == 1
+
+    @staticmethod
+    def _echo_response(model, contents, config):
+        """テキスト長を値にしたEmbeddingを返すモック応答"""
+        response = Mock()
+        response.embeddings = [Mock(values=[float(len(t))]) for t in contents]
+        return response
+
+    def test_iter_embed_batches_in_order(self, mock_gemini_client):
+        """並列送信でもバッチは入力順に返る"""
+        client, mock_instance = mock_gemini_client
+        client.max_in_flight = 3
+        mock_instance.models.embed_content.side_effect = self._echo_response
+
+        texts = ["x" * n for n in range(1, 11)]
+        batches = list(client.iter_embed_batches(texts, batch_size=3))
+
+        assert [start for start, _ in batches] == [0, 3, 6, 9]
+        assert [v[0] for _, vecs in batches for v in vecs] == [float(n) for n in range(1, 11)]
+
+    def test_failed_batch_is_retried(self, mock_gemini_client):
+        """429のバッチはゼロ埋めせずリトライする"""
+        client, mock_instance = mock_gemini_client
+        client.retry_base_delay = 0.01
+        calls = []
+
+        def flaky(model, contents, config):
+            calls.append(list(contents))
+            if len(calls) == 1:
+                raise RuntimeError("429 RESOURCE_EXHAUSTED")
+            return self._echo_response(model, contents, config)
+
+        mock_instance.models.embed_content.side_effect = flaky
+
+        result = client.embed_texts(["ab", "abc"])
+
+        assert result == [[2.0], [3.0]]
+        assert len(calls) == 2
+
+    def test_batch_error_after_retries(self, mock_gemini_client):
+        """リトライ上限に達したバッチは例外を送出"""
+        from helper_embedding import EmbeddingBatchError
+
+        client, mock_instance = mock_gemini_client
+        client.max_retries = 1
+        client.retry_base_delay = 0.01
+        mock_instance.models.embed_content.side_effect = RuntimeError("server error")
+
+        with pytest.raises(EmbeddingBatchError):
+            client.embed_texts(["a", "b"])
 
     def test_model_parameter(self, mock_gemini_client):
         """モデルパラメータ"""
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_embedding_cache.py - Embeddingキャッシュのテスト
+============================================================
+"""
+
+from typing import List
+
+import pytest
+
+from helper_embedding import EmbeddingClient
+from helper_embedding_cache import (
+    CachedEmbeddingClient,
+    EmbeddingCache,
+    make_namespace,
+    text_hash,
+)
+
+
+class FakeEmbedding(EmbeddingClient):
+    """呼び出し回数を記録するテスト用クライアント"""
+
+    def __init__(self, dims: int = 4):
+        self.model = "fake-model"
+        self._dims = dims
+        self.calls: List[List[str]] = []
+
+    @property
+    def dimensions(self) -> int:
+        return self._dims
+
+    def embed_text(self, text: str) -> List[float]:
+        return self.embed_texts([text])[0]
+
+    def embed_texts(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0, 0.5, float(i)] for i, t in enumerate(texts)]
+
+
+class TestEmbeddingCache:
+    """EmbeddingCacheのテスト"""
+
+    def test_only_misses_are_embedded(self, temp_dir):
+        """ヒットしたテキストはAPIへ送信されない"""
+        inner = FakeEmbedding()
+        client = CachedEmbeddingClient(inner, cache=EmbeddingCache(str(temp_dir)))
+
+        first = client.embed_texts(["a", "bb", "a"])
+        second = client.embed_texts(["bb", "ccc", "a"])
+
+        assert inner.calls == [["a", "bb"], ["ccc"]]
+        assert first[0] == first[2]
+        assert second[0] == first[1]
+        assert second[2] == first[0]
+
+        stats = client.cache_stats()
+        assert stats["hits"] == 2
+        assert stats["misses"] == 4
+        assert stats["entries"] == 3
+
+    def test_persists_across_instances(self, temp_dir):
+        """別インスタンスからも保存済みベクトルを参照できる"""
+        client = CachedEmbeddingClient(FakeEmbedding(), cache=EmbeddingCache(str(temp_dir)))
+        expected = client.embed_texts(["永続化テスト"])
+
+        inner = FakeEmbedding()
+        reopened = CachedEmbeddingClient(inner, cache=EmbeddingCache(str(temp_dir)))
+        assert reopened.embed_texts(["永続化テスト"])[0] == pytest.approx(expected[0])
+        assert inner.calls == []
+
+    def test_zero_vectors_are_not_cached(self, temp_dir):
+        """API失敗時のゼロベクトルはキャッシュしない"""
+        cache = EmbeddingCache(str(temp_dir))
+        namespace = make_namespace("fake", "fake-model", 2)
+
+        assert cache.put_many(namespace, 2, [(text_hash("x"), [0.0, 0.0])]) == 0
+        assert cache.get_many(namespace, 2, [text_hash("x")]) == {}
+
+    def test_lru_eviction(self, temp_dir):
+        """上限件数を超えると最終アクセスが古いものから追い出される"""
+        cache = EmbeddingCache(str(temp_dir), max_entries=2)
+        namespace = make_namespace("fake", "fake-model", 2)
+        ha, hb, hc = text_hash("a"), text_hash("b"), text_hash("c")
+
+        cache.put_many(namespace, 2, [(ha, [1.0, 0.0])])
+        cache.put_many(namespace, 2, [(hb, [0.0, 1.0])])
+        cache.get_many(namespace, 2, [ha])  # aを最近使用に更新
+        cache.put_many(namespace, 2, [(hc, [1.0, 1.0])])
+
+        found = cache.get_many(namespace, 2, [ha, hb, hc])
+        assert set(found) == {ha, hc}
+        assert found[hc].tolist() == [1.0, 1.0]
+        assert cache.stats()["evictions"] == 1
+
+    def test_namespace_isolated_by_model(self, temp_dir):
+        """モデルが異なればキャッシュは共有されない"""
+        cache = EmbeddingCache(str(temp_dir))
+        inner = FakeEmbedding()
+        CachedEmbeddingClient(inner, cache=cache, model="model-a").embed_texts(["q"])
+        CachedEmbeddingClient(inner, cache=cache, model="model-b").embed_texts(["q"])
+        assert inner.calls == [["q"], ["q"]]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_keyword_scoring.py - キーワードスコアリングエンジンのテスト
+========================================================================
+"""
+
+import re
+
+import pytest
+
+import helper_keyword_scoring
+from helper_keyword_scoring import CharType, KeywordAutomaton, count_keywords, keyword_char_type, keyword_coverage
+
+TEXT = "機械学習モデルと機械学習。aaaa と AIのAI研究。ディープラーニング"
+KEYWORDS = ["機械学習", "機械学習モデル", "学習", "aa", "AI", "存在しない", "ディープラーニング"]
+
+
+@pytest.fixture(params=["scan", "automaton"])
+def backend(request, monkeypatch):
+    """キーワードごとの走査と純Pythonオートマトンの両方で検証する"""
+    monkeypatch.setattr(helper_keyword_scoring, "ahocorasick", None)
+    threshold = 0 if request.param == "automaton" else 10 ** 9
+    monkeypatch.setattr(helper_keyword_scoring, "AUTOMATON_MIN_KEYWORDS", threshold)
+    return request.param
+
+
+class TestCountKeywords:
+    """count_keywords のテスト"""
+
+    def test_matches_str_count(self, backend):
+        """str.count と同じ回数（自己重複する出現は重ならない数）"""
+        assert count_keywords(TEXT, KEYWORDS) == {kw: TEXT.count(kw) for kw in KEYWORDS}
+        assert count_keywords("aaaa", ["aa"]) == {"aa": 2}
+
+    def test_coverage_matches_overlapping_positions(self, backend):
+        """被覆率は重なる出現も含めた文字位置の和集合"""
+        positions = set()
+        for kw in KEYWORDS:
+            for m in re.finditer(f"(?={re.escape(kw)})", TEXT):
+                positions.update(range(m.start(), m.start() + len(kw)))
+        assert keyword_coverage(TEXT, KEYWORDS) == pytest.approx(len(positions) / len(TEXT))
+        assert keyword_coverage("", KEYWORDS) == 0.0
+
+
+class TestKeywordAutomaton:
+    """KeywordAutomaton のテスト"""
+
+    def test_matches_share_suffixes(self):
+        """失敗遷移で接尾辞を共有するキーワードもすべて検出する"""
+        automaton = KeywordAutomaton(["he", "she", "hers"])
+        found = [(end, automaton.keywords[kid]) for end, kid in automaton.iter_matches("ushers")]
+        assert found == [(3, "she"), (3, "he"), (5, "hers")]
+
+
+class TestKeywordCharType:
+    """文字種判定のテスト"""
+
+    def test_flags(self):
+        """旧実装の re.match と同じ分類"""
+        assert keyword_char_type("トランスフォーマー") == CharType.KATAKANA
+        assert keyword_char_type("自然言語処理") == CharType.KANJI
+        assert keyword_char_type("GPT4") == CharType.ALNUM | CharType.ACRONYM
+        assert keyword_char_type("NLP") & CharType.UPPER
+        assert keyword_char_type("機械") == 0
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_mecab.py - MeCab形態素解析サービスのテスト
+=======================================================
+"""
+
+import threading
+
+import pytest
+
+pytest.importorskip("MeCab")
+
+from helper_mecab import POS_NOUN, MeCabTokenizer, get_mecab_tokenizer, pos_name
+
+
+@pytest.fixture
+def tokenizer():
+    tok = MeCabTokenizer(cache_size=2)
+    if not tok.available:
+        pytest.skip("MeCab辞書が利用できません")
+    return tok
+
+
+class TestMeCabTokenizer:
+    """MeCabTokenizer のテスト"""
+
+    def test_parse_returns_compact_tokens(self, tokenizer):
+        """表層形と品詞IDが同じ長さで返る（BOS/EOSは含まない）"""
+        tokens = tokenizer.parse("東京は晴れ。")
+        assert "".join(tokens.surfaces) == "東京は晴れ。"
+        assert len(tokens.pos) == len(tokens.surfaces)
+        assert tokens.pos[0] == POS_NOUN and pos_name(POS_NOUN) == "名詞"
+
+    def test_parse_many_preserves_order(self, tokenizer):
+        """parse_many は入力順に結果を返す"""
+        results = tokenizer.parse_many(["猫", "", "犬が走る"])
+        assert [r.surfaces[:1] for r in results] == [("猫",), (), ("犬",)]
+
+    def test_memo_lru(self, tokenizer):
+        """同じテキストはメモから返し、上限を超えると古いものから削除"""
+        first = tokenizer.parse("自然言語処理")
+        assert tokenizer.parse("自然言語処理") is first
+        tokenizer.parse("a")
+        tokenizer.parse("b")
+        assert tokenizer.parse("自然言語処理") is not first
+        assert tokenizer.cache_info()["size"] == 2
+
+    def test_tagger_per_thread(self, tokenizer):
+        """Taggerはスレッドごとに1つ生成され、同一スレッドでは再利用される"""
+        main_tagger = tokenizer._tagger()
+        assert tokenizer._tagger() is main_tagger
+        other = []
+        t = threading.Thread(target=lambda: other.append(tokenizer._tagger()))
+        t.start()
+        t.join()
+        assert other[0] is not main_tagger
+
+    def test_compound_nouns_and_sentences(self, tokenizer):
+        """複合名詞抽出と文分割"""
+        assert "自然言語処理" in tokenizer.compound_nouns("自然言語処理の研究が進む")
+        assert tokenizer.split_sentences("今日は晴れ。明日は雨？") == ["今日は晴れ。", "明日は雨？"]
+
+
+class TestCallers:
+    """呼び出し元が共有トークナイザーを使うことのテスト"""
+
+    def test_keyword_extractor_uses_shared_tokenizer(self):
+        """KeywordExtractor の MeCab 抽出は共有トークナイザーで1回だけ解析する"""
+        from helper_text_analysis import get_text_analysis_cache
+        from regex_mecab import KeywordExtractor
+
+        shared = get_mecab_tokenizer()
+        if not shared.available:
+            pytest.skip("MeCab辞書が利用できません")
+        get_text_analysis_cache().clear()
+        text = "機械学習モデルの評価と機械学習モデルの改善"
+        extractor = KeywordExtractor()
+        extractor.extract(text, use_scoring=False)
+        before = shared.cache_info()
+        assert extractor.extract(text, use_scoring=False)[0] == "機械学習モデル"
+        assert shared.cache_info() == before
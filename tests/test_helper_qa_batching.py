@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_qa_batching.py - トークン予算によるチャンク詰め込みのテスト
+======================================================================
+"""
+
+from helper_qa_batching import (
+    FALLBACK_LIMITS,
+    MIN_BATCH_OUTPUT_TOKENS,
+    MIN_CHUNK_OUTPUT_TOKENS,
+    OUTPUT_SAFETY_FACTOR,
+    TokenBudgetPacker,
+    estimate_output_tokens,
+    request_output_tokens,
+)
+from helper_qa_executor import PROMPT_OVERHEAD_TOKENS
+
+
+def _chunks(n):
+    return [{"id": f"c{i}", "text": f"text {i}"} for i in range(n)]
+
+
+class TestTokenBudgetPacker:
+    """TokenBudgetPacker のテスト"""
+
+    def test_budget_clamped_to_model_limits(self):
+        """予算はモデル上限で抑え、出力は安全率を掛けた上限まで"""
+        packer = TokenBudgetPacker("gpt-4o-mini", token_budget=10 ** 9)
+        assert packer.token_budget == 128000
+        assert packer.output_budget == int(4096 * OUTPUT_SAFETY_FACTOR)
+
+    def test_unknown_model_uses_fallback(self):
+        packer = TokenBudgetPacker("unknown-model")
+        assert packer.token_budget == FALLBACK_LIMITS["max_tokens"]
+
+    def test_packs_in_order_within_budget(self):
+        """入力 + 出力が予算に収まるまで入力順に詰め込む"""
+        per_chunk = 300 + estimate_output_tokens(4) - estimate_output_tokens(0)
+        budget = PROMPT_OVERHEAD_TOKENS + estimate_output_tokens(0) + per_chunk * 3
+        packer = TokenBudgetPacker("gemini-2.0-flash", token_budget=budget)
+
+        chunks = _chunks(7)
+        batches = packer.pack(chunks, [4] * 7, [300] * 7)
+
+        assert [len(b.chunks) for b in batches] == [3, 3, 1]
+        assert [c for b in batches for c in b.chunks] == chunks
+        assert all(b.input_tokens + b.output_tokens <= budget for b in batches)
+
+    def test_output_budget_limits_batch(self):
+        """出力トークンの見込みが出力上限を超えないように分ける"""
+        packer = TokenBudgetPacker("gpt-4o-mini")
+        batches = packer.pack(_chunks(20), [8] * 20, [10] * 20)
+
+        assert len(batches) > 1
+        assert all(b.output_tokens <= packer.output_budget for b in batches)
+
+    def test_oversized_chunk_goes_alone(self):
+        """予算を超えるチャンクは切り詰めずに単独のリクエストにする"""
+        packer = TokenBudgetPacker("gemini-2.0-flash", token_budget=2000)
+        batches = packer.pack(_chunks(3), [2, 3, 2], [100, 5000, 100])
+
+        assert [[c["id"] for c in b.chunks] for b in batches] == [["c0"], ["c1"], ["c2"]]
+        assert batches[1].qa_counts == [3]
+
+    def test_max_chunks(self):
+        packer = TokenBudgetPacker("gemini-2.0-flash", max_chunks=2)
+        batches = packer.pack(_chunks(5), [2] * 5, [10] * 5)
+        assert [len(b.chunks) for b in batches] == [2, 2, 1]
+
+
+class TestRequestOutputTokens:
+    """request_output_tokens のテスト"""
+
+    def test_floor_and_model_limit(self):
+        """見込みの2倍を従来の固定値で下支えし、モデルの出力上限で抑える"""
+        assert request_output_tokens("gemini-2.0-flash", 1) == MIN_BATCH_OUTPUT_TOKENS
+        assert request_output_tokens("gemini-2.0-flash", 1, batch=False) == MIN_CHUNK_OUTPUT_TOKENS
+        assert request_output_tokens("gemini-2.0-flash", 15) == estimate_output_tokens(15) * 2
+        assert request_output_tokens("gpt-4o-mini", 100) == 4096
+
+    def test_packed_batch_fits_doubled_output(self):
+        """詰め込んだバッチは見込みの2倍でもモデルの出力上限に収まる"""
+        packer = TokenBudgetPacker("gemini-2.0-flash")
+        for batch in packer.pack(_chunks(40), [5] * 40, [100] * 40):
+            assert batch.output_tokens * 2 <= packer.max_output_tokens
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_qa_dedup.py - Q/Aの近似重複検出のテスト
+==================================================
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from helper_qa_dedup import (
+    MinHasher,
+    QADeduplicator,
+    char_shingles,
+    dedup_csv_files,
+    jaccard,
+    optimal_bands,
+)
+
+
+QUESTIONS = [
+    "機械学習とは何ですか？",
+    "トランスフォーマーの注意機構はどのように動作しますか？",
+    "機械学習とは 何ですか",                                  # 0 の表記ゆれ
+    "BERTとGPTの違いは何ですか？",
+    "トランスフォーマーの注意機構はどのように動作するのですか？",  # 1 の言い換え
+    "",
+]
+
+
+class TestShingles:
+    """シングル・MinHash のテスト"""
+
+    def test_normalized_shingles(self):
+        """全角・空白・記号の違いは同じシングル集合になる"""
+        assert char_shingles("ＡＩとは？") == char_shingles("ai とは")
+        assert char_shingles("") == set()
+        assert char_shingles("AI") == {"ai"}
+
+    def test_signature_estimates_jaccard(self):
+        """署名の一致率は Jaccard 係数の推定値になる"""
+        a = char_shingles(QUESTIONS[1])
+        b = char_shingles(QUESTIONS[4])
+        hasher = MinHasher(num_perm=256)
+        estimate = float(np.mean(hasher.signature(a) == hasher.signature(b)))
+        assert abs(estimate - jaccard(a, b)) < 0.1
+
+    def test_batch_signatures_match(self):
+        """まとめて計算した署名は1件ずつの署名と一致（空集合の行を含む）"""
+        sets = [char_shingles(q) for q in QUESTIONS]
+        hasher = MinHasher(num_perm=32)
+        expected = np.vstack([hasher.signature(s) for s in sets])
+        assert (hasher.signatures(sets, block_shingles=20) == expected).all()
+
+    def test_optimal_bands(self):
+        bands, rows = optimal_bands(0.7, 128)
+        assert bands * rows <= 128
+        # 閾値付近で候補になる確率が 0.5 前後
+        assert 0.55 < (1 / bands) ** (1 / rows) < 0.85
+
+
+class TestQADeduplicator:
+    """QADeduplicator のテスト"""
+
+    def test_clusters_keep_first(self):
+        """各クラスタは最初に出現した行を残し、空テキストは対象外"""
+        df = pd.DataFrame({"question": QUESTIONS, "answer": ["a"] * len(QUESTIONS)})
+        kept, report = QADeduplicator(threshold=0.6).deduplicate(df)
+
+        assert kept.index.tolist() == [0, 1, 3, 5]
+        assert report.removed == 2
+        assert [(c["keep"]["row"], [r["row"] for r in c["removed"]]) for c in report.clusters] == [(0, [2]), (1, [4])]
+
+    def test_embedding_confirmation(self):
+        """Embedding のコサイン類似度が閾値未満の組は重複にしない"""
+        def embed(texts):
+            return [[1.0, 0.0] if "機械学習" in t else [0.0, 1.0] if "BERT" in t else [0.6, 0.8] for t in texts]
+
+        dedup = QADeduplicator(threshold=0.6, embed_fn=embed, cosine_threshold=0.99)
+        pairs, _ = dedup.find_duplicate_pairs(QUESTIONS)
+        assert [(i, j) for i, j, _ in pairs] == [(0, 2), (1, 4)]
+
+        dedup.cosine_threshold = 1.01
+        assert dedup.find_duplicate_pairs(QUESTIONS)[0] == []
+
+    def test_exact_duplicates_scale_linearly(self):
+        """同一テキストが大量にあっても候補の組は件数に比例"""
+        texts = ["同じ質問ですか？"] * 500 + ["別の質問です"]
+        pairs, n_candidates = QADeduplicator().find_duplicate_pairs(texts)
+        assert n_candidates < 2 * 500
+        clusters, report = QADeduplicator().cluster(texts)
+        assert len(clusters) == 1 and report.removed == 499
+
+
+class TestDedupCsvFiles:
+    """dedup_csv_files のテスト"""
+
+    def test_cross_file(self, tmp_path):
+        """ファイル横断では先のファイルの行を残し、ファイルごとにCSVを出力"""
+        first = tmp_path / "a02_qa.csv"
+        second = tmp_path / "a10_qa.csv"
+        pd.DataFrame({"question": QUESTIONS[:2], "answer": ["x", "y"]}).to_csv(first, index=False)
+        pd.DataFrame({"Question": [QUESTIONS[2], QUESTIONS[3]], "Answer": ["x", "z"]}).to_csv(second, index=False)
+
+        out = tmp_path / "dedup"
+        reports = dedup_csv_files([str(first), str(second)], output_dir=str(out), cross_file=True)
+
+        assert reports["*"].removed == 1
+        assert pd.read_csv(out / "a02_qa_dedup.csv")["question"].tolist() == QUESTIONS[:2]
+        assert pd.read_csv(out / "a10_qa_dedup.csv")["question"].tolist() == [QUESTIONS[3]]
+        report = json.loads((out / "cross_file_dedup_report.json").read_text(encoding="utf-8"))
+        assert report["clusters"][0]["removed"][0]["source"] == str(second)
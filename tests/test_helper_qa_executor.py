@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_qa_executor.py - Q/A生成の非同期実行器のテスト
+==========================================================
+"""
+
+import threading
+import time
+
+import pytest
+
+from helper_qa_executor import AsyncQAExecutor
+from helper_qa_journal import QAJournal
+from helper_rate_limiter import InMemoryTokenBucket, RateLimiter
+
+
+def _chunks(n):
+    return [{"id": f"c{i}", "text": f"text {i}"} for i in range(n)]
+
+
+def _batches(chunks, size):
+    return [chunks[i:i + size] for i in range(0, len(chunks), size)]
+
+
+def _qa(chunk):
+    return {"question": f"Q {chunk['id']}", "answer": "A", "source_chunk_id": chunk["id"]}
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter(InMemoryTokenBucket())
+
+
+def _executor(generate_fn, limiter, **kwargs):
+    kwargs.setdefault("token_count_fn", lambda texts: [1] * len(texts))
+    kwargs.setdefault("retry_base_delay", 0.0)
+    return AsyncQAExecutor(generate_fn, rate_limiter=limiter, **kwargs)
+
+
+class TestAsyncQAExecutor:
+    """AsyncQAExecutor のテスト"""
+
+    def test_concurrent_and_ordered(self, limiter):
+        """同時実行数の上限内で並行し、結果は入力順"""
+        lock = threading.Lock()
+        active = {"now": 0, "max": 0}
+
+        def generate(batch):
+            with lock:
+                active["now"] += 1
+                active["max"] = max(active["max"], active["now"])
+            # 後のバッチほど早く終わる
+            time.sleep(0.02 * (10 - int(batch[0]["id"][1:])) / 10)
+            with lock:
+                active["now"] -= 1
+            return [_qa(c) for c in batch]
+
+        chunks = _chunks(10)
+        executor = _executor(generate, limiter, concurrency=3)
+        results = executor.run(_batches(chunks, 2))
+
+        assert [qa["source_chunk_id"] for qa in results] == [c["id"] for c in chunks]
+        assert 1 < active["max"] <= 3
+        assert executor.stats.generated == 5
+
+    def test_retry_then_fail(self, limiter):
+        """空レスポンス・例外はリトライし、上限に達したバッチは空で返す"""
+        calls = {"c0": 0, "c1": 0}
+
+        def generate(batch):
+            cid = batch[0]["id"]
+            calls[cid] += 1
+            if cid == "c0" and calls[cid] == 1:
+                raise RuntimeError("429")
+            return [_qa(batch[0])] if cid == "c0" else []
+
+        executor = _executor(generate, limiter, concurrency=2, max_retries=3)
+        results = executor.run(_batches(_chunks(2), 1))
+
+        assert [qa["source_chunk_id"] for qa in results] == ["c0"]
+        assert calls == {"c0": 2, "c1": 3}
+        assert (executor.stats.retries, executor.stats.failed) == (3, 1)
+
+    def test_journal_resume(self, limiter, tmp_path):
+        """中断後の再実行では完了済みチャンクを呼び出さずにジャーナルから返す"""
+        path = str(tmp_path / "journal.jsonl")
+        chunks = _chunks(4)
+
+        def first_run(batch):
+            return [] if batch[0]["id"] == "c2" else [_qa(c) for c in batch]
+
+        _executor(first_run, limiter, max_retries=1, journal=QAJournal(path)).run(_batches(chunks, 1))
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"type": "done", "chunk_id": "c3", "qa_pa')  # 書き込み途中の行
+
+        called = []
+
+        def second_run(batch):
+            called.append(batch[0]["id"])
+            return [_qa(c) for c in batch]
+
+        executor = _executor(second_run, limiter, journal=QAJournal(path))
+        results = executor.run(_batches(chunks, 1))
+
+        assert called == ["c2"]
+        assert [qa["source_chunk_id"] for qa in results] == ["c0", "c1", "c2", "c3"]
+        assert executor.stats.resumed == 3
+        assert set(QAJournal(path).completed) == {"c0", "c1", "c2", "c3"}
+
+
+class TestAcquireAsync:
+    """非同期のレート制限取得のテスト"""
+
+    def test_waits_without_blocking(self):
+        """RPM不足時は補充まで待機する"""
+        import asyncio
+        from helper_rate_limiter import RateLimits
+
+        bucket = InMemoryTokenBucket()
+        limits = RateLimits(rpm=600, tpm=10 ** 6)
+
+        async def run():
+            return [await bucket.acquire_async("k", limits) for _ in range(601)]
+
+        waits = asyncio.run(run())
+        assert waits[0] < 0.05 and waits[-1] >= 0.09
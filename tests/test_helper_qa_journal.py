@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_qa_journal.py - Q/A生成ジャーナルのテスト
+=====================================================
+"""
+
+import json
+import os
+
+from helper_qa_journal import QAJournal
+
+
+def _chunks(n):
+    return [{"id": f"c{i}", "text": f"text {i}"} for i in range(n)]
+
+
+def _qa(chunk):
+    return {"question": f"Q {chunk['id']}", "answer": "A", "source_chunk_id": chunk["id"]}
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestQAJournal:
+    """QAJournal のテスト"""
+
+    def test_resume_skips_completed(self, tmp_path):
+        """再開時は完了済みチャンクを pending から除き、Q/Aを入力順に返す"""
+        path = str(tmp_path / "journal.jsonl")
+        chunks = _chunks(3)
+        with QAJournal(path) as journal:
+            journal.record(chunks[:2], [_qa(chunks[1]), _qa(chunks[0])])
+
+        with QAJournal(path) as journal:
+            assert journal.pending(chunks) == [chunks[2]]
+            assert [qa["source_chunk_id"] for qa in journal.all_pairs(chunks)] == ["c0", "c1"]
+
+    def test_failed_and_changed_chunks_are_pending(self, tmp_path):
+        """失敗・Q/Aなし・本文が変わったチャンクは再投入対象"""
+        path = str(tmp_path / "journal.jsonl")
+        chunks = _chunks(3)
+        with QAJournal(path) as journal:
+            journal.record(chunks[:2], [_qa(chunks[0])])
+            journal.record_failure(["c2"], "timeout")
+            assert set(journal.failed) == {"c1", "c2"}
+
+        changed = dict(chunks[0], text="edited")
+        with QAJournal(path) as journal:
+            assert [c["id"] for c in journal.pending([changed] + chunks[1:])] == ["c0", "c1", "c2"]
+
+    def test_failure_does_not_override_completed(self, tmp_path):
+        """完了済みチャンクへの後からの失敗記録は無視する"""
+        path = str(tmp_path / "journal.jsonl")
+        chunk = _chunks(1)[0]
+        with QAJournal(path) as journal:
+            journal.record([chunk], [_qa(chunk)])
+            journal.record_failure(["c0"], "duplicate task")
+
+        assert QAJournal(path).is_done(chunk)
+
+    def test_torn_tail_is_skipped(self, tmp_path):
+        """書き込み途中の末尾行は読み飛ばし、次の記録は新しい行に書く"""
+        path = str(tmp_path / "journal.jsonl")
+        chunks = _chunks(2)
+        with QAJournal(path) as journal:
+            journal.record(chunks[:1], [_qa(chunks[0])])
+        with open(path, "a", encoding="utf-8") as f:
+            f.write('{"type": "done", "chunk_id": "c1", "qa_pa')
+
+        with QAJournal(path) as journal:
+            assert journal.pending(chunks) == [chunks[1]]
+            journal.record(chunks[1:], [_qa(chunks[1])])
+
+        assert set(QAJournal(path).completed) == {"c0", "c1"}
+
+    def test_compact_rewrites_and_snapshots(self, tmp_path):
+        """compact_every 件ごとに最新の記録だけに書き直し、スナップショットを出力"""
+        path = str(tmp_path / "journal.jsonl")
+        chunks = _chunks(4)
+        snapshots = []
+        with QAJournal(path, meta={"model": "m"}, compact_every=2, snapshot_fn=snapshots.append) as journal:
+            journal.record_failure(["c0"], "timeout")
+            journal.record(chunks[:1], [_qa(chunks[0])])
+            journal.record(chunks[1:2], [_qa(chunks[1])])
+            journal.record(chunks[2:3], [_qa(chunks[2])])
+
+        records = _lines(path)
+        assert [r["type"] for r in records] == ["meta", "done", "done", "done"]
+        assert records[0]["model"] == "m"
+        assert len(snapshots) == 1
+        assert [qa["source_chunk_id"] for qa in snapshots[0]] == ["c0", "c1"]
+
+    def test_no_resume_backs_up_existing(self, tmp_path):
+        """resume=False では既存のジャーナルを退避して新規に始める"""
+        path = str(tmp_path / "journal.jsonl")
+        chunk = _chunks(1)[0]
+        with QAJournal(path) as journal:
+            journal.record([chunk], [_qa(chunk)])
+
+        with QAJournal(path, resume=False) as journal:
+            assert journal.pending([chunk]) == [chunk]
+
+        backups = [name for name in os.listdir(tmp_path) if name.endswith(".bak")]
+        assert len(backups) == 1
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_rate_limiter.py - レート制限のテスト
+================================================
+"""
+
+import pytest
+
+from helper_rate_limiter import (
+    InMemoryTokenBucket,
+    RateLimiter,
+    RateLimitTimeout,
+    RateLimits,
+    TokenBucket,
+    get_rate_limits,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestInMemoryTokenBucket:
+    """InMemoryTokenBucketのテスト"""
+
+    def test_request_bucket(self):
+        """RPM上限に達すると補充までの待機秒数を返す"""
+        clock = FakeClock()
+        bucket = InMemoryTokenBucket(clock=clock)
+        limits = RateLimits(rpm=60, tpm=100000)
+
+        for _ in range(60):
+            assert bucket.try_acquire("gemini:m", limits, 1, 0) == 0.0
+        assert bucket.try_acquire("gemini:m", limits, 1, 0) == pytest.approx(1.0)
+
+        clock.now += 1.0
+        assert bucket.try_acquire("gemini:m", limits, 1, 0) == 0.0
+
+    def test_token_bucket_is_atomic(self):
+        """TPM不足時はRPMも消費しない"""
+        clock = FakeClock()
+        bucket = InMemoryTokenBucket(clock=clock)
+        limits = RateLimits(rpm=10, tpm=600)
+
+        assert bucket.try_acquire("k", limits, 1, 600) == 0.0
+        assert bucket.try_acquire("k", limits, 1, 300) == pytest.approx(30.0)
+        clock.now += 30.0
+        assert bucket.try_acquire("k", limits, 1, 300) == 0.0
+
+    def test_keys_are_independent(self):
+        """プロバイダー・モデルごとに別バケット"""
+        bucket = InMemoryTokenBucket(clock=FakeClock())
+        limits = RateLimits(rpm=1, tpm=1000)
+
+        assert bucket.try_acquire("gemini:a", limits, 1, 0) == 0.0
+        assert bucket.try_acquire("gemini:b", limits, 1, 0) == 0.0
+        assert bucket.try_acquire("gemini:a", limits, 1, 0) > 0
+
+    def test_acquire_timeout(self):
+        """待機が timeout を超える場合は例外"""
+        bucket = InMemoryTokenBucket(clock=FakeClock())
+        limits = RateLimits(rpm=1, tpm=1000)
+        bucket.acquire("k", limits)
+
+        with pytest.raises(RateLimitTimeout):
+            bucket.acquire("k", limits, timeout=1.0)
+
+
+class TestRateLimiter:
+    """RateLimiterのテスト"""
+
+    def test_limits_lookup(self):
+        """OpenAIはOPENAI_CONFIG、Geminiは設定テーブルから上限を取得"""
+        pytest.importorskip("celery")
+        openai_limits = get_rate_limits("openai", "gpt-4o-mini")
+        gemini_limits = get_rate_limits("gemini", "gemini-2.0-flash-001")
+
+        assert openai_limits.rpm == int(500 * 0.9)
+        assert gemini_limits.rpm == int(2000 * 0.9)
+
+    def test_falls_back_to_memory_on_backend_error(self):
+        """バックエンド障害時はプロセス内バケットで継続"""
+        class BrokenBucket(TokenBucket):
+            def try_acquire(self, key, limits, requests, tokens):
+                raise ConnectionError("redis down")
+
+        limiter = RateLimiter(BrokenBucket())
+        assert limiter.acquire("gemini", "gemini-2.0-flash", tokens=10) == pytest.approx(0.0, abs=0.1)
+        assert isinstance(limiter.bucket, InMemoryTokenBucket)
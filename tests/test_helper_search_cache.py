@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_search_cache.py - RAG検索キャッシュのテスト
+========================================================
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from helper_collection_registry import CollectionRegistry
+import helper_search_cache
+from helper_search_cache import (
+    SearchCache,
+    TTLCache,
+    add_collection_change_listener,
+    normalize_query,
+    notify_collection_changed,
+    remove_collection_change_listener,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestNormalizeQuery:
+    """クエリ正規化のテスト"""
+
+    def test_normalize(self):
+        """全角・大文字・連続空白を同一視する"""
+        assert normalize_query("  Ｐｙｔｈｏｎ　とは\n ") == "python とは"
+        assert normalize_query("python  とは") == normalize_query("PYTHON とは")
+
+
+class TestTTLCache:
+    """LRU + TTL キャッシュのテスト"""
+
+    def test_ttl_expiry(self):
+        """TTLを過ぎたエントリはミスになる"""
+        clock = FakeClock()
+        cache = TTLCache(maxsize=10, ttl=5, clock=clock)
+        cache.put("k", 1)
+        assert cache.get("k") == 1
+        clock.now = 6
+        assert cache.get("k") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_lru_eviction(self):
+        """上限を超えると最も古く使われたものから削除"""
+        cache = TTLCache(maxsize=2, ttl=100)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert len(cache) == 2
+
+
+class TestSearchCache:
+    """2段キャッシュのテスト"""
+
+    def test_vectors_cached_by_normalized_query(self):
+        """正規化して同じクエリはEmbeddingを再生成しない"""
+        cache = SearchCache()
+        calls = []
+
+        def embed(q):
+            calls.append(q)
+            return [0.1], {"indices": [1]}
+
+        assert cache.get_vectors("Python とは", embed)[2] is False
+        dense, sparse, hit = cache.get_vectors("python  とは", embed)
+        assert hit is True and dense == [0.1]
+        assert len(calls) == 1
+
+    def test_failed_embedding_not_cached(self):
+        """Embedding失敗（None）はキャッシュしない"""
+        cache = SearchCache()
+        cache.get_vectors("q", lambda q: (None, None))
+        assert len(cache.vectors) == 0
+
+    def test_version_changes_key(self):
+        """ポイント数や更新カウンタが変わると別キーになる"""
+        cache = SearchCache()
+        client = SimpleNamespace(get_collection=lambda name: SimpleNamespace(points_count=10))
+        v1 = cache.collection_version(client, "col")
+        cache.bump_version("col")
+        v2 = cache.collection_version(client, "col")
+        assert cache.result_key("col", v1, "q", 3) != cache.result_key("col", v2, "q", 3)
+
+    def test_notify_collection_changed(self, monkeypatch):
+        """登録・削除の通知で共有キャッシュのバージョンが進み、リスナーが呼ばれる（ポイント数が同じでも）"""
+        cache = SearchCache()
+        monkeypatch.setattr(helper_search_cache, "_search_cache", cache)
+        client = SimpleNamespace(get_collection=lambda name: SimpleNamespace(points_count=10))
+        notified = []
+        add_collection_change_listener(notified.append)
+        try:
+            v1 = cache.collection_version(client, "col")
+            notify_collection_changed("col")
+            assert cache.collection_version(client, "col") != v1
+            assert notified == ["col"]
+        finally:
+            remove_collection_change_listener(notified.append)
+
+
+class TestSearchRagKnowledgeBase:
+    """search_rag_knowledge_base のキャッシュ連携テスト"""
+
+    @pytest.fixture
+    def tools(self, monkeypatch):
+        agent_tools = pytest.importorskip("agent_tools")
+        cache = SearchCache()
+        calls = {"embed": 0, "sparse": 0, "search": 0}
+
+        def search_collection(**kwargs):
+            calls["search"] += 1
+            return [{"score": 0.9, "payload": {"question": "Q", "answer": "A", "source": "s.csv"}}]
+
+        def embed_query(q):
+            calls["embed"] += 1
+            return [0.1, 0.2]
+
+        def embed_sparse(q):
+            calls["sparse"] += 1
+            return None
+
+        fake_client = SimpleNamespace(
+            get_collections=lambda: SimpleNamespace(collections=[SimpleNamespace(name="col")]),
+            get_collection=lambda name: SimpleNamespace(points_count=1),
+        )
+        monkeypatch.setattr(agent_tools, "client", fake_client)
+        monkeypatch.setattr(agent_tools, "collection_registry", CollectionRegistry(fake_client))
+        monkeypatch.setattr(agent_tools, "get_search_cache", lambda: cache)
+        monkeypatch.setattr(agent_tools, "RAG_CACHE_ENABLED", True)
+        monkeypatch.setattr(agent_tools, "search_collection", search_collection)
+        monkeypatch.setattr(agent_tools, "embed_query", embed_query)
+        monkeypatch.setattr(agent_tools, "embed_sparse_query_unified", embed_sparse)
+        agent_tools.clear_search_metrics()
+        yield agent_tools, calls
+        agent_tools.clear_search_metrics()
+
+    def test_failed_search_is_not_cached(self, tools, monkeypatch):
+        """検索エラー（on_error）で空になった結果はキャッシュせず、次の呼び出しはQdrantを検索する"""
+        agent_tools, calls = tools
+        outcomes = [None, [{"score": 0.9, "payload": {"question": "Q", "answer": "A", "source": "s.csv"}}]]
+
+        def flaky_search(**kwargs):
+            calls["search"] += 1
+            results = outcomes.pop(0)
+            if results is None:
+                kwargs["on_error"](ConnectionError("timeout"))
+                return []
+            return results
+
+        monkeypatch.setattr(agent_tools, "search_collection", flaky_search)
+        first = agent_tools.search_rag_knowledge_base("Python とは", "col")
+        second = agent_tools.search_rag_knowledge_base("Python とは", "col")
+
+        assert "[[NO_RAG_RESULT]]" in first
+        assert "Q: Q" in second
+        assert calls["search"] == 2
+        assert [m.result_cache_hit for m in agent_tools.get_search_metrics()] == [False, False]
+
+    def test_repeated_query_hits_result_cache(self, tools):
+        """2回目以降はEmbedding・検索を行わず、メトリクスにヒットが記録される"""
+        agent_tools, calls = tools
+        first = agent_tools.search_rag_knowledge_base("Python とは", "col")
+        second = agent_tools.search_rag_knowledge_base("python とは", "col")
+
+        assert first == second
+        assert calls == {"embed": 1, "sparse": 1, "search": 1}
+        metrics = agent_tools.get_search_metrics()
+        assert [m.result_cache_hit for m in metrics] == [False, True]
+        assert metrics[1].top_score == pytest.approx(0.9)
+        assert {"embed.dense", "embed.sparse", "qdrant.query"} <= set(metrics[0].stage_ms)
+        assert "qdrant.query" not in metrics[1].stage_ms
+        assert agent_tools.get_search_cache_stats()["metrics_result_hit_rate"] == pytest.approx(0.5)
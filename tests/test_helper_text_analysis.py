@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_text_analysis.py - チャンク解析結果の共有のテスト
+==============================================================
+"""
+
+import pytest
+
+import helper_text_analysis
+from helper_mecab import get_mecab_tokenizer
+from helper_text_analysis import AnalyzedDocument, TextAnalysisCache, analyze_text, analyze_texts
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = TextAnalysisCache(max_total_chars=100)
+    monkeypatch.setattr(helper_text_analysis, "_cache", cache)
+    return cache
+
+
+class TestAnalyzedDocument:
+    """AnalyzedDocument のテスト"""
+
+    def test_count_matches_str_count(self):
+        """出現回数は str.count と同じで、2回目以降はメモから返す"""
+        doc = AnalyzedDocument("AIとAIとAI")
+        assert doc.count("AI") == 3
+        assert doc.contains("と") and not doc.contains("ML")
+        assert doc._counts == {"AI": 3, "と": 2, "ML": 0}
+
+    def test_regex_terms_and_technical_terms(self):
+        """正規表現の候補語と専門用語候補"""
+        doc = AnalyzedDocument("ディープラーニングとBERTの自然言語処理")
+        assert doc.regex_terms == ("ディープラーニング", "BERT", "自然言語処理")
+        assert doc.technical_terms("ja") == ("ディープラーニング", "自然言語処理")
+        assert doc.term_frequencies["BERT"] == 1
+
+    def test_regex_sentences_for_english(self):
+        """英語は正規表現で文分割"""
+        doc = AnalyzedDocument("First one. Second one? Third!")
+        assert doc.sentences == ("First one.", "Second one?", "Third!")
+
+    def test_known_token_count_is_used(self):
+        """チャンク作成時に計測済みのトークン数はそのまま使う"""
+        assert AnalyzedDocument("abc", token_count=7).token_count == 7
+
+    def test_mecab_sentences_and_nouns_from_single_parse(self):
+        """文分割と複合名詞は1回の解析結果から作る"""
+        tokenizer = get_mecab_tokenizer()
+        if not tokenizer.available:
+            pytest.skip("MeCab辞書が利用できません")
+        tokenizer.clear_cache()
+        doc = AnalyzedDocument("自然言語処理の研究。機械学習の応用！")
+        assert doc.sentences == ("自然言語処理の研究。", "機械学習の応用！")
+        assert "自然言語処理" in doc.compound_nouns
+        assert tokenizer.cache_info()["misses"] == 1
+
+
+class TestAnalysisCache:
+    """analyze_text の共有メモのテスト"""
+
+    def test_same_text_returns_same_document(self, cache):
+        """同じテキストは同じ AnalyzedDocument、合計文字数の上限を超えると古いものから削除"""
+        doc = analyze_text("x" * 60)
+        assert analyze_text("x" * 60) is doc
+        assert analyze_text(doc) is doc
+        for t in ("a" * 20, "b" * 20, "c" * 20):
+            analyze_text(t)
+        assert analyze_text("x" * 60) is not doc
+        info = cache.cache_info()
+        assert info["total_chars"] <= 100
+        assert info["size"] == 3
+
+    def test_long_text_is_not_cached(self):
+        """メモ対象の最大文字数を超えるテキストは保持しない"""
+        cache = TextAnalysisCache(max_total_chars=100, max_cached_chars=10)
+        long_text = "長" * 11
+        assert cache.get(long_text) is not cache.get(long_text)
+        assert cache.cache_info()["size"] == 0
+
+    def test_shared_results_are_immutable(self, cache):
+        """共有される解析結果はタプルで、呼び出し元が書き換えられない"""
+        doc = analyze_text("BERTとGPT。RAGの応用。")
+        assert isinstance(doc.regex_terms, tuple)
+        assert isinstance(doc.sentences, tuple)
+        with pytest.raises(AttributeError):
+            doc.regex_terms.append("X")
+
+    def test_analyze_texts_counts_tokens_in_batch(self, cache, monkeypatch):
+        """トークン数は未計測のものだけまとめて計測"""
+        calls = []
+
+        class FakeEstimator:
+            def count_raw_batch(self, texts):
+                calls.append(list(texts))
+                return [len(t) for t in texts]
+
+        monkeypatch.setattr("helper_token_estimator.get_token_estimator", lambda: FakeEstimator())
+        analyze_text("known", token_count=1)
+        docs = analyze_texts(["known", "abc", "de"])
+        assert [d.token_count for d in docs] == [1, 3, 2]
+        assert calls == [["abc", "de"]]
+
+
+class TestConsumers:
+    """呼び出し元が解析結果を共有することのテスト"""
+
+    def test_complexity_and_keywords_share_document(self, cache, monkeypatch):
+        """複雑度分析とキーワード評価は同じ解析結果を使う"""
+        a02 = pytest.importorskip("a02_make_qa_para")
+        text = "トランスフォーマーの注意機構。トランスフォーマーの応用。"
+        analyze_text(text, token_count=20)
+
+        result = a02.analyze_chunk_complexity(text, lang="ja")
+        assert result["token_count"] == 20
+        assert result["sentence_count"] == 3
+        assert sorted(result["technical_terms"]) == ["トランスフォーマー", "注意機構"]
+
+        from regex_mecab import KeywordExtractor
+        extractor = KeywordExtractor(prefer_mecab=False)
+        assert extractor._calculate_keyword_score("トランスフォーマー", text) > 0
+        assert analyze_text(text)._counts["トランスフォーマー"] == 2
+        assert cache.cache_info()["misses"] == 1
+
+    def test_long_text_is_analyzed_once_per_extraction(self, cache, monkeypatch):
+        """メモされない長いテキストでも、1回の抽出・評価では解析結果を1つだけ作る"""
+        helper_rag_qa = pytest.importorskip("helper_rag_qa")
+        created = []
+
+        class CountingDocument(AnalyzedDocument):
+            def __init__(self, text, token_count=None):
+                created.append(text)
+                super().__init__(text, token_count)
+
+        monkeypatch.setattr(helper_text_analysis, "AnalyzedDocument", CountingDocument)
+        text = "トランスフォーマーの注意機構とBERTの自然言語処理。" * 20
+        assert len(text) > cache.max_total_chars
+
+        from regex_mecab import KeywordExtractor
+        KeywordExtractor(prefer_mecab=False).extract_with_details(text, top_n=5)
+        assert len(created) == 1
+
+        created.clear()
+        result = helper_rag_qa.BestKeywordSelector(prefer_mecab=False).extract_best(text, top_n=5)
+        assert result["keywords"]
+        assert len(created) == 1
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_token_estimator.py - ローカルトークン推定のテスト
+==============================================================
+"""
+
+import pytest
+
+import helper_token_estimator
+from helper_token_estimator import TokenEstimator
+
+
+class FakeEncoding:
+    """1文字=1トークンとして数えるテスト用エンコーディング"""
+
+    def encode_ordinary_batch(self, texts, num_threads=8):
+        return [list(t) for t in texts]
+
+
+@pytest.fixture
+def estimator(monkeypatch):
+    monkeypatch.setattr(helper_token_estimator.tiktoken, "get_encoding", lambda name: FakeEncoding())
+    return TokenEstimator(corrections={})
+
+
+class TestTokenEstimator:
+    """TokenEstimatorのテスト"""
+
+    def test_count_batch_keeps_order(self, estimator):
+        """バッチ計測は入力順で返る"""
+        assert estimator.count_batch(["abc", "", "abcdef"]) == [3, 0, 6]
+        assert estimator.count("") == 0
+
+    def test_correction_prefix_match(self, estimator):
+        """補正係数は完全一致、なければ最長の前方一致を使う"""
+        estimator.corrections.update({"gemini": 0.5, "gemini-2.0": 2.0})
+
+        assert estimator.correction_for("gemini-2.0-flash") == 2.0
+        assert estimator.correction_for("gemini-1.5-pro") == 0.5
+        assert estimator.correction_for("gpt-4o") == 1.0
+        assert estimator.count_batch(["abcd"], model="gemini-2.0-flash") == [8]
+
+    def test_calibrate_learns_ratio(self, estimator, temp_dir):
+        """リモート計測との比率を学習して保存・読み込みできる"""
+        texts = ["a" * 10, "b" * 20, "c" * 30]
+        ratio = estimator.calibrate("gemini-2.0-flash", texts, lambda t: len(t) // 2)
+
+        assert ratio == pytest.approx(0.5)
+        assert estimator.count("x" * 40, model="gemini-2.0-flash") == 20
+
+        path = temp_dir / "corrections.json"
+        estimator.save_corrections(str(path))
+        reloaded = TokenEstimator(corrections={})
+        reloaded.load_corrections(str(path))
+        assert reloaded.correction_for("gemini-2.0-flash") == pytest.approx(0.5)
+
+    def test_count_chunks_reuses_cached_tokens(self, estimator):
+        """計測済みの tokens は再利用し、未計測のチャンクだけ計測して保存する"""
+        estimator.corrections["gemini"] = 2.0
+        chunks = [{"text": "abc", "tokens": 10}, {"text": "abcd"}]
+
+        assert estimator.count_chunks(chunks) == [10, 4]
+        assert chunks[1]["tokens"] == 4
+        assert estimator.count_chunks(chunks, model="gemini-2.0-flash") == [20, 8]
+
+    def test_fallback_without_encoding(self, monkeypatch):
+        """エンコーディングを取得できない場合は文字種比率で推定"""
+        def unavailable(name):
+            raise OSError("network unavailable")
+
+        monkeypatch.setattr(helper_token_estimator.tiktoken, "get_encoding", unavailable)
+        estimator = TokenEstimator(corrections={})
+
+        assert estimator.count_batch(["日本語テキスト", "abcdefgh"]) == [3, 2]
+
+
+class TestEnsureCalibrated:
+    """ensure_calibrated のテスト"""
+
+    @pytest.fixture(autouse=True)
+    def shared(self, estimator, monkeypatch):
+        monkeypatch.setattr(helper_token_estimator, "_estimator", estimator)
+        monkeypatch.setattr(helper_token_estimator, "TOKEN_CORRECTIONS_PATH", None)
+        return estimator
+
+    def test_calibrates_once_per_model(self, shared, temp_dir):
+        """保存先がある場合、未学習のモデルだけ学習して保存する"""
+        path = str(temp_dir / "corrections.json")
+        calls = []
+
+        def remote(text):
+            calls.append(text)
+            return len(text) // 2
+
+        ratio = helper_token_estimator.ensure_calibrated("gemini-2.0-flash", ["a" * 10], remote, path=path)
+        assert ratio == pytest.approx(0.5)
+        assert helper_token_estimator.ensure_calibrated("gemini-2.0-flash", ["a" * 10], remote, path=path) is None
+        assert len(calls) == 1
+
+        reloaded = TokenEstimator(corrections={})
+        reloaded.load_corrections(path)
+        assert reloaded.correction_for("gemini-2.0-flash") == pytest.approx(0.5)
+
+    def test_skips_without_path_unless_forced(self, shared):
+        """保存先がなければ学習しない（force=True の場合は学習する）"""
+        remote = lambda text: len(text) * 2
+
+        assert helper_token_estimator.ensure_calibrated("gemini-2.0-flash", ["abc"], remote) is None
+        assert not shared.has_correction("gemini-2.0-flash")
+        assert helper_token_estimator.ensure_calibrated("gemini-2.0-flash", ["abc"], remote, force=True) == 2.0
+        assert shared.has_correction("gemini-2.0-flash")
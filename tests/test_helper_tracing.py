@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_helper_tracing.py - スパントレースのテスト
+===============================================
+"""
+
+import json
+import threading
+
+import pytest
+
+from helper_tracing import (
+    JSONLTraceExporter,
+    add_trace_exporter,
+    current_span,
+    remove_trace_exporter,
+    span,
+    summarize_traces,
+    trace,
+)
+
+
+class TestTrace:
+    """trace / span のテスト"""
+
+    def test_span_tree_and_noop_outside_trace(self):
+        """trace 内の span は子として記録し、trace 外の span は何もしない"""
+        with span("outside") as s:
+            assert s is None
+
+        with trace("agent_turn", input="q") as root:
+            with span("llm.generate", iteration=0):
+                pass
+            with span("react.iteration", iteration=1):
+                with span("tool") as tool:
+                    tool.set(hits=3)
+        assert current_span() is None
+
+        data = root.to_dict()
+        assert [c["name"] for c in data["children"]] == ["llm.generate", "react.iteration"]
+        assert data["children"][1]["children"][0]["attributes"] == {"hits": 3}
+        assert data["attributes"] == {"input": "q"}
+        assert data["duration_ms"] >= data["children"][1]["duration_ms"]
+
+    def test_error_is_recorded(self):
+        with pytest.raises(ValueError):
+            with trace("agent_turn") as root:
+                with span("qdrant.query"):
+                    raise ValueError("boom")
+        assert root.children[0].error == "ValueError: boom"
+        assert root.error == "ValueError: boom"
+
+    def test_threads_do_not_mix(self):
+        """並列に実行したターンのスパンは混ざらない"""
+        roots = {}
+
+        def worker(i):
+            with trace("agent_turn") as root:
+                for _ in range(50):
+                    with span(f"stage{i}"):
+                        pass
+            roots[i] = root
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for i, root in roots.items():
+            assert {c.name for c in root.children} == {f"stage{i}"}
+            assert len(root.children) == 50
+
+    def test_jsonl_exporter(self, tmp_path):
+        """終了したルートスパンだけを1行ずつ出力する"""
+        path = str(tmp_path / "traces.jsonl")
+        exporter = JSONLTraceExporter(path)
+        add_trace_exporter(exporter)
+        try:
+            for _ in range(2):
+                with trace("agent_turn"):
+                    with trace("nested"):
+                        pass
+        finally:
+            remove_trace_exporter(exporter)
+
+        with open(path, encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == 2
+        assert lines[0]["children"][0]["name"] == "nested"
+        assert lines[0]["trace_id"] != lines[1]["trace_id"]
+
+
+class TestSummarizeTraces:
+    """summarize_traces のテスト"""
+
+    def test_sums_per_turn_and_percentiles(self):
+        """同じターン内の同名スパンは合計してからパーセンタイルを計算する"""
+        traces = []
+        for i in range(1, 101):
+            traces.append({
+                "name": "agent_turn", "duration_ms": float(i * 3),
+                "children": [
+                    {"name": "llm.generate", "duration_ms": float(i), "children": []},
+                    {"name": "llm.generate", "duration_ms": float(i), "children": []},
+                ],
+            })
+
+        summary = summarize_traces(traces)
+
+        assert summary["llm.generate"]["turns"] == 100
+        assert summary["llm.generate"]["p50_ms"] == pytest.approx(101.0)
+        assert summary["llm.generate"]["p95_ms"] == pytest.approx(190.1)
+        assert summary["agent_turn"]["max_ms"] == 300.0
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_qdrant_client_async.py - AsyncQdrantClient 版の検索・アップサートのテスト
+==============================================================================
+インメモリの Qdrant（AsyncQdrantClient(":memory:")）を使います。
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from qdrant_client import AsyncQdrantClient, models
+
+import qdrant_client_wrapper as wrapper
+from helper_tracing import trace
+from qdrant_client_async import (
+    resolve_prefer_grpc,
+    run_sync,
+    search_collection_async,
+    search_collections_async,
+    upsert_points_async,
+)
+from tests.test_qdrant_client_wrapper import POINTS, QUERY, SPARSE
+
+
+async def _create(client, name, use_sparse):
+    await client.create_collection(
+        collection_name=name,
+        vectors_config=models.VectorParams(size=3, distance=models.Distance.COSINE),
+        sparse_vectors_config={"text-sparse": models.SparseVectorParams()} if use_sparse else None,
+    )
+    points = []
+    for pid, (dense, sparse) in POINTS.items():
+        vector = dense
+        if use_sparse:
+            vector = {
+                "": dense,
+                "text-sparse": models.SparseVector(indices=list(sparse), values=list(sparse.values())),
+            }
+        points.append(models.PointStruct(id=pid, vector=vector, payload={"question": f"Q{pid}"}))
+    await upsert_points_async(client, name, points, batch_size=1, max_concurrency=2)
+
+
+@pytest.fixture
+def client():
+    wrapper.invalidate_collection_capabilities()
+    async_client = AsyncQdrantClient(":memory:")
+
+    async def setup():
+        await _create(async_client, "hybrid", use_sparse=True)
+        await _create(async_client, "dense", use_sparse=False)
+    run_sync(setup())
+    yield async_client
+    wrapper.invalidate_collection_capabilities()
+
+
+class SlowUpsertClient:
+    """upsert の同時実行数を記録するクライアント"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def upsert(self, collection_name, points):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+
+
+class TestSearchCollectionAsync:
+    """search_collection_async のテスト"""
+
+    @pytest.mark.parametrize("fusion", ["rrf", "weighted", "dbsf"])
+    def test_same_results_as_sync_dispatch(self, client, fusion):
+        """search_collection に AsyncQdrantClient を渡すと async 版に委譲し、同じ結果になる"""
+        direct = run_sync(search_collection_async(client, "hybrid", QUERY, SPARSE, limit=3, fusion=fusion))
+        dispatched = wrapper.search_collection(client, "hybrid", QUERY, SPARSE, limit=3, fusion=fusion)
+
+        assert [r["id"] for r in direct] == [r["id"] for r in dispatched]
+        assert direct[0]["id"] == 1
+
+    def test_dense_collection_and_missing_collection(self, client):
+        """Sparseベクトルのないコレクションは Dense 検索、存在しないコレクションは on_error を呼んで空"""
+        errors = []
+        dense = run_sync(search_collection_async(client, "dense", QUERY, SPARSE, limit=2))
+        missing = run_sync(search_collection_async(client, "missing", QUERY, on_error=errors.append))
+
+        assert [r["id"] for r in dense] == [1, 2]
+        assert missing == []
+        assert len(errors) == 1
+
+    def test_multi_collection_records_spans(self, client):
+        """複数コレクションの検索はトレースのスパンを呼び出し元のターンに記録する"""
+        with trace("turn") as turn:
+            results = wrapper.search_collections(client, ["hybrid", "dense"], QUERY, SPARSE, limit=3, fusion="weighted")
+
+        assert results[0]["payload"] == {"question": "Q1"}
+        assert results[0]["also_in"]
+        assert sorted(c.attributes["collection"] for c in turn.children) == ["dense", "hybrid"]
+
+
+class TestUpsertPointsAsync:
+    """upsert_points_async のテスト"""
+
+    def test_limits_concurrency(self):
+        points = [models.PointStruct(id=i, vector=[1.0, 0.0, 0.0]) for i in range(10)]
+        fake = SlowUpsertClient()
+
+        count = run_sync(upsert_points_async(fake, "c", points, batch_size=2, max_concurrency=3))
+
+        assert count == 10
+        assert fake.max_in_flight == 3
+
+    def test_threads_overlap_on_shared_loop(self):
+        """複数スレッドからの run_sync は共有イベントループ上で並行する"""
+        fake = SlowUpsertClient(delay=0.2)
+        points = [models.PointStruct(id=1, vector=[1.0, 0.0, 0.0])]
+        threads = [
+            threading.Thread(target=lambda: run_sync(upsert_points_async(fake, "c", points))) for _ in range(4)
+        ]
+
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert fake.max_in_flight == 4
+        assert time.perf_counter() - started < 0.6
+
+
+class TestResolvePreferGrpc:
+    def test_disabled_and_unreachable(self):
+        assert resolve_prefer_grpc("http://localhost:6333", setting="false") is False
+        # 接続できないポートは REST にフォールバック
+        assert resolve_prefer_grpc("http://127.0.0.1:6333", grpc_port=1, setting="auto") is False
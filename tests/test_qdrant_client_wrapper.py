@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_qdrant_client_wrapper.py - 検索（Dense / Hybrid）のテスト
+==============================================================
+インメモリの Qdrant（QdrantClient(":memory:")）で検索します。
+"""
+
+import warnings
+
+import pytest
+from qdrant_client import QdrantClient, models
+
+import qdrant_client_wrapper as wrapper
+from qdrant_client_wrapper import (
+    CollectionCapabilities,
+    fuse_hybrid_results,
+    get_collection_capabilities,
+    merge_collection_results,
+    search_collection,
+    search_collections,
+)
+
+# id: (Denseベクトル, Sparseベクトルの{index: value})
+POINTS = {
+    1: ([1.0, 0.0, 0.0], {0: 1.0}),
+    2: ([0.9, 0.1, 0.0], {1: 1.0}),
+    3: ([0.0, 1.0, 0.0], {0: 2.0, 1: 0.5}),
+    4: ([0.0, 0.0, 1.0], {2: 1.0}),
+}
+# 正規化後は "hybrid" の低スコアの結果が上位に並ぶ複数コレクションの検索結果
+MIXED_SCALE_RESULTS = {
+    "hybrid": [
+        {"id": 1, "score": 0.45, "payload": {"question": "Q1"}},
+        {"id": 2, "score": 0.44, "payload": {"question": "Q2"}},
+        {"id": 3, "score": 0.10, "payload": {"question": "Q3"}},
+    ],
+    "dense": [
+        {"id": 4, "score": 0.90, "payload": {"question": "Q4"}},
+        {"id": 5, "score": 0.80, "payload": {"question": "Q5"}},
+        {"id": 6, "score": 0.10, "payload": {"question": "Q6"}},
+    ],
+}
+QUERY = [1.0, 0.0, 0.0]
+SPARSE = models.SparseVector(indices=[0], values=[1.0])
+
+
+class CountingClient:
+    """Qdrantクライアントへのリクエスト数を数えるラッパー"""
+
+    def __init__(self, client):
+        self._client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.calls.append(name)
+            return attr(*args, **kwargs)
+        return call
+
+
+def _create(client, name, use_sparse):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # ローカルモードのペイロード索引の警告
+        wrapper.create_or_recreate_collection(client, name, recreate=True, vector_size=3, use_sparse=use_sparse)
+    points = []
+    for pid, (dense, sparse) in POINTS.items():
+        vector = dense
+        if use_sparse:
+            vector = {
+                "": dense,
+                "text-sparse": models.SparseVector(indices=list(sparse), values=list(sparse.values())),
+            }
+        points.append(models.PointStruct(id=pid, vector=vector, payload={"question": f"Q{pid}"}))
+    client.upsert(collection_name=name, points=points)
+
+
+@pytest.fixture
+def client():
+    wrapper.invalidate_collection_capabilities()
+    raw = QdrantClient(":memory:")
+    _create(raw, "hybrid", use_sparse=True)
+    _create(raw, "dense", use_sparse=False)
+    yield CountingClient(raw)
+    wrapper.invalidate_collection_capabilities()
+
+
+class TestCollectionCapabilities:
+    """ベクトル構成の取得とキャッシュのテスト"""
+
+    def test_detects_sparse_and_caches(self, client):
+        """Sparseベクトルの有無を判定し、2回目以降は get_collection を呼ばない"""
+        assert get_collection_capabilities(client, "hybrid") == CollectionCapabilities(None, "text-sparse")
+        assert get_collection_capabilities(client, "dense") == CollectionCapabilities(None, None)
+        get_collection_capabilities(client, "hybrid")
+        assert client.calls.count("get_collection") == 2
+
+
+class TestSearchCollection:
+    """search_collection のテスト"""
+
+    def test_dense_only_collection_skips_hybrid_request(self, client):
+        """Sparseベクトルのないコレクションには失敗するHybridリクエストを送らない"""
+        results = search_collection(client, "dense", QUERY, sparse_vector=SPARSE, limit=2)
+
+        assert [r["id"] for r in results] == [1, 2]
+        assert client.calls == ["get_collection", "query_points"]
+
+    def test_weighted_fusion_uses_one_batch_request(self, client):
+        """weighted はDense/Sparseを1回の query_batch_points で取得し、alpha で順位が変わる"""
+        get_collection_capabilities(client, "hybrid")
+        client.calls.clear()
+
+        dense_heavy = search_collection(client, "hybrid", QUERY, SPARSE, limit=2, hybrid_alpha=1.0, fusion="weighted")
+        sparse_heavy = search_collection(client, "hybrid", QUERY, SPARSE, limit=2, hybrid_alpha=0.0, fusion="weighted")
+
+        assert client.calls == ["query_batch_points", "query_batch_points"]
+        assert [r["id"] for r in dense_heavy] == [1, 2]
+        assert [r["id"] for r in sparse_heavy] == [3, 1]
+        assert dense_heavy[0]["payload"] == {"question": "Q1"}
+
+    @pytest.mark.parametrize("fusion", ["rrf", "dbsf"])
+    def test_other_fusions(self, client, fusion):
+        """rrf・dbsf でも両方に現れる点が上位になり、Dense検索のスコアを dense_score に残す"""
+        results = search_collection(client, "hybrid", QUERY, SPARSE, limit=3, fusion=fusion)
+
+        assert results[0]["id"] == 1
+        assert {r["id"] for r in results} >= {1, 3}
+        assert results[0]["dense_score"] == pytest.approx(1.0)
+
+    def test_unknown_fusion(self, client):
+        with pytest.raises(ValueError):
+            search_collection(client, "hybrid", QUERY, SPARSE, fusion="max")
+
+
+class TestFuseHybridResults:
+    """fuse_hybrid_results のテスト"""
+
+    def test_weighted_alpha(self):
+        """片方にしか現れない結果はもう片方を0として加重平均する"""
+        dense = [{"id": "a", "score": 0.9, "payload": {}}, {"id": "b", "score": 0.5, "payload": {}}]
+        sparse = [{"id": "b", "score": 12.0, "payload": {}}, {"id": "c", "score": 2.0, "payload": {}}]
+
+        results = fuse_hybrid_results(dense, sparse, alpha=0.6, method="weighted", limit=3)
+
+        assert [r["id"] for r in results] == ["a", "b", "c"]
+        assert [r["score"] for r in results] == pytest.approx([0.6, 0.4, 0.0])
+        assert [r["dense_score"] for r in results] == [0.9, 0.5, None]
+
+    def test_rrf_matches_qdrant(self):
+        """rrf は Qdrant の RRF と同じく 1 / (順位 + 2) を足し、alpha は使わない"""
+        dense = [{"id": "a", "score": 0.9, "payload": {}}, {"id": "b", "score": 0.8, "payload": {}}]
+        sparse = [{"id": "b", "score": 12.0, "payload": {}}, {"id": "c", "score": 2.0, "payload": {}}]
+
+        results = fuse_hybrid_results(dense, sparse, alpha=0.9, method="rrf", limit=3)
+
+        assert [r["id"] for r in results] == ["b", "a", "c"]
+        assert [r["score"] for r in results] == pytest.approx([1 / 3 + 1 / 2, 1 / 2, 1 / 3])
+
+
+class TestSearchCollections:
+    """複数コレクションの検索・統合のテスト"""
+
+    def test_merges_and_dedups_across_collections(self, client):
+        """同じQ/Aは1件にまとめ、もう一方のコレクションを also_in に記録する"""
+        results = search_collections(client, ["hybrid", "dense"], QUERY, SPARSE, limit=3, fusion="weighted")
+
+        assert len(results) == 3
+        assert results[0]["payload"] == {"question": "Q1"}
+        assert results[0]["normalized_score"] == pytest.approx(1.0)
+        assert results[0]["also_in"] == ["dense" if results[0]["collection"] == "hybrid" else "hybrid"]
+        assert len({r["payload"]["question"] for r in results}) == 3
+        assert client.calls.count("get_collection") == 2
+
+    def test_error_in_one_collection(self, client):
+        """存在しないコレクションは on_error を呼び、他のコレクションの結果を返す"""
+        errors = []
+        results = search_collections(
+            client, ["dense", "missing"], QUERY, limit=2, on_error=lambda name, e: errors.append(name)
+        )
+
+        assert [r["collection"] for r in results] == ["dense", "dense"]
+        assert errors == ["missing"]
+
+
+class TestMergeCollectionResults:
+    """merge_collection_results のテスト"""
+
+    def test_normalizes_per_collection(self):
+        """スコアの尺度が違うコレクションでも、コレクション内の順位で比較する"""
+        results = merge_collection_results({
+            "a": [{"id": 1, "score": 0.9, "payload": {"question": "x"}}, {"id": 2, "score": 0.8, "payload": {"question": "y"}}],
+            "b": [{"id": 1, "score": 30.0, "payload": {"question": "z"}}, {"id": 2, "score": 10.0, "payload": {"question": "x"}}],
+        }, limit=3)
+
+        assert [(r["collection"], r["id"]) for r in results] == [("b", 1), ("a", 1), ("a", 2)]
+        assert results[1]["also_in"] == ["b"]
+        assert results[2]["normalized_score"] == pytest.approx(0.0)
+
+    def test_score_filter_applied_before_limit(self):
+        """元のスコアによる絞り込みは上限で切る前に適用する"""
+        results = merge_collection_results(
+            MIXED_SCALE_RESULTS, limit=3, score_filter=lambda hit: hit["score"] >= 0.5
+        )
+
+        assert [r["payload"]["question"] for r in results] == ["Q4", "Q5"]
+        assert all(r["collection"] == "dense" for r in results)
+
+
+class TestAgentScoreThreshold:
+    """Hybrid検索の結果に対するエージェントのスコア閾値のテスト"""
+
+    @pytest.fixture
+    def agent_tools(self, client, monkeypatch):
+        agent_tools = pytest.importorskip("agent_tools")
+        from helper_collection_registry import CollectionRegistry
+        monkeypatch.setattr(agent_tools, "client", client)
+        monkeypatch.setattr(agent_tools, "_search_client", lambda: client)
+        monkeypatch.setattr(agent_tools, "collection_registry", CollectionRegistry(client))
+        monkeypatch.setattr(agent_tools, "RAG_CACHE_ENABLED", False)
+        monkeypatch.setattr(agent_tools, "embed_query", lambda q: QUERY)
+        monkeypatch.setattr(agent_tools, "embed_sparse_query_unified", lambda q: SPARSE)
+        monkeypatch.setattr(wrapper, "DEFAULT_HYBRID_FUSION", "rrf")
+        agent_tools.clear_search_metrics()
+        yield agent_tools
+        agent_tools.clear_search_metrics()
+
+    def test_threshold_uses_dense_score_not_rrf(self, agent_tools):
+        """RRF の統合スコアでは2位以下が閾値を下回るが、閾値は Dense のスコアに適用する"""
+        from config import AgentConfig
+
+        output = agent_tools.search_rag_knowledge_base("query", "hybrid")
+
+        # Q2 は Dense のみ2位（RRF 1/3）、Q3 は Sparse のみ上位（Dense のコサイン類似度 0）
+        assert 1 / 3 < AgentConfig.RAG_SCORE_THRESHOLD
+        assert "Q: Q1" in output and "Q: Q2" in output
+        assert "Q: Q3" not in output
+        metrics = agent_tools.get_search_metrics()[-1]
+        assert metrics.filtered_results == 2
+        assert metrics.top_score == pytest.approx(1.0)
+
+    def test_sparse_only_hit_is_not_filtered(self, agent_tools, monkeypatch):
+        """Sparse検索のみがヒットした結果（dense_score なし）は閾値で除外しない"""
+        sparse_only = {
+            "id": 3, "score": 0.5, "dense_score": None,
+            "payload": {"question": "Q3", "answer": "A3", "source": "s"},
+        }
+        low_dense = {
+            "id": 4, "score": 0.25, "dense_score": 0.0,
+            "payload": {"question": "Q4", "answer": "A4", "source": "s"},
+        }
+        monkeypatch.setattr(
+            agent_tools, "search_collection", lambda **kwargs: [sparse_only, low_dense]
+        )
+
+        output = agent_tools.search_rag_knowledge_base("query", "hybrid")
+
+        assert "Q: Q3" in output
+        assert "Q: Q4" not in output
+        metrics = agent_tools.get_search_metrics()[-1]
+        assert metrics.filtered_results == 1
+        assert metrics.top_score == pytest.approx(0.5)
+
+    def test_multi_collection_threshold_before_limit(self, agent_tools, monkeypatch):
+        """複数コレクションの検索では、上位 RAG_SEARCH_LIMIT 件に切る前に閾値を適用する"""
+        def fake_search_collections(**kwargs):
+            return merge_collection_results(
+                MIXED_SCALE_RESULTS, limit=kwargs["limit"], score_filter=kwargs["score_filter"]
+            )
+
+        monkeypatch.setattr(agent_tools, "search_collections", fake_search_collections)
+
+        output = agent_tools.search_rag_knowledge_base("query", collection_names=["hybrid", "dense"])
+
+        assert "Q: Q4" in output and "Q: Q5" in output
+        assert "Q: Q1" not in output
+        assert agent_tools.get_search_metrics()[-1].filtered_results == 2
+
+    def test_multi_collection_all_below_threshold(self, agent_tools, monkeypatch):
+        """複数コレクションで閾値以上の結果がない場合は、閾値未満であることを返す"""
+        low = {name: [dict(hit, score=hit["score"] / 10) for hit in hits]
+               for name, hits in MIXED_SCALE_RESULTS.items()}
+
+        def fake_search_collections(**kwargs):
+            return merge_collection_results(low, limit=kwargs["limit"], score_filter=kwargs["score_filter"])
+
+        monkeypatch.setattr(agent_tools, "search_collections", fake_search_collections)
+
+        output = agent_tools.search_rag_knowledge_base("query", collection_names=["hybrid", "dense"])
+
+        assert output.startswith("[[NO_RAG_RESULT_LOW_SCORE]]")
+        metrics = agent_tools.get_search_metrics()[-1]
+        assert metrics.filtered_results == 0
+        assert metrics.top_score == pytest.approx(0.09)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+test_qdrant_ingest_pipeline.py - ストリーミング登録パイプラインのテスト
+=========================================================================
+"""
+
+import threading
+import time
+
+import pandas as pd
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+
+from qdrant_ingest_pipeline import (
+    fetch_point_ids,
+    iter_csv_batches,
+    make_point_id,
+    qa_point_ids,
+    run_delta_ingest,
+    run_ingest_pipeline,
+)
+
+
+class FakeQdrantClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def upsert(self, collection_name, points, wait=True):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+            self.calls.append((collection_name, [p.id for p in points], wait))
+
+
+class FakeStoreClient(FakeQdrantClient):
+    """scroll / delete に対応したインメモリのQdrantクライアント"""
+
+    def __init__(self, ids=()):
+        super().__init__()
+        self.store = set(ids)
+        self.deleted = []
+
+    def upsert(self, collection_name, points, wait=True):
+        super().upsert(collection_name, points, wait)
+        self.store.update(p.id for p in points)
+
+    def scroll(self, collection_name, scroll_filter=None, limit=10, offset=None, with_payload=True, with_vectors=False):
+        ids = sorted(self.store, key=str)
+        start = offset or 0
+        page = [models.Record(id=pid) for pid in ids[start:start + limit]]
+        next_offset = start + limit if start + limit < len(ids) else None
+        return page, next_offset
+
+    def delete(self, collection_name, points_selector, wait=True):
+        self.deleted.extend(points_selector.points)
+        self.store.difference_update(points_selector.points)
+
+
+def _build_qa_points(df, dense, sparse, start_index):
+    ids = qa_point_ids(df, "test", "qa.csv")
+    return [models.PointStruct(id=pid, vector=vec, payload={}) for pid, vec in zip(ids, dense)]
+
+
+def _build_points(df, dense, sparse, start_index):
+    assert len(dense) == len(df)
+    return [
+        models.PointStruct(id=start_index + i, vector=vec, payload={"question": q})
+        for i, (vec, q) in enumerate(zip(dense, df["question"]))
+    ]
+
+
+@pytest.fixture
+def qa_csv(tmp_path):
+    path = tmp_path / "qa.csv"
+    rows = [{"Question": f"q{i}", "Answer": f"a{i}"} for i in range(10)]
+    rows.insert(5, {"Question": "q1", "Answer": "a1"})  # 別チャンクの重複
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+class TestIterCsvBatches:
+    """CSV分割読み込みのテスト"""
+
+    def test_matches_full_load(self, qa_csv):
+        """列名マッピング・全体での重複除去・通し番号が全件読み込みと一致"""
+        batches = list(iter_csv_batches(qa_csv, batch_size=3))
+        df = pd.concat(batches)
+        assert df["question"].tolist() == [f"q{i}" for i in range(10)]
+        assert df.index.tolist() == list(range(10))
+        assert all(len(b) <= 3 for b in batches)
+
+    def test_limit(self, qa_csv):
+        """limit件で打ち切る"""
+        df = pd.concat(iter_csv_batches(qa_csv, batch_size=4, limit=6))
+        assert len(df) == 6
+
+    def test_missing_column(self, tmp_path):
+        """必須列がない場合はValueError"""
+        path = tmp_path / "bad.csv"
+        pd.DataFrame({"question": ["q"]}).to_csv(path, index=False)
+        with pytest.raises(ValueError):
+            list(iter_csv_batches(str(path)))
+
+
+class TestRunIngestPipeline:
+    """パイプライン実行のテスト"""
+
+    def test_all_points_upserted_with_barrier(self, qa_csv):
+        """全ポイントが wait=True で1回ずつ送信される（再書き込みなし）"""
+        client = FakeQdrantClient()
+        stats = run_ingest_pipeline(
+            client, "col",
+            iter_csv_batches(qa_csv, batch_size=4),
+            text_fn=lambda df: df["question"].tolist(),
+            embed_dense=lambda texts: [[float(len(t))] for t in texts],
+            build_points=_build_points,
+            upsert_batch_size=3,
+        )
+
+        ids = sorted(pid for _, pids, wait in client.calls for pid in pids)
+        assert ids == list(range(10))
+        assert all(wait for _, _, wait in client.calls)
+        assert stats.rows == 10 and stats.points == 10 and stats.batches == 3
+
+    def test_dense_and_sparse_run_concurrently(self, qa_csv):
+        """Dense / Sparse Embedding が同一バッチで並列実行される"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def dense(texts):
+            barrier.wait()
+            return [[1.0] for _ in texts]
+
+        def sparse(texts):
+            barrier.wait()
+            return [models.SparseVector(indices=[0], values=[1.0]) for _ in texts]
+
+        received = []
+
+        def build(df, dense_vecs, sparse_vecs, start_index):
+            received.append(len(sparse_vecs))
+            return _build_points(df, dense_vecs, sparse_vecs, start_index)
+
+        stats = run_ingest_pipeline(
+            FakeQdrantClient(), "col",
+            iter_csv_batches(qa_csv, batch_size=20),
+            text_fn=lambda df: df["question"].tolist(),
+            embed_dense=dense,
+            build_points=build,
+            embed_sparse=sparse,
+            prefetch_batches=0,
+        )
+        assert received == [10]
+        assert stats.points == 10
+
+    def test_backpressure_bounds_pending_upserts(self, qa_csv):
+        """送信中のupsertは max_pending_upserts を超えない"""
+        client = FakeQdrantClient(delay=0.02)
+        stats = run_ingest_pipeline(
+            client, "col",
+            iter_csv_batches(qa_csv, batch_size=10),
+            text_fn=lambda df: df["question"].tolist(),
+            embed_dense=lambda texts: [[1.0] for _ in texts],
+            build_points=_build_points,
+            upsert_batch_size=1,
+            max_pending_upserts=2,
+        )
+        assert client.max_in_flight <= 2
+        assert stats.max_pending_upserts == 2
+
+    def test_upsert_error_propagates(self, qa_csv):
+        """upsertの失敗は呼び出し元に伝播する"""
+        class FailingClient(FakeQdrantClient):
+            def upsert(self, collection_name, points, wait=True):
+                raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            run_ingest_pipeline(
+                FailingClient(), "col",
+                iter_csv_batches(qa_csv, batch_size=4),
+                text_fn=lambda df: df["question"].tolist(),
+                embed_dense=lambda texts: [[1.0] for _ in texts],
+                build_points=_build_points,
+            )
+
+
+class TestPointIds:
+    """ポイントIDのテスト"""
+
+    def test_deterministic_uuid(self):
+        """同じ内容なら同じUUID、内容・スコープが違えば別のUUID"""
+        df = pd.DataFrame({"question": ["q1", "q2"], "answer": ["a1", "a2"]})
+        ids = qa_point_ids(df, "news", "/tmp/data/qa.csv")
+        assert ids == qa_point_ids(df, "news", "qa.csv")
+        assert len(set(ids)) == 2
+        assert ids[0] != qa_point_ids(df, "other", "qa.csv")[0]
+        # Embedding入力（回答を含めるか）が違えばベクトルも違うため別のID
+        assert ids[0] != qa_point_ids(df, "news", "qa.csv", include_answer=True)[0]
+        assert make_point_id("a", "b") != make_point_id("ab")
+
+
+class TestRunDeltaIngest:
+    """差分登録のテスト"""
+
+    def _run(self, client, path, embedded):
+        def embed(texts):
+            embedded.extend(texts)
+            return [[1.0] for _ in texts]
+
+        return run_delta_ingest(
+            client, "col",
+            iter_csv_batches(path, batch_size=4),
+            id_fn=lambda df: qa_point_ids(df, "test", "qa.csv"),
+            text_fn=lambda df: df["question"].tolist(),
+            embed_dense=embed,
+            build_points=_build_qa_points,
+        )
+
+    def test_only_delta_is_embedded(self, qa_csv, tmp_path):
+        """2回目は変更行のみEmbeddingし、消えた行と旧IDを削除する"""
+        client = FakeStoreClient(ids=[12345])  # 旧形式の整数ID
+        embedded = []
+        first = self._run(client, qa_csv, embedded)
+        assert first.points == 10 and first.skipped == 0
+        assert client.deleted == [12345]
+
+        # q3 を変更、q9 を削除
+        rows = [{"question": f"q{i}", "answer": f"a{i}"} for i in range(9)]
+        rows[3]["answer"] = "changed"
+        path = tmp_path / "qa2.csv"
+        pd.DataFrame(rows).to_csv(path, index=False)
+
+        embedded.clear()
+        client.deleted.clear()
+        second = self._run(client, str(path), embedded)
+
+        assert embedded == ["q3"]
+        assert second.points == 1 and second.skipped == 8 and second.deleted == 2
+        assert len(client.store) == 9
+
+    def test_truncated_input_does_not_delete(self, qa_csv):
+        """件数上限で切り詰めた入力では、上限以降の既存ポイントを削除しない"""
+        client = FakeStoreClient()
+        self._run(client, qa_csv, [])
+
+        stats = run_delta_ingest(
+            client, "col",
+            iter_csv_batches(qa_csv, batch_size=4, limit=3),
+            id_fn=lambda df: qa_point_ids(df, "test", "qa.csv"),
+            text_fn=lambda df: df["question"].tolist(),
+            embed_dense=lambda texts: [[1.0] for _ in texts],
+            build_points=_build_qa_points,
+            truncated=True,
+        )
+
+        assert stats.skipped == 3 and stats.deleted == 0
+        assert client.deleted == [] and len(client.store) == 10
+
+    def test_legacy_int_ids_are_deleted_from_qdrant(self, qa_csv):
+        """旧形式の整数IDは整数のまま削除リクエストに渡し、実際に削除される"""
+        client = QdrantClient(":memory:")
+        client.create_collection("col", vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT))
+        client.upsert("col", points=[models.PointStruct(id=12345, vector=[1.0], payload={})])
+        assert fetch_point_ids(client, "col") == {12345}
+
+        stats = self._run(client, qa_csv, [])
+
+        assert stats.deleted == 1
+        assert 12345 not in fetch_point_ids(client, "col")
+        assert client.count("col").count == 10
@@ -58,6 +58,7 @@ SYSTEM_INSTRUCTION_TEMPLATE = """
         *   **ただし、一般的なプログラミング言語の文法や使い方に関する質問にはツールを使用しないでください。**
     *   **現在利用可能なコレクションは以下の通りです:**
         {available_collections}
+    *   **どのコレクションに情報があるか判断できない場合は、`collection_names` に候補のコレクションを複数指定してください。1回の検索で同時に検索し、統合した結果が返ります（コレクションを変えて何度も検索する必要はありません）。**
 
 2.  **コレクション選択のヒント (言語と内容のマッチング)**:
     *   質問の言語と内容に応じて、最適なコレクションを選択してください。
@@ -69,7 +70,7 @@ SYSTEM_INSTRUCTION_TEMPLATE = """
 3.  **再試行戦略 (Multi-turn Strategy)**:
     *   **Step 1 (初回検索):** 質問内容に最も適したコレクションを選びます。(英語なら `cc_news`、日本のニュース・エンタメなら `livedoor`、一般知識なら `wikipedia`)
     *   **Step 2 (結果の評価):** もし検索結果が `[[NO_RAG_RESULT]]` (結果なし) だった場合、**すぐに諦めずに以下の戦略をとってください。**
-        *   **コレクション変更:** 別のコレクションを試してください。例えば `livedoor` で見つからなければ `wikipedia_ja` を、それでもなければ `japanese_text` を検索してください。
+        *   **コレクション変更:** 別のコレクションを試してください。例えば `livedoor` で見つからなければ `wikipedia_ja` と `japanese_text` を `collection_names` でまとめて検索してください。
         *   **クエリ変更:** キーワードを少し広げる、または同義語に変えて再検索する。英語コレクションには英語で、日本語コレクションには日本語で検索するよう注意してください。
     *   **Step 3 (諦め):** 複数のコレクションを試行しても情報が見つからない場合のみ、「情報が見つかりませんでした」と回答してください。
 
@@ -214,10 +215,10 @@ def run_agent_turn(chat_session: ChatSession, user_input: str) -> str:
                     if "LOW_SCORE" in tool_result:
                         reason = "LOW_SCORE"
                     
-                    collection_arg = tool_args.get('collection_name', 'unknown')
+                    collections_arg = list(tool_args.get('collection_names') or []) or [tool_args.get('collection_name', 'unknown')]
                     log_unanswered_question(
                         query=user_input,
-                        collections=[collection_arg],
+                        collections=collections_arg,
                         reason=reason,
                         agent_response="(Search Failed)"
                     )
@@ -22,15 +22,9 @@ from qdrant_client import QdrantClient
 # サービスモジュールからインポート
 from services.qdrant_service import (
     get_collection_stats,
-    load_csv_for_qdrant,
-    build_inputs_for_embedding,
-    embed_texts_for_qdrant,
     create_or_recreate_collection_for_qdrant,
-    build_points_for_qdrant,
-    upsert_points_to_qdrant,
+    register_csv_streaming,
 )
-# Wrapperから直接インポート (Sparse用)
-from qdrant_client_wrapper import embed_sparse_texts_unified
 from helper_embedding import get_embedding_dimensions, DEFAULT_EMBEDDING_PROVIDER
 
 logger = logging.getLogger(__name__)
@@ -115,6 +109,13 @@ def show_qdrant_registration_page():
             help="同名のコレクションが存在する場合、削除して新規作成します（チェックを外すと追加登録になります）",
         )
 
+        incremental = st.checkbox(
+            "差分登録（変更分のみ）",
+            value=False,
+            disabled=recreate_collection,
+            help="既存コレクションと比較し、新規・変更された行のみ登録、CSVから消えた行を削除します（上書き時は無効、データ件数制限時は削除しません）",
+        )
+
         include_answer = st.checkbox(
             "answerを含める（推奨）", 
             value=True, 
@@ -184,12 +185,6 @@ def show_qdrant_registration_page():
         add_log(f"🚀 登録処理開始: {selected_csv}")
 
         try:
-            # ステップ1: CSVロード
-            with st.spinner("📁 CSVファイル読み込み中..."):
-                add_log(f"📁 CSV読み込み: {csv_path}")
-                df = load_csv_for_qdrant(str(csv_path), limit=data_limit)
-                add_log(f"✅ {len(df)} 件のデータを読み込みました")
-
             # ステップ2: コレクション作成
             with st.spinner("🗄️ コレクション準備中..."):
                 add_log(f"🗄️ コレクション準備: {collection_name}")
@@ -206,26 +201,9 @@ def show_qdrant_registration_page():
                 )
                 add_log(f"✅ コレクション準備完了 (Sparse: {use_hybrid_search})")
 
-            # ステップ3: 埋め込み生成 (Dense)
-            with st.spinner("🔢 Dense埋め込み生成中..."):
-                add_log("🔢 Dense埋め込み生成開始")
-                texts = build_inputs_for_embedding(df, include_answer)
-                vectors = embed_texts_for_qdrant(
-                    texts, model="gemini-embedding-001" # model引数は互換性のため残るが内部でprovider使用
-                )
-                add_log(f"✅ {len(vectors)} 件のDense埋め込みを生成しました")
-            
-            # ステップ3.5: Sparse埋め込み生成
-            sparse_vectors = None
-            if use_hybrid_search:
-                with st.spinner("🔠 Sparse埋め込み生成中 (FastEmbed)..."):
-                    add_log("🔠 Sparse埋め込み生成開始 (FastEmbed)")
-                    sparse_vectors = embed_sparse_texts_unified(texts)
-                    add_log(f"✅ {len(sparse_vectors)} 件のSparse埋め込みを生成しました")
-
-            # ステップ4: ポイント構築
-            with st.spinner("📦 ポイント構築中..."):
-                add_log("📦 Qdrantポイント構築中")
+            # ステップ3: 読み込み → 埋め込み生成 → アップサート（ストリーミング）
+            with st.spinner("🔢 埋め込み生成・Qdrantアップサート中..."):
+                add_log(f"📁 CSVをストリーミング登録: {csv_path} (Sparse: {use_hybrid_search})")
                 # ドメイン名を推定
                 if "cc_news" in selected_csv.lower():
                     domain = "cc_news"
@@ -234,20 +212,20 @@ def show_qdrant_registration_page():
                 else:
                     domain = "custom"
 
-                points = build_points_for_qdrant(
-                    df, 
-                    vectors, 
-                    domain, 
-                    selected_csv,
-                    sparse_vectors=sparse_vectors
+                ingest_stats = register_csv_streaming(
+                    client,
+                    collection_name,
+                    str(csv_path),
+                    domain,
+                    include_answer=include_answer,
+                    use_sparse=use_hybrid_search,
+                    limit=data_limit,
+                    incremental=incremental and not recreate_collection,
+                    progress_callback=lambda s: add_log(f"⬆️ {s.rows:,} 件送信済み ({s.throughput:.1f} 件/秒)"),
                 )
-                add_log(f"✅ {len(points)} 個のポイントを構築しました")
-
-            # ステップ5: Qdrantアップサート
-            with st.spinner("⬆️ Qdrantアップサート中..."):
-                add_log("⬆️ Qdrantにアップサート中")
-                count = upsert_points_to_qdrant(client, collection_name, points)
+                count = ingest_stats.points
                 add_log(f"✅ {count} 件をQdrantに登録しました")
+                add_log(f"📊 {ingest_stats.summary()}")
 
             # 完了
             add_log("🎉 全処理完了！")
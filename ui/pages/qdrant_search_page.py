@@ -26,6 +26,7 @@ from services.qdrant_service import (
 )
 from services.file_service import load_source_qa_data
 from qdrant_client_wrapper import search_collection, embed_sparse_query_unified # Import search_collection and embed_sparse_query_unified
+from qdrant_client_async import QDRANT_USE_ASYNC, get_async_client
 
 def show_qdrant_search_page():
     """画面5: Qdrant検索"""
@@ -205,7 +206,7 @@ def show_qdrant_search_page():
                 
                 # search_collection関数を呼び出し
                 hits_dict_list = search_collection( # search_collection returns List[Dict[str, Any]]
-                    client=client,
+                    client=get_async_client(qdrant_url) if QDRANT_USE_ASYNC else client,  # 再実行をまたいで接続を再利用
                     collection_name=collection,
                     query_vector=qvec,
                     sparse_vector=sparse_vector if use_hybrid_search else None, # ハイブリッド検索が有効な場合のみSparseベクトルを渡す